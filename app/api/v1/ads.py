@@ -2,22 +2,23 @@
 TikTok Ads Creation API endpoints
 - Create ACE Ad (1 adgroup = 1 content)
 - Create ABX Ad (add content to existing adgroup)
+- async_job mode → background job + GET /ads/jobs/{job_id}
 """
 from typing import Optional, List, Dict
 import json
-from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.core.deps import get_db, get_current_user
-from app.models import AdAccount, Campaign, AdGroup, Ad, Content
+from app.models import AdAccount, Campaign, AdGroup, Content, TaskLog
 from app.models.platform import TargetingTemplate
 from app.models.enums import Platform, AdAccountStatus, AdStatus
 from app.models.user import User
 from app.services.tiktok_ads_service import TikTokAdsService
 from app.services.naming_service import NamingService
+from app.services.ad_creation_service import AdCreationError, AdCreationService
 from app.schemas.common import DataResponse, ListResponse
 
 
@@ -96,6 +97,8 @@ class CreateACEAdRequest(BaseModel):
     budget: Optional[float] = None  # daily budget for adgroup
     # Manual auth code input (fallback for influencer content without pre-registered auth)
     auth_code: Optional[str] = None
+    # true → enqueue แล้วคืน job_id ทันที (ดู GET /ads/jobs/{job_id})
+    async_job: bool = False
 
 
 class CreateABXAdRequest(BaseModel):
@@ -105,6 +108,8 @@ class CreateABXAdRequest(BaseModel):
     ad_name: str
     # Manual auth code input (fallback for influencer content without pre-registered auth)
     auth_code: Optional[str] = None
+    # true → enqueue แล้วคืน job_id ทันที (ดู GET /ads/jobs/{job_id})
+    async_job: bool = False
 
 
 class CreateAdResponse(BaseModel):
@@ -112,6 +117,7 @@ class CreateAdResponse(BaseModel):
     adgroup_id: Optional[str] = None
     ad_id: Optional[str] = None
     message: Optional[str] = None
+    job_id: Optional[int] = None
 
 
 class SuggestNamesRequest(BaseModel):
@@ -374,6 +380,10 @@ def create_adgroup(
 # Endpoints - Create Ads
 # ============================================
 
+def _raise_http(e: AdCreationError):
+    raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
 @router.post("/ace/create", response_model=DataResponse[CreateAdResponse])
 def create_ace_ad(
     payload: CreateACEAdRequest,
@@ -389,30 +399,22 @@ def create_ace_ad(
     - ถ้ามี SparkAdAuth bound อยู่แล้ว → ใช้ identity_id จาก SparkAdAuth
     - ถ้าไม่มี และส่ง auth_code มา → authorize ก่อนแล้วค่อย create
     - ถ้าไม่มีทั้งสอง → return error พร้อม needs_auth_code=true
-    """
-    from app.models import SparkAdAuth, SparkAuthStatus
-    from app.models.enums import ContentSource
-    from app.services.spark_auth_service import SparkAuthService
     
+    async_job=true → ตอบกลับทันทีพร้อม job_id (ดูสถานะที่ GET /ads/jobs/{job_id})
+    """
     advertiser = _get_active_advertiser_or_404(db, payload.advertiser_id)
-    # Validate content exists
-    content = db.query(Content).filter(Content.id == payload.content_id).first()
-    if not content:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Content not found"
-        )
-    
-    if content.platform != Platform.TIKTOK:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Content platform is not TikTok"
+    try:
+        content = AdCreationService.load_content(db, advertiser, payload.content_id)
+    except AdCreationError as e:
+        _raise_http(e)
+    
+    if payload.async_job:
+        task = AdCreationService.submit_job(
+            db, "ace", payload.model_dump(exclude={"async_job"}), user_id=current_user.id
         )
-    
-    if not content.platform_post_id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Content does not have a TikTok item ID"
+        return DataResponse(
+            data=CreateAdResponse(success=True, job_id=task.id, message="Queued"),
+            message=f"ACE Ad creation queued (job #{task.id})",
         )
     
     # Get targeting data if provided
@@ -424,93 +426,20 @@ def create_ace_ad(
         if targeting:
             targeting_data = targeting.settings
     
-    # Bind content to advertiser if not set; otherwise enforce same advertiser
-    if content.ad_account_id is None:
-        content.ad_account_id = advertiser.id
-        db.commit()
-        db.refresh(content)
-    elif content.ad_account_id != advertiser.id:
+    # Resolve identity for Spark Ads
+    try:
+        identity_id, identity_type, spark_auth = AdCreationService.resolve_identity(
+            db, content, advertiser, payload.auth_code, current_user.id
+        )
+    except AdCreationError as e:
+        _raise_http(e)
+    
+    if not identity_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Content is linked to a different advertiser account"
+            detail="Identity ID not found for this content/advertiser"
         )
     
-    # ============================================
-    # Resolve identity for Spark Ads
-    # ============================================
-    identity_id = None
-    identity_type = "TT_USER"
-    spark_auth = None
-    
-    # Check if content is INFLUENCER
-    is_influencer = content.content_source == ContentSource.INFLUENCER
-    
-    if is_influencer:
-        # For Influencer content: check SparkAdAuth first
-        spark_auth = db.query(SparkAdAuth).filter(
-            SparkAdAuth.content_id == content.id,
-            SparkAdAuth.status.in_([SparkAuthStatus.AUTHORIZED, SparkAuthStatus.BOUND]),
-            SparkAdAuth.deleted_at.is_(None),
-        ).first()
-        
-        if spark_auth and spark_auth.is_usable:
-            # Use identity from SparkAdAuth
-            identity_id = spark_auth.identity_id
-            identity_type = "AUTH_CODE"
-        elif payload.auth_code:
-            # Manual auth code provided - authorize it first
-            auth_result = SparkAuthService.authorize_single(
-                auth_code=payload.auth_code,
-                ad_account_id=advertiser.id,
-                influencer_name=content.creator_name,
-                imported_by=current_user.id,
-            )
-            
-            if auth_result.get("authorized", 0) > 0:
-                # Get the newly created SparkAdAuth
-                details = auth_result.get("details", [])
-                if details and details[0].get("status") in ["authorized", "bound"]:
-                    # Refetch to get the identity_id
-                    spark_auth = db.query(SparkAdAuth).filter(
-                        SparkAdAuth.auth_code == payload.auth_code,
-                        SparkAdAuth.deleted_at.is_(None),
-                    ).first()
-                    
-                    if spark_auth:
-                        identity_id = spark_auth.identity_id
-                        identity_type = "AUTH_CODE"
-                        
-                        # Bind to content if not already bound
-                        if not spark_auth.content_id:
-                            spark_auth.content_id = content.id
-                            spark_auth.status = SparkAuthStatus.BOUND
-                            db.commit()
-            
-            if not identity_id:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to authorize auth code: {auth_result.get('details', [{}])[0].get('error', 'Unknown error')}"
-                )
-        else:
-            # No SparkAdAuth and no manual auth_code
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail={
-                    "message": "Influencer content requires auth code. Please provide auth_code or pre-register it.",
-                    "needs_auth_code": True,
-                    "content_id": content.id,
-                }
-            )
-    else:
-        # For Official/Staff content: use standard identity lookup
-        identity_id = TikTokAdsService.get_identity_id(payload.advertiser_id, content.platform_post_id)
-        
-        if not identity_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Identity ID not found for this content/advertiser"
-            )
-    
     # Create adgroup + ad on TikTok
     result = TikTokAdsService.create_ace_adgroup_and_ad(
         advertiser_id=payload.advertiser_id,
@@ -525,25 +454,8 @@ def create_ace_ad(
         identity_type=identity_type,
     )
     
-    if result.get("success"):
-        # Mark SparkAdAuth as used
-        if spark_auth:
-            ad_id_str = result.get("ad_id")
-            if ad_id_str:
-                # Find or create internal Ad record
-                ad = db.query(Ad).filter(Ad.external_ad_id == ad_id_str).first()
-                spark_auth.status = SparkAuthStatus.USED
-                spark_auth.used_at = datetime.utcnow()
-                if ad:
-                    spark_auth.used_in_ad_id = ad.id
-                db.commit()
-        
-        # Sync the new ad back to our database
-        ad_account = db.query(AdAccount).filter(
-            AdAccount.external_account_id == payload.advertiser_id
-        ).first()
-        if ad_account:
-            TikTokAdsService.sync_ads_for_account(db, ad_account, days=1)
+    # Mark SparkAdAuth as used + sync the new ad back to our database
+    AdCreationService.finalize(db, payload.advertiser_id, result, spark_auth)
     
     return DataResponse(
         data=CreateAdResponse(**result),
@@ -566,116 +478,38 @@ def create_abx_ad(
     - ถ้ามี SparkAdAuth bound อยู่แล้ว → ใช้ identity_id จาก SparkAdAuth
     - ถ้าไม่มี และส่ง auth_code มา → authorize ก่อนแล้วค่อย create
     - ถ้าไม่มีทั้งสอง → return error พร้อม needs_auth_code=true
-    """
-    from app.models import SparkAdAuth, SparkAuthStatus
-    from app.models.enums import ContentSource
-    from app.services.spark_auth_service import SparkAuthService
     
+    async_job=true → ตอบกลับทันทีพร้อม job_id (ดูสถานะที่ GET /ads/jobs/{job_id})
+    """
     advertiser = _get_active_advertiser_or_404(db, payload.advertiser_id)
-    # Validate content exists
-    content = db.query(Content).filter(Content.id == payload.content_id).first()
-    if not content:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Content not found"
+    try:
+        content = AdCreationService.load_content(db, advertiser, payload.content_id)
+    except AdCreationError as e:
+        _raise_http(e)
+    
+    if payload.async_job:
+        task = AdCreationService.submit_job(
+            db, "abx", payload.model_dump(exclude={"async_job"}), user_id=current_user.id
         )
-    
-    if content.platform != Platform.TIKTOK:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Content platform is not TikTok"
+        return DataResponse(
+            data=CreateAdResponse(success=True, adgroup_id=payload.adgroup_id, job_id=task.id, message="Queued"),
+            message=f"ABX Ad creation queued (job #{task.id})",
         )
     
-    if not content.platform_post_id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Content does not have a TikTok item ID"
+    # Resolve identity for Spark Ads
+    try:
+        identity_id, identity_type, spark_auth = AdCreationService.resolve_identity(
+            db, content, advertiser, payload.auth_code, current_user.id
         )
+    except AdCreationError as e:
+        _raise_http(e)
     
-    # Bind content to advertiser if not set; otherwise enforce same advertiser
-    if content.ad_account_id is None:
-        content.ad_account_id = advertiser.id
-        db.commit()
-        db.refresh(content)
-    elif content.ad_account_id != advertiser.id:
+    if not identity_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Content is linked to a different advertiser account"
+            detail="Identity ID not found for this content/advertiser"
         )
     
-    # ============================================
-    # Resolve identity for Spark Ads
-    # ============================================
-    identity_id = None
-    identity_type = "TT_USER"
-    spark_auth = None
-    
-    # Check if content is INFLUENCER
-    is_influencer = content.content_source == ContentSource.INFLUENCER
-    
-    if is_influencer:
-        # For Influencer content: check SparkAdAuth first
-        spark_auth = db.query(SparkAdAuth).filter(
-            SparkAdAuth.content_id == content.id,
-            SparkAdAuth.status.in_([SparkAuthStatus.AUTHORIZED, SparkAuthStatus.BOUND]),
-            SparkAdAuth.deleted_at.is_(None),
-        ).first()
-        
-        if spark_auth and spark_auth.is_usable:
-            # Use identity from SparkAdAuth
-            identity_id = spark_auth.identity_id
-            identity_type = "AUTH_CODE"
-        elif payload.auth_code:
-            # Manual auth code provided - authorize it first
-            auth_result = SparkAuthService.authorize_single(
-                auth_code=payload.auth_code,
-                ad_account_id=advertiser.id,
-                influencer_name=content.creator_name,
-                imported_by=current_user.id,
-            )
-            
-            if auth_result.get("authorized", 0) > 0:
-                # Get the newly created SparkAdAuth
-                spark_auth = db.query(SparkAdAuth).filter(
-                    SparkAdAuth.auth_code == payload.auth_code,
-                    SparkAdAuth.deleted_at.is_(None),
-                ).first()
-                
-                if spark_auth:
-                    identity_id = spark_auth.identity_id
-                    identity_type = "AUTH_CODE"
-                    
-                    # Bind to content if not already bound
-                    if not spark_auth.content_id:
-                        spark_auth.content_id = content.id
-                        spark_auth.status = SparkAuthStatus.BOUND
-                        db.commit()
-            
-            if not identity_id:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to authorize auth code: {auth_result.get('details', [{}])[0].get('error', 'Unknown error')}"
-                )
-        else:
-            # No SparkAdAuth and no manual auth_code
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail={
-                    "message": "Influencer content requires auth code. Please provide auth_code or pre-register it.",
-                    "needs_auth_code": True,
-                    "content_id": content.id,
-                }
-            )
-    else:
-        # For Official/Staff content: use standard identity lookup
-        identity_id = TikTokAdsService.get_identity_id(payload.advertiser_id, content.platform_post_id)
-        
-        if not identity_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Identity ID not found for this content/advertiser"
-            )
-    
     # Create ad in existing adgroup on TikTok
     result = TikTokAdsService.create_abx_ad(
         advertiser_id=payload.advertiser_id,
@@ -686,24 +520,8 @@ def create_abx_ad(
         identity_type=identity_type,
     )
     
-    if result.get("success"):
-        # Mark SparkAdAuth as used
-        if spark_auth:
-            ad_id_str = result.get("ad_id")
-            if ad_id_str:
-                ad = db.query(Ad).filter(Ad.external_ad_id == ad_id_str).first()
-                spark_auth.status = SparkAuthStatus.USED
-                spark_auth.used_at = datetime.utcnow()
-                if ad:
-                    spark_auth.used_in_ad_id = ad.id
-                db.commit()
-        
-        # Sync the new ad back to our database
-        ad_account = db.query(AdAccount).filter(
-            AdAccount.external_account_id == payload.advertiser_id
-        ).first()
-        if ad_account:
-            TikTokAdsService.sync_ads_for_account(db, ad_account, days=1)
+    # Mark SparkAdAuth as used + sync the new ad back to our database
+    AdCreationService.finalize(db, payload.advertiser_id, result, spark_auth)
     
     return DataResponse(
         data=CreateAdResponse(**result),
@@ -711,6 +529,31 @@ def create_abx_ad(
     )
 
 
+@router.get("/jobs/{job_id}", response_model=DataResponse[Dict])
+def get_ad_creation_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    สถานะ job สร้าง ACE / ABX Ad
+    
+    status: pending / running / completed / failed
+    step: queued / identity / adgroup / ad / sync / done
+    """
+    task = db.query(TaskLog).filter(
+        TaskLog.id == job_id,
+        TaskLog.task_name.in_(list(AdCreationService.JOB_TASK_NAMES.values()))
+    ).first()
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return DataResponse(data=AdCreationService.get_job(task))
+
+
 # ============================================
 # Endpoints - Name Suggestions
 # ============================================
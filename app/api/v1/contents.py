@@ -2,6 +2,7 @@
 Content API endpoints
 """
 import re
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -17,6 +18,7 @@ from app.models.user import User
 from app.schemas.common import DataResponse, ListResponse
 from app.schemas.contents import TikTokImportRequest
 from app.services.naming_service import NamingService
+from app.services.score_history_service import ScoreHistoryService
 from app.services.thumbnail_service import process_content_thumbnail
 from app.services.tiktok_service import TikTokService
 from app.tasks import sync_tasks
@@ -597,6 +599,23 @@ def recalculate_pfm(db: Session = Depends(get_db)):
     )
 
 
+@router.post("/recalculate-scores")
+def recalculate_scores(
+    full: bool = Query(False, description="true = คำนวณทุก content (เช่นหลังแก้สูตร), false = เฉพาะที่เปลี่ยน"),
+    current_user: User = Depends(require_admin),
+):
+    """Recalculate PFM / FB / unified scores (score_tasks.calculate_all_scores)"""
+    from app.tasks.score_tasks import calculate_all_scores
+
+    result = calculate_all_scores(full=full)
+
+    return DataResponse(
+        success=True,
+        data=result,
+        message=f"Updated scores for {result['updated']} contents ({result['mode']})"
+    )
+
+
 # ============================================
 # Naming helpers for Boost / Ads creation
 # ============================================
@@ -973,6 +992,34 @@ def update_content(
         )
 
 
+@router.get("/{content_id}/score-history")
+def get_content_score_history(
+    content_id: int,
+    days: int = Query(30, ge=1, le=730),
+    db: Session = Depends(get_db),
+):
+    """
+    Score curve ของ content ย้อนหลัง `days` วัน (content_score_points)
+
+    จุดเก็บเฉพาะตอน score เปลี่ยน (step series) - จุดแรกอาจอยู่ก่อนช่วง = ค่า ณ ต้นช่วง
+    resolution: raw (7 วันล่าสุด) / hourly (ถึง 90 วัน) / daily
+    """
+    exists = db.query(Content.id).filter(
+        Content.id == content_id,
+        Content.deleted_at.is_(None)
+    ).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    points = ScoreHistoryService.get_curve(db, content_id, start)
+
+    return DataResponse(
+        success=True,
+        data={"content_id": content_id, "days": days, "points": points},
+    )
+
+
 @router.get("/{content_id}/ads")
 def get_content_ads(content_id: int, refresh: bool = False, db: Session = Depends(get_db)):
     """Get ads for a specific content. Set refresh=true to fetch real-time data from TikTok API."""
@@ -1111,6 +1158,7 @@ def refresh_tiktok_ads_data(content, ads_details: list, db: Session) -> list:
     import concurrent.futures
 
     from app.models import ABXAdgroup
+    from app.services.spend_ledger_service import SpendLedgerService
     from app.services.tiktok_ads_service import TikTokAdsService
 
     if not ads_details:
@@ -1160,14 +1208,7 @@ def refresh_tiktok_ads_data(content, ads_details: list, db: Session) -> list:
 
         try:
             # Parallel API calls for better performance
-            # NOTE: Use requests instead of httpx for Report API (httpx has issues with TikTok)
-            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                # 1. Fetch lifetime spend for this advertiser (real-time!)
-                future_spend = executor.submit(
-                    TikTokAdsService.fetch_lifetime_spend_by_advertiser,
-                    advertiser_id
-                )
-
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
                 # 2. Fetch ad details (ad_name, campaign_name, adgroup_name, status, etc.)
                 future_ad_details = executor.submit(
                     TikTokAdsService.fetch_ad_details_batch,
@@ -1182,8 +1223,13 @@ def refresh_tiktok_ads_data(content, ads_details: list, db: Session) -> list:
                     adgroup_ids_for_this
                 )
 
+                # 1. Lifetime spend from the spend ledger (closed days in DB + cached
+                #    intraday delta) - runs on this thread because it uses `db`
+                ad_spend_map = SpendLedgerService.get_lifetime_spend_by_advertiser(
+                    db, advertiser_id, ad_ids_for_this
+                )
+
                 # Wait for all to complete
-                ad_spend_map = future_spend.result()
                 ad_details_map = future_ad_details.result()
                 adgroup_map = future_adgroup.result()
 
@@ -1579,7 +1625,7 @@ def update_adgroup_budget_and_status(
         advertiser_id,
         adgroup_id,
         budget=float(budget) if budget is not None else None,
-        status=status
+        status=status,
     )
 
     if result.get("success"):
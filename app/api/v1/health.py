@@ -8,6 +8,8 @@ from sqlalchemy import text
 from app.core.deps import get_db
 from app.core.config import settings
 from app.schemas.common import DataResponse
+from app.services.tiktok_http import TikTokHttpClientRegistry
+from app.services.tiktok_request_executor import TikTokRequestExecutor
 
 router = APIRouter(tags=["Health"])
 
@@ -40,3 +42,12 @@ def database_health(db: Session = Depends(get_db)):
             "error": str(e)
         }
 
+
+@router.get("/health/tiktok-http")
+def tiktok_http_health():
+    """Shared TikTok HTTP client pool stats (connection reuse per host + rate limiter)"""
+    return {
+        "status": "healthy",
+        **TikTokHttpClientRegistry.stats(),
+        "executor": TikTokRequestExecutor.stats(),
+    }
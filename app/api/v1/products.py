@@ -3,12 +3,12 @@ Products and Product Groups API endpoints
 """
 from datetime import datetime
 from typing import List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.core.deps import get_db
-from app.models import Product, ProductGroup, TargetingTemplate, AdAccount
+from app.models import Product, ProductGroup, TargetingTemplate, AdAccount, TaskLog
 from app.models.enums import (
     ObjectiveCode, 
     OBJECTIVE_CODE_TO_TIKTOK, 
@@ -17,6 +17,7 @@ from app.models.enums import (
 )
 from app.services.tiktok_ads_service import TikTokAdsService
 from app.services.naming_service import NamingService
+from app.services.abx_bulk_create_service import ABXBulkCreateService
 
 
 router = APIRouter(prefix="/products", tags=["products"])
@@ -139,6 +140,7 @@ class AutoCreateAbxAdgroupsResponse(BaseModel):
     failed_count: int
     adgroups: List[Dict]
     message: str
+    job_id: Optional[int] = None  # background job (ดู progress ที่ GET .../abx/auto-create/{job_id})
 
 
 # ============================================
@@ -591,6 +593,7 @@ def preview_abx_adgroups(
 def auto_create_abx_adgroups(
     group_id: int,
     request: AutoCreateAbxAdgroupsRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -603,8 +606,12 @@ def auto_create_abx_adgroups(
     2. ตรวจสอบ Advertiser Account
     3. ดึง Targeting Templates
     4. Generate ชื่อ Adgroups ตาม pattern: [Products]_ABX_<OBJ>_(<Targeting>)_<Style>#<Num>
-    5. สร้าง Adgroups บน TikTok
-    6. บันทึกลง Database (ABXAdgroup)
+    5. ส่ง job เข้า background (ABXBulkCreateService) แล้วตอบกลับทันทีพร้อม job_id
+       - สร้าง Adgroups บน TikTok พร้อมกันหลายตัว
+       - บันทึกลง Database (ABXAdgroup) เป็นชุด
+       - ชื่อที่สร้างไปแล้วจะไม่ถูกสร้างซ้ำ (เรียกซ้ำได้ปลอดภัย)
+    
+    ดู progress ที่ GET /product-groups/{group_id}/abx/auto-create/{job_id}
     """
     # Get product group
     group = db.query(ProductGroup).filter(
@@ -636,80 +643,43 @@ def auto_create_abx_adgroups(
     if not targeting_templates:
         raise HTTPException(status_code=400, detail="No valid targeting templates found")
     
-    # Map objective code to TikTok optimization goal
-    obj_code = request.objective_code.upper()
-    try:
-        objective_enum = ObjectiveCode(obj_code)
-        optimization_goal = OBJECTIVE_CODE_TO_OPTIMIZATION.get(objective_enum, "VIDEO_VIEW")
-    except ValueError:
-        optimization_goal = "VIDEO_VIEW"
-    
-    # Create adgroups
-    created_adgroups = []
-    failed_adgroups = []
+    plan = ABXBulkCreateService.build_plan(
+        group,
+        targeting_templates,
+        request.content_types,
+        request.adgroups_per_style,
+        request.objective_code.upper(),
+    )
+    if not plan:
+        raise HTTPException(status_code=400, detail="Nothing to create")
     
-    for targeting in targeting_templates:
-        # Get targeting settings from template
-        targeting_settings = None
-        if targeting.settings:
-            targeting_settings = targeting.settings
-        
-        for style in request.content_types:
-            for i in range(1, request.adgroups_per_style + 1):
-                adgroup_name = NamingService.generate_adgroup_name(
-                    product_codes=group.product_codes,
-                    structure_code="ABX",
-                    objective_code=obj_code,
-                    targeting_code=targeting.name,
-                    content_style_code=style,
-                    index=i
-                )
-                
-                # Create adgroup on TikTok
-                result = TikTokAdsService.create_adgroup(
-                    advertiser_id=request.advertiser_id,
-                    campaign_id=request.campaign_id,
-                    adgroup_name=adgroup_name,
-                    targeting=targeting_settings,
-                    budget=request.budget_per_adgroup,
-                    optimization_goal=optimization_goal
-                )
-                
-                if result.get("success"):
-                    created_adgroups.append({
-                        "name": adgroup_name,
-                        "adgroup_id": result.get("adgroup_id"),
-                        "targeting": targeting.name,
-                        "style": style,
-                        "index": i
-                    })
-                else:
-                    failed_adgroups.append({
-                        "name": adgroup_name,
-                        "error": result.get("message", "Unknown error"),
-                        "targeting": targeting.name,
-                        "style": style,
-                        "index": i
-                    })
-    
-    # Generate response
-    total_created = len(created_adgroups)
-    total_failed = len(failed_adgroups)
-    
-    if total_created == 0 and total_failed > 0:
-        return AutoCreateAbxAdgroupsResponse(
-            success=False,
-            created_count=0,
-            failed_count=total_failed,
-            adgroups=failed_adgroups,
-            message=f"Failed to create all {total_failed} adgroups"
-        )
+    task = ABXBulkCreateService.start_job(db, group_id, request.model_dump(), total=len(plan))
+    background_tasks.add_task(ABXBulkCreateService.run_job, task.id)
     
     return AutoCreateAbxAdgroupsResponse(
         success=True,
-        created_count=total_created,
-        failed_count=total_failed,
-        adgroups=created_adgroups,
-        message=f"Created {total_created} adgroups" + (f", {total_failed} failed" if total_failed > 0 else "")
+        created_count=0,
+        failed_count=0,
+        adgroups=[],
+        message=f"Queued {len(plan)} adgroups (job #{task.id})",
+        job_id=task.id,
     )
 
+
+@groups_router.get("/{group_id}/abx/auto-create/{job_id}")
+def get_abx_auto_create_progress(group_id: int, job_id: int, db: Session = Depends(get_db)):
+    """
+    Progress ของ job สร้าง ABX Adgroups
+    
+    status: pending / running / completed / failed
+    adgroups[].state: created / existing / failed
+    """
+    task = db.query(TaskLog).filter(
+        TaskLog.id == job_id,
+        TaskLog.task_name == ABXBulkCreateService.TASK_NAME
+    ).first()
+    
+    if not task or (task.input_params or {}).get("group_id") != group_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return ABXBulkCreateService.get_progress(task)
@@ -20,6 +20,7 @@ from app.schemas.settings import (
     TikTokChannelsConfig,
     TikTokConfig,
 )
+from app.services.tiktok_service import TikTokService
 
 router = APIRouter(prefix="/settings", tags=["Settings"])
 
@@ -237,6 +238,9 @@ def update_tiktok_config(
 
     db.commit()
 
+    # credentials เปลี่ยน → token ที่ cache ไว้ใช้ไม่ได้แล้ว
+    TikTokService.invalidate_access_token()
+
     # Return latest values
     new_map = _get_tiktok_settings_map(db)
 
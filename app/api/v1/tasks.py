@@ -181,6 +181,7 @@ def run_task_now(
     - sync_tiktok_content
     - refresh_tiktok_organic
     - sync_campaigns_adgroups
+    - backfill_tiktok_ad_daily_report_task
     """
 
     from app.tasks import sync_tasks
@@ -204,6 +205,9 @@ def run_task_now(
     elif task_name == "sync_campaigns_adgroups":
         r = sync_tasks.sync_campaigns_adgroups()
         result = {"task": "sync_campaigns_adgroups", **r}
+    elif task_name == "backfill_tiktok_ad_daily_report_task":
+        r = sync_tasks.backfill_tiktok_ad_performance_daily_report_task()
+        result = {"task": "backfill_tiktok_ad_daily_report_task", **r}
     else:
         return DataResponse(
             success=False,
@@ -3,7 +3,7 @@ WeBoostX 2.0 Configuration
 Load settings from environment variables
 """
 from functools import lru_cache
-from typing import Optional, List
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -76,6 +76,98 @@ class Settings(BaseSettings):
     ADVERTISER_ID_ENTRA: Optional[str] = None
     ADVERTISER_ID_GRVT: Optional[str] = None
     TIKTOK_API_BASE_URL: str = "https://business-api.tiktok.com/open_api/v1.3"
+    # Access token cache (TikTokService.get_access_token)
+    TIKTOK_TOKEN_CACHE_SECONDS: int = 300  # token ตรง ๆ (ไม่มี expires_in)
+    TIKTOK_TOKEN_EXPIRY_SKEW_SECONDS: int = 300  # refresh ก่อนหมดอายุจริง
+    TIKTOK_TOKEN_FAILURE_CACHE_SECONDS: int = 30
+    # Shared HTTP client pool (app/services/tiktok_http.py)
+    TIKTOK_HTTP_TIMEOUT: float = 30.0
+    TIKTOK_HTTP2_ENABLED: bool = True  # ต้องติดตั้ง h2 (httpx[http2]) ด้วย
+    TIKTOK_HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    TIKTOK_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    TIKTOK_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    # Override per-host cap เช่น {"api-tiktok.julaherb.co": 10}
+    TIKTOK_HTTP_HOST_LIMITS: Dict[str, int] = {}
+    # Item detail fetcher (ITEM_DETAIL_API, app/services/item_detail_fetcher.py)
+    TIKTOK_ITEM_DETAIL_CONCURRENCY: int = 8  # ค่าเริ่มต้น (ปรับขึ้นลงตาม latency / error)
+    TIKTOK_ITEM_DETAIL_MIN_CONCURRENCY: int = 2
+    TIKTOK_ITEM_DETAIL_MAX_CONCURRENCY: int = 32
+    TIKTOK_ITEM_DETAIL_TARGET_LATENCY: float = 2.0  # seconds; ช้ากว่านี้ถือว่า upstream เริ่มอิ่ม
+    TIKTOK_ITEM_DETAIL_TIMEOUT: float = 10.0  # ต่อ request
+    TIKTOK_ITEM_DETAIL_MAX_ATTEMPTS: int = 3
+    TIKTOK_ITEM_DETAIL_WRITE_BATCH: int = 50  # update_content_details ทุก ๆ N items ที่ได้มา
+    # Item detail cache (app/services/item_detail_cache_service.py)
+    TIKTOK_ITEM_DETAIL_CACHE_ENABLED: bool = True
+    TIKTOK_ITEM_DETAIL_CACHE_LRU_SIZE: int = 5000  # in-process LRU หน้า tiktok_item_details
+    TIKTOK_ITEM_DETAIL_RECENT_POST_DAYS: int = 3  # โพสต์อายุไม่เกินนี้ใช้ TTL สั้น
+    TIKTOK_ITEM_DETAIL_RECENT_TTL_MINUTES: int = 15
+    TIKTOK_ITEM_DETAIL_OLD_TTL_HOURS: int = 24
+    # PFM scoring (app/services/pfm_score_engine.py)
+    PFM_SCORE_CHUNK_SIZE: int = 10000  # แถวต่อ chunk (อ่าน + UPDATE 1 ครั้ง)
+    # Score history (app/services/score_history_service.py)
+    SCORE_HISTORY_ENABLED: bool = True  # เขียน content_score_points ตอน score เปลี่ยน
+    SCORE_HISTORY_RAW_DAYS: int = 7  # เก่ากว่านี้ → รวมเป็นรายชั่วโมง
+    SCORE_HISTORY_HOURLY_DAYS: int = 90  # เก่ากว่านี้ → รวมเป็นรายวัน
+    SCORE_HISTORY_PARTITION_MONTHS_AHEAD: int = 2  # สร้าง partition รายเดือนล่วงหน้า
+    # Organic refresh planner (app/services/organic_refresh_planner.py)
+    ORGANIC_REFRESH_MIN_INTERVAL_MINUTES: int = 30  # item ที่เพิ่งถูกเลือกไม่เกินนี้ข้ามไป
+    ORGANIC_REFRESH_STALE_HOURS: float = 72.0  # ไม่ได้ refresh นานเท่านี้ขึ้นไป = staleness เต็ม
+    ORGANIC_REFRESH_VELOCITY_REF: float = 500.0  # views/hour ที่ให้คะแนน velocity เต็ม
+    ORGANIC_REFRESH_SPEND_REF: float = 5000.0  # ad spend (ช่วง SPEND_DAYS) ที่ให้คะแนน spend เต็ม
+    ORGANIC_REFRESH_SPEND_DAYS: int = 7
+    ORGANIC_REFRESH_EXPIRY_SOON_DAYS: int = 7  # expire_date ภายในกี่วันถือว่าใกล้หมดอายุ
+    ORGANIC_REFRESH_WEIGHTS: Dict[str, float] = {
+        "velocity": 0.45,
+        "spend": 0.30,
+        "expiry": 0.15,
+        "base": 0.10,
+    }
+    # Paginated endpoints: page 1 ก่อน แล้วดึงหน้าที่เหลือพร้อมกัน
+    TIKTOK_PAGE_FETCH_CONCURRENCY: int = 4
+    TIKTOK_REPORT_PIPELINE_DEPTH: int = 4  # หน้าที่ prefetch ค้างไว้ระหว่างเขียน DB
+    TIKTOK_VIDEO_SYNC_PIPELINE_DEPTH: int = 4  # หน้า /business/video/list/ ที่ prefetch ค้างไว้
+    TIKTOK_VIDEO_SYNC_CHECKPOINT_TTL_HOURS: int = 12  # cursor เก่ากว่านี้ไม่ resume (เริ่มหน้าแรกใหม่)
+    # Rate limit / retry กลาง (app/services/tiktok_request_executor.py)
+    TIKTOK_RATE_LIMIT_QPS: float = 10.0  # ต่อ advertiser_id
+    TIKTOK_RATE_LIMIT_BURST: float = 20.0
+    TIKTOK_MAX_INFLIGHT_REQUESTS: int = 16  # ทั้ง process
+    TIKTOK_RETRY_MAX_ATTEMPTS: int = 5
+    TIKTOK_RETRY_BASE_DELAY: float = 0.5  # seconds
+    TIKTOK_RETRY_MAX_DELAY: float = 30.0  # seconds
+    # sync_all_tiktok_ads: จำนวน ad account ที่ sync พร้อมกัน (1 = ทีละ account)
+    TIKTOK_ADS_SYNC_ACCOUNT_WORKERS: int = 4
+    # Spend ledger (lifetime spend = ad_performance_daily + intraday delta)
+    TIKTOK_SPEND_DELTA_CACHE_SECONDS: int = 600
+    TIKTOK_SPEND_LEDGER_MAX_GAP_DAYS: int = 7  # cursor ตามหลังเกินนี้ → fallback lifetime report
+    # Delta metadata sync (TikTokAdsService.sync_metadata_delta)
+    TIKTOK_METADATA_FULL_SYNC_HOURS: int = 24  # full reconciliation เป็น safety net
+    TIKTOK_METADATA_DELTA_OVERLAP_MINUTES: int = 10  # ถอย high-water mark กัน clock skew
+    TIKTOK_MODIFIED_FILTER_RECHECK_HOURS: int = 6  # advertiser ที่ API ไม่รับ modified_after → ลองใหม่หลังจากนี้
+    # AdgroupMutationQueue.submit: รอรวม budget / status changes จากหลาย request ก่อน flush เป็น batch
+    ADGROUP_MUTATION_FLUSH_SECONDS: float = 0.2
+    # Intraday hourly spend (app/services/intraday_spend_service.py)
+    TIKTOK_HOURLY_RESYNC_HOURS: int = 3  # ชั่วโมงล่าสุดที่ยังเขียนทับได้ (ที่เก่ากว่านี้ถือว่านิ่งแล้ว)
+    TIKTOK_HOURLY_RETENTION_DAYS: int = 2  # ลบทิ้งแม้ daily cursor ยังไม่ผ่าน
+    # Async report task backfill (app/services/tiktok_report_task_service.py)
+    TIKTOK_REPORT_TASK_MAX_DAYS: int = 365  # วันต่อ 1 task
+    TIKTOK_REPORT_TASK_POLL_SECONDS: float = 10.0
+    TIKTOK_REPORT_TASK_TIMEOUT_SECONDS: float = 1800.0
+
+    # Spark Ads identity cache (app/services/identity_cache_service.py)
+    TIKTOK_IDENTITY_CACHE_TTL_HOURS: int = 168  # TT_USER identity ที่ได้จาก /identity/get/
+
+    # Spark post index (app/services/spark_post_index_service.py)
+    TIKTOK_SPARK_POSTS_REFRESH_HOURS: int = 6  # account ที่ refresh ไม่เกินนี้ถือว่ายังสด
+    TIKTOK_SPARK_POSTS_ACCOUNT_WORKERS: int = 4
+
+    # ABX bulk adgroup creation (app/services/abx_bulk_create_service.py)
+    ABX_BULK_CREATE_CONCURRENCY: int = 4  # adgroup/create ที่ยิงพร้อมกันต่อ job
+    ABX_BULK_CREATE_WRITE_BATCH: int = 10  # เขียน abx_adgroups + progress ทุก ๆ N adgroups
+
+    # ACE/ABX ad creation jobs (app/services/ad_creation_service.py)
+    AD_CREATION_JOB_WORKERS: int = 4
+    AD_CREATION_JOB_MAX_ATTEMPTS: int = 3  # ต่อขั้น (identity / adgroup / ad)
+    AD_CREATION_JOB_RETRY_DELAY: float = 2.0  # seconds x attempt
 
     # ============================================
     # Facebook/Meta API Settings
@@ -123,6 +215,16 @@ class Settings(BaseSettings):
     LINE_NOTIFY_TOKEN: Optional[str] = None
     LINE_NOTIFY_TOKEN_ADMIN: Optional[str] = None
 
+    # ============================================
+    # SKU Signal Settings (app/services/sku_signal_service.py)
+    # ============================================
+    SKU_SIGNAL_WINDOW_DAYS: int = 28  # rolling window (เทียบกับ window ก่อนหน้าขนาดเท่ากันเป็น trend)
+    SKU_SIGNAL_WEIGHTS: Dict[str, float] = {
+        "online": 0.5,  # online_sales_daily.revenue
+        "saversure": 0.3,  # saversure_scans_daily.scan_count
+        "offline": 0.2,  # offline_sales_weekly.units_sold
+    }
+
     # ============================================
     # Scheduler Settings
     # ============================================
@@ -130,6 +232,8 @@ class Settings(BaseSettings):
     CONTENT_SYNC_INTERVAL_MINUTES: int = 60
     AD_SYNC_INTERVAL_MINUTES: int = 30
     OPTIMIZATION_INTERVAL_HOURS: int = 2
+    # run_budget_optimization: ส่ง budget ของ ABX adgroups ขึ้น TikTok จริง (ผ่าน AdgroupMutationQueue)
+    OPTIMIZATION_APPLY_ADGROUP_BUDGETS: bool = False
 
     # ============================================
     # Redis Settings (for caching/celery)
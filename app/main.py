@@ -19,6 +19,20 @@ async def lifespan(app: FastAPI):
     print(f"[STARTUP] Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     print(f"[ENV] Environment: {settings.ENVIRONMENT}")
     print(f"[DEBUG] Debug mode: {settings.DEBUG}")
+
+    # job สร้าง ad / adgroup รันใน thread ของ process → ที่ค้าง PENDING/RUNNING จากรอบก่อนไม่มีใครรันต่อแล้ว
+    try:
+        from app.services.abx_bulk_create_service import ABXBulkCreateService
+        from app.services.ad_creation_service import AdCreationService
+        from app.tasks.sync_tasks import fail_interrupted_tasks
+
+        interrupted = fail_interrupted_tasks(
+            [*AdCreationService.JOB_TASK_NAMES.values(), ABXBulkCreateService.TASK_NAME]
+        )
+        if interrupted:
+            print(f"[STARTUP] Marked {interrupted} interrupted creation jobs as failed")
+    except Exception as e:
+        print(f"[STARTUP] Cannot check interrupted jobs: {e}")
     
     # Initialize scheduler if enabled
     if settings.SCHEDULER_ENABLED:
@@ -34,6 +48,12 @@ async def lifespan(app: FastAPI):
         stop_scheduler()
         print("[SCHEDULER] Scheduler stopped")
     
+    # ปิด shared TikTok HTTP clients (keep-alive pool)
+    from app.services.tiktok_http import TikTokHttpClientRegistry
+    TikTokHttpClientRegistry.close_all()
+    from app.services.item_detail_fetcher import ItemDetailFetcher
+    ItemDetailFetcher.close()
+    
     print(f"[SHUTDOWN] Shutting down {settings.APP_NAME}")
 
 
@@ -4,6 +4,7 @@ Database models for WeBoostX 2.0
 # ABX models
 from app.models.abx import ABXAdgroup, ABXBudgetLog
 from app.models.ad_performance_daily import AdPerformanceDaily
+from app.models.ad_performance_hourly import AdPerformanceHourly
 from app.models.base import Base, BaseModel, SoftDeleteMixin, TimestampMixin
 
 # Budget models
@@ -19,6 +20,8 @@ from app.models.campaign import Ad, AdGroup, AdPerformanceHistory, Campaign
 
 # Content models
 from app.models.content import Content, ContentScoreHistory, ContentStaffAllocation
+from app.models.content_refresh_stat import ContentRefreshStat
+from app.models.content_score_point import ContentScorePoint
 
 # Employee/Influencer models
 from app.models.employee import ContentCreatorAssignment, Employee, Influencer
@@ -68,6 +71,11 @@ from app.models.targeting_cache import (
 # Task models
 from app.models.task import SyncStatus, TaskLog, TaskStatus
 
+# Spark Ads identity cache
+from app.models.tiktok_item_detail import TikTokItemDetail
+from app.models.tiktok_item_identity import TikTokItemIdentity
+from app.models.tiktok_spark_post import TikTokSparkPost
+
 # User models
 from app.models.user import Notification, User
 
@@ -90,10 +98,12 @@ __all__ = [
     "Product", "ProductGroup",
     
     # Content
-    "Content", "ContentScoreHistory", "ContentStaffAllocation",
+    "Content", "ContentScoreHistory", "ContentStaffAllocation", "ContentRefreshStat",
+    "ContentScorePoint",
     
     # Campaign/Ad
     "Campaign", "AdGroup", "Ad", "AdPerformanceHistory", "AdPerformanceDaily",
+    "AdPerformanceHourly",
     
     # ABX
     "ABXAdgroup", "ABXBudgetLog",
@@ -118,4 +128,5 @@ __all__ = [
     
     # Spark Ad Auth
     "SparkAdAuth", "SparkAuthImportLog", "SparkAuthStatus",
+    "TikTokItemDetail", "TikTokItemIdentity", "TikTokSparkPost",
 ]
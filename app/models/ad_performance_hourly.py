@@ -0,0 +1,38 @@
+"""
+Intraday (hourly) ad performance for the current day.
+
+Rationale:
+- Pacing (spend so far today) without calling external APIs from the optimizer / dashboards.
+- Compact on purpose: composite primary key, core metrics only, no JSON.
+- Rows are short-lived: once a day is closed into `ad_performance_daily`
+  (tiktok_daily_cursor passed it) its hourly rows are deleted.
+"""
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, Numeric, String, func
+
+from app.core.database import Base
+from app.models.enums import Platform
+
+
+class AdPerformanceHourly(Base):
+    """Hourly performance of an external ad for today (TikTok stat_time_hour)."""
+
+    __tablename__ = "ad_performance_hourly"
+
+    platform = Column(Enum(Platform), primary_key=True)
+    ad_account_id = Column(Integer, ForeignKey("ad_accounts.id"), primary_key=True)
+    external_ad_id = Column(String(100), primary_key=True)
+    # Start of the hour in the platform's report timezone (naive)
+    stat_hour = Column(DateTime, primary_key=True, index=True)
+
+    # Adgroup of the ad (report attribute) → today's spend per adgroup without joins
+    external_adgroup_id = Column(String(100), nullable=True, index=True)
+
+    spend = Column(Numeric(15, 2), default=0)
+    impressions = Column(Integer, default=0)
+    clicks = Column(Integer, default=0)
+    conversions = Column(Integer, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = ({"extend_existing": True},)
@@ -1,7 +1,7 @@
 """
 Campaign, AdGroup, Ad models - unified across platforms
 """
-from sqlalchemy import Column, Integer, String, Boolean, Enum, Text, Date, DateTime, JSON, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Enum, Text, Date, DateTime, JSON, Numeric, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel, SoftDeleteMixin
@@ -20,6 +20,14 @@ class Campaign(BaseModel, SoftDeleteMixin):
     """Campaign model - unified for TikTok and Facebook"""
     
     __tablename__ = "campaigns"
+    __table_args__ = (
+        UniqueConstraint(
+            "platform",
+            "ad_account_id",
+            "external_campaign_id",
+            name="uq_campaigns_platform_account_external",
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -76,6 +84,14 @@ class AdGroup(BaseModel, SoftDeleteMixin):
     """
     
     __tablename__ = "ad_groups"
+    __table_args__ = (
+        UniqueConstraint(
+            "platform",
+            "ad_account_id",
+            "external_adgroup_id",
+            name="uq_ad_groups_platform_account_external",
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -176,6 +192,14 @@ class Ad(BaseModel, SoftDeleteMixin):
     """Individual Ad"""
     
     __tablename__ = "ads"
+    __table_args__ = (
+        UniqueConstraint(
+            "platform",
+            "ad_account_id",
+            "external_ad_id",
+            name="uq_ads_platform_account_external",
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -227,6 +251,11 @@ class Ad(BaseModel, SoftDeleteMixin):
     # Platform-specific metrics
     # ============================================
     platform_metrics = Column(JSON, nullable=True)
+
+    # ============================================
+    # Platform-specific data (metadata snapshot จาก /ad/get/ รวม modify_time)
+    # ============================================
+    platform_data = Column(JSON, nullable=True)
     
     # ============================================
     # Sync tracking
@@ -1,13 +1,18 @@
 """
 Content model - unified content across all platforms
 """
-from sqlalchemy import Column, Integer, String, Boolean, Enum, Text, Date, DateTime, JSON, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Enum, Text, Date, DateTime, JSON, Numeric, ForeignKey, UniqueConstraint, Index, Sequence, text
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel, SoftDeleteMixin
 from app.models.enums import Platform, ContentType, ContentSource, ContentStatus, ContentStaffRole
 
 
+# เลขเวอร์ชัน (เพิ่มขึ้นเรื่อย ๆ) ของ input ของ score - ทุกการเขียน contents ต้อง bump (ดู Content.content_version)
+CONTENT_VERSION_SEQ = Sequence("content_version_seq", metadata=BaseModel.metadata)
+CONTENT_VERSION_NEXT = "nextval('content_version_seq')"
+
+
 class Content(BaseModel, SoftDeleteMixin):
     """
     Unified content model for all platforms (TikTok, Facebook, Instagram)
@@ -15,6 +20,21 @@ class Content(BaseModel, SoftDeleteMixin):
     """
     
     __tablename__ = "contents"
+    __table_args__ = (
+        UniqueConstraint(
+            "platform",
+            "platform_post_id",
+            name="uq_contents_platform_post",
+        ),
+        # content ที่ต้องคำนวณ score ใหม่ (ดู score_tasks.calculate_all_scores)
+        Index(
+            "ix_contents_score_dirty",
+            "id",
+            postgresql_where=text(
+                "deleted_at IS NULL AND (scored_version IS NULL OR content_version > scored_version)"
+            ),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -118,6 +138,16 @@ class Content(BaseModel, SoftDeleteMixin):
     fb_score = Column(Numeric(5, 2), nullable=True)   # Facebook performance score
     unified_score = Column(Numeric(5, 2), nullable=True)  # Unified Content Impact Score
     score_details = Column(JSON, nullable=True)  # Score breakdown
+    scored_at = Column(DateTime(timezone=True), nullable=True)  # คำนวณ score ล่าสุด (NULL = ยังไม่เคยคำนวณ)
+    # content_version bump ทุกครั้งที่แถวถูกเขียน (ORM onupdate / raw SQL ใช้ CONTENT_VERSION_NEXT)
+    # scored_version = content_version ที่อ่านตอนคำนวณ score → content_version > scored_version = ต้องคำนวณใหม่
+    content_version = Column(
+        BigInteger,
+        nullable=False,
+        server_default=text(CONTENT_VERSION_NEXT),
+        onupdate=text(CONTENT_VERSION_NEXT),
+    )
+    scored_version = Column(BigInteger, nullable=True)
     
     # ============================================
     # Boost Feature
@@ -185,7 +215,11 @@ class ContentStaffAllocation(BaseModel, SoftDeleteMixin):
 
 
 class ContentScoreHistory(BaseModel):
-    """Track content score changes over time"""
+    """
+    Track content score changes over time
+
+    score_tasks เขียน history ลง ContentScorePoint (content_score_points) แทน
+    """
     
     __tablename__ = "content_score_history"
     
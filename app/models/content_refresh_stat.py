@@ -0,0 +1,37 @@
+"""
+Per-content organic refresh state (TikTok item-detail refresh).
+
+Rationale:
+- The organic refresh job has a fixed API budget per run; OrganicRefreshPlanner
+  ranks contents by staleness, view velocity, ad spend and expiry instead of
+  always taking the newest posts.
+- Velocity is measured between refreshes, so the last seen view count and the
+  time it was seen must be persisted.
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Integer, func
+
+from app.core.database import Base
+
+
+class ContentRefreshStat(Base):
+    """สถานะ / สถิติการ refresh organic metrics ของ content หนึ่ง"""
+
+    __tablename__ = "content_refresh_stats"
+
+    content_id = Column(Integer, ForeignKey("contents.id", ondelete="CASCADE"), primary_key=True)
+
+    last_refreshed_at = Column(DateTime(timezone=True), nullable=True, index=True)  # ดึงสำเร็จล่าสุด
+    last_attempted_at = Column(DateTime(timezone=True), nullable=True)  # ถูกเลือกล่าสุด (สำเร็จหรือไม่ก็ตาม)
+
+    last_views = Column(BigInteger, nullable=True)  # views ตอน refresh สำเร็จล่าสุด
+    views_per_hour = Column(Float, nullable=True)  # EMA ของ view velocity ระหว่าง refresh
+
+    refresh_count = Column(Integer, nullable=False, default=0)
+    unchanged_count = Column(Integer, nullable=False, default=0)  # refresh ติดกันที่ views ไม่ขยับ
+    fail_count = Column(Integer, nullable=False, default=0)  # ดึงไม่สำเร็จติดกัน
+    last_score = Column(Float, nullable=True)  # priority ตอนถูกเลือกครั้งล่าสุด
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = ({"extend_existing": True},)
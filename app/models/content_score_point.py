@@ -0,0 +1,48 @@
+"""
+Compact score history (time series) per content.
+
+Rationale:
+- content_score_history (row per snapshot + JSON metrics_snapshot) grows too fast
+  if scores are snapshotted every 30 minutes for every content.
+- Points are written only when a score changes (step series), with numeric
+  columns only, into monthly range partitions on recorded_at.
+- ScoreHistoryService.compact() downsamples old points: raw → hourly → daily
+  (last value in each bucket).
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, Numeric, SmallInteger, text
+
+from app.core.database import Base
+
+
+class ContentScorePoint(Base):
+    """score ของ content ณ เวลาหนึ่ง (1 แถวต่อการเปลี่ยนแปลง / ต่อ bucket หลัง downsample)"""
+
+    __tablename__ = "content_score_points"
+
+    # resolution
+    RAW = 0
+    HOURLY = 1
+    DAILY = 2
+
+    content_id = Column(Integer, ForeignKey("contents.id", ondelete="CASCADE"), primary_key=True)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True)  # partition key (monthly)
+    resolution = Column(SmallInteger, primary_key=True, default=RAW)  # RAW / HOURLY / DAILY
+
+    pfm_score = Column(Numeric(5, 2), nullable=True)
+    fb_score = Column(Numeric(5, 2), nullable=True)
+    unified_score = Column(Numeric(5, 2), nullable=True)
+
+    # metrics ตอนที่ score เปลี่ยน
+    views = Column(BigInteger, nullable=True)
+    likes = Column(Integer, nullable=True)
+    comments = Column(Integer, nullable=True)
+    shares = Column(Integer, nullable=True)
+    saves = Column(Integer, nullable=True)
+    ads_total_cost = Column(Numeric(15, 2), nullable=True)
+
+    __table_args__ = (
+        # แถวที่ยัง downsample ต่อได้ (compact หาเฉพาะส่วนนี้ ไม่ scan partition เก่าทั้งหมด)
+        Index("ix_content_score_points_pending", "recorded_at", postgresql_where=text("resolution < 2")),
+        {"postgresql_partition_by": "RANGE (recorded_at)", "extend_existing": True},
+    )
@@ -1,7 +1,7 @@
 """
 Sales and offline signals models
 """
-from sqlalchemy import Column, Integer, String, Date, DateTime, JSON, Numeric
+from sqlalchemy import Column, Integer, String, Date, DateTime, JSON, Numeric, UniqueConstraint
 
 from app.models.base import BaseModel
 
@@ -87,6 +87,9 @@ class SKUSignal(BaseModel):
     """Aggregated SKU-level signals for optimization"""
     
     __tablename__ = "sku_signals"
+    __table_args__ = (
+        UniqueConstraint("date", "product_code", name="uq_sku_signals_date_product"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -0,0 +1,27 @@
+"""
+Cached responses of the external item-detail API (TikTokService.ITEM_DETAIL_API).
+
+Rationale:
+- Ads sync, organic refresh and manual import ask for the same item ids within
+  minutes of each other; each call is a slow external request.
+- Freshness depends on post age (see ItemDetailCacheService): recent posts still
+  move quickly, older posts are refreshed at most daily.
+"""
+
+from sqlalchemy import JSON, Column, DateTime, String, func
+
+from app.core.database import Base
+
+
+class TikTokItemDetail(Base):
+    """item detail ล่าสุดที่ดึงได้ของ TikTok item หนึ่ง"""
+
+    __tablename__ = "tiktok_item_details"
+
+    item_id = Column(String(100), primary_key=True)
+
+    detail = Column(JSON, nullable=False)  # response ทั้งก้อนจาก ITEM_DETAIL_API
+    item_created_at = Column(DateTime(timezone=True), nullable=True)  # create_time ของโพสต์ (ใช้เลือก TTL)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    __table_args__ = ({"extend_existing": True},)
@@ -0,0 +1,35 @@
+"""
+Identity cache for Spark Ads, keyed by TikTok item id.
+
+Rationale:
+- Ad creation needs (identity_id, identity_type) per advertiser + item; resolving it
+  live costs an API call on every ACE/ABX creation.
+- Filled in bulk from `/tt_video/list/` (AUTH_CODE identities of authorized posts)
+  and on lookup miss from `/identity/get/` (TT_USER identity of the advertiser).
+- identity_type is part of the key: a TT_USER fallback never replaces the AUTH_CODE
+  identity of the same advertiser + item (lookup prefers AUTH_CODE).
+"""
+
+from sqlalchemy import Column, DateTime, String, func
+
+from app.core.database import Base
+
+
+class TikTokItemIdentity(Base):
+    """Identity ที่ใช้สร้าง Spark Ad ของ item หนึ่งภายใต้ advertiser หนึ่ง"""
+
+    __tablename__ = "tiktok_item_identities"
+
+    advertiser_id = Column(String(100), primary_key=True)
+    item_id = Column(String(100), primary_key=True)
+
+    identity_id = Column(String(100), nullable=False)
+    identity_type = Column(String(50), primary_key=True)  # AUTH_CODE, TT_USER
+
+    # AUTH_CODE: ใช้ได้ถึงวันหมดอายุ authorization (None = ไม่ทราบ)
+    auth_end_time = Column(DateTime(timezone=True), nullable=True)
+    source = Column(String(30), nullable=True)  # tt_video_list, identity_get
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = ({"extend_existing": True},)
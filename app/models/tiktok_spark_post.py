@@ -0,0 +1,37 @@
+"""
+Local index of TikTok Spark Ad posts (authorized content) per advertiser.
+
+Rationale:
+- `/tt_video/list/` is the only source of authorization expiry; walking it for every
+  account each hour just to rebuild an in-memory map is slow and wasteful.
+- Rows are refreshed per account when stale (see SparkPostIndexService) and read by
+  expiry jobs with a single join on item_id.
+"""
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, func
+
+from app.core.database import Base
+
+
+class TikTokSparkPost(Base):
+    """Spark Ad post ที่ authorize ให้ advertiser หนึ่ง (1 แถวต่อ advertiser + item)"""
+
+    __tablename__ = "tiktok_spark_posts"
+
+    advertiser_id = Column(String(100), primary_key=True)
+    item_id = Column(String(100), primary_key=True, index=True)
+    ad_account_id = Column(Integer, ForeignKey("ad_accounts.id"), nullable=True, index=True)
+
+    identity_id = Column(String(100), nullable=True)
+    auth_code = Column(String(255), nullable=True)
+    auth_start_time = Column(DateTime(timezone=True), nullable=True)
+    auth_end_time = Column(DateTime(timezone=True), nullable=True, index=True)
+    ad_auth_status = Column(String(50), nullable=True)
+
+    # false เมื่อ post หายจาก tt_video/list ในรอบ refresh ล่าสุด (ยกเลิก / หมดอายุ)
+    is_listed = Column(Boolean, nullable=False, default=True)
+
+    first_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = ({"extend_existing": True},)
@@ -0,0 +1,366 @@
+"""
+ABX Bulk Create Service - สร้าง ABX Adgroups ชุดใหญ่แบบ background job
+
+ใช้โดย POST /product-groups/{group_id}/abx/auto-create
+
+- 1 job = 1 แถวใน task_logs (input_params = request, output_data = progress)
+- idempotency key = (advertiser_id, campaign_id, ชื่อจาก NamingService)
+    - ชื่อที่มีใน abx_adgroups แล้ว → ข้าม
+    - ชื่อที่มีบน TikTok ใต้ campaign เดียวกันแล้ว (เช่นรอบก่อนสร้างสำเร็จแต่ยังไม่ได้บันทึก) → ใช้ตัวเดิม
+    - ชื่อที่อีก job ใน process นี้กำลังสร้างอยู่ → ข้าม
+  ยิงซ้ำ (retry) จึงไม่ได้ adgroup ซ้ำ
+- adgroup/create ยิงพร้อมกัน ABX_BULK_CREATE_CONCURRENCY ตัว (rate limit ผ่าน TikTokRequestExecutor)
+- บันทึก abx_adgroups + อัปเดต progress ทุก ABX_BULK_CREATE_WRITE_BATCH ตัว
+"""
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import ABXAdgroup, ProductGroup, TargetingTemplate, TaskLog, TaskStatus
+from app.models.enums import (
+    OBJECTIVE_CODE_TO_OPTIMIZATION,
+    AdStatus,
+    ContentType,
+    ObjectiveCode,
+)
+from app.models.enums import Platform as PlatformEnum
+from app.services.naming_service import NamingService
+from app.services.tiktok_ads_service import TikTokAdsService
+
+
+class ABXBulkCreateService:
+    """Background bulk creation ของ ABX Adgroups"""
+
+    TASK_NAME = "abx_bulk_create_adgroups"
+
+    # idempotency keys ที่กำลังสร้างอยู่ใน process นี้ (advertiser_id, campaign_id, name)
+    _inflight: Set[Tuple[str, str, str]] = set()
+    _inflight_lock = threading.Lock()
+
+    # ============================================
+    # Plan
+    # ============================================
+
+    @staticmethod
+    def build_plan(
+        group: ProductGroup,
+        targeting_templates: List[TargetingTemplate],
+        content_types: List[str],
+        adgroups_per_style: int,
+        objective_code: str,
+    ) -> List[Dict]:
+        """รายการ adgroup ที่ต้องมี (targeting x style x index) ชื่อไม่ซ้ำกัน"""
+        plan: List[Dict] = []
+        seen: Set[str] = set()
+        for targeting in targeting_templates:
+            for style in content_types:
+                for i in range(1, adgroups_per_style + 1):
+                    name = NamingService.generate_adgroup_name(
+                        product_codes=group.product_codes,
+                        structure_code="ABX",
+                        objective_code=objective_code,
+                        targeting_code=targeting.name,
+                        content_style_code=style,
+                        index=i,
+                    )
+                    if name in seen:
+                        continue
+                    seen.add(name)
+                    plan.append({
+                        "name": name,
+                        "targeting_id": targeting.id,
+                        "targeting": targeting.name,
+                        "style": style,
+                        "index": i,
+                    })
+        return plan
+
+    # ============================================
+    # Job lifecycle
+    # ============================================
+
+    @classmethod
+    def start_job(cls, db: Session, group_id: int, params: Dict, total: int) -> TaskLog:
+        """สร้าง task log ของ job (caller ส่ง run_job เข้า background เอง)"""
+        task = TaskLog(
+            task_name=cls.TASK_NAME,
+            task_type="creation",
+            status=TaskStatus.PENDING,
+            input_params={**params, "group_id": group_id},
+            output_data=cls._progress([], total),
+            triggered_by="api",
+        )
+        db.add(task)
+        db.commit()
+        db.refresh(task)
+        return task
+
+    @staticmethod
+    def _progress(items: List[Dict], total: int) -> Dict:
+        counts = {"created": 0, "existing": 0, "failed": 0}
+        for item in items:
+            counts[item["state"]] = counts.get(item["state"], 0) + 1
+        return {"total": total, "done": len(items), **counts, "adgroups": list(items)}
+
+    @staticmethod
+    def get_progress(task: TaskLog) -> Dict:
+        data = task.output_data if isinstance(task.output_data, dict) else {}
+        return {
+            "job_id": task.id,
+            "status": task.status.value if task.status else None,
+            "total": data.get("total", 0),
+            "done": data.get("done", 0),
+            "created": data.get("created", 0),
+            "existing": data.get("existing", 0),
+            "failed": data.get("failed", 0),
+            "adgroups": data.get("adgroups", []),
+            "message": task.message or task.error_message,
+            "started_at": task.started_at,
+            "completed_at": task.completed_at,
+        }
+
+    # ============================================
+    # Persistence
+    # ============================================
+
+    @staticmethod
+    def _abx_row(item: Dict, params: Dict) -> Dict:
+        try:
+            group_style = ContentType(str(item["style"]).lower())
+        except ValueError:
+            group_style = None
+        return {
+            "platform": PlatformEnum.TIKTOK,
+            "external_adgroup_id": str(item["adgroup_id"]),
+            "external_campaign_id": str(params["campaign_id"]),
+            "external_advertiser_id": str(params["advertiser_id"]),
+            "name": item["name"],
+            "group_style": group_style,
+            "product_group_id": params["group_id"],
+            "targeting_template_id": item.get("targeting_id"),
+            "status": AdStatus.ACTIVE,
+            "is_active": True,
+            "plan_budget": params.get("budget_per_adgroup"),
+        }
+
+    @classmethod
+    def _write_batch(cls, db: Session, task: TaskLog, rows: List[Dict], items: List[Dict], total: int) -> None:
+        """บันทึก abx_adgroups ที่ค้าง + progress ใน transaction เดียว"""
+        if rows:
+            stmt = pg_insert(ABXAdgroup.__table__).values(rows)
+            db.execute(stmt.on_conflict_do_nothing(index_elements=["external_adgroup_id"]))
+            rows.clear()
+        task.output_data = cls._progress(items, total)
+        db.commit()
+
+    # ============================================
+    # Run
+    # ============================================
+
+    @classmethod
+    def _remote_adgroups_by_name(cls, advertiser_id: str, campaign_id: str, names: Set[str]) -> Dict[str, str]:
+        """
+        adgroup ที่มีบน TikTok แล้วใต้ campaign นี้ (เฉพาะชื่อที่อยู่ในแผน) → {name: adgroup_id}
+        ดึงไม่สำเร็จ / ไม่ครบ → raise (ห้ามตีความว่า "ยังไม่มี" แล้วสร้างซ้ำ)
+        """
+        found: Dict[str, str] = {}
+        for ag in TikTokAdsService.fetch_adgroups(advertiser_id, campaign_ids=[campaign_id], raise_on_error=True):
+            name = ag.get("adgroup_name")
+            if name in names and ag.get("adgroup_id") and name not in found:
+                found[name] = str(ag["adgroup_id"])
+        return found
+
+    @classmethod
+    def run_job(cls, task_id: int) -> None:
+        """รัน job (เรียกจาก BackgroundTasks) - เปิด session เอง"""
+        db = SessionLocal()
+        claimed: Set[Tuple[str, str, str]] = set()
+        try:
+            task = db.query(TaskLog).filter(TaskLog.id == task_id).first()
+            if not task:
+                return
+
+            params = dict(task.input_params or {})
+            advertiser_id = str(params["advertiser_id"])
+            campaign_id = str(params["campaign_id"])
+
+            group = db.query(ProductGroup).filter(ProductGroup.id == params["group_id"]).first()
+            templates = (
+                db.query(TargetingTemplate)
+                .filter(TargetingTemplate.id.in_(params.get("targeting_ids") or []))
+                .all()
+            )
+            settings_by_targeting = {t.id: t.settings or None for t in templates}
+
+            obj_code = str(params.get("objective_code") or "VV").upper()
+            try:
+                optimization_goal = OBJECTIVE_CODE_TO_OPTIMIZATION.get(ObjectiveCode(obj_code), "VIDEO_VIEW")
+            except ValueError:
+                optimization_goal = "VIDEO_VIEW"
+
+            plan = cls.build_plan(
+                group,
+                templates,
+                params.get("content_types") or [],
+                int(params.get("adgroups_per_style") or 0),
+                obj_code,
+            )
+            total = len(plan)
+            names = {spec["name"] for spec in plan}
+
+            task.status = TaskStatus.RUNNING
+            task.started_at = datetime.now()
+            task.output_data = cls._progress([], total)
+            db.commit()
+
+            items: List[Dict] = []
+            pending_rows: List[Dict] = []
+
+            # 1) มีใน abx_adgroups แล้ว
+            local = dict(
+                db.query(ABXAdgroup.name, ABXAdgroup.external_adgroup_id)
+                .filter(
+                    ABXAdgroup.external_advertiser_id == advertiser_id,
+                    ABXAdgroup.external_campaign_id == campaign_id,
+                    ABXAdgroup.name.in_(list(names)),
+                )
+                .all()
+            )
+            # 2) มีบน TikTok แล้วแต่ยังไม่มีใน DB (เช็คไม่ได้ → item ที่เหลือ fail ไม่สร้าง)
+            lookup_error = None
+            try:
+                remote = cls._remote_adgroups_by_name(advertiser_id, campaign_id, names - set(local))
+            except Exception as e:
+                print(f"[ABXBulkCreateService] Job {task_id}: remote adgroup lookup failed: {e}")
+                remote = {}
+                lookup_error = f"Cannot check existing adgroups on TikTok: {e}"
+
+            todo: List[Dict] = []
+            for spec in plan:
+                existing_id = local.get(spec["name"]) or remote.get(spec["name"])
+                if existing_id:
+                    item = {**spec, "adgroup_id": existing_id, "state": "existing"}
+                    items.append(item)
+                    if spec["name"] in remote:
+                        pending_rows.append(cls._abx_row(item, params))
+                    continue
+                if lookup_error:
+                    items.append({**spec, "adgroup_id": None, "state": "failed", "error": lookup_error})
+                    continue
+
+                # 3) job อื่นกำลังสร้างชื่อนี้อยู่
+                key = (advertiser_id, campaign_id, spec["name"])
+                with cls._inflight_lock:
+                    if key in cls._inflight:
+                        items.append({**spec, "adgroup_id": None, "state": "failed",
+                                      "error": "Being created by another job"})
+                        continue
+                    cls._inflight.add(key)
+                    claimed.add(key)
+                todo.append(spec)
+
+            cls._write_batch(db, task, pending_rows, items, total)
+            print(
+                f"[ABXBulkCreateService] Job {task_id}: {total} planned, "
+                f"{len(items)} already exist/skipped, {len(todo)} to create"
+            )
+
+            def create(spec: Dict) -> Dict:
+                return TikTokAdsService.create_adgroup(
+                    advertiser_id=advertiser_id,
+                    campaign_id=campaign_id,
+                    adgroup_name=spec["name"],
+                    targeting=settings_by_targeting.get(spec["targeting_id"]),
+                    budget=params.get("budget_per_adgroup", 500.0),
+                    optimization_goal=optimization_goal,
+                )
+
+            batch_size = max(settings.ABX_BULK_CREATE_WRITE_BATCH, 1)
+            failed_specs: List[Dict] = []
+            since_write = 0
+
+            if todo:
+                workers = max(min(settings.ABX_BULK_CREATE_CONCURRENCY, len(todo)), 1)
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="abx-create") as executor:
+                    futures = {executor.submit(create, spec): spec for spec in todo}
+                    for future in as_completed(futures):
+                        spec = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {"success": False, "message": str(e)}
+
+                        if result.get("success") and result.get("adgroup_id"):
+                            item = {**spec, "adgroup_id": str(result["adgroup_id"]), "state": "created"}
+                            pending_rows.append(cls._abx_row(item, params))
+                            items.append(item)
+                        else:
+                            failed_specs.append({**spec, "error": result.get("message", "Unknown error")})
+
+                        since_write += 1
+                        if since_write >= batch_size:
+                            cls._write_batch(db, task, pending_rows, items + cls._failed_items(failed_specs), total)
+                            since_write = 0
+
+            # create ที่ "ล้ม" อาจสำเร็จฝั่ง TikTok แล้ว (timeout) → ตรวจซ้ำ 1 ครั้งก่อนสรุป
+            if failed_specs:
+                try:
+                    late = cls._remote_adgroups_by_name(
+                        advertiser_id, campaign_id, {s["name"] for s in failed_specs}
+                    )
+                except Exception as e:
+                    print(f"[ABXBulkCreateService] Job {task_id}: reconcile failed: {e}")
+                    late = {}
+                still_failed = []
+                for spec in failed_specs:
+                    if spec["name"] in late:
+                        item = {k: v for k, v in spec.items() if k != "error"}
+                        item.update({"adgroup_id": late[spec["name"]], "state": "created"})
+                        pending_rows.append(cls._abx_row(item, params))
+                        items.append(item)
+                    else:
+                        still_failed.append(spec)
+                failed_specs = still_failed
+
+            items.extend(cls._failed_items(failed_specs))
+            cls._write_batch(db, task, pending_rows, items, total)
+
+            progress = cls._progress(items, total)
+            succeeded = progress["created"] + progress["existing"]
+            task.status = TaskStatus.COMPLETED if succeeded or not progress["failed"] else TaskStatus.FAILED
+            task.completed_at = datetime.now()
+            task.items_processed = total
+            task.items_success = succeeded
+            task.items_failed = progress["failed"]
+            task.message = (
+                f"Created {progress['created']} adgroups, {progress['existing']} already existed"
+                + (f", {progress['failed']} failed" if progress["failed"] else "")
+            )
+            db.commit()
+            print(f"[ABXBulkCreateService] Job {task_id}: {task.message}")
+
+        except Exception as e:
+            db.rollback()
+            print(f"[ABXBulkCreateService] Job {task_id} error: {e}")
+            task = db.query(TaskLog).filter(TaskLog.id == task_id).first()
+            if task:
+                task.status = TaskStatus.FAILED
+                task.completed_at = datetime.now()
+                task.error_message = str(e)
+                task.error_traceback = traceback.format_exc()
+                db.commit()
+        finally:
+            with cls._inflight_lock:
+                cls._inflight.difference_update(claimed)
+            db.close()
+
+    @staticmethod
+    def _failed_items(failed_specs: List[Dict]) -> List[Dict]:
+        return [{**spec, "adgroup_id": None, "state": "failed"} for spec in failed_specs]
@@ -0,0 +1,425 @@
+"""
+Ad Creation Service - ขั้นตอนสร้าง ACE / ABX Ad ที่ใช้ร่วมกันระหว่าง endpoint และ job
+
+ใช้โดย POST /ads/ace/create และ POST /ads/abx/create
+
+- sync mode: endpoint เรียก resolve_identity → TikTokAdsService.create_* → finalize ตามเดิม
+- job mode (async_job=true): endpoint ตรวจ advertiser / content แล้ว submit_job คืน job_id ทันที
+    - 1 job = 1 แถวใน task_logs (input_params = payload, output_data = ขั้นตอน + ผลลัพธ์)
+    - worker pool ขนาด AD_CREATION_JOB_WORKERS รันทีละขั้น: identity → adgroup (ACE) → ad → sync
+    - แต่ละขั้น retry ได้ AD_CREATION_JOB_MAX_ATTEMPTS ครั้ง (backoff AD_CREATION_JOB_RETRY_DELAY)
+    - adgroup_id ที่สร้างแล้วถูกเก็บไว้ใน output_data ก่อนสร้าง ad → retry ไม่สร้าง adgroup ซ้ำ
+    - ก่อน retry สร้าง adgroup / ad จะเช็คบน TikTok ก่อน (รอบก่อนอาจสำเร็จแต่ timeout)
+      เช็คไม่ได้ = ไม่สร้าง (นับเป็น attempt ที่ล้ม)
+    - job ที่ค้าง PENDING/RUNNING ตอน restart ถูก mark FAILED ตอน startup (main.lifespan)
+    - ดูสถานะที่ GET /ads/jobs/{job_id}
+"""
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import Ad, AdAccount, Content, TaskLog, TaskStatus
+from app.models.enums import ContentSource, Platform
+from app.models.platform import TargetingTemplate
+from app.services.tiktok_ads_service import TikTokAdsService
+
+
+class AdCreationError(Exception):
+    """validation / identity error ที่ไม่ควร retry (map เป็น HTTPException ใน endpoint)"""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(detail if isinstance(detail, str) else detail.get("message", str(detail)))
+        self.status_code = status_code
+        self.detail = detail
+
+
+class AdCreationService:
+    """สร้าง ACE / ABX Ad แบบ sync หรือ background job"""
+
+    JOB_TASK_NAMES = {"ace": "ad_create_ace", "abx": "ad_create_abx"}
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    # ============================================
+    # Shared steps
+    # ============================================
+
+    @staticmethod
+    def load_content(db: Session, advertiser: AdAccount, content_id: int) -> Content:
+        """ตรวจ content + bind กับ advertiser (ถ้ายังไม่ได้ bind)"""
+        content = db.query(Content).filter(Content.id == content_id).first()
+        if not content:
+            raise AdCreationError(404, "Content not found")
+
+        if content.platform != Platform.TIKTOK:
+            raise AdCreationError(400, "Content platform is not TikTok")
+
+        if not content.platform_post_id:
+            raise AdCreationError(400, "Content does not have a TikTok item ID")
+
+        # Bind content to advertiser if not set; otherwise enforce same advertiser
+        if content.ad_account_id is None:
+            content.ad_account_id = advertiser.id
+            db.commit()
+            db.refresh(content)
+        elif content.ad_account_id != advertiser.id:
+            raise AdCreationError(400, "Content is linked to a different advertiser account")
+
+        return content
+
+    @staticmethod
+    def resolve_identity(
+        db: Session,
+        content: Content,
+        advertiser: AdAccount,
+        auth_code: Optional[str] = None,
+        user_id: Optional[int] = None,
+    ) -> Tuple[Optional[str], str, object]:
+        """
+        หา identity สำหรับ Spark Ads
+
+        For Influencer content:
+        - ถ้ามี SparkAdAuth bound อยู่แล้ว → ใช้ identity_id จาก SparkAdAuth
+        - ถ้าไม่มี และส่ง auth_code มา → authorize ก่อนแล้วค่อย create
+        - ถ้าไม่มีทั้งสอง → AdCreationError พร้อม needs_auth_code=true
+
+        For Official/Staff content: TikTokAdsService.get_identity (identity cache → /identity/get/)
+        (คืน identity_id=None ถ้าหาไม่เจอ ให้ caller ตัดสินใจ retry / error)
+
+        Returns:
+            (identity_id, identity_type, spark_auth)
+        """
+        from app.models import SparkAdAuth, SparkAuthStatus
+        from app.services.spark_auth_service import SparkAuthService
+
+        if content.content_source != ContentSource.INFLUENCER:
+            identity_id, identity_type = TikTokAdsService.get_identity(
+                advertiser.external_account_id, content.platform_post_id, db=db
+            )
+            return identity_id, identity_type, None
+
+        spark_auth = db.query(SparkAdAuth).filter(
+            SparkAdAuth.content_id == content.id,
+            SparkAdAuth.status.in_([SparkAuthStatus.AUTHORIZED, SparkAuthStatus.BOUND]),
+            SparkAdAuth.deleted_at.is_(None),
+        ).first()
+
+        if spark_auth and spark_auth.is_usable:
+            return spark_auth.identity_id, "AUTH_CODE", spark_auth
+
+        if not auth_code:
+            raise AdCreationError(400, {
+                "message": "Influencer content requires auth code. Please provide auth_code or pre-register it.",
+                "needs_auth_code": True,
+                "content_id": content.id,
+            })
+
+        # Manual auth code provided - authorize it first
+        auth_result = SparkAuthService.authorize_single(
+            auth_code=auth_code,
+            ad_account_id=advertiser.id,
+            influencer_name=content.creator_name,
+            imported_by=user_id,
+        )
+
+        if auth_result.get("authorized", 0) > 0:
+            spark_auth = db.query(SparkAdAuth).filter(
+                SparkAdAuth.auth_code == auth_code,
+                SparkAdAuth.deleted_at.is_(None),
+            ).first()
+
+            if spark_auth and spark_auth.identity_id:
+                # Bind to content if not already bound
+                if not spark_auth.content_id:
+                    spark_auth.content_id = content.id
+                    spark_auth.status = SparkAuthStatus.BOUND
+                    db.commit()
+                return spark_auth.identity_id, "AUTH_CODE", spark_auth
+
+        raise AdCreationError(
+            400,
+            f"Failed to authorize auth code: {auth_result.get('details', [{}])[0].get('error', 'Unknown error')}",
+        )
+
+    @staticmethod
+    def finalize(db: Session, advertiser_id: str, result: Dict, spark_auth=None) -> None:
+        """หลังสร้างสำเร็จ: mark SparkAdAuth ว่าใช้แล้ว + sync ad ใหม่กลับเข้า DB"""
+        from app.models import SparkAuthStatus
+
+        if not result.get("success"):
+            return
+
+        if spark_auth:
+            ad_id_str = result.get("ad_id")
+            if ad_id_str:
+                ad = db.query(Ad).filter(Ad.external_ad_id == ad_id_str).first()
+                spark_auth.status = SparkAuthStatus.USED
+                spark_auth.used_at = datetime.utcnow()
+                if ad:
+                    spark_auth.used_in_ad_id = ad.id
+                db.commit()
+
+        ad_account = db.query(AdAccount).filter(
+            AdAccount.external_account_id == advertiser_id
+        ).first()
+        if ad_account:
+            TikTokAdsService.sync_ads_for_account(db, ad_account, days=1)
+
+    # ============================================
+    # Jobs
+    # ============================================
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(settings.AD_CREATION_JOB_WORKERS, 1),
+                    thread_name_prefix="ad-create",
+                )
+            return cls._executor
+
+    @classmethod
+    def submit_job(cls, db: Session, kind: str, payload: Dict, user_id: Optional[int] = None) -> TaskLog:
+        """บันทึก job (PENDING) แล้วส่งเข้า worker pool"""
+        task = TaskLog(
+            task_name=cls.JOB_TASK_NAMES[kind],
+            task_type="creation",
+            status=TaskStatus.PENDING,
+            input_params={**payload, "user_id": user_id},
+            output_data={"step": "queued", "attempts": {}},
+            triggered_by=f"user:{user_id}" if user_id else "api",
+        )
+        db.add(task)
+        db.commit()
+        db.refresh(task)
+
+        cls._get_executor().submit(cls.run_job, task.id)
+        return task
+
+    @staticmethod
+    def get_job(task: TaskLog) -> Dict:
+        data = task.output_data if isinstance(task.output_data, dict) else {}
+        return {
+            "job_id": task.id,
+            "kind": task.task_name,
+            "status": task.status.value if task.status else None,
+            "step": data.get("step"),
+            "attempts": data.get("attempts", {}),
+            "adgroup_id": data.get("adgroup_id"),
+            "ad_id": data.get("ad_id"),
+            "error": data.get("error") or task.error_message,
+            "message": task.message,
+            "started_at": task.started_at,
+            "completed_at": task.completed_at,
+        }
+
+    @staticmethod
+    def _set_progress(db: Session, task: TaskLog, **updates) -> None:
+        data = dict(task.output_data or {})
+        data.update(updates)
+        task.output_data = data
+        db.commit()
+
+    @classmethod
+    def _run_step(cls, db: Session, task: TaskLog, step: str, fn) -> Dict:
+        """
+        รัน 1 ขั้น พร้อม retry
+
+        fn() คืน dict ที่มี success; AdCreationError ไม่ retry
+        """
+        attempts = max(settings.AD_CREATION_JOB_MAX_ATTEMPTS, 1)
+        result: Dict = {"success": False, "message": "not run"}
+        for attempt in range(1, attempts + 1):
+            counts = dict((task.output_data or {}).get("attempts") or {})
+            counts[step] = attempt
+            cls._set_progress(db, task, step=step, attempts=counts)
+            try:
+                result = fn()
+            except AdCreationError:
+                raise
+            except Exception as e:
+                db.rollback()
+                result = {"success": False, "message": str(e)}
+
+            if result.get("success"):
+                return result
+            print(f"[AdCreationService] Job {task.id} {step} attempt {attempt}/{attempts} failed: {result.get('message')}")
+            if attempt < attempts:
+                time.sleep(settings.AD_CREATION_JOB_RETRY_DELAY * attempt)
+        return result
+
+    @staticmethod
+    def _find_adgroup_by_name(advertiser_id: str, campaign_id: str, name: str) -> Optional[str]:
+        for ag in TikTokAdsService.fetch_adgroups(advertiser_id, campaign_ids=[campaign_id], raise_on_error=True):
+            if ag.get("adgroup_name") == name and ag.get("adgroup_id"):
+                return str(ag["adgroup_id"])
+        return None
+
+    @staticmethod
+    def _find_ad(advertiser_id: str, adgroup_id: str, name: str, item_id: Optional[str]) -> Optional[str]:
+        """ad ใน adgroup ที่ชื่อตรงกัน หรือใช้ TikTok post เดียวกัน (ถือว่าเป็นตัวที่สร้างไปแล้ว)"""
+        for ad in TikTokAdsService.fetch_ads_in_adgroup(advertiser_id, adgroup_id):
+            if not ad.get("ad_id"):
+                continue
+            if ad.get("ad_name") == name or (item_id and str(ad.get("tiktok_item_id") or "") == str(item_id)):
+                return str(ad["ad_id"])
+        return None
+
+    @classmethod
+    def run_job(cls, task_id: int) -> None:
+        """รัน job ใน worker thread - เปิด session เอง"""
+        db = SessionLocal()
+        try:
+            task = db.query(TaskLog).filter(TaskLog.id == task_id).first()
+            if not task:
+                return
+
+            kind = "ace" if task.task_name == cls.JOB_TASK_NAMES["ace"] else "abx"
+            params = dict(task.input_params or {})
+            advertiser_id = str(params["advertiser_id"])
+
+            task.status = TaskStatus.RUNNING
+            task.started_at = datetime.now()
+            db.commit()
+
+            try:
+                advertiser = db.query(AdAccount).filter(
+                    AdAccount.platform == Platform.TIKTOK,
+                    AdAccount.external_account_id == advertiser_id,
+                    AdAccount.is_active == True,
+                ).first()
+                if not advertiser:
+                    raise AdCreationError(404, "Advertiser not found or inactive")
+
+                content = cls.load_content(db, advertiser, int(params["content_id"]))
+
+                # ---------- identity ----------
+                identity: Dict = {}
+
+                def step_identity() -> Dict:
+                    identity_id, identity_type, spark_auth = cls.resolve_identity(
+                        db, content, advertiser, params.get("auth_code"), params.get("user_id")
+                    )
+                    if not identity_id:
+                        return {"success": False, "message": "Identity ID not found for this content/advertiser"}
+                    identity.update(identity_id=identity_id, identity_type=identity_type, spark_auth=spark_auth)
+                    return {"success": True}
+
+                result = cls._run_step(db, task, "identity", step_identity)
+                if not result.get("success"):
+                    raise AdCreationError(400, result.get("message"))
+
+                # ---------- adgroup (ACE เท่านั้น) ----------
+                if kind == "ace":
+                    adgroup_id = (task.output_data or {}).get("adgroup_id")
+                    targeting_data = None
+                    if params.get("targeting_id"):
+                        targeting = db.query(TargetingTemplate).filter(
+                            TargetingTemplate.id == int(params["targeting_id"])
+                        ).first()
+                        if targeting:
+                            targeting_data = targeting.settings
+
+                    def step_adgroup() -> Dict:
+                        # รอบก่อนอาจสร้างสำเร็จแต่ไม่ได้คำตอบ → ใช้ตัวที่มีอยู่
+                        if (task.output_data or {}).get("attempts", {}).get("adgroup", 0) > 1:
+                            existing = cls._find_adgroup_by_name(
+                                advertiser_id, str(params["campaign_id"]), params["adgroup_name"]
+                            )
+                            if existing:
+                                return {"success": True, "adgroup_id": existing}
+                        return TikTokAdsService.create_adgroup(
+                            advertiser_id=advertiser_id,
+                            campaign_id=str(params["campaign_id"]),
+                            adgroup_name=params["adgroup_name"],
+                            targeting=targeting_data,
+                            budget=params.get("budget") or 200.0,
+                            optimization_goal=params.get("optimization_goal") or "VIDEO_VIEW",
+                        )
+
+                    if not adgroup_id:
+                        result = cls._run_step(db, task, "adgroup", step_adgroup)
+                        if not result.get("success"):
+                            raise AdCreationError(502, result.get("message", "Failed to create adgroup"))
+                        adgroup_id = str(result["adgroup_id"])
+                        cls._set_progress(db, task, adgroup_id=adgroup_id)
+                else:
+                    adgroup_id = str(params["adgroup_id"])
+                    cls._set_progress(db, task, adgroup_id=adgroup_id)
+
+                # ---------- ad ----------
+                def step_ad() -> Dict:
+                    # create ไม่ idempotent: รอบก่อนอาจสร้างสำเร็จแต่ไม่ได้คำตอบ → เช็คก่อน
+                    # (เช็คไม่ได้ → raise = attempt นี้ล้ม ไม่สร้างซ้ำแบบไม่รู้)
+                    if (task.output_data or {}).get("attempts", {}).get("ad", 0) > 1:
+                        existing = cls._find_ad(
+                            advertiser_id, adgroup_id, params["ad_name"], content.platform_post_id
+                        )
+                        if existing:
+                            return {"success": True, "ad_id": existing}
+                    return TikTokAdsService.create_abx_ad(
+                        advertiser_id=advertiser_id,
+                        adgroup_id=adgroup_id,
+                        tiktok_item_id=content.platform_post_id,
+                        ad_name=params["ad_name"],
+                        identity_id=identity["identity_id"],
+                        identity_type=identity["identity_type"],
+                    )
+
+                result = cls._run_step(db, task, "ad", step_ad)
+                if not result.get("success"):
+                    raise AdCreationError(502, result.get("message", "Failed to create ad"))
+                ad_id = result.get("ad_id")
+                cls._set_progress(db, task, ad_id=ad_id)
+
+                # ---------- sync back (ไม่ทำให้ job ล้มถ้า sync พัง) ----------
+                cls._set_progress(db, task, step="sync")
+                try:
+                    cls.finalize(
+                        db,
+                        advertiser_id,
+                        {"success": True, "adgroup_id": adgroup_id, "ad_id": ad_id},
+                        identity.get("spark_auth"),
+                    )
+                except Exception as e:
+                    db.rollback()
+                    print(f"[AdCreationService] Job {task_id} sync back failed: {e}")
+
+                task.status = TaskStatus.COMPLETED
+                task.message = f"{kind.upper()} Ad created successfully"
+                task.items_success = 1
+                cls._set_progress(db, task, step="done")
+
+            except AdCreationError as e:
+                db.rollback()
+                task.status = TaskStatus.FAILED
+                task.error_message = str(e)
+                task.items_failed = 1
+                cls._set_progress(db, task, error=e.detail)
+
+            task.completed_at = datetime.now()
+            task.items_processed = 1
+            db.commit()
+            print(f"[AdCreationService] Job {task_id} {task.status.value}: {task.message or task.error_message}")
+
+        except Exception as e:
+            db.rollback()
+            print(f"[AdCreationService] Job {task_id} error: {e}")
+            task = db.query(TaskLog).filter(TaskLog.id == task_id).first()
+            if task:
+                task.status = TaskStatus.FAILED
+                task.completed_at = datetime.now()
+                task.error_message = str(e)
+                task.error_traceback = traceback.format_exc()
+                db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,410 @@
+"""
+AdGroup Mutation Queue - รวม budget / status changes ของ TikTok AdGroup แล้วยิงเป็น batch
+
+ทุกทางที่แก้ budget / status ของ adgroup วิ่งผ่านคิวนี้:
+- TikTokAdsService.update_adgroup_status / update_adgroup_budget / update_adgroup_budget_and_status
+  (endpoints ใน contents.py) → AdgroupMutationQueue.submit(): คิวกลางของ process
+  รอ ADGROUP_MUTATION_FLUSH_SECONDS (หรือจนครบ batch) แล้ว flush รวมกับ request อื่นที่เข้ามาพร้อมกัน
+- optimizer (run_budget_optimization) → instance ของตัวเอง enqueue ทั้งรอบแล้ว flush ครั้งเดียว
+
+- แก้ adgroup เดิมซ้ำหลายครั้ง (ก่อน flush) → เหลือค่าสุดท้ายค่าเดียว
+- ข้าม no-op เฉพาะ field ที่ caller ขอ (skip_noop=True) โดยเทียบกับตาราง ad_groups
+  ad_groups อาจเก่ากว่า TikTok (sync ไม่ทัน / มีคนแก้บน TikTok) → ค่าที่ผู้ใช้สั่งเองยิงเสมอ
+  ค่าที่ apply สำเร็จถูกเขียนกลับ ad_groups (ไม่ cache ใน memory)
+- flush แยกต่อ advertiser:
+    - status: /adgroup/status/update/ ครั้งละ ADGROUP_STATUS_BATCH_SIZE ตาม operation_status
+    - budget: /adgroup/budget/update/ ครั้งละ ADGROUP_BUDGET_BATCH_SIZE
+    - batch ที่ล้ม → ยิงแยกทีละ adgroup เพื่อให้รู้ผลรายตัว
+- ผลลัพธ์รายงานต่อ adgroup_id
+
+Usage:
+    queue = AdgroupMutationQueue()
+    queue.set_budget(advertiser_id, adgroup_id, 500, skip_noop=True)
+    queue.set_status(advertiser_id, adgroup_id, "DISABLE")
+    results = queue.flush(db)   # {adgroup_id: {"success": ..., "status": {...}, "budget": {...}}}
+
+    # คิวกลาง (blocking จนได้ผลของ adgroup นี้; enqueue() คืน Future)
+    entry = AdgroupMutationQueue.submit(advertiser_id, adgroup_id, budget=500)
+"""
+import threading
+import time
+from concurrent.futures import Future
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import AdGroup
+from app.models.enums import AdStatus
+from app.models.enums import Platform as PlatformEnum
+
+# TikTok API limits (ต่อ request)
+ADGROUP_STATUS_BATCH_SIZE = 20
+ADGROUP_BUDGET_BATCH_SIZE = 20
+
+_STATUS_TO_AD_STATUS = {"ENABLE": AdStatus.ACTIVE, "DISABLE": AdStatus.PAUSED}
+
+
+class AdgroupMutationQueue:
+    """
+    คิว budget / status changes (instance ไม่ thread-safe)
+
+    คิวกลางของ process (submit) เป็น state ระดับ class เหมือน TikTokRequestExecutor
+    """
+
+    # คิวกลาง: changes ที่รอ flush + Future ของแต่ละ (advertiser_id, adgroup_id)
+    _shared: Optional["AdgroupMutationQueue"] = None
+    _shared_waiters: Dict[Tuple[str, str], List[Future]] = {}
+    _shared_cond = threading.Condition()
+    _shared_worker: Optional[threading.Thread] = None
+
+    def __init__(self):
+        # (advertiser_id, adgroup_id) -> {"budget": float?, "status": str?, "skip_noop": {field}}
+        self._pending: Dict[Tuple[str, str], Dict] = {}
+
+    # ============================================
+    # Enqueue
+    # ============================================
+
+    def _set(self, advertiser_id: str, adgroup_id: str, field: str, value, skip_noop: bool) -> None:
+        change = self._pending.setdefault((str(advertiser_id), str(adgroup_id)), {"skip_noop": set()})
+        change[field] = value
+        # ค่าล่าสุดเป็นตัวกำหนด: ถ้าสั่งซ้ำแบบไม่ skip → ต้องยิงเสมอ
+        if skip_noop:
+            change["skip_noop"].add(field)
+        else:
+            change["skip_noop"].discard(field)
+
+    def set_budget(self, advertiser_id: str, adgroup_id: str, budget: float, skip_noop: bool = False) -> None:
+        """skip_noop=True → ไม่ยิงถ้า budget เท่ากับ ad_groups.daily_budget (ใช้เมื่อ ad_groups สดพอ)"""
+        self._set(advertiser_id, adgroup_id, "budget", round(float(budget), 2), skip_noop)
+
+    def set_status(self, advertiser_id: str, adgroup_id: str, status: str, skip_noop: bool = False) -> None:
+        """skip_noop=True → ไม่ยิงถ้า status ตรงกับ ad_groups.status (ใช้เมื่อ ad_groups สดพอ)"""
+        status = str(status).upper()
+        if status not in _STATUS_TO_AD_STATUS:
+            raise ValueError(f"Invalid status {status!r}. Use 'ENABLE' or 'DISABLE'")
+        self._set(advertiser_id, adgroup_id, "status", status, skip_noop)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # ============================================
+    # Shared process-wide queue
+    # ============================================
+
+    @classmethod
+    def enqueue(
+        cls,
+        advertiser_id: str,
+        adgroup_id: str,
+        budget: Optional[float] = None,
+        status: Optional[str] = None,
+        skip_noop: bool = False,
+    ) -> Future:
+        """
+        ใส่ change เข้าคิวกลาง คืน Future ของผล adgroup นี้
+
+        changes จาก request อื่นที่เข้ามาภายใน ADGROUP_MUTATION_FLUSH_SECONDS ถูก flush รวมกัน
+        (adgroup เดียวกัน → รวมเป็นค่าสุดท้าย, advertiser เดียวกัน → batch เดียวกัน)
+        Future.result() = entry ของ adgroup นี้จาก flush() ({"success", "advertiser_id", "status"?, "budget"?})
+        """
+        future: Future = Future()
+        with cls._shared_cond:
+            queue = cls._shared or cls()
+            if status is not None:
+                queue.set_status(advertiser_id, adgroup_id, status, skip_noop=skip_noop)
+            if budget is not None:
+                queue.set_budget(advertiser_id, adgroup_id, budget, skip_noop=skip_noop)
+            cls._shared = queue
+            cls._shared_waiters.setdefault((str(advertiser_id), str(adgroup_id)), []).append(future)
+            if cls._shared_worker is None or not cls._shared_worker.is_alive():
+                cls._shared_worker = threading.Thread(
+                    target=cls._run_shared, name="adgroup-mutation-queue", daemon=True
+                )
+                cls._shared_worker.start()
+            cls._shared_cond.notify_all()
+        return future
+
+    @classmethod
+    def submit(
+        cls,
+        advertiser_id: str,
+        adgroup_id: str,
+        budget: Optional[float] = None,
+        status: Optional[str] = None,
+        skip_noop: bool = False,
+    ) -> Dict:
+        """enqueue แล้วรอผล (blocking)"""
+        return cls.enqueue(advertiser_id, adgroup_id, budget=budget, status=status, skip_noop=skip_noop).result()
+
+    @classmethod
+    def _run_shared(cls) -> None:
+        """worker ของคิวกลาง: รอจนครบ window หรือครบ batch แล้ว flush"""
+        batch_size = max(ADGROUP_STATUS_BATCH_SIZE, ADGROUP_BUDGET_BATCH_SIZE)
+        while True:
+            with cls._shared_cond:
+                while cls._shared is None:
+                    cls._shared_cond.wait()
+                deadline = time.monotonic() + settings.ADGROUP_MUTATION_FLUSH_SECONDS
+                while len(cls._shared) < batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    cls._shared_cond.wait(remaining)
+                queue, cls._shared = cls._shared, None
+                waiters, cls._shared_waiters = cls._shared_waiters, {}
+            cls._flush_shared(queue, waiters)
+
+    @staticmethod
+    def _flush_shared(queue: "AdgroupMutationQueue", waiters: Dict[Tuple[str, str], List[Future]]) -> None:
+        db = SessionLocal()
+        try:
+            try:
+                results = queue.flush(db)
+            except Exception as e:
+                db.rollback()
+                print(f"[AdgroupMutationQueue] Shared flush failed: {e}")
+                for futures in waiters.values():
+                    for future in futures:
+                        future.set_exception(e)
+                return
+
+            try:
+                db.commit()
+            except Exception as e:
+                # TikTok apply แล้ว แค่เขียน ad_groups ไม่ลง → sync รอบถัดไปแก้ให้
+                db.rollback()
+                print(f"[AdgroupMutationQueue] Could not write back ad_groups: {e}")
+        finally:
+            db.close()
+
+        for (advertiser_id, adgroup_id), futures in waiters.items():
+            entry = results.get(adgroup_id, {"success": True, "advertiser_id": advertiser_id})
+            for future in futures:
+                future.set_result(entry)
+
+    # ============================================
+    # Known state (no-op detection)
+    # ============================================
+
+    @staticmethod
+    def _known_state(db: Optional[Session], keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict]:
+        """state ล่าสุดที่รู้จากตาราง ad_groups ของ keys ที่ขอ skip no-op (ไม่มี db → ไม่ข้าม)"""
+        known: Dict[Tuple[str, str], Dict] = {}
+
+        if db is not None and keys:
+            wanted = {key[1]: key for key in keys}
+            rows = (
+                db.query(AdGroup.external_adgroup_id, AdGroup.daily_budget, AdGroup.status)
+                .filter(
+                    AdGroup.platform == PlatformEnum.TIKTOK,
+                    AdGroup.external_adgroup_id.in_(list(wanted.keys())),
+                )
+                .all()
+            )
+            for ext_id, budget, status in rows:
+                key = wanted.get(str(ext_id))
+                if key is None:
+                    continue
+                state: Dict = {}
+                if budget is not None:
+                    state["budget"] = round(float(budget), 2)
+                if status == AdStatus.ACTIVE:
+                    state["status"] = "ENABLE"
+                elif status == AdStatus.PAUSED:
+                    state["status"] = "DISABLE"
+                known[key] = state
+        return known
+
+    # ============================================
+    # Flush
+    # ============================================
+
+    @staticmethod
+    def _post(client, url: str, token: str, payload: Dict) -> Optional[str]:
+        """POST 1 batch คืน None ถ้าสำเร็จ หรือข้อความ error"""
+        try:
+            resp = client.post(
+                url,
+                headers={"Access-Token": token, "Content-Type": "application/json"},
+                json=payload,
+            )
+            data = resp.json()
+            if resp.status_code == 200 and data.get("code") == 0:
+                return None
+            return data.get("message") or f"HTTP {resp.status_code}"
+        except Exception as e:
+            return str(e)
+
+    def flush(self, db: Optional[Session] = None) -> Dict[str, Dict]:
+        """
+        ส่ง changes ที่ค้างทั้งหมด แล้วล้างคิว
+
+        Args:
+            db: ใช้อ่าน state ล่าสุด (ข้าม no-op ของ field ที่ skip_noop) และอัปเดต ad_groups
+                หลัง apply สำเร็จ (caller commit เอง)
+
+        Returns:
+            {adgroup_id: {"success": bool, "advertiser_id": ..., "status": {...}, "budget": {...}}}
+            แต่ละ field มี "applied" / "skipped" (no-op) หรือ "error"
+        """
+        from app.services.tiktok_ads_service import TikTokAdsService
+
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return {}
+
+        known = self._known_state(db, [key for key, change in pending.items() if change["skip_noop"]])
+        results: Dict[str, Dict] = {}
+
+        # advertiser -> status -> [adgroup_id], advertiser -> [(adgroup_id, budget)]
+        status_plan: Dict[str, Dict[str, List[str]]] = {}
+        budget_plan: Dict[str, List[Tuple[str, float]]] = {}
+
+        for key, change in pending.items():
+            advertiser_id, adgroup_id = key
+            state = known.get(key, {})
+            skip = change["skip_noop"]
+            entry = results.setdefault(adgroup_id, {"success": True, "advertiser_id": advertiser_id})
+
+            if "status" in change:
+                if "status" in skip and state.get("status") == change["status"]:
+                    entry["status"] = {"value": change["status"], "skipped": "no-op"}
+                else:
+                    status_plan.setdefault(advertiser_id, {}).setdefault(change["status"], []).append(adgroup_id)
+
+            if "budget" in change:
+                if "budget" in skip and state.get("budget") == change["budget"]:
+                    entry["budget"] = {"value": change["budget"], "skipped": "no-op"}
+                else:
+                    budget_plan.setdefault(advertiser_id, []).append((adgroup_id, change["budget"]))
+
+        if not status_plan and not budget_plan:
+            return results
+
+        token = TikTokAdsService._get_access_token()
+        if not token:
+            # error เฉพาะ field ที่ขอแก้และยังไม่ถูกข้าม
+            for (_, adgroup_id), change in pending.items():
+                entry = results[adgroup_id]
+                for field in ("status", "budget"):
+                    if field in change and field not in entry:
+                        entry[field] = {"value": change[field], "error": "Missing access token"}
+                        entry["success"] = False
+            return results
+
+        base_url = TikTokAdsService.BASE_URL
+        applied_status: List[Tuple[str, str, str]] = []
+        applied_budget: List[Tuple[str, str, float]] = []
+
+        with TikTokAdsService._get_client() as client:
+            # ---------- status (ก่อน budget เหมือน update_adgroup_budget_and_status เดิม) ----------
+            for advertiser_id, by_status in status_plan.items():
+                for status, adgroup_ids in by_status.items():
+                    for i in range(0, len(adgroup_ids), ADGROUP_STATUS_BATCH_SIZE):
+                        chunk = adgroup_ids[i:i + ADGROUP_STATUS_BATCH_SIZE]
+                        error = self._post(
+                            client,
+                            f"{base_url}/adgroup/status/update/",
+                            token,
+                            {"advertiser_id": advertiser_id, "adgroup_ids": chunk, "operation_status": status},
+                        )
+                        if error and len(chunk) > 1:
+                            # batch ล้ม → แยกยิงทีละตัวเพื่อรู้ว่าตัวไหนมีปัญหา
+                            outcomes = [
+                                (ag, self._post(
+                                    client,
+                                    f"{base_url}/adgroup/status/update/",
+                                    token,
+                                    {"advertiser_id": advertiser_id, "adgroup_ids": [ag], "operation_status": status},
+                                ))
+                                for ag in chunk
+                            ]
+                        else:
+                            outcomes = [(ag, error) for ag in chunk]
+
+                        for ag, err in outcomes:
+                            entry = results[ag]
+                            if err:
+                                entry["status"] = {"value": status, "error": err}
+                                entry["success"] = False
+                            else:
+                                entry["status"] = {"value": status, "applied": True}
+                                applied_status.append((advertiser_id, ag, status))
+
+            # ---------- budget ----------
+            for advertiser_id, items in budget_plan.items():
+                for i in range(0, len(items), ADGROUP_BUDGET_BATCH_SIZE):
+                    chunk = items[i:i + ADGROUP_BUDGET_BATCH_SIZE]
+                    error = self._post(
+                        client,
+                        f"{base_url}/adgroup/budget/update/",
+                        token,
+                        {
+                            "advertiser_id": advertiser_id,
+                            "budget": [{"adgroup_id": ag, "budget": b} for ag, b in chunk],
+                        },
+                    )
+                    if error:
+                        # fallback ทีละตัวผ่าน /adgroup/update/ (endpoint เดิม)
+                        outcomes = [
+                            (ag, b, self._post(
+                                client,
+                                f"{base_url}/adgroup/update/",
+                                token,
+                                {"advertiser_id": advertiser_id, "adgroup_id": ag, "budget": b},
+                            ))
+                            for ag, b in chunk
+                        ]
+                    else:
+                        outcomes = [(ag, b, None) for ag, b in chunk]
+
+                    for ag, b, err in outcomes:
+                        entry = results[ag]
+                        if err:
+                            entry["budget"] = {"value": b, "error": err}
+                            entry["success"] = False
+                        else:
+                            entry["budget"] = {"value": b, "applied": True}
+                            applied_budget.append((advertiser_id, ag, b))
+
+        if db is not None:
+            self._write_back(db, applied_status, applied_budget)
+
+        failed = sum(1 for r in results.values() if not r["success"])
+        print(
+            f"[AdgroupMutationQueue] Flushed {len(pending)} adgroups: "
+            f"{len(applied_status)} status, {len(applied_budget)} budget applied, {failed} failed"
+        )
+        return results
+
+    @staticmethod
+    def _write_back(
+        db: Session,
+        applied_status: List[Tuple[str, str, str]],
+        applied_budget: List[Tuple[str, str, float]],
+    ) -> None:
+        """อัปเดต ad_groups ให้ตรงกับที่เพิ่ง apply (flush เท่านั้น ไม่ commit)"""
+        by_id: Dict[str, Dict] = {}
+        for _, ag, status in applied_status:
+            by_id.setdefault(ag, {})["status"] = _STATUS_TO_AD_STATUS[status]
+        for _, ag, b in applied_budget:
+            by_id.setdefault(ag, {})["daily_budget"] = Decimal(str(b))
+        if not by_id:
+            return
+
+        rows = (
+            db.query(AdGroup)
+            .filter(
+                AdGroup.platform == PlatformEnum.TIKTOK,
+                AdGroup.external_adgroup_id.in_(list(by_id.keys())),
+            )
+            .all()
+        )
+        for row in rows:
+            for field, value in by_id[str(row.external_adgroup_id)].items():
+                setattr(row, field, value)
+        db.flush()
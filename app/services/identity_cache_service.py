@@ -0,0 +1,171 @@
+"""
+Identity Cache Service - identity สำหรับ Spark Ads ต่อ (advertiser, item) ในตาราง tiktok_item_identities
+
+- เติมเป็นชุดจาก spark-post sync (/tt_video/list/ → AUTH_CODE identity ของ post ที่ authorize แล้ว)
+- ตอนสร้าง ad อ่าน cache ก่อน; miss → /identity/get/ (TT_USER) แล้วเก็บไว้
+- AUTH_CODE ใช้ได้ถึง auth_end_time, TT_USER ใช้ได้ TIKTOK_IDENTITY_CACHE_TTL_HOURS
+- key = (advertiser, item, identity_type): เก็บ TT_USER ไม่ทับ AUTH_CODE ของ item เดียวกัน
+  lookup ที่ไม่ระบุ type → AUTH_CODE ที่ยังใช้ได้ก่อน
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import TikTokItemIdentity
+
+
+class IdentityCacheService:
+    """อ่าน / เขียน identity cache"""
+
+    @staticmethod
+    def parse_auth_time(value) -> Optional[datetime]:
+        """auth_start_time / auth_end_time จาก tt_video/list ("%Y-%m-%d %H:%M:%S" หรือ timestamp) → UTC"""
+        if not value:
+            return None
+        try:
+            if isinstance(value, (int, float)):
+                return datetime.fromtimestamp(value, tz=timezone.utc)
+            return datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError, OSError):
+            return None
+
+    @staticmethod
+    def _upsert(db: Session, rows: List[Dict]) -> int:
+        if not rows:
+            return 0
+        stmt = pg_insert(TikTokItemIdentity.__table__).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["advertiser_id", "item_id", "identity_type"],
+            set_={
+                "identity_id": excluded.identity_id,
+                "auth_end_time": excluded.auth_end_time,
+                "source": excluded.source,
+                "updated_at": excluded.updated_at,
+            },
+        )
+        db.execute(stmt)
+        return len(rows)
+
+    @classmethod
+    def store_spark_posts(cls, db: Session, advertiser_id: str, posts: List[Dict], commit: bool = True) -> int:
+        """เก็บ AUTH_CODE identity จากผลของ fetch_spark_ad_posts (1 statement ต่อ 500 แถว)"""
+        now = datetime.now(timezone.utc)
+        rows: Dict[str, Dict] = {}
+        for post in posts:
+            item_id = post.get("item_id")
+            identity_id = post.get("identity_id")
+            if not item_id or not identity_id:
+                continue
+            rows[str(item_id)] = {
+                "advertiser_id": str(advertiser_id),
+                "item_id": str(item_id),
+                "identity_id": str(identity_id),
+                "identity_type": "AUTH_CODE",
+                "auth_end_time": cls.parse_auth_time(post.get("auth_end_time")),
+                "source": "tt_video_list",
+                "updated_at": now,
+            }
+
+        values = list(rows.values())
+        stored = 0
+        for i in range(0, len(values), 500):
+            stored += cls._upsert(db, values[i:i + 500])
+        if commit:
+            db.commit()
+        return stored
+
+    @classmethod
+    def store(
+        cls,
+        db: Session,
+        advertiser_id: str,
+        item_id: str,
+        identity_id: str,
+        identity_type: str,
+        source: str,
+        auth_end_time: Optional[datetime] = None,
+    ) -> None:
+        cls._upsert(db, [{
+            "advertiser_id": str(advertiser_id),
+            "item_id": str(item_id),
+            "identity_id": str(identity_id),
+            "identity_type": identity_type,
+            "auth_end_time": auth_end_time,
+            "source": source,
+            "updated_at": datetime.now(timezone.utc),
+        }])
+        db.commit()
+
+    @staticmethod
+    def lookup(
+        db: Session,
+        advertiser_id: str,
+        item_id: str,
+        identity_type: Optional[str] = None,
+    ) -> Optional[Tuple[str, str]]:
+        """(identity_id, identity_type) ที่ยังใช้ได้ (AUTH_CODE ก่อน TT_USER) หรือ None"""
+        now = datetime.now(timezone.utc)
+        q = db.query(TikTokItemIdentity).filter(
+            TikTokItemIdentity.advertiser_id == str(advertiser_id),
+            TikTokItemIdentity.item_id == str(item_id),
+            or_(TikTokItemIdentity.auth_end_time.is_(None), TikTokItemIdentity.auth_end_time > now),
+        )
+        if identity_type:
+            q = q.filter(TikTokItemIdentity.identity_type == identity_type)
+        rows = q.order_by(case((TikTokItemIdentity.identity_type == "AUTH_CODE", 0), else_=1)).all()
+
+        ttl = timedelta(hours=settings.TIKTOK_IDENTITY_CACHE_TTL_HOURS)
+        for row in rows:
+            if row.identity_type == "TT_USER":
+                updated_at = row.updated_at
+                if updated_at and updated_at.tzinfo is None:
+                    updated_at = updated_at.replace(tzinfo=timezone.utc)
+                if not updated_at or now - updated_at > ttl:
+                    continue
+            return row.identity_id, row.identity_type
+        return None
+
+    @classmethod
+    def get_or_fetch(
+        cls,
+        advertiser_id: str,
+        item_id: str,
+        fetch_tt_user,
+        identity_type: Optional[str] = None,
+        db: Optional[Session] = None,
+    ) -> Tuple[Optional[str], str]:
+        """
+        cache ก่อน → miss เรียก fetch_tt_user(advertiser_id) แล้วเก็บเป็น TT_USER
+
+        identity_type="TT_USER" → ไม่ใช้ AUTH_CODE rows (caller ที่ต้องการ TT_USER เท่านั้น)
+        """
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            try:
+                hit = cls.lookup(db, advertiser_id, item_id, identity_type)
+            except Exception as e:
+                # ตารางยังไม่ถูกสร้าง / DB มีปัญหา → ทำงานแบบไม่มี cache
+                db.rollback()
+                print(f"[IdentityCacheService] lookup failed: {e}")
+                return fetch_tt_user(advertiser_id), "TT_USER"
+            if hit:
+                return hit
+
+            identity_id = fetch_tt_user(advertiser_id)
+            if identity_id:
+                try:
+                    cls.store(db, advertiser_id, item_id, identity_id, "TT_USER", "identity_get")
+                except Exception as e:
+                    db.rollback()
+                    print(f"[IdentityCacheService] store failed: {e}")
+            return identity_id, "TT_USER"
+        finally:
+            if own_session:
+                db.close()
@@ -0,0 +1,399 @@
+"""
+Intraday Spend Service - spend ระหว่างวัน (รายชั่วโมง) ของวันนี้จาก TikTok report API
+
+- ดึง report dimensions ["ad_id", "stat_time_hour"] เฉพาะวันนี้ (1 report ต่อ account)
+- เขียนลง `ad_performance_hourly` แบบ compact:
+    - ข้ามชั่วโมงที่ไม่มี delivery
+    - ข้ามชั่วโมงที่ "นิ่งแล้ว" (เก่ากว่า hour cursor - TIKTOK_HOURLY_RESYNC_HOURS)
+    - ON CONFLICT update เฉพาะแถวที่ตัวเลขเปลี่ยนจริง
+- แถวของวันที่ปิดเข้า `ad_performance_daily` แล้ว (tiktok_daily_cursor ผ่านวันนั้น) ถูกลบทิ้ง
+- rollup ไปที่ ABXAdgroup.today_spend และ DailyBudget.actual_spend ของวันนี้
+
+optimizer / dashboard อ่าน pacing จาก DB ได้โดยไม่ต้องยิง API
+"""
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import AdAccount, AdPerformanceHourly
+from app.models.enums import AdAccountStatus
+from app.models.enums import Platform as PlatformEnum
+from app.services.tiktok_ads_service import TikTokAdsService
+
+
+class IntradaySpendService:
+    """เติม / ล้าง ad_performance_hourly และ rollup spend ของวันนี้"""
+
+    # AdAccount.config key: ชั่วโมงล่าสุดที่มีข้อมูล ("YYYY-MM-DD HH:00:00")
+    HOURLY_CURSOR_KEY = "tiktok_hourly_cursor"
+    UPSERT_BATCH_SIZE = 1000
+
+    # ============================================
+    # Fetch
+    # ============================================
+
+    @staticmethod
+    def fetch_ad_hourly_report(advertiser_id: str, day: date) -> List[Dict]:
+        """
+        Ad-level hourly report ของวันเดียว (TikTok บังคับ start_date = end_date สำหรับ stat_time_hour)
+        adgroup_id ขอเป็น attribute metric เพื่อ rollup ต่อ adgroup ได้ทันที
+        """
+        token = TikTokAdsService._get_access_token()
+        if not token:
+            print("[IntradaySpendService] Missing access token, skip fetch_ad_hourly_report")
+            return []
+
+        params = {
+            "advertiser_id": advertiser_id,
+            "report_type": "BASIC",
+            "data_level": "AUCTION_AD",
+            "dimensions": json.dumps(["ad_id", "stat_time_hour"]),
+            "metrics": json.dumps(["spend", "impressions", "clicks", "conversion", "adgroup_id"]),
+            "start_date": day.isoformat(),
+            "end_date": day.isoformat(),
+            "page_size": 1000,
+        }
+        return TikTokAdsService._fetch_all_pages(
+            "/report/integrated/get/",
+            token,
+            params,
+            label=f"fetch_ad_hourly_report advertiser={advertiser_id} {day}",
+            raise_on_error=True,
+        )
+
+    @staticmethod
+    def _row_to_record(ad_account_id: int, r: Dict) -> Optional[Dict]:
+        dims = r.get("dimensions") or {}
+        mets = r.get("metrics") or {}
+        ad_id = dims.get("ad_id")
+        hour = dims.get("stat_time_hour")
+        if not ad_id or not hour:
+            return None
+        try:
+            stat_hour = datetime.strptime(str(hour)[:19], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return None
+
+        def _f(key) -> float:
+            try:
+                return float(mets.get(key) or 0)
+            except (TypeError, ValueError):
+                return 0.0
+
+        record = {
+            "platform": PlatformEnum.TIKTOK,
+            "ad_account_id": ad_account_id,
+            "external_ad_id": str(ad_id),
+            "stat_hour": stat_hour,
+            "external_adgroup_id": str(mets["adgroup_id"]) if mets.get("adgroup_id") else None,
+            "spend": _f("spend"),
+            "impressions": int(_f("impressions")),
+            "clicks": int(_f("clicks")),
+            "conversions": int(_f("conversion")),
+        }
+        if not (record["spend"] or record["impressions"] or record["clicks"]):
+            return None  # ชั่วโมงที่ไม่มี delivery ไม่ต้องเก็บ
+        return record
+
+    # ============================================
+    # Write
+    # ============================================
+
+    @classmethod
+    def _upsert_hourly(cls, db: Session, records: List[Dict], now: datetime) -> int:
+        """upsert ทีละ batch; แถวที่ตัวเลขไม่เปลี่ยนจะไม่ถูกเขียนซ้ำ (ไม่สร้าง dead tuple)"""
+        from sqlalchemy.dialects.postgresql import insert
+
+        written = 0
+        for i in range(0, len(records), cls.UPSERT_BATCH_SIZE):
+            chunk = records[i:i + cls.UPSERT_BATCH_SIZE]
+            stmt = insert(AdPerformanceHourly).values(chunk)
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["platform", "ad_account_id", "external_ad_id", "stat_hour"],
+                set_={
+                    "external_adgroup_id": excluded.external_adgroup_id,
+                    "spend": excluded.spend,
+                    "impressions": excluded.impressions,
+                    "clicks": excluded.clicks,
+                    "conversions": excluded.conversions,
+                    "updated_at": now,
+                },
+                where=or_(
+                    AdPerformanceHourly.spend.is_distinct_from(excluded.spend),
+                    AdPerformanceHourly.impressions.is_distinct_from(excluded.impressions),
+                    AdPerformanceHourly.clicks.is_distinct_from(excluded.clicks),
+                    AdPerformanceHourly.conversions.is_distinct_from(excluded.conversions),
+                    AdPerformanceHourly.external_adgroup_id.is_distinct_from(excluded.external_adgroup_id),
+                ),
+            )
+            res = db.execute(stmt)
+            written += int(getattr(res, "rowcount", 0) or 0)
+        return written
+
+    @classmethod
+    def sync_account_today(cls, db: Session, ad_account: AdAccount, today: Optional[date] = None) -> Dict:
+        """ดึง hourly report ของวันนี้ 1 account แล้ว upsert เฉพาะชั่วโมงที่ยังขยับได้ (commit เอง)"""
+        today = today or date.today()
+        rows = cls.fetch_ad_hourly_report(ad_account.external_account_id, today)
+
+        cfg = ad_account.config if isinstance(ad_account.config, dict) else {}
+        floor = datetime.combine(today, datetime.min.time())
+        cursor_raw = str(cfg.get(cls.HOURLY_CURSOR_KEY) or "")
+        if cursor_raw.startswith(today.isoformat()):
+            try:
+                cursor = datetime.strptime(cursor_raw[:19], "%Y-%m-%d %H:%M:%S")
+                floor = max(floor, cursor - timedelta(hours=settings.TIKTOK_HOURLY_RESYNC_HOURS))
+            except ValueError:
+                pass
+
+        records: List[Dict] = []
+        for r in rows:
+            record = cls._row_to_record(ad_account.id, r)
+            if record and record["stat_hour"] >= floor:
+                records.append(record)
+
+        written = cls._upsert_hourly(db, records, datetime.utcnow()) if records else 0
+
+        if records:
+            # เขียนเฉพาะ key ของตัวเอง (tiktok_daily_cursor ถูกเลื่อนโดย job daily พร้อมกันได้)
+            TikTokAdsService.update_account_config(
+                db,
+                ad_account,
+                {cls.HOURLY_CURSOR_KEY: max(r["stat_hour"] for r in records).strftime("%Y-%m-%d %H:%M:%S")},
+            )
+        db.commit()
+
+        return {"rows_fetched": len(rows), "rows_considered": len(records), "rows_written": written}
+
+    @staticmethod
+    def purge_closed_days(db: Session, today: Optional[date] = None) -> int:
+        """
+        ลบแถวของวันที่ปิดเข้า ad_performance_daily แล้ว (วัน <= tiktok_daily_cursor ของ account)
+        และทุกแถวที่เก่ากว่า TIKTOK_HOURLY_RETENTION_DAYS (กัน cursor ค้าง)
+        """
+        today = today or date.today()
+        hard_cutoff = today - timedelta(days=max(settings.TIKTOK_HOURLY_RETENTION_DAYS, 1))
+        res = db.execute(
+            text(
+                """
+                DELETE FROM ad_performance_hourly h
+                USING ad_accounts a
+                WHERE h.ad_account_id = a.id
+                  AND h.stat_hour < :today
+                  AND (
+                        h.stat_hour < :hard_cutoff
+                     OR h.stat_hour::date <= CAST(NULLIF(a.config->>'tiktok_daily_cursor', '') AS date)
+                  )
+                """
+            ),
+            {
+                "today": datetime.combine(today, datetime.min.time()),
+                "hard_cutoff": datetime.combine(hard_cutoff, datetime.min.time()),
+            },
+        )
+        db.commit()
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    # ============================================
+    # Rollups
+    # ============================================
+
+    @staticmethod
+    def update_abx_today_spend(db: Session, today: Optional[date] = None) -> int:
+        """ABXAdgroup.today_spend = Σ spend รายชั่วโมงของวันนี้ (adgroup ที่ไม่มีแถว → 0)"""
+        today = today or date.today()
+        start = datetime.combine(today, datetime.min.time())
+        res = db.execute(
+            text(
+                """
+                UPDATE abx_adgroups x
+                SET today_spend = COALESCE(t.spend, 0), updated_at = NOW()
+                FROM abx_adgroups x2
+                LEFT JOIN (
+                    SELECT external_adgroup_id, SUM(spend) AS spend
+                    FROM ad_performance_hourly
+                    WHERE stat_hour >= :start AND stat_hour < :end
+                      AND external_adgroup_id IS NOT NULL
+                    GROUP BY external_adgroup_id
+                ) t ON t.external_adgroup_id = x2.external_adgroup_id
+                WHERE x.id = x2.id
+                  AND x.today_spend IS DISTINCT FROM COALESCE(t.spend, 0)
+                """
+            ),
+            {"start": start, "end": start + timedelta(days=1)},
+        )
+        db.commit()
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    @staticmethod
+    def update_daily_budget_actual_spend(
+        db: Session,
+        day: date,
+        allocation_id: Optional[int] = None,
+        commit: bool = True,
+    ) -> int:
+        """
+        DailyBudget.actual_spend ของวัน `day` = Σ spend ของ ads ที่ content อยู่ใน product group ของ allocation
+
+        - วันนี้ → อ่านจาก ad_performance_hourly
+        - วันที่ผ่านไปแล้ว → account ที่ tiktok_daily_cursor ปิดวันนั้นแล้วอ่านจาก ad_performance_daily
+          account ที่ยังไม่ปิด อ่านจาก ad_performance_hourly (ยังไม่ถูก purge) แทนที่จะได้ 0
+          sync_tiktok_ad_performance_daily เรียกซ้ำหลังเลื่อน cursor เพื่อ reconcile เป็นยอดปิดวัน
+        - allocation ที่ระบุ platform จะนับเฉพาะ platform นั้น
+        - allocation_id → อัปเดตเฉพาะ allocation นั้น
+        """
+        if day >= date.today():
+            start = datetime.combine(day, datetime.min.time())
+            spend_sql = """
+                SELECT platform, ad_account_id, external_ad_id, SUM(spend) AS spend
+                FROM ad_performance_hourly
+                WHERE stat_hour >= :start AND stat_hour < :end
+                GROUP BY platform, ad_account_id, external_ad_id
+            """
+            params = {"start": start, "end": start + timedelta(days=1)}
+        else:
+            start = datetime.combine(day, datetime.min.time())
+            spend_sql = """
+                SELECT d.platform, d.ad_account_id, d.external_ad_id, d.spend
+                FROM ad_performance_daily d
+                JOIN ad_accounts acc ON acc.id = d.ad_account_id
+                WHERE d.date = :day
+                  AND (
+                        acc.platform::text <> 'TIKTOK'
+                     OR CAST(NULLIF(acc.config->>'tiktok_daily_cursor', '') AS date) >= :day
+                  )
+                UNION ALL
+                SELECT h.platform, h.ad_account_id, h.external_ad_id, SUM(h.spend) AS spend
+                FROM ad_performance_hourly h
+                JOIN ad_accounts acc ON acc.id = h.ad_account_id
+                WHERE h.stat_hour >= :start AND h.stat_hour < :end
+                  AND COALESCE(CAST(NULLIF(acc.config->>'tiktok_daily_cursor', '') AS date) < :day, TRUE)
+                GROUP BY h.platform, h.ad_account_id, h.external_ad_id
+            """
+            params = {"start": start, "end": start + timedelta(days=1)}
+
+        params["day"] = day
+        params["allocation_id"] = allocation_id
+        res = db.execute(
+            text(
+                f"""
+                WITH s AS ({spend_sql}),
+                per_group AS (
+                    SELECT c.product_group_id, a.platform::text AS platform, SUM(s.spend) AS spend
+                    FROM s
+                    JOIN ads a
+                      ON a.platform::text = s.platform::text
+                     AND a.ad_account_id = s.ad_account_id
+                     AND a.external_ad_id = s.external_ad_id
+                    JOIN contents c ON c.id = a.content_id
+                    WHERE c.product_group_id IS NOT NULL
+                    GROUP BY c.product_group_id, a.platform::text
+                ),
+                per_allocation AS (
+                    SELECT dbg.id AS daily_budget_id, COALESCE(SUM(pg.spend), 0) AS spend
+                    FROM daily_budgets dbg
+                    JOIN budget_allocations ba ON ba.id = dbg.allocation_id
+                    LEFT JOIN per_group pg
+                      ON pg.product_group_id = ba.product_group_id
+                     AND (ba.platform IS NULL OR pg.platform = ba.platform::text)
+                    WHERE dbg.date = :day
+                      AND (CAST(:allocation_id AS INTEGER) IS NULL OR dbg.allocation_id = :allocation_id)
+                    GROUP BY dbg.id
+                )
+                UPDATE daily_budgets d
+                SET actual_spend = p.spend, updated_at = NOW()
+                FROM per_allocation p
+                WHERE d.id = p.daily_budget_id
+                  AND d.actual_spend IS DISTINCT FROM p.spend
+                """
+            ),
+            params,
+        )
+        if commit:
+            db.commit()
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    # ============================================
+    # Read API (pacing)
+    # ============================================
+
+    @staticmethod
+    def get_today_spend_by_adgroup(db: Session, ad_account_id: Optional[int] = None) -> Dict[str, float]:
+        """spend ของวันนี้ต่อ external_adgroup_id (ไม่ยิง API)"""
+        from sqlalchemy import func
+
+        start = datetime.combine(date.today(), datetime.min.time())
+        q = db.query(
+            AdPerformanceHourly.external_adgroup_id,
+            func.sum(AdPerformanceHourly.spend),
+        ).filter(
+            AdPerformanceHourly.stat_hour >= start,
+            AdPerformanceHourly.external_adgroup_id.isnot(None),
+        )
+        if ad_account_id is not None:
+            q = q.filter(AdPerformanceHourly.ad_account_id == ad_account_id)
+        return {
+            str(adgroup_id): float(total or 0)
+            for adgroup_id, total in q.group_by(AdPerformanceHourly.external_adgroup_id).all()
+        }
+
+    # ============================================
+    # Job entry
+    # ============================================
+
+    @classmethod
+    def sync_all_today(cls, max_accounts: int = 0) -> Dict:
+        """sync ทุก TikTok account ที่ active → purge วันที่ปิดแล้ว → rollup"""
+        today = date.today()
+        db = SessionLocal()
+        try:
+            accounts = (
+                db.query(AdAccount)
+                .filter(
+                    AdAccount.platform == PlatformEnum.TIKTOK,
+                    AdAccount.status == AdAccountStatus.ACTIVE,
+                )
+                .order_by(AdAccount.id.asc())
+                .all()
+            )
+            if max_accounts and max_accounts > 0:
+                accounts = accounts[:max_accounts]
+
+            rows_fetched = 0
+            rows_written = 0
+            errors = []
+            for acc in accounts:
+                try:
+                    r = cls.sync_account_today(db, acc, today)
+                    rows_fetched += r["rows_fetched"]
+                    rows_written += r["rows_written"]
+                except Exception as e:
+                    db.rollback()
+                    print(f"[IntradaySpendService] Error {acc.name} ({acc.external_account_id}): {e}")
+                    errors.append({"ad_account_id": acc.id, "name": acc.name, "error": str(e)})
+
+            purged = cls.purge_closed_days(db, today)
+            abx_updated = cls.update_abx_today_spend(db, today)
+            budgets_updated = cls.update_daily_budget_actual_spend(db, today)
+
+            print(
+                f"[IntradaySpendService] {len(accounts)} accounts: fetched={rows_fetched} "
+                f"written={rows_written} purged={purged} abx={abx_updated} daily_budgets={budgets_updated}"
+            )
+            return {
+                "accounts_total": len(accounts),
+                "rows_fetched": rows_fetched,
+                "rows_written": rows_written,
+                "rows_purged": purged,
+                "abx_adgroups_updated": abx_updated,
+                "daily_budgets_updated": budgets_updated,
+                "errors": errors,
+            }
+        finally:
+            db.close()
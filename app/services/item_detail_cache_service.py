@@ -0,0 +1,171 @@
+"""
+Item Detail Cache Service - cache ของ ITEM_DETAIL_API ในตาราง tiktok_item_details
+โดยมี in-process LRU อยู่ด้านหน้า
+
+- ความสดขึ้นกับอายุโพสต์:
+    - โพสต์อายุ < TIKTOK_ITEM_DETAIL_RECENT_POST_DAYS (หรือไม่รู้อายุ) → TIKTOK_ITEM_DETAIL_RECENT_TTL_MINUTES
+    - โพสต์ที่เก่ากว่านั้น → TIKTOK_ITEM_DETAIL_OLD_TTL_HOURS
+- get_fresh(): LRU ก่อน → ที่เหลืออ่านจาก DB ด้วย IN query เดียว
+- store(): upsert ลง DB + อัปเดต LRU
+- ใช้ session ของตัวเองเสมอ (ไม่กระทบ transaction ของ caller)
+- DB ใช้ไม่ได้ (เช่นยังไม่ได้สร้างตาราง) → ทำงานแบบ LRU อย่างเดียว
+
+ผู้ใช้: TikTokService.iter_item_details (ensure_contents_for_item_ids, refresh_tiktok_organic,
+/contents/import-tiktok)
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import TikTokItemDetail
+
+
+class ItemDetailCacheService:
+    """อ่าน / เขียน item detail cache"""
+
+    # item_id -> (detail, item_created_at, fetched_at)
+    _lru: "OrderedDict[str, Tuple[Dict, Optional[datetime], datetime]]" = OrderedDict()
+    _lock = threading.Lock()
+
+    # ============================================
+    # Freshness
+    # ============================================
+
+    @staticmethod
+    def item_created_at(detail: Dict) -> Optional[datetime]:
+        """create_time (unix timestamp) ของโพสต์ → UTC datetime"""
+        raw = detail.get("create_time")
+        if not raw:
+            return None
+        try:
+            return datetime.fromtimestamp(int(raw), tz=timezone.utc)
+        except (TypeError, ValueError, OSError):
+            return None
+
+    @staticmethod
+    def ttl_for(item_created_at: Optional[datetime], now: datetime) -> timedelta:
+        recent = timedelta(days=settings.TIKTOK_ITEM_DETAIL_RECENT_POST_DAYS)
+        if item_created_at is None or now - item_created_at < recent:
+            return timedelta(minutes=settings.TIKTOK_ITEM_DETAIL_RECENT_TTL_MINUTES)
+        return timedelta(hours=settings.TIKTOK_ITEM_DETAIL_OLD_TTL_HOURS)
+
+    @classmethod
+    def _is_fresh(cls, item_created_at: Optional[datetime], fetched_at: datetime, now: datetime) -> bool:
+        if fetched_at.tzinfo is None:
+            fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+        if item_created_at is not None and item_created_at.tzinfo is None:
+            item_created_at = item_created_at.replace(tzinfo=timezone.utc)
+        return now - fetched_at < cls.ttl_for(item_created_at, now)
+
+    # ============================================
+    # LRU
+    # ============================================
+
+    @classmethod
+    def _lru_put(cls, item_id: str, detail: Dict, item_created_at: Optional[datetime], fetched_at: datetime) -> None:
+        with cls._lock:
+            cls._lru[item_id] = (detail, item_created_at, fetched_at)
+            cls._lru.move_to_end(item_id)
+            while len(cls._lru) > settings.TIKTOK_ITEM_DETAIL_CACHE_LRU_SIZE:
+                cls._lru.popitem(last=False)
+
+    @classmethod
+    def clear_memory(cls) -> None:
+        with cls._lock:
+            cls._lru.clear()
+
+    # ============================================
+    # Read / write
+    # ============================================
+
+    @classmethod
+    def get_fresh(cls, item_ids: List[str]) -> Dict[str, Dict]:
+        """{item_id: detail} ของ item ที่ cache ยังสด (ที่ไม่มี / หมดอายุจะไม่อยู่ในผล)"""
+        now = datetime.now(timezone.utc)
+        fresh: Dict[str, Dict] = {}
+        missing: List[str] = []
+
+        with cls._lock:
+            for item_id in item_ids:
+                entry = cls._lru.get(item_id)
+                if entry and cls._is_fresh(entry[1], entry[2], now):
+                    cls._lru.move_to_end(item_id)
+                    fresh[item_id] = entry[0]
+                else:
+                    missing.append(item_id)
+
+        if not missing:
+            return fresh
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(TikTokItemDetail)
+                .filter(TikTokItemDetail.item_id.in_(missing))
+                .all()
+            )
+        except Exception as e:
+            # ตารางยังไม่ถูกสร้าง / DB มีปัญหา → ใช้ LRU อย่างเดียว
+            db.rollback()
+            print(f"[ItemDetailCacheService] lookup failed: {e}")
+            rows = []
+        finally:
+            db.close()
+
+        for row in rows:
+            cls._lru_put(row.item_id, row.detail, row.item_created_at, row.fetched_at)
+            if cls._is_fresh(row.item_created_at, row.fetched_at, now):
+                fresh[row.item_id] = row.detail
+
+        return fresh
+
+    @classmethod
+    def store(cls, details: List[Dict]) -> int:
+        """เก็บ item details ที่เพิ่งดึงมา (upsert 1 statement ต่อ 500 แถว)"""
+        now = datetime.now(timezone.utc)
+        rows: Dict[str, Dict] = {}
+        for detail in details:
+            item_id = detail.get("item_id")
+            if not item_id:
+                continue
+            item_id = str(item_id)
+            created_at = cls.item_created_at(detail)
+            cls._lru_put(item_id, detail, created_at, now)
+            rows[item_id] = {
+                "item_id": item_id,
+                "detail": detail,
+                "item_created_at": created_at,
+                "fetched_at": now,
+            }
+
+        if not rows:
+            return 0
+
+        db = SessionLocal()
+        try:
+            values = list(rows.values())
+            for i in range(0, len(values), 500):
+                stmt = pg_insert(TikTokItemDetail.__table__).values(values[i:i + 500])
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["item_id"],
+                    set_={
+                        "detail": excluded.detail,
+                        "item_created_at": excluded.item_created_at,
+                        "fetched_at": excluded.fetched_at,
+                    },
+                )
+                db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[ItemDetailCacheService] store failed: {e}")
+            return 0
+        finally:
+            db.close()
+        return len(rows)
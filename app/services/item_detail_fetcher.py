@@ -0,0 +1,256 @@
+"""
+Item Detail Fetcher - ดึง item details จาก ITEM_DETAIL_API แบบ asyncio
+
+ใช้แทน ThreadPoolExecutor(max_workers=10) ใน get_item_details_concurrently เดิม
+
+- event loop 1 ตัวใน background thread + httpx.AsyncClient ตัวเดียว (keep-alive pool) ทั้ง process
+- concurrency ปรับเองแบบ AIMD:
+    - สำเร็จและเร็วกว่า TIKTOK_ITEM_DETAIL_TARGET_LATENCY ครบ 1 รอบ → +1
+    - timeout / 429 / 5xx / ช้าเกิน target → ลดครึ่ง (ไม่ต่ำกว่า MIN, ลดได้ไม่เกิน 1 ครั้งต่อ target latency)
+- ต่อ item: timeout TIKTOK_ITEM_DETAIL_TIMEOUT, retry ไม่เกิน TIKTOK_ITEM_DETAIL_MAX_ATTEMPTS ครั้ง
+  (เฉพาะ timeout / connection error / 429 / 5xx)
+- caller (sync) ได้ผลทีละ item ตามลำดับที่เสร็จผ่าน iter_details()
+
+Usage:
+    for item_id, detail in ItemDetailFetcher.iter_details(base_url, item_ids):
+        ...  # detail = None ถ้าดึงไม่สำเร็จ
+"""
+import asyncio
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+
+    _H2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    _H2_AVAILABLE = False
+
+_DONE = object()
+
+
+class _AdaptiveLimit:
+    """AIMD concurrency limit (ใช้ภายใน event loop ของ fetcher เท่านั้น)"""
+
+    def __init__(self, initial: float, minimum: int, maximum: int, target_latency: float):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, ok: bool) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if not ok or latency > self.target_latency:
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._last_decrease = now
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= int(self.limit):
+                    self.limit = min(float(self.maximum), self.limit + 1)
+                    self._successes = 0
+            self._cond.notify(max(int(self.limit) - self.in_flight, 0))
+
+
+class ItemDetailFetcher:
+    """Process-wide async fetcher สำหรับ ITEM_DETAIL_API"""
+
+    _lock = threading.Lock()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _client: Optional[httpx.AsyncClient] = None
+    # limit ล่าสุดของรอบก่อน → รอบถัดไปเริ่มจากตรงนั้น
+    _last_limit: Optional[float] = None
+
+    # ============================================
+    # Event loop / client
+    # ============================================
+
+    @classmethod
+    def _ensure_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None or cls._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="item-detail-fetcher", daemon=True
+                ).start()
+                cls._loop = loop
+            return cls._loop
+
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        """เรียกจาก event loop ของ fetcher เท่านั้น"""
+        if cls._client is None or cls._client.is_closed:
+            max_conn = settings.TIKTOK_ITEM_DETAIL_MAX_CONCURRENCY
+            cls._client = httpx.AsyncClient(
+                timeout=settings.TIKTOK_ITEM_DETAIL_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=max_conn,
+                    max_keepalive_connections=max_conn,
+                    keepalive_expiry=settings.TIKTOK_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=settings.TIKTOK_HTTP2_ENABLED and _H2_AVAILABLE,
+            )
+        return cls._client
+
+    @classmethod
+    def close(cls) -> None:
+        """ปิด client + หยุด event loop (เรียกตอน shutdown) - เรียกซ้ำได้"""
+        with cls._lock:
+            loop, cls._loop = cls._loop, None
+        if loop is None or loop.is_closed():
+            return
+
+        async def _shutdown():
+            client, cls._client = cls._client, None
+            if client is not None:
+                await client.aclose()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout=5)
+        except Exception as e:
+            print(f"[ItemDetailFetcher] Error closing client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    # ============================================
+    # Fetch
+    # ============================================
+
+    @classmethod
+    async def _fetch_one(
+        cls,
+        client: httpx.AsyncClient,
+        limiter: _AdaptiveLimit,
+        base_url: str,
+        item_id: str,
+    ) -> Optional[Dict]:
+        url = f"{base_url}/{item_id}"
+        max_attempts = max(1, settings.TIKTOK_ITEM_DETAIL_MAX_ATTEMPTS)
+        last_error = None
+
+        for attempt in range(1, max_attempts + 1):
+            await limiter.acquire()
+            started = time.monotonic()
+            ok = False
+            try:
+                resp = await client.get(url)
+                if resp.status_code == 429 or resp.status_code >= 500:
+                    last_error = f"HTTP {resp.status_code}"
+                else:
+                    # ตอบกลับปกติ (รวม 4xx) → ไม่ retry
+                    ok = True
+                    if resp.status_code != 200:
+                        return None
+                    data = resp.json()
+                    if not isinstance(data, dict) or "error" in data:
+                        return None
+                    return data
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            except ValueError:
+                # JSON เสีย
+                ok = True
+                return None
+            finally:
+                await limiter.release(time.monotonic() - started, ok)
+
+            if attempt < max_attempts:
+                await asyncio.sleep(0.5 * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+        print(f"Error getting item detail for {item_id}: {last_error} (after {max_attempts} attempts)")
+        return None
+
+    @classmethod
+    async def _run(
+        cls,
+        base_url: str,
+        item_ids: List[str],
+        max_concurrency: Optional[int],
+        emit: Callable,
+    ) -> None:
+        maximum = settings.TIKTOK_ITEM_DETAIL_MAX_CONCURRENCY
+        if max_concurrency:
+            maximum = min(maximum, max_concurrency)
+        limiter = _AdaptiveLimit(
+            initial=cls._last_limit or settings.TIKTOK_ITEM_DETAIL_CONCURRENCY,
+            minimum=settings.TIKTOK_ITEM_DETAIL_MIN_CONCURRENCY,
+            maximum=maximum,
+            target_latency=settings.TIKTOK_ITEM_DETAIL_TARGET_LATENCY,
+        )
+        client = cls._get_client()
+
+        async def one(item_id: str) -> None:
+            try:
+                detail = await cls._fetch_one(client, limiter, base_url, item_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error getting item detail for {item_id}: {e}")
+                detail = None
+            emit((item_id, detail))
+
+        tasks = [asyncio.ensure_future(one(item_id)) for item_id in item_ids]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            cls._last_limit = limiter.limit
+            emit(_DONE)
+
+    @classmethod
+    def iter_details(
+        cls,
+        base_url: str,
+        item_ids: Iterable[str],
+        max_concurrency: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """
+        yield (item_id, detail | None) ตามลำดับที่เสร็จ
+
+        เลิกอ่านกลางทาง (break / close generator) → request ที่ค้างถูกยกเลิก
+        """
+        ids = list(dict.fromkeys(str(i).strip() for i in item_ids if i and str(i).strip()))
+        if not ids:
+            return
+
+        results: "queue.Queue" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            cls._run(base_url, ids, max_concurrency, results.put),
+            cls._ensure_loop(),
+        )
+        try:
+            while True:
+                try:
+                    item = results.get(timeout=1.0)
+                except queue.Empty:
+                    # loop ถูกปิด / งานล้มก่อนส่ง _DONE
+                    if future.done():
+                        future.result()
+                        break
+                    continue
+                if item is _DONE:
+                    break
+                yield item
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
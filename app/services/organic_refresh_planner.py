@@ -0,0 +1,266 @@
+"""
+Organic Refresh Planner - เลือก TikTok content ที่ควร refresh item details ในรอบนี้
+
+แทนการเลือกโพสต์ใหม่สุด N ตัว (โพสต์เก่าที่ยังใช้ยิงแอดไม่เคยถูก refresh
+ส่วนโพสต์ใหม่ที่ไม่มีคนดูกินโควตา) → ให้คะแนนทุก content แล้วเลือก top N ตาม API budget
+
+priority = staleness * (w.velocity * velocity + w.spend * spend + w.expiry * expiry + w.base)
+
+- staleness: ชั่วโมงตั้งแต่ถูกเลือกครั้งล่าสุด / ORGANIC_REFRESH_STALE_HOURS (ไม่เคย refresh = 1)
+- velocity: views/hour (EMA ระหว่าง refresh; ยังไม่มีสถิติ → views / อายุโพสต์) เทียบ VELOCITY_REF แบบ log
+- spend: ad spend ช่วง ORGANIC_REFRESH_SPEND_DAYS วันล่าสุด (ad_performance_daily) เทียบ SPEND_REF แบบ log
+- expiry: expire_date ภายใน ORGANIC_REFRESH_EXPIRY_SOON_DAYS วัน = 1, หมดอายุแล้ว = 0 และลดครึ่ง priority
+- item ที่ถูกเลือกภายใน ORGANIC_REFRESH_MIN_INTERVAL_MINUTES ข้ามไป
+- โพสต์ที่เก่ากว่า max_age_days (organic_refresh_max_days) ยังถูกเลือกได้ถ้ามี ad spend ล่าสุด
+  หรือใกล้หมดอายุ
+
+สถิติต่อ content อยู่ในตาราง content_refresh_stats (record_results หลังดึงเสร็จ)
+"""
+import math
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Content, ContentRefreshStat
+from app.models.enums import Platform as PlatformEnum
+
+# น้ำหนักของ velocity ใหม่ใน EMA
+VELOCITY_EMA_ALPHA = 0.5
+
+
+class OrganicRefreshPlanner:
+    """ให้คะแนน + เลือก content สำหรับ organic refresh และบันทึกสถิติหลัง refresh"""
+
+    # ============================================
+    # Scoring
+    # ============================================
+
+    @staticmethod
+    def _log_ratio(value: float, reference: float) -> float:
+        if value <= 0 or reference <= 0:
+            return 0.0
+        return min(math.log1p(value) / math.log1p(reference), 1.0)
+
+    @classmethod
+    def score(
+        cls,
+        now: datetime,
+        views: int,
+        platform_created_at: Optional[datetime],
+        expire_date: Optional[date],
+        recent_spend: float,
+        last_attempted_at: Optional[datetime],
+        views_per_hour: Optional[float],
+    ) -> Tuple[float, Dict]:
+        """คืน (priority, breakdown)"""
+        weights = settings.ORGANIC_REFRESH_WEIGHTS
+
+        if last_attempted_at is None:
+            staleness = 1.0
+        else:
+            if last_attempted_at.tzinfo is None:
+                last_attempted_at = last_attempted_at.replace(tzinfo=timezone.utc)
+            hours = (now - last_attempted_at).total_seconds() / 3600
+            staleness = min(max(hours, 0.0) / settings.ORGANIC_REFRESH_STALE_HOURS, 1.0)
+
+        if views_per_hour is None:
+            # ยังไม่มีสถิติระหว่าง refresh → ประมาณจากอายุโพสต์
+            views_per_hour = 0.0
+            if platform_created_at is not None:
+                if platform_created_at.tzinfo is None:
+                    platform_created_at = platform_created_at.replace(tzinfo=timezone.utc)
+                age_hours = max((now - platform_created_at).total_seconds() / 3600, 1.0)
+                views_per_hour = (views or 0) / age_hours
+        velocity = cls._log_ratio(views_per_hour, settings.ORGANIC_REFRESH_VELOCITY_REF)
+
+        spend = cls._log_ratio(recent_spend or 0.0, settings.ORGANIC_REFRESH_SPEND_REF)
+
+        expiry = 0.0
+        expired = False
+        if expire_date is not None:
+            days_left = (expire_date - now.date()).days
+            if days_left < 0:
+                expired = True
+            elif days_left <= settings.ORGANIC_REFRESH_EXPIRY_SOON_DAYS:
+                expiry = 1.0
+
+        value = (
+            weights.get("velocity", 0) * velocity
+            + weights.get("spend", 0) * spend
+            + weights.get("expiry", 0) * expiry
+            + weights.get("base", 0)
+        )
+        priority = staleness * value * (0.5 if expired else 1.0)
+
+        return round(priority, 6), {
+            "staleness": round(staleness, 4),
+            "velocity": round(velocity, 4),
+            "spend": round(spend, 4),
+            "expiry": expiry,
+            "expired": expired,
+            "views_per_hour": round(views_per_hour, 2),
+        }
+
+    # ============================================
+    # Plan
+    # ============================================
+
+    @classmethod
+    def _load_candidates(cls, db: Session, now: datetime) -> List:
+        """content TikTok ทั้งหมดที่ยังไม่ถูกลบ + สถิติ refresh + spend ล่าสุด (1 query)"""
+        return db.execute(
+            text(
+                """
+                SELECT c.id, c.platform_post_id, c.views, c.platform_created_at, c.expire_date,
+                       s.last_attempted_at, s.views_per_hour,
+                       COALESCE(sp.spend, 0) AS recent_spend
+                  FROM contents c
+                  LEFT JOIN content_refresh_stats s ON s.content_id = c.id
+                  LEFT JOIN (
+                        SELECT a.content_id, SUM(p.spend) AS spend
+                          FROM ad_performance_daily p
+                          JOIN ads a
+                            ON a.platform = p.platform
+                           AND a.ad_account_id = p.ad_account_id
+                           AND a.external_ad_id = p.external_ad_id
+                         WHERE p.date >= :spend_since
+                           AND a.content_id IS NOT NULL
+                         GROUP BY a.content_id
+                       ) sp ON sp.content_id = c.id
+                 WHERE c.platform::text = 'TIKTOK'
+                   AND c.deleted_at IS NULL
+                   AND c.platform_post_id IS NOT NULL
+                   AND (s.last_attempted_at IS NULL OR s.last_attempted_at < :attempt_before)
+                """
+            ),
+            {
+                "spend_since": now.date() - timedelta(days=settings.ORGANIC_REFRESH_SPEND_DAYS),
+                "attempt_before": now - timedelta(minutes=settings.ORGANIC_REFRESH_MIN_INTERVAL_MINUTES),
+            },
+        ).all()
+
+    @classmethod
+    def plan(cls, db: Session, budget: int, max_age_days: Optional[int] = None) -> List[Dict]:
+        """
+        เลือก content สูงสุด budget ตัว เรียงตาม priority
+
+        max_age_days: โพสต์ที่เก่ากว่านี้ต้องมี spend หรือใกล้หมดอายุถึงจะถูกพิจารณา
+
+        Returns:
+            [{"content_id", "item_id", "priority", "breakdown"}]
+        """
+        if budget <= 0:
+            return []
+
+        now = datetime.now(timezone.utc)
+        min_created_at = now - timedelta(days=max_age_days) if max_age_days else None
+
+        scored: List[Dict] = []
+        for row in cls._load_candidates(db, now):
+            priority, breakdown = cls.score(
+                now,
+                views=row.views or 0,
+                platform_created_at=row.platform_created_at,
+                expire_date=row.expire_date,
+                recent_spend=float(row.recent_spend or 0),
+                last_attempted_at=row.last_attempted_at,
+                views_per_hour=row.views_per_hour,
+            )
+            if min_created_at is not None and not (breakdown["spend"] > 0 or breakdown["expiry"] > 0):
+                created_at = row.platform_created_at
+                if created_at is not None and created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                if created_at is None or created_at < min_created_at:
+                    continue
+            scored.append({
+                "content_id": row.id,
+                "item_id": row.platform_post_id,
+                "priority": priority,
+                "breakdown": breakdown,
+            })
+
+        scored.sort(key=lambda c: c["priority"], reverse=True)
+        return scored[:budget]
+
+    # ============================================
+    # Stats
+    # ============================================
+
+    @classmethod
+    def record_results(cls, db: Session, planned: List[Dict], failed_item_ids: Iterable[str]) -> None:
+        """
+        อัปเดต content_refresh_stats ของ content ที่ถูกเลือกรอบนี้ (หลัง update_content_details)
+        - สำเร็จ: last_refreshed_at, velocity (EMA), last_views, refresh_count, unchanged_count
+        - ไม่สำเร็จ: fail_count (last_attempted_at ขยับเหมือนกันเพื่อให้ item อื่นได้คิว)
+        """
+        if not planned:
+            return
+
+        now = datetime.now(timezone.utc)
+        failed = {str(i) for i in failed_item_ids}
+        content_ids = [p["content_id"] for p in planned]
+
+        views_by_id = dict(
+            db.query(Content.id, Content.views)
+            .filter(Content.id.in_(content_ids), Content.platform == PlatformEnum.TIKTOK)
+            .all()
+        )
+        stats_by_id = {
+            s.content_id: s
+            for s in db.query(ContentRefreshStat).filter(ContentRefreshStat.content_id.in_(content_ids)).all()
+        }
+
+        rows = []
+        for p in planned:
+            content_id = p["content_id"]
+            prev = stats_by_id.get(content_id)
+            row = {
+                "content_id": content_id,
+                "last_attempted_at": now,
+                "last_score": p["priority"],
+                "last_refreshed_at": prev.last_refreshed_at if prev else None,
+                "last_views": prev.last_views if prev else None,
+                "views_per_hour": prev.views_per_hour if prev else None,
+                "refresh_count": (prev.refresh_count or 0) if prev else 0,
+                "unchanged_count": (prev.unchanged_count or 0) if prev else 0,
+                "fail_count": (prev.fail_count or 0) if prev else 0,
+                "updated_at": now,
+            }
+
+            if str(p["item_id"]) in failed or content_id not in views_by_id:
+                row["fail_count"] += 1
+            else:
+                views = int(views_by_id[content_id] or 0)
+                if prev and prev.last_refreshed_at is not None and prev.last_views is not None:
+                    last_at = prev.last_refreshed_at
+                    if last_at.tzinfo is None:
+                        last_at = last_at.replace(tzinfo=timezone.utc)
+                    hours = max((now - last_at).total_seconds() / 3600, 1 / 60)
+                    observed = max(views - prev.last_views, 0) / hours
+                    if prev.views_per_hour is None:
+                        row["views_per_hour"] = observed
+                    else:
+                        row["views_per_hour"] = (
+                            VELOCITY_EMA_ALPHA * observed + (1 - VELOCITY_EMA_ALPHA) * prev.views_per_hour
+                        )
+                    row["unchanged_count"] = row["unchanged_count"] + 1 if views == prev.last_views else 0
+                else:
+                    row["views_per_hour"] = p["breakdown"].get("views_per_hour")
+                row["last_refreshed_at"] = now
+                row["last_views"] = views
+                row["refresh_count"] += 1
+                row["fail_count"] = 0
+            rows.append(row)
+
+        stmt = pg_insert(ContentRefreshStat.__table__).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["content_id"],
+            set_={col: getattr(excluded, col) for col in rows[0] if col != "content_id"},
+        )
+        db.execute(stmt)
+        db.commit()
@@ -0,0 +1,252 @@
+"""
+PFM Score Engine - คำนวณ PFM score ของ TikTok content แบบ set-based
+
+ใช้แทน loop ใน update_all_pfm_scores เดิม (โหลด Content ORM ทั้งหมด + calculate_pfm_score
+ทีละแถวด้วย Decimal + UPDATE ทีละแถว)
+
+- ดึงเฉพาะคอลัมน์ metrics ทีละ chunk (keyset ตาม id) เป็น array
+- คำนวณทั้ง chunk พร้อมกันด้วย NumPy (ลำดับการคำนวณเหมือน calculate_pfm_score ทุกขั้น
+  → ค่า float ก่อนปัดตรงกัน bit-for-bit แล้วปัดเป็นหน่วย 0.01 ให้ได้ผลเดียวกับ round(score, 2))
+- เทียบกับค่าเดิมเป็นจำนวนเต็ม (cents) แล้วเขียนกลับ 1 UPDATE ... FROM unnest() ต่อ chunk
+  เฉพาะแถวที่ค่าเปลี่ยน
+- numpy อยู่ใน requirements.txt; ถ้า import ไม่ได้ → คำนวณทีละแถวด้วย calculate_pfm_score
+  (อ่าน/เขียนยังเป็น chunk แต่ช้ากว่าแบบเดิมเล็กน้อย) และ print warning ตอน update_all
+
+Benchmark: scripts/benchmark_pfm_scoring.py
+"""
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+try:
+    import numpy as np
+
+    _NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+    _NUMPY_AVAILABLE = False
+
+_fallback_warned = False
+
+
+def _warn_numpy_fallback() -> None:
+    """เตือนครั้งเดียวต่อ process ว่ากำลังใช้ path ทีละแถว (numpy ไม่ได้ติดตั้ง)"""
+    global _fallback_warned
+    if _NUMPY_AVAILABLE or _fallback_warned:
+        return
+    _fallback_warned = True
+    print(
+        "[PFMScoreEngine] WARNING: numpy not installed - falling back to per-row "
+        "calculate_pfm_score (pip install -r requirements.txt)"
+    )
+
+
+# (views < upper_bound, target_comments %, target_shares %, target_likes %)
+# upper_bound = None → tier สุดท้าย
+PFM_TIERS = (
+    (10000, 0.018, 0.07, 12),
+    (50000, 0.016, 0.05, 10),
+    (100000, 0.013, 0.04, 7),
+    (500000, 0.01, 0.035, 4),
+    (1000000, 0.009, 0.025, 1.8),
+    (5000000, 0.004, 0.02, 1.5),
+    (10000000, 0.003, 0.015, 1.2),
+    (None, 0.002, 0.01, 1),
+)
+
+# Comments: 45%, Shares: 35%, Likes: 25%
+PFM_WEIGHTS = (45, 35, 25)
+
+
+class PFMScoreEngine:
+    """Vectorized PFM scoring + bulk write-back"""
+
+    @staticmethod
+    def numpy_available() -> bool:
+        return _NUMPY_AVAILABLE
+
+    @staticmethod
+    def compute_raw(views, likes, comments, shares, bookmarks):
+        """
+        PFM score ก่อนปัดเศษของทั้ง array (float64)
+
+        ต้องคงลำดับการคำนวณให้เหมือน TikTokService.calculate_pfm_score
+        """
+        views = np.asarray(views, dtype=np.float64)
+        likes = np.asarray(likes, dtype=np.float64)
+        comments = np.asarray(comments, dtype=np.float64)
+        shares = np.asarray(shares, dtype=np.float64)
+        bookmarks = np.asarray(bookmarks, dtype=np.float64)
+
+        # Adjust likes with bookmarks (1 bookmark = 10 likes)
+        adjusted_likes = likes + (bookmarks * 10)
+
+        # tier index: views < bound[i] ตัวแรก (เท่ากับ bound → tier ถัดไป)
+        bounds = np.array([t[0] for t in PFM_TIERS[:-1]], dtype=np.float64)
+        tier = np.searchsorted(bounds, views, side="right")
+        target_comments = np.array([t[1] for t in PFM_TIERS], dtype=np.float64)[tier]
+        target_shares = np.array([t[2] for t in PFM_TIERS], dtype=np.float64)[tier]
+        target_likes = np.array([t[3] for t in PFM_TIERS], dtype=np.float64)[tier]
+
+        view_target_comments = (views * target_comments) / 100
+        view_target_shares = (views * target_shares) / 100
+        view_target_likes = (views * target_likes) / 100
+
+        def norm(value, target):
+            out = np.zeros_like(value)
+            np.divide(value, target, out=out, where=target > 0)
+            return out
+
+        norm_comments = norm(comments, view_target_comments)
+        norm_shares = norm(shares, view_target_shares)
+        norm_likes = norm(adjusted_likes, view_target_likes)
+
+        w_comments, w_shares, w_likes = PFM_WEIGHTS
+        score = (norm_comments * w_comments + norm_shares * w_shares + norm_likes * w_likes) / 100
+        return np.where(views > 0, score, 0.0)
+
+    @classmethod
+    def compute_cents(cls, views, likes, comments, shares, bookmarks):
+        """
+        PFM score เป็นจำนวนเต็มหน่วย 0.01 (int64 array)
+
+        = round(score, 2) * 100 ของ Python ทุกแถว: np.rint บน score*100 ให้ผลเดียวกันเสมอ
+        ยกเว้นค่าที่อยู่ห่างจากครึ่ง (x.5) ไม่เกินความคลาดเคลื่อนของการคูณ 100
+        → แถวเหล่านั้น (น้อยมาก) ปัดด้วย round() ของ Python
+        """
+        raw = cls.compute_raw(views, likes, comments, shares, bookmarks)
+        scaled = raw * 100
+        cents = np.rint(scaled)
+
+        distance_to_half = np.abs(scaled - np.floor(scaled) - 0.5)
+        ambiguous = np.nonzero(distance_to_half <= 1e-9 * np.maximum(1.0, np.abs(scaled)))[0]
+        for i in ambiguous.tolist():
+            cents[i] = round(round(float(raw[i]), 2) * 100)
+
+        return cents.astype(np.int64)
+
+    @classmethod
+    def compute(
+        cls,
+        views: Sequence,
+        likes: Sequence,
+        comments: Sequence,
+        shares: Sequence,
+        bookmarks: Sequence,
+    ) -> List[Decimal]:
+        """PFM score (Decimal 2 ตำแหน่ง) เท่ากับ calculate_pfm_score ทุกแถว"""
+        if not _NUMPY_AVAILABLE:
+            from app.services.tiktok_service import TikTokService
+
+            return [
+                TikTokService.calculate_pfm_score(v, l, c, s, b)
+                for v, l, c, s, b in zip(views, likes, comments, shares, bookmarks)
+            ]
+
+        cents = cls.compute_cents(views, likes, comments, shares, bookmarks)
+        return [Decimal(c).scaleb(-2) for c in cents.tolist()]
+
+    @classmethod
+    def _changed(cls, ids, views, likes, comments, shares, saves, old_cents) -> Tuple[List[int], List[int]]:
+        """(content_ids, new_cents) ของแถวที่ pfm_score เปลี่ยน (old_cents = -1 คือ NULL)"""
+        if not _NUMPY_AVAILABLE:
+            from app.services.tiktok_service import TikTokService
+
+            changed_ids, changed_cents = [], []
+            for content_id, v, l, c, s, b, old in zip(ids, views, likes, comments, shares, saves, old_cents):
+                new = int(TikTokService.calculate_pfm_score(v, l, c, s, b) * 100)
+                if new != old:
+                    changed_ids.append(content_id)
+                    changed_cents.append(new)
+            return changed_ids, changed_cents
+
+        new_cents = cls.compute_cents(views, likes, comments, shares, saves)
+        mask = new_cents != np.asarray(old_cents, dtype=np.int64)
+        return np.asarray(ids)[mask].tolist(), new_cents[mask].tolist()
+
+    @classmethod
+    def update_all(cls, db: Optional[Session] = None, chunk_size: Optional[int] = None) -> int:
+        """
+        คำนวณ PFM ใหม่ของ TikTok content ทั้งหมด (ที่ยังไม่ถูกลบ) แล้วเขียนเฉพาะที่เปลี่ยน
+
+        Returns:
+            จำนวนแถวที่ pfm_score เปลี่ยน
+        """
+        chunk_size = chunk_size or settings.PFM_SCORE_CHUNK_SIZE
+        _warn_numpy_fallback()
+        own_session = db is None
+        db = db or SessionLocal()
+        updated = 0
+        last_id = 0
+
+        try:
+            while True:
+                # 1 แถวต่อ chunk: แต่ละคอลัมน์มาเป็น array
+                chunk = db.execute(
+                    text(
+                        """
+                        SELECT COUNT(*), MAX(id),
+                               ARRAY_AGG(id ORDER BY id),
+                               ARRAY_AGG(views ORDER BY id),
+                               ARRAY_AGG(likes ORDER BY id),
+                               ARRAY_AGG(comments ORDER BY id),
+                               ARRAY_AGG(shares ORDER BY id),
+                               ARRAY_AGG(saves ORDER BY id),
+                               ARRAY_AGG(old_cents ORDER BY id)
+                          FROM (
+                                SELECT id,
+                                       COALESCE(views, 0) AS views,
+                                       COALESCE(likes, 0) AS likes,
+                                       COALESCE(comments, 0) AS comments,
+                                       COALESCE(shares, 0) AS shares,
+                                       COALESCE(saves, 0) AS saves,
+                                       COALESCE(ROUND(pfm_score * 100)::BIGINT, -1) AS old_cents
+                                  FROM contents
+                                 WHERE platform::text = 'TIKTOK'
+                                   AND deleted_at IS NULL
+                                   AND id > :last_id
+                                 ORDER BY id
+                                 LIMIT :limit
+                               ) t
+                        """
+                    ),
+                    {"last_id": last_id, "limit": chunk_size},
+                ).one()
+                count, max_id = chunk[0], chunk[1]
+                if not count:
+                    break
+                last_id = max_id
+
+                changed_ids, changed_cents = cls._changed(*chunk[2:])
+                if changed_ids:
+                    db.execute(
+                        text(
+                            """
+                            UPDATE contents c
+                               SET pfm_score = v.cents::NUMERIC / 100,
+                                   updated_at = NOW(),
+                                   content_version = nextval('content_version_seq')
+                              FROM (
+                                    SELECT UNNEST(CAST(:ids AS INTEGER[])) AS id,
+                                           UNNEST(CAST(:cents AS BIGINT[])) AS cents
+                                   ) v
+                             WHERE c.id = v.id
+                            """
+                        ),
+                        {"ids": changed_ids, "cents": changed_cents},
+                    )
+                    db.commit()
+                    updated += len(changed_ids)
+
+                if count < chunk_size:
+                    break
+
+            return updated
+        finally:
+            if own_session:
+                db.close()
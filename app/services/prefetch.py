@@ -0,0 +1,61 @@
+"""
+Prefetch - รัน iterator (เช่น API page stream) ใน background thread ผ่าน bounded queue
+
+ใช้ทำ producer/consumer pipeline: producer ดึงหน้าถัดไปจาก API
+ระหว่างที่ consumer เขียน DB → network / DB overlap กัน
+
+ผู้ใช้: TikTokAdsService.upsert_tiktok_ad_performance_daily, TikTokService.fetch_and_sync_all_videos
+"""
+import queue
+import threading
+from typing import Iterator
+
+
+def prefetch(iterator: Iterator, depth: int, name: str = "prefetch") -> Iterator:
+    """
+    yield item จาก iterator ที่ถูกดึงล่วงหน้าใน background thread
+
+    - queue มีขนาด depth → producer ถือ item ค้างไว้ไม่เกิน depth ตัว (backpressure, memory คงที่)
+    - exception ฝั่ง producer ถูก raise ต่อที่ consumer
+    - consumer เลิกอ่านกลางทาง → producer หยุดและ iterator ถูก close
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(("item", item)):
+                    return
+            put(("done", done))
+        except BaseException as e:  # ส่งต่อให้ consumer
+            put(("error", e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, payload = q.get()
+            if kind == "item":
+                yield payload
+            elif kind == "error":
+                raise payload
+            else:
+                return
+    finally:
+        stop.set()
+        producer.join(timeout=5)
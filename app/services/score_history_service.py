@@ -0,0 +1,238 @@
+"""
+Score History Service - time series ของ score ต่อ content (ตาราง content_score_points)
+
+- record(): เขียนเฉพาะ content ที่ score เปลี่ยน (score_tasks.calculate_all_scores เป็นคนเรียก)
+  เป็นคอลัมน์ตัวเลขล้วน ไม่มี JSON
+- partition รายเดือนตาม recorded_at (UTC) + default partition กันเขียนไม่ลง
+  ensure_partitions() สร้างล่วงหน้า SCORE_HISTORY_PARTITION_MONTHS_AHEAD เดือน
+- compact(): downsample เป็น step series (เก็บค่าสุดท้ายของแต่ละ bucket, เวลา = ต้น bucket)
+    - อายุ <= SCORE_HISTORY_RAW_DAYS → raw
+    - อายุ <= SCORE_HISTORY_HOURLY_DAYS → รายชั่วโมง
+    - เก่ากว่านั้น → รายวัน
+- get_curve(): จุดของ content ในช่วงเวลา + จุดสุดท้ายก่อนช่วง (ค่า ณ ต้นช่วง)
+  ใช้ PK (content_id, recorded_at, resolution) + partition pruning
+
+Job: scheduler.compact_score_history_job (ทุกวัน)
+"""
+from datetime import date, datetime, timedelta, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import Content, ContentScorePoint
+
+TABLE_NAME = ContentScorePoint.__tablename__
+
+SCORE_COLUMNS = ("pfm_score", "fb_score", "unified_score")
+METRIC_COLUMNS = ("views", "likes", "comments", "shares", "saves", "ads_total_cost")
+DECIMAL_COLUMNS = SCORE_COLUMNS + ("ads_total_cost",)
+CENT = Decimal("0.01")
+
+RESOLUTION_NAMES = {
+    ContentScorePoint.RAW: "raw",
+    ContentScorePoint.HOURLY: "hourly",
+    ContentScorePoint.DAILY: "daily",
+}
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class ScoreHistoryService:
+    """เขียน / บีบอัด / อ่าน score history"""
+
+    # ============================================
+    # Partitions
+    # ============================================
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f"{TABLE_NAME}_{month.year}{month.month:02d}"
+
+    @classmethod
+    def ensure_partitions(
+        cls,
+        db: Session,
+        months_ahead: Optional[int] = None,
+        start: Optional[date] = None,
+    ) -> List[str]:
+        """สร้าง partition รายเดือนตั้งแต่ start (default เดือนนี้) ไปอีก months_ahead เดือน + default partition"""
+        if months_ahead is None:
+            months_ahead = settings.SCORE_HISTORY_PARTITION_MONTHS_AHEAD
+        month = _month_start(start or datetime.now(timezone.utc).date())
+
+        created: List[str] = []
+        for _ in range(months_ahead + 1):
+            name = cls.partition_name(month)
+            upper = _next_month(month)
+            try:
+                db.execute(
+                    text(
+                        f"""
+                        CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE_NAME}
+                        FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')
+                        """
+                    )
+                )
+                db.commit()
+                created.append(name)
+            except Exception as e:
+                # เช่น default partition มีแถวของเดือนนี้อยู่แล้ว
+                db.rollback()
+                print(f"[ScoreHistoryService] Cannot create partition {name}: {e}")
+            month = upper
+
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME}_default PARTITION OF {TABLE_NAME} DEFAULT"))
+        db.commit()
+        return created
+
+    # ============================================
+    # Write
+    # ============================================
+
+    @staticmethod
+    def scores_of(content: Content) -> tuple:
+        """score ปัดเป็น 2 ตำแหน่งแบบเดียวกับคอลัมน์ Numeric(5, 2) (ใช้เทียบว่าเปลี่ยนหรือไม่)"""
+        scores = []
+        for col in SCORE_COLUMNS:
+            value = getattr(content, col)
+            scores.append(None if value is None else Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP))
+        return tuple(scores)
+
+    @staticmethod
+    def point_for(content: Content, recorded_at: datetime) -> Dict:
+        row = {"content_id": content.id, "recorded_at": recorded_at, "resolution": ContentScorePoint.RAW}
+        for col in SCORE_COLUMNS + METRIC_COLUMNS:
+            row[col] = getattr(content, col)
+        return row
+
+    @classmethod
+    def record(cls, db: Session, points: List[Dict]) -> int:
+        """insert จุด raw (ไม่ commit - ให้ commit พร้อม score ของ batch นั้น)"""
+        if not points:
+            return 0
+        stmt = pg_insert(ContentScorePoint.__table__).values(points)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["content_id", "recorded_at", "resolution"],
+            set_={col: getattr(excluded, col) for col in SCORE_COLUMNS + METRIC_COLUMNS},
+        )
+        db.execute(stmt)
+        return len(points)
+
+    # ============================================
+    # Downsampling
+    # ============================================
+
+    @classmethod
+    def _downsample(cls, db: Session, target: int, unit: str, cutoff: datetime) -> int:
+        """
+        แทนที่แถว resolution < target ที่เก่ากว่า cutoff ด้วยค่าสุดท้ายของแต่ละ bucket (unit)
+        cutoff ต้องตรงขอบ bucket → แต่ละ bucket ถูกรวมครั้งเดียว
+        """
+        columns = SCORE_COLUMNS + METRIC_COLUMNS
+        bucket = f"date_trunc('{unit}', recorded_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+        result = db.execute(
+            text(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {TABLE_NAME}
+                     WHERE resolution < :target
+                       AND recorded_at < :cutoff
+                    RETURNING content_id, recorded_at, {", ".join(columns)}
+                )
+                INSERT INTO {TABLE_NAME} (content_id, recorded_at, resolution, {", ".join(columns)})
+                SELECT DISTINCT ON (content_id, {bucket})
+                       content_id, {bucket}, :target, {", ".join(columns)}
+                  FROM moved
+                 ORDER BY content_id, {bucket}, recorded_at DESC
+                ON CONFLICT (content_id, recorded_at, resolution) DO UPDATE
+                   SET {", ".join(f"{col} = EXCLUDED.{col}" for col in columns)}
+                """
+            ),
+            {"target": target, "cutoff": cutoff},
+        )
+        db.commit()
+        return int(result.rowcount or 0)
+
+    @classmethod
+    def compact(cls, db: Optional[Session] = None, now: Optional[datetime] = None) -> Dict:
+        """ensure partitions + raw → hourly → daily"""
+        now = now or datetime.now(timezone.utc)
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            cls.ensure_partitions(db)
+
+            hourly_cutoff = (now - timedelta(days=settings.SCORE_HISTORY_RAW_DAYS)).replace(
+                minute=0, second=0, microsecond=0
+            )
+            daily_cutoff = (now - timedelta(days=settings.SCORE_HISTORY_HOURLY_DAYS)).replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+
+            # daily ก่อน: raw ที่ค้างนานเกิน (job ไม่ได้รัน) ข้ามไปเป็นรายวันเลย
+            daily = cls._downsample(db, ContentScorePoint.DAILY, "day", daily_cutoff)
+            hourly = cls._downsample(db, ContentScorePoint.HOURLY, "hour", hourly_cutoff)
+
+            print(f"[ScoreHistoryService] Compacted: hourly={hourly}, daily={daily}")
+            return {"hourly_points": hourly, "daily_points": daily}
+        finally:
+            if own_session:
+                db.close()
+
+    # ============================================
+    # Read
+    # ============================================
+
+    @classmethod
+    def get_curve(
+        cls,
+        db: Session,
+        content_id: int,
+        start: datetime,
+        end: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """
+        จุดของ content ในช่วง [start, end] เรียงตามเวลา
+        จุดแรกอาจอยู่ก่อน start (ค่าที่มีผล ณ start เพราะเก็บเฉพาะตอนเปลี่ยน)
+        """
+        end = end or datetime.now(timezone.utc)
+        columns = ", ".join(("recorded_at", "resolution") + SCORE_COLUMNS + METRIC_COLUMNS)
+        rows = db.execute(
+            text(
+                f"""
+                (SELECT {columns} FROM {TABLE_NAME}
+                  WHERE content_id = :content_id AND recorded_at < :start
+                  ORDER BY recorded_at DESC
+                  LIMIT 1)
+                UNION ALL
+                (SELECT {columns} FROM {TABLE_NAME}
+                  WHERE content_id = :content_id AND recorded_at >= :start AND recorded_at <= :end)
+                ORDER BY recorded_at
+                """
+            ),
+            {"content_id": content_id, "start": start, "end": end},
+        ).all()
+
+        points = []
+        for row in rows:
+            point = {
+                "recorded_at": row.recorded_at.isoformat(),
+                "resolution": RESOLUTION_NAMES.get(row.resolution, str(row.resolution)),
+            }
+            for col in SCORE_COLUMNS + METRIC_COLUMNS:
+                value = getattr(row, col)
+                point[col] = float(value) if value is not None and col in DECIMAL_COLUMNS else value
+            points.append(point)
+        return points
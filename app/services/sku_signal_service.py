@@ -0,0 +1,247 @@
+"""
+SKU Signal Service - รวม demand signal ระดับ SKU ลง sku_signals และ map demand_score สำหรับ scoring
+
+aggregate(): 1 statement (INSERT ... SELECT ... ON CONFLICT) ต่อวัน
+- window ปัจจุบัน = SKU_SIGNAL_WINDOW_DAYS วันถึง as_of, window ก่อนหน้า = ขนาดเท่ากันก่อนหน้านั้น
+    - online_sales_daily: revenue, orders
+    - saversure_scans_daily: scan_count
+    - offline_sales_weekly: units_sold (ตาม week_start)
+- demand_score (0-100) = ค่าเฉลี่ยถ่วงน้ำหนัก (SKU_SIGNAL_WEIGHTS) ของ CUME_DIST ของแต่ละ source
+  เทียบกับทุก SKU (SKU ที่ไม่มียอดใน source นั้น = 0, source ที่ไม่มีข้อมูลเลยไม่นับน้ำหนัก)
+- trend_pct = % เปลี่ยนจาก window ก่อนหน้า ถ่วงน้ำหนักเฉพาะ source ที่ window ก่อนหน้ามียอด
+- SKU ที่ demand_score เปลี่ยน → content ที่มี product_code นั้นถูก mark ให้คำนวณ score ใหม่
+  (bump contents.content_version, ดู score_tasks.calculate_all_scores)
+- map ใน memory เปลี่ยนเป็นค่าใหม่หลัง commit สำเร็จเท่านั้น
+
+load_demand_scores(): {product_code: demand_score} ของวันล่าสุด (1 query) เก็บไว้ใน memory
+score_tasks โหลดครั้งเดียวต่อรอบแล้วส่งเข้า calculate_unified_score
+"""
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+# ค่าที่เก็บได้ใน trend_pct Numeric(6, 2)
+TREND_LIMIT = 9999.99
+
+_AGGREGATE_SQL = """
+WITH src AS (
+    SELECT product_code,
+           COALESCE(SUM(revenue) FILTER (WHERE date >= :cur_start), 0) AS online_revenue,
+           COALESCE(SUM(revenue) FILTER (WHERE date < :cur_start), 0) AS online_revenue_prev,
+           COALESCE(SUM(orders) FILTER (WHERE date >= :cur_start), 0) AS online_orders,
+           0 AS scan_count, 0 AS scan_count_prev,
+           0 AS offline_units, 0 AS offline_units_prev
+      FROM online_sales_daily
+     WHERE date BETWEEN :prev_start AND :as_of
+     GROUP BY product_code
+    UNION ALL
+    SELECT product_code,
+           0, 0, 0,
+           COALESCE(SUM(scan_count) FILTER (WHERE date >= :cur_start), 0),
+           COALESCE(SUM(scan_count) FILTER (WHERE date < :cur_start), 0),
+           0, 0
+      FROM saversure_scans_daily
+     WHERE date BETWEEN :prev_start AND :as_of
+     GROUP BY product_code
+    UNION ALL
+    SELECT product_code,
+           0, 0, 0, 0, 0,
+           COALESCE(SUM(units_sold) FILTER (WHERE week_start >= :cur_start), 0),
+           COALESCE(SUM(units_sold) FILTER (WHERE week_start < :cur_start), 0)
+      FROM offline_sales_weekly
+     WHERE week_start BETWEEN :prev_start AND :as_of
+     GROUP BY product_code
+),
+totals AS (
+    SELECT product_code,
+           SUM(online_revenue) AS online_revenue,
+           SUM(online_revenue_prev) AS online_revenue_prev,
+           SUM(online_orders) AS online_orders,
+           SUM(scan_count) AS scan_count,
+           SUM(scan_count_prev) AS scan_count_prev,
+           SUM(offline_units) AS offline_units,
+           SUM(offline_units_prev) AS offline_units_prev
+      FROM src
+     GROUP BY product_code
+),
+ranked AS (
+    SELECT t.*,
+           CASE WHEN online_revenue > 0 THEN CUME_DIST() OVER (ORDER BY online_revenue) ELSE 0 END AS online_rank,
+           CASE WHEN scan_count > 0 THEN CUME_DIST() OVER (ORDER BY scan_count) ELSE 0 END AS scan_rank,
+           CASE WHEN offline_units > 0 THEN CUME_DIST() OVER (ORDER BY offline_units) ELSE 0 END AS offline_rank,
+           CASE WHEN SUM(online_revenue) OVER () > 0 THEN :w_online ELSE 0 END AS w_online,
+           CASE WHEN SUM(scan_count) OVER () > 0 THEN :w_saversure ELSE 0 END AS w_saversure,
+           CASE WHEN SUM(offline_units) OVER () > 0 THEN :w_offline ELSE 0 END AS w_offline,
+           100.0 * (online_revenue - online_revenue_prev) / NULLIF(online_revenue_prev, 0) AS online_trend,
+           100.0 * (scan_count - scan_count_prev) / NULLIF(scan_count_prev, 0) AS scan_trend,
+           100.0 * (offline_units - offline_units_prev) / NULLIF(offline_units_prev, 0) AS offline_trend
+      FROM totals t
+),
+scored AS (
+    SELECT r.*,
+           (w_online * online_rank + w_saversure * scan_rank + w_offline * offline_rank)
+               / NULLIF(w_online + w_saversure + w_offline, 0) * 100 AS demand,
+           (COALESCE(:w_online * online_trend, 0)
+              + COALESCE(:w_saversure * scan_trend, 0)
+              + COALESCE(:w_offline * offline_trend, 0))
+               / NULLIF(
+                     CASE WHEN online_trend IS NOT NULL THEN :w_online ELSE 0 END
+                   + CASE WHEN scan_trend IS NOT NULL THEN :w_saversure ELSE 0 END
+                   + CASE WHEN offline_trend IS NOT NULL THEN :w_offline ELSE 0 END,
+                 0) AS trend
+      FROM ranked r
+)
+INSERT INTO sku_signals (
+    date, product_code, online_revenue, online_orders, scan_count, offline_units,
+    demand_score, trend_pct, signal_breakdown
+)
+SELECT :as_of, product_code, online_revenue, online_orders, scan_count, offline_units,
+       ROUND(CAST(demand AS NUMERIC), 2),
+       ROUND(CAST(LEAST(GREATEST(trend, -:trend_limit), :trend_limit) AS NUMERIC), 2),
+       json_build_object(
+           'window_days', :window_days,
+           'online', json_build_object(
+               'revenue', online_revenue, 'revenue_prev', online_revenue_prev,
+               'rank', ROUND(CAST(online_rank AS NUMERIC), 4), 'trend_pct', ROUND(CAST(online_trend AS NUMERIC), 2)),
+           'saversure', json_build_object(
+               'scans', scan_count, 'scans_prev', scan_count_prev,
+               'rank', ROUND(CAST(scan_rank AS NUMERIC), 4), 'trend_pct', ROUND(CAST(scan_trend AS NUMERIC), 2)),
+           'offline', json_build_object(
+               'units', offline_units, 'units_prev', offline_units_prev,
+               'rank', ROUND(CAST(offline_rank AS NUMERIC), 4), 'trend_pct', ROUND(CAST(offline_trend AS NUMERIC), 2))
+       )
+  FROM scored
+ON CONFLICT (date, product_code) DO UPDATE
+   SET online_revenue = EXCLUDED.online_revenue,
+       online_orders = EXCLUDED.online_orders,
+       scan_count = EXCLUDED.scan_count,
+       offline_units = EXCLUDED.offline_units,
+       demand_score = EXCLUDED.demand_score,
+       trend_pct = EXCLUDED.trend_pct,
+       signal_breakdown = EXCLUDED.signal_breakdown,
+       updated_at = NOW()
+"""
+
+
+class SKUSignalService:
+    """SKU signal aggregation + in-memory demand score map"""
+
+    _lock = threading.Lock()
+    _demand_scores: Dict[str, Decimal] = {}
+    _loaded_at: Optional[datetime] = None
+
+    # ============================================
+    # Demand score map
+    # ============================================
+
+    @classmethod
+    def load_demand_scores(cls, db: Session, publish: bool = True) -> Dict[str, Decimal]:
+        """
+        โหลด {product_code: demand_score} ของวันล่าสุดใน sku_signals ใหม่ (1 query)
+
+        publish=False: คืน map อย่างเดียว ไม่แทน map ใน memory (ใช้ตอนยังไม่ commit)
+        """
+        rows = db.execute(
+            text(
+                """
+                SELECT product_code, demand_score
+                  FROM sku_signals
+                 WHERE date = (SELECT MAX(date) FROM sku_signals)
+                   AND demand_score IS NOT NULL
+                """
+            )
+        ).all()
+        scores = {row.product_code: Decimal(row.demand_score) for row in rows}
+        if publish:
+            cls._publish(scores)
+        return scores
+
+    @classmethod
+    def _publish(cls, scores: Dict[str, Decimal]) -> None:
+        with cls._lock:
+            cls._demand_scores = scores
+            cls._loaded_at = datetime.now()
+
+    @classmethod
+    def demand_scores(cls) -> Dict[str, Decimal]:
+        """map ล่าสุดที่โหลดไว้ (ว่างถ้ายังไม่เคยโหลด)"""
+        with cls._lock:
+            return cls._demand_scores
+
+    # ============================================
+    # Aggregation
+    # ============================================
+
+    @classmethod
+    def _mark_contents_dirty(cls, db: Session, product_codes) -> int:
+        """content ที่มี product_code ที่ demand เปลี่ยน → ให้ calculate_all_scores คำนวณใหม่"""
+        result = db.execute(
+            text(
+                """
+                UPDATE contents
+                   SET content_version = nextval('content_version_seq'),
+                       updated_at = NOW()
+                 WHERE deleted_at IS NULL
+                   AND scored_version IS NOT NULL
+                   AND product_codes IS NOT NULL
+                   AND jsonb_typeof(CAST(product_codes AS JSONB)) = 'array'
+                   AND jsonb_exists_any(CAST(product_codes AS JSONB), CAST(:codes AS TEXT[]))
+                """
+            ),
+            {"codes": sorted(product_codes)},
+        )
+        return int(result.rowcount or 0)
+
+    @classmethod
+    def aggregate(cls, db: Optional[Session] = None, as_of: Optional[date] = None) -> Dict:
+        """
+        คำนวณ sku_signals ของวัน as_of (default = เมื่อวาน) แล้ว refresh demand score map
+
+        Returns:
+            {"date", "skus", "changed", "contents_marked"}
+        """
+        as_of = as_of or (date.today() - timedelta(days=1))
+        window = max(1, settings.SKU_SIGNAL_WINDOW_DAYS)
+        weights = settings.SKU_SIGNAL_WEIGHTS
+
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            previous = cls.load_demand_scores(db, publish=False)
+
+            result = db.execute(
+                text(_AGGREGATE_SQL),
+                {
+                    "as_of": as_of,
+                    "cur_start": as_of - timedelta(days=window - 1),
+                    "prev_start": as_of - timedelta(days=2 * window - 1),
+                    "window_days": window,
+                    "w_online": float(weights.get("online", 0)),
+                    "w_saversure": float(weights.get("saversure", 0)),
+                    "w_offline": float(weights.get("offline", 0)),
+                    "trend_limit": TREND_LIMIT,
+                },
+            )
+            skus = int(result.rowcount or 0)
+
+            current = cls.load_demand_scores(db, publish=False)
+            changed = {code for code in set(previous) | set(current) if previous.get(code) != current.get(code)}
+            marked = cls._mark_contents_dirty(db, changed) if changed else 0
+            db.commit()
+            cls._publish(current)
+
+            print(f"[SKUSignalService] {as_of}: {skus} SKUs, {len(changed)} demand changed, {marked} contents to rescore")
+            return {"date": as_of.isoformat(), "skus": skus, "changed": len(changed), "contents_marked": marked}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if own_session:
+                db.close()
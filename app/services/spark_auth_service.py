@@ -9,9 +9,8 @@ Spark Ad Authorization Service
 """
 import json
 from datetime import datetime, timezone
-from typing import List, Dict, Optional, Tuple
+from typing import ContextManager, List, Dict, Optional, Tuple
 
-import httpx
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -22,6 +21,7 @@ from app.models import (
     Platform,
 )
 from app.models.enums import AdAccountStatus, ContentSource, Platform as PlatformEnum
+from app.services.tiktok_request_executor import TikTokApiClient, TikTokRequestExecutor
 
 
 class SparkAuthService:
@@ -43,8 +43,9 @@ class SparkAuthService:
         return settings.tiktok_content_access_token or ""
     
     @classmethod
-    def _get_client(cls) -> httpx.Client:
-        return httpx.Client(timeout=30.0)
+    def _get_client(cls) -> ContextManager[TikTokApiClient]:
+        """Client ที่ยิงผ่าน TikTokRequestExecutor (shared pool + rate limit + retry)"""
+        return TikTokRequestExecutor.client_context()
     
     # ============================================
     # Bulk Import
@@ -89,6 +90,8 @@ class SparkAuthService:
             if not ad_account:
                 return {"success": False, "message": "Ad account not found"}
             
+            authorized_auths: List[SparkAdAuth] = []
+            
             results = {
                 "total": len(auth_codes),
                 "imported": 0,
@@ -152,17 +155,26 @@ class SparkAuthService:
                     
                     if auth_result["success"]:
                         results["authorized"] += 1
-                        
-                        # Try to auto-bind with content
-                        if spark_auth.item_id:
-                            bind_result = cls._auto_bind_content(db, spark_auth)
-                            if bind_result:
-                                results["bound"] += 1
                     else:
                         results["failed"] += 1
+                    authorized_auths.append(spark_auth)
+            
+            if authorized_auths:
+                # auth_end_time ฯลฯ จาก spark post index (refresh account นี้ครั้งเดียวทั้ง batch)
+                cls._fetch_auth_details(
+                    db,
+                    [a for a in authorized_auths if a.status == SparkAuthStatus.AUTHORIZED],
+                    ad_account,
+                )
+                
+                for spark_auth in authorized_auths:
+                    # Try to auto-bind with content
+                    if spark_auth.status == SparkAuthStatus.AUTHORIZED and spark_auth.item_id:
+                        if cls._auto_bind_content(db, spark_auth):
+                            results["bound"] += 1
                     
                     results["details"].append({
-                        "auth_code": auth_code[:20] + "...",
+                        "auth_code": spark_auth.auth_code[:20] + "...",
                         "status": spark_auth.status.value,
                         "item_id": spark_auth.item_id,
                         "content_id": spark_auth.content_id,
@@ -245,9 +257,6 @@ class SparkAuthService:
                     spark_auth.status = SparkAuthStatus.AUTHORIZED
                     spark_auth.authorized_at = datetime.now(timezone.utc)
                     
-                    # Fetch additional info from tt_video/list
-                    cls._fetch_auth_details(db, spark_auth, advertiser_id)
-                    
                     print(f"[SparkAuthService] Authorized: {spark_auth.auth_code[:20]}... -> item_id={spark_auth.item_id}")
                     return {"success": True, "item_id": spark_auth.item_id}
                 else:
@@ -267,45 +276,46 @@ class SparkAuthService:
     def _fetch_auth_details(
         cls,
         db: Session,
-        spark_auth: SparkAdAuth,
-        advertiser_id: str,
+        spark_auths: List[SparkAdAuth],
+        ad_account: AdAccount,
     ):
         """
-        Fetch auth_end_time และข้อมูลอื่นจาก tt_video/list
+        เติม auth_start_time / auth_end_time / ad_auth_status จาก spark post index
+        
+        item ที่เพิ่ง authorize ยังไม่อยู่ใน index → refresh account นี้ (1 ครั้ง) แล้วอ่านใหม่
         """
-        from app.services.tiktok_ads_service import TikTokAdsService
+        from app.models import TikTokSparkPost
+        from app.services.spark_post_index_service import SparkPostIndexService
         
-        posts = TikTokAdsService.fetch_spark_ad_posts(advertiser_id)
+        item_ids = {a.item_id for a in spark_auths if a.item_id}
+        if not item_ids:
+            return
         
-        for post in posts:
-            if post.get("item_id") == spark_auth.item_id:
-                # Parse auth times
-                auth_end = post.get("auth_end_time")
-                if auth_end:
-                    try:
-                        if isinstance(auth_end, str):
-                            spark_auth.auth_end_time = datetime.strptime(
-                                auth_end, "%Y-%m-%d %H:%M:%S"
-                            ).replace(tzinfo=timezone.utc)
-                        elif isinstance(auth_end, (int, float)):
-                            spark_auth.auth_end_time = datetime.fromtimestamp(
-                                auth_end, tz=timezone.utc
-                            )
-                    except Exception:
-                        pass
-                
-                auth_start = post.get("auth_start_time")
-                if auth_start:
-                    try:
-                        if isinstance(auth_start, str):
-                            spark_auth.auth_start_time = datetime.strptime(
-                                auth_start, "%Y-%m-%d %H:%M:%S"
-                            ).replace(tzinfo=timezone.utc)
-                    except Exception:
-                        pass
-                
-                spark_auth.ad_auth_status = post.get("ad_auth_status")
-                break
+        def load_index() -> Dict[str, TikTokSparkPost]:
+            rows = db.query(TikTokSparkPost).filter(
+                TikTokSparkPost.advertiser_id == ad_account.external_account_id,
+                TikTokSparkPost.item_id.in_(list(item_ids)),
+                TikTokSparkPost.is_listed.is_(True),
+            ).all()
+            return {row.item_id: row for row in rows}
+        
+        posts = load_index()
+        if item_ids - set(posts):
+            try:
+                SparkPostIndexService.refresh_account(db, ad_account, force=True, commit=False)
+            except Exception as e:
+                print(f"[SparkAuthService] Spark post index refresh failed: {e}")
+            posts = load_index()
+        
+        for spark_auth in spark_auths:
+            post = posts.get(spark_auth.item_id)
+            if not post:
+                continue
+            if post.auth_end_time:
+                spark_auth.auth_end_time = post.auth_end_time
+            if post.auth_start_time:
+                spark_auth.auth_start_time = post.auth_start_time
+            spark_auth.ad_auth_status = post.ad_auth_status
     
     @classmethod
     def _auto_bind_content(cls, db: Session, spark_auth: SparkAdAuth) -> bool:
@@ -497,8 +507,13 @@ class SparkAuthService:
         db = SessionLocal()
         
         try:
+            from app.services.spark_post_index_service import SparkPostIndexService
+            
             now = datetime.now(timezone.utc)
             
+            # auth_end_time ล่าสุดจาก spark post index (1 UPDATE join)
+            synced = SparkPostIndexService.apply_spark_auth_expiry(db)
+            
             # Find expired auths
             expired = db.query(SparkAdAuth).filter(
                 SparkAdAuth.status.in_([
@@ -514,9 +529,12 @@ class SparkAuthService:
             
             db.commit()
             
-            print(f"[SparkAuthService] Expire check job: {len(expired)} marked as expired")
+            print(
+                f"[SparkAuthService] Expire check job: {synced} synced from index, "
+                f"{len(expired)} marked as expired"
+            )
             
-            return {"expired_count": len(expired)}
+            return {"expired_count": len(expired), "synced_from_index": synced}
             
         finally:
             db.close()
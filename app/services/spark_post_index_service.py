@@ -0,0 +1,293 @@
+"""
+Spark Post Index Service - เก็บ Spark Ad posts (/tt_video/list/) ลงตาราง tiktok_spark_posts
+
+- refresh ต่อ account เมื่อข้อมูลเก่ากว่า TIKTOK_SPARK_POSTS_REFRESH_HOURS
+  (เวลา refresh ล่าสุดอยู่ใน AdAccount.config["tiktok_spark_posts_synced_at"])
+- หลาย account ดึงพร้อมกัน TIKTOK_SPARK_POSTS_ACCOUNT_WORKERS (session แยกต่อ account)
+- เขียนเฉพาะแถวที่เปลี่ยน (IS DISTINCT FROM), post ที่หายไปจาก list → is_listed = false
+- เติม identity cache (IdentityCacheService) จากข้อมูลชุดเดียวกัน
+
+ผู้อ่าน: update_content_expire_dates (join ตาม item_id) และ SparkAuthService
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import AdAccount, TikTokSparkPost
+from app.models.enums import AdAccountStatus
+from app.models.enums import Platform as PlatformEnum
+from app.services.identity_cache_service import IdentityCacheService
+from app.services.tiktok_ads_service import TikTokAdsService
+
+
+class SparkPostIndexService:
+    """Local index ของ Spark Ad posts"""
+
+    SYNCED_AT_KEY = "tiktok_spark_posts_synced_at"
+
+    _COMPARE_COLS = (
+        "identity_id",
+        "auth_code",
+        "auth_start_time",
+        "auth_end_time",
+        "ad_auth_status",
+        "is_listed",
+        "ad_account_id",
+    )
+
+    # ============================================
+    # Refresh
+    # ============================================
+
+    @classmethod
+    def _is_fresh(cls, acc: AdAccount) -> bool:
+        cfg = acc.config if isinstance(acc.config, dict) else {}
+        raw = cfg.get(cls.SYNCED_AT_KEY)
+        if not raw:
+            return False
+        try:
+            synced_at = datetime.fromisoformat(str(raw))
+        except ValueError:
+            return False
+        if synced_at.tzinfo is None:
+            synced_at = synced_at.replace(tzinfo=timezone.utc)
+        age = datetime.now(timezone.utc) - synced_at
+        return age < timedelta(hours=settings.TIKTOK_SPARK_POSTS_REFRESH_HOURS)
+
+    @classmethod
+    def _upsert_posts(cls, db: Session, acc: AdAccount, posts: List[Dict], now: datetime) -> int:
+        """upsert เฉพาะแถวที่ค่าเปลี่ยน คืนจำนวนแถวที่เขียนจริง"""
+        rows: Dict[str, Dict] = {}
+        for post in posts:
+            item_id = post.get("item_id")
+            if not item_id:
+                continue
+            rows[str(item_id)] = {
+                "advertiser_id": acc.external_account_id,
+                "item_id": str(item_id),
+                "ad_account_id": acc.id,
+                "identity_id": post.get("identity_id"),
+                "auth_code": post.get("auth_code"),
+                "auth_start_time": IdentityCacheService.parse_auth_time(post.get("auth_start_time")),
+                "auth_end_time": IdentityCacheService.parse_auth_time(post.get("auth_end_time")),
+                "ad_auth_status": post.get("ad_auth_status"),
+                "is_listed": True,
+                "updated_at": now,
+            }
+
+        values = list(rows.values())
+        table = TikTokSparkPost.__table__
+        written = 0
+        for i in range(0, len(values), 500):
+            stmt = pg_insert(table).values(values[i:i + 500])
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["advertiser_id", "item_id"],
+                set_={
+                    **{col: getattr(excluded, col) for col in cls._COMPARE_COLS},
+                    "updated_at": excluded.updated_at,
+                },
+                where=or_(*[
+                    getattr(table.c, col).is_distinct_from(getattr(excluded, col))
+                    for col in cls._COMPARE_COLS
+                ]),
+            )
+            written += db.execute(stmt).rowcount or 0
+        return written
+
+    @classmethod
+    def refresh_account(
+        cls,
+        db: Session,
+        acc: AdAccount,
+        force: bool = False,
+        commit: bool = True,
+    ) -> Dict:
+        """
+        refresh 1 account (ข้ามถ้ายังสดอยู่ เว้นแต่ force)
+
+        ดึงไม่ครบ → raise (ไม่แตะ is_listed / synced_at)
+        """
+        if not force and cls._is_fresh(acc):
+            return {"account": acc.name, "skipped": True}
+
+        posts = TikTokAdsService.fetch_spark_ad_posts(acc.external_account_id, raise_on_error=True)
+        now = datetime.now(timezone.utc)
+
+        written = cls._upsert_posts(db, acc, posts, now)
+
+        listed_ids = {str(p["item_id"]) for p in posts if p.get("item_id")}
+        unlisted_q = db.query(TikTokSparkPost).filter(
+            TikTokSparkPost.advertiser_id == acc.external_account_id,
+            TikTokSparkPost.is_listed.is_(True),
+        )
+        if listed_ids:
+            unlisted_q = unlisted_q.filter(TikTokSparkPost.item_id.notin_(listed_ids))
+        unlisted = unlisted_q.update(
+            {TikTokSparkPost.is_listed: False, TikTokSparkPost.updated_at: now},
+            synchronize_session=False,
+        )
+
+        IdentityCacheService.store_spark_posts(db, acc.external_account_id, posts, commit=False)
+
+        TikTokAdsService.update_account_config(db, acc, {cls.SYNCED_AT_KEY: now.isoformat()})
+
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+        print(
+            f"[SparkPostIndexService] {acc.name}: {len(listed_ids)} posts listed, "
+            f"{written} changed, {unlisted} unlisted"
+        )
+        return {"account": acc.name, "posts": len(listed_ids), "changed": written, "unlisted": unlisted}
+
+    @classmethod
+    def _refresh_account_isolated(cls, account_id: int, force: bool) -> Dict:
+        db = SessionLocal()
+        try:
+            acc = db.query(AdAccount).filter(AdAccount.id == account_id).first()
+            if not acc:
+                return {"account_id": account_id, "error": "not found"}
+            return cls.refresh_account(db, acc, force=force)
+        except Exception as e:
+            db.rollback()
+            print(f"[SparkPostIndexService] account {account_id} failed: {e}")
+            return {"account_id": account_id, "error": str(e)}
+        finally:
+            db.close()
+
+    @classmethod
+    def refresh_all(cls, force: bool = False, max_workers: Optional[int] = None) -> Dict:
+        """refresh ทุก active TikTok account ที่ข้อมูลเก่าแล้ว (หลาย account พร้อมกัน)"""
+        db = SessionLocal()
+        try:
+            accounts = (
+                db.query(AdAccount)
+                .filter(
+                    AdAccount.platform == PlatformEnum.TIKTOK,
+                    AdAccount.status == AdAccountStatus.ACTIVE,
+                )
+                .all()
+            )
+            due_ids = [acc.id for acc in accounts if force or not cls._is_fresh(acc)]
+        finally:
+            db.close()
+
+        results: List[Dict] = []
+        if due_ids:
+            workers = max(1, min(max_workers or settings.TIKTOK_SPARK_POSTS_ACCOUNT_WORKERS, len(due_ids)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(cls._refresh_account_isolated, acc_id, force) for acc_id in due_ids]
+                for future in as_completed(futures):
+                    results.append(future.result())
+
+        failed = [r for r in results if r.get("error")]
+        print(
+            f"[SparkPostIndexService] Refreshed {len(results) - len(failed)}/{len(accounts)} accounts "
+            f"({len(accounts) - len(due_ids)} still fresh, {len(failed)} failed)"
+        )
+        return {
+            "accounts": len(accounts),
+            "refreshed": len(results) - len(failed),
+            "fresh": len(accounts) - len(due_ids),
+            "failed": len(failed),
+            "results": results,
+        }
+
+    # ============================================
+    # Read
+    # ============================================
+
+    @staticmethod
+    def get_post(db: Session, advertiser_id: str, item_id: str) -> Optional[TikTokSparkPost]:
+        return (
+            db.query(TikTokSparkPost)
+            .filter(
+                TikTokSparkPost.advertiser_id == str(advertiser_id),
+                TikTokSparkPost.item_id == str(item_id),
+            )
+            .first()
+        )
+
+    @staticmethod
+    def get_posts_map(db: Session) -> Dict[str, Dict]:
+        """{item_id: post dict} ของ post ที่ยัง listed (auth_end_time ล่าสุดต่อ item)"""
+        rows = (
+            db.query(TikTokSparkPost)
+            .filter(TikTokSparkPost.is_listed.is_(True))
+            .order_by(TikTokSparkPost.auth_end_time.asc().nullsfirst())
+            .all()
+        )
+        return {
+            row.item_id: {
+                "item_id": row.item_id,
+                "identity_id": row.identity_id,
+                "auth_code": row.auth_code,
+                "auth_start_time": row.auth_start_time,
+                "auth_end_time": row.auth_end_time,
+                "ad_auth_status": row.ad_auth_status,
+            }
+            for row in rows
+        }
+
+    @staticmethod
+    def apply_influencer_expire_dates(db: Session) -> int:
+        """
+        contents.expire_date ของ INFLUENCER content = auth_end_time (UTC date) ล่าสุดของ item
+        1 UPDATE ... FROM join (เขียนเฉพาะแถวที่ค่าเปลี่ยน) ไม่ commit
+        """
+        result = db.execute(
+            text(
+                """
+                UPDATE contents c
+                   SET expire_date = sp.expire_date,
+                       updated_at = NOW(),
+                       content_version = nextval('content_version_seq')
+                  FROM (
+                        SELECT item_id, (MAX(auth_end_time) AT TIME ZONE 'UTC')::date AS expire_date
+                          FROM tiktok_spark_posts
+                         WHERE is_listed AND auth_end_time IS NOT NULL
+                         GROUP BY item_id
+                       ) sp
+                 WHERE c.platform_post_id = sp.item_id
+                   AND c.platform::text = 'TIKTOK'
+                   AND c.content_source::text = 'INFLUENCER'
+                   AND c.deleted_at IS NULL
+                   AND c.expire_date IS DISTINCT FROM sp.expire_date
+                """
+            )
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def apply_spark_auth_expiry(db: Session) -> int:
+        """
+        spark_ad_auths.auth_end_time / ad_auth_status จาก index (join ตาม item_id + advertiser ของ auth)
+        ไม่ commit
+        """
+        result = db.execute(
+            text(
+                """
+                UPDATE spark_ad_auths s
+                   SET auth_end_time = sp.auth_end_time,
+                       ad_auth_status = sp.ad_auth_status,
+                       updated_at = NOW()
+                  FROM tiktok_spark_posts sp
+                 WHERE sp.item_id = s.item_id
+                   AND sp.ad_account_id = s.ad_account_id
+                   AND sp.is_listed
+                   AND s.deleted_at IS NULL
+                   AND (s.auth_end_time IS DISTINCT FROM sp.auth_end_time
+                        OR s.ad_auth_status IS DISTINCT FROM sp.ad_auth_status)
+                """
+            )
+        )
+        return result.rowcount or 0
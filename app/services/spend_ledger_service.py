@@ -0,0 +1,212 @@
+"""
+Spend Ledger Service - lifetime spend ต่อ Ad จาก `ad_performance_daily`
+
+lifetime spend = Σ spend ของวันที่ปิดแล้ว (date <= tiktok_daily_cursor)
+               + delta ของวันที่ยังไม่เข้า ledger (cursor+1 .. วันนี้)
+
+- ส่วนวันปิดแล้ว: 1 query GROUP BY จาก DB
+- ส่วน delta: report API รายวัน เฉพาะช่วงสั้น ๆ (ปกติคือเมื่อวาน+วันนี้) แล้ว cache ไว้
+  TIKTOK_SPEND_DELTA_CACHE_SECONDS
+- account ที่ยังไม่มี tiktok_daily_cursor (ยังไม่ backfill) หรือ cursor ค้างนานเกิน
+  จะ fallback ไปใช้ lifetime report เหมือนเดิม
+
+ใช้โดย sync_ads_spend_data, TikTokAdsService.sync_ads_for_account และ
+refresh_tiktok_ads_data (api/v1/contents.py)
+"""
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import AdAccount, AdPerformanceDaily
+from app.models.enums import Platform as PlatformEnum
+
+
+class SpendLedgerService:
+    """คำนวณ lifetime spend จาก daily ledger + intraday delta"""
+
+    # (advertiser_id, start, end) -> (fetched_at monotonic, {ad_id: spend})
+    _delta_cache: Dict[Tuple[str, date, date], Tuple[float, Dict[str, float]]] = {}
+    _lock = threading.Lock()
+
+    # ============================================
+    # Readiness
+    # ============================================
+
+    @staticmethod
+    def _parse_date(value) -> Optional[date]:
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+
+    @classmethod
+    def ledger_cursor(cls, ad_account: AdAccount) -> Optional[date]:
+        """
+        วันสุดท้ายที่ ledger ครบ (None = ใช้ ledger ไม่ได้)
+
+        ใช้ได้ (default) เมื่อ backfill seed tiktok_daily_cursor แล้ว และ cursor ตามหลัง
+        ไม่เกิน TIKTOK_SPEND_LEDGER_MAX_GAP_DAYS
+        ยกเว้น config["spend_ledger_ready"] = false (ปิดมือ เช่นบัญชีที่ backfill ไม่ถึงวันแรก)
+        """
+        cfg = ad_account.config if isinstance(ad_account.config, dict) else {}
+        cursor = cls._parse_date(cfg.get("tiktok_daily_cursor"))
+        if not cursor:
+            return None
+
+        if (date.today() - cursor).days > settings.TIKTOK_SPEND_LEDGER_MAX_GAP_DAYS:
+            return None
+
+        if cfg.get("spend_ledger_ready") is False:
+            return None
+
+        return cursor
+
+    # ============================================
+    # Ledger parts
+    # ============================================
+
+    @staticmethod
+    def get_closed_spend(
+        db: Session,
+        ad_account: AdAccount,
+        through: date,
+        ad_ids: Optional[List[str]] = None,
+    ) -> Dict[str, float]:
+        """Σ spend ต่อ ad ของวันที่ <= through (1 query)"""
+        q = db.query(
+            AdPerformanceDaily.external_ad_id,
+            func.sum(AdPerformanceDaily.spend),
+        ).filter(
+            AdPerformanceDaily.platform == PlatformEnum.TIKTOK,
+            AdPerformanceDaily.ad_account_id == ad_account.id,
+            AdPerformanceDaily.date <= through,
+        )
+        if ad_ids is not None:
+            q = q.filter(AdPerformanceDaily.external_ad_id.in_([str(a) for a in ad_ids]))
+
+        return {
+            str(ad_id): float(total or 0)
+            for ad_id, total in q.group_by(AdPerformanceDaily.external_ad_id).all()
+        }
+
+    @classmethod
+    def get_delta_spend(cls, advertiser_id: str, start: date, end: date) -> Dict[str, float]:
+        """
+        spend ต่อ ad ของช่วง start..end จาก daily report (cache ตาม TTL)
+        error จาก API จะ raise ออกไป (caller fallback เอง)
+        """
+        from app.services.tiktok_ads_service import TikTokAdsService
+
+        if start > end:
+            return {}
+
+        key = (str(advertiser_id), start, end)
+        cached = cls._delta_cache.get(key)
+        if cached and time.monotonic() - cached[0] < settings.TIKTOK_SPEND_DELTA_CACHE_SECONDS:
+            return cached[1]
+
+        rows = TikTokAdsService.fetch_ad_daily_report(
+            advertiser_id,
+            start_date=start.isoformat(),
+            end_date=end.isoformat(),
+            metrics=["spend"],
+        )
+        delta: Dict[str, float] = {}
+        for r in rows:
+            ad_id = (r.get("dimensions") or {}).get("ad_id")
+            if not ad_id:
+                continue
+            try:
+                spend = float((r.get("metrics") or {}).get("spend") or 0)
+            except (TypeError, ValueError):
+                spend = 0.0
+            delta[str(ad_id)] = delta.get(str(ad_id), 0.0) + spend
+
+        with cls._lock:
+            # ทิ้ง entry ของวันก่อน ๆ ของ advertiser เดียวกัน
+            for old_key in [k for k in cls._delta_cache if k[0] == key[0] and k != key]:
+                cls._delta_cache.pop(old_key, None)
+            cls._delta_cache[key] = (time.monotonic(), delta)
+        return delta
+
+    # ============================================
+    # Public API
+    # ============================================
+
+    @classmethod
+    def get_lifetime_spend(
+        cls,
+        db: Session,
+        ad_account: AdAccount,
+        ad_ids: Optional[List[str]] = None,
+        fallback: bool = True,
+    ) -> Dict[str, float]:
+        """
+        Lifetime spend ต่อ ad ของ account นี้
+
+        Args:
+            ad_ids: จำกัดเฉพาะ ads เหล่านี้ (None = ทุก ad ใน ledger)
+            fallback: ถ้า ledger ใช้ไม่ได้ / delta ดึงไม่สำเร็จ → ใช้ lifetime report API
+        """
+        from app.services.tiktok_ads_service import TikTokAdsService
+
+        advertiser_id = ad_account.external_account_id
+        cursor = cls.ledger_cursor(ad_account)
+
+        if cursor is not None:
+            try:
+                spend = cls.get_closed_spend(db, ad_account, cursor, ad_ids)
+                delta = cls.get_delta_spend(
+                    advertiser_id, cursor + timedelta(days=1), date.today()
+                )
+                wanted = {str(a) for a in ad_ids} if ad_ids is not None else None
+                for ad_id, amount in delta.items():
+                    if wanted is None or ad_id in wanted:
+                        spend[ad_id] = spend.get(ad_id, 0.0) + amount
+                print(
+                    f"[SpendLedgerService] {ad_account.name}: {len(spend)} ads from ledger "
+                    f"(closed <= {cursor}, delta {len(delta)} ads)"
+                )
+                return spend
+            except Exception as e:
+                print(f"[SpendLedgerService] Ledger failed for {advertiser_id}: {e}")
+
+        if not fallback:
+            return {}
+
+        print(f"[SpendLedgerService] {ad_account.name}: ledger not ready, using lifetime report")
+        if ad_ids is not None:
+            return TikTokAdsService.fetch_spend_for_ads(advertiser_id, [str(a) for a in ad_ids])
+        return TikTokAdsService.fetch_lifetime_spend(advertiser_id)
+
+    @classmethod
+    def get_lifetime_spend_by_advertiser(
+        cls,
+        db: Session,
+        advertiser_id: str,
+        ad_ids: Optional[List[str]] = None,
+    ) -> Dict[str, float]:
+        """เหมือน get_lifetime_spend แต่รับ external advertiser_id"""
+        from app.services.tiktok_ads_service import TikTokAdsService
+
+        ad_account = (
+            db.query(AdAccount)
+            .filter(
+                AdAccount.platform == PlatformEnum.TIKTOK,
+                AdAccount.external_account_id == str(advertiser_id),
+            )
+            .first()
+        )
+        if ad_account:
+            return cls.get_lifetime_spend(db, ad_account, ad_ids)
+
+        if ad_ids is not None:
+            return TikTokAdsService.fetch_spend_for_ads(str(advertiser_id), [str(a) for a in ad_ids])
+        return TikTokAdsService.fetch_lifetime_spend_by_advertiser(str(advertiser_id))
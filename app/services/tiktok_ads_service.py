@@ -13,10 +13,12 @@ NOTE:
 """
 
 import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
 
-import httpx
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -31,6 +33,8 @@ from app.models import (
 )
 from app.models.enums import AdAccountStatus, AdStatus
 from app.models.enums import Platform as PlatformEnum
+from app.services.prefetch import prefetch
+from app.services.tiktok_request_executor import TikTokApiClient, TikTokRequestExecutor
 from app.services.tiktok_service import TikTokService
 
 
@@ -42,6 +46,14 @@ def _truncate(value: Optional[str], max_length: int = 255) -> Optional[str]:
     return s if len(s) <= max_length else s[:max_length]
 
 
+class TikTokApiError(RuntimeError):
+    """request ล้มเหลว (code = `code` ใน response ของ TikTok, None ถ้าเป็น HTTP / network error)"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
 class TikTokAdsService:
     """บริการดึงและ sync ข้อมูล TikTok Ads"""
 
@@ -70,8 +82,165 @@ class TikTokAdsService:
         return settings.tiktok_content_access_token or ""
 
     @classmethod
-    def _get_client(cls) -> httpx.Client:
-        return httpx.Client(timeout=30.0)
+    def _get_client(cls) -> ContextManager[TikTokApiClient]:
+        """Client ที่ยิงผ่าน TikTokRequestExecutor (shared pool + rate limit + retry)"""
+        return TikTokRequestExecutor.client_context()
+
+    # ============================================
+    # Pagination
+    # ============================================
+
+    @classmethod
+    def _request_page(
+        cls,
+        client: TikTokApiClient,
+        url: str,
+        token: str,
+        params: Dict,
+        page: int,
+        label: str,
+    ) -> Dict:
+        """
+        ยิง request 1 หน้า (retry / backoff อยู่ใน TikTokRequestExecutor แล้ว ไม่ retry ซ้ำที่นี่)
+
+        Returns:
+            `data` object ของ response (มี list / page_info)
+
+        Raises:
+            TikTokApiError: ถ้าล้มเหลว (มี code ของ TikTok ถ้า API ตอบ error กลับมา)
+        """
+        code = None
+        try:
+            resp = client.get(
+                url,
+                headers={"Access-Token": token},
+                params={**params, "page": page},
+            )
+            if resp.status_code != 200:
+                error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+            else:
+                data = resp.json()
+                if isinstance(data, dict) and data.get("code") == 0:
+                    return data.get("data") or {}
+                if isinstance(data, dict):
+                    code = data.get("code")
+                    error = f"API error: {data.get('message')} (code={code})"
+                else:
+                    error = f"Unexpected response: {data}"
+        except Exception as e:
+            error = f"exception: {e}"
+
+        print(f"[TikTokAdsService] {label} page {page} failed - {error}")
+        raise TikTokApiError(f"{label}: page {page} failed - {error}", code)
+
+    @classmethod
+    def _iter_pages(
+        cls,
+        path: str,
+        token: str,
+        params: Dict,
+        label: str,
+        max_workers: Optional[int] = None,
+        raise_on_error: bool = True,
+    ) -> Iterator[List[Dict]]:
+        """
+        Generic paginator สำหรับ endpoint ที่มี `page_info.total_page` (generator)
+
+        - ดึง page 1 ก่อนเพื่อรู้ total_page
+        - หน้าที่เหลือดึงพร้อมกันแบบ sliding window (ไม่เกิน TIKTOK_PAGE_FETCH_CONCURRENCY หน้า
+          ค้างอยู่ในมือ) → memory คงที่ไม่ขึ้นกับจำนวนหน้า
+        - yield ทีละหน้าตามลำดับหน้าเสมอ (retry ต่อ request อยู่ใน TikTokRequestExecutor)
+        - ถ้ามีหน้าที่ล้มเหลว: raise TikTokApiError (default) ไม่คืนข้อมูลครึ่งเดียวแบบเงียบ ๆ
+          raise_on_error=False → หยุดที่หน้านั้น (caller ต้องยอมรับข้อมูลไม่ครบเอง)
+        """
+        url = f"{cls.BASE_URL}{path}"
+
+        with cls._get_client() as client:
+            try:
+                first = cls._request_page(client, url, token, params, 1, label)
+            except TikTokApiError:
+                if raise_on_error:
+                    raise
+                return
+
+            first_rows = first.get("list") or []
+            if not first_rows:
+                return
+
+            page_info = first.get("page_info") or {}
+            total_page = int(page_info.get("total_page") or 1)
+            yield first_rows
+            if total_page <= 1:
+                return
+
+            workers = max(
+                1,
+                min(max_workers or settings.TIKTOK_PAGE_FETCH_CONCURRENCY, total_page - 1),
+            )
+            rows_total = len(first_rows)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                next_page = 2
+
+                def submit_upto_window():
+                    nonlocal next_page
+                    while len(pending) < workers and next_page <= total_page:
+                        pending.append((
+                            next_page,
+                            executor.submit(
+                                cls._request_page, client, url, token, params, next_page, label
+                            ),
+                        ))
+                        next_page += 1
+
+                submit_upto_window()
+                try:
+                    while pending:
+                        page, future = pending.popleft()
+                        try:
+                            data = future.result()
+                        except TikTokApiError:
+                            if raise_on_error:
+                                raise
+                            print(
+                                f"[TikTokAdsService] {label} giving up at page {page}/{total_page}, "
+                                f"returning {rows_total} rows from earlier pages"
+                            )
+                            return
+                        rows = data.get("list") or []
+                        if not rows:
+                            return
+                        submit_upto_window()
+                        rows_total += len(rows)
+                        yield rows
+                finally:
+                    for _, future in pending:
+                        future.cancel()
+
+            print(
+                f"[TikTokAdsService] {label}: {rows_total} rows "
+                f"from {total_page} pages (workers={workers})"
+            )
+
+    @classmethod
+    def _fetch_all_pages(
+        cls,
+        path: str,
+        token: str,
+        params: Dict,
+        label: str,
+        max_workers: Optional[int] = None,
+        raise_on_error: bool = True,
+    ) -> List[Dict]:
+        """รวมทุกหน้าจาก `_iter_pages` เป็น list เดียว (เรียงตามลำดับหน้า)"""
+        results: List[Dict] = []
+        for rows in cls._iter_pages(
+            path, token, params, label,
+            max_workers=max_workers, raise_on_error=raise_on_error,
+        ):
+            results.extend(rows)
+        return results
 
     @classmethod
     def fetch_ads_last_days(
@@ -93,96 +262,54 @@ class TikTokAdsService:
         # days = -1 หรือ None หมายถึงไม่ใช้ filter (ดึง ads ทั้งหมด)
         use_date_filter = days is not None and days > 0
 
-        all_ads: List[Dict] = []
-        page = 1
-
-        with cls._get_client() as client:
-            while True:
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "fields": json.dumps(
-                        [
-                            "advertiser_id",
-                            "campaign_id",
-                            "adgroup_id",
-                            "ad_id",
-                            "tiktok_item_id",
-                            "ad_name",
-                            "operation_status",
-                            "app_name",
-                            "adgroup_name",
-                            "campaign_name",
-                            "ad_text",
-                            "display_name",
-                            "create_time",
-                            "secondary_status",
-                            "modify_time",
-                        ]
-                    ),
-                    "page": page,
-                    "page_size": 1000,  # ใช้ page_size 1000 เหมือนระบบเก่า
-                }
-
-                # ถ้ามี filter ตาม creation time
-                if use_date_filter:
-                    end_date = datetime.utcnow()
-                    start_date = end_date - timedelta(days=days)
-                    start_str = start_date.strftime("%Y-%m-%d %H:%M:%S")
-                    end_str = end_date.strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    filtering = {
-                        "creation_filter_start_time": start_str,
-                        "creation_filter_end_time": end_str,
-                    }
-                    params["filtering"] = json.dumps(filtering)
-                    print(f"[TikTokAdsService] Fetching ads created in last {days} days")
-                else:
-                    print(f"[TikTokAdsService] Fetching ALL ads (no date filter)")
-
-                url = f"{cls.BASE_URL}/ad/get/"
-
-                try:
-                    resp = client.get(
-                        url,
-                        headers={"Access-Token": token},
-                        params=params,
-                    )
-                    if resp.status_code != 200:
-                        print(
-                            f"[TikTokAdsService] fetch_ads_last_days error "
-                            f"{resp.status_code}: {resp.text}"
-                        )
-                        break
-
-                    data = resp.json()
-                except Exception as e:
-                    print(f"[TikTokAdsService] HTTP error while fetching ads: {e}")
-                    break
-
-                if not isinstance(data, dict) or "data" not in data:
-                    print(f"[TikTokAdsService] Unexpected response: {data}")
-                    break
-
-                d = data["data"]
-                ads = d.get("list") or []
-                if not ads:
-                    if page == 1:
-                        print(f"[TikTokAdsService] No ads found for advertiser_id={advertiser_id}")
-                    break
-
-                all_ads.extend(ads)
-
-                page_info = d.get("page_info") or {}
-                total_page = page_info.get("total_page") or 1
-                print(
-                    f"[TikTokAdsService] advertiser_id={advertiser_id} "
-                    f"page {page}/{total_page}, ads_so_far={len(all_ads)}"
-                )
+        params = {
+            "advertiser_id": advertiser_id,
+            "fields": json.dumps(
+                [
+                    "advertiser_id",
+                    "campaign_id",
+                    "adgroup_id",
+                    "ad_id",
+                    "tiktok_item_id",
+                    "ad_name",
+                    "operation_status",
+                    "app_name",
+                    "adgroup_name",
+                    "campaign_name",
+                    "ad_text",
+                    "display_name",
+                    "create_time",
+                    "secondary_status",
+                    "modify_time",
+                ]
+            ),
+            "page_size": 1000,  # ใช้ page_size 1000 เหมือนระบบเก่า
+        }
 
-                if page >= total_page:
-                    break
-                page += 1
+        # ถ้ามี filter ตาม creation time
+        if use_date_filter:
+            end_date = datetime.utcnow()
+            start_date = end_date - timedelta(days=days)
+            start_str = start_date.strftime("%Y-%m-%d %H:%M:%S")
+            end_str = end_date.strftime("%Y-%m-%d %H:%M:%S")
 
+            filtering = {
+                "creation_filter_start_time": start_str,
+                "creation_filter_end_time": end_str,
+            }
+            params["filtering"] = json.dumps(filtering)
+            print(f"[TikTokAdsService] Fetching ads created in last {days} days")
+        else:
+            print(f"[TikTokAdsService] Fetching ALL ads (no date filter)")
+
+        all_ads = cls._fetch_all_pages(
+            "/ad/get/",
+            token,
+            params,
+            label=f"fetch_ads_last_days advertiser_id={advertiser_id}",
+        )
+        if not all_ads:
+            print(f"[TikTokAdsService] No ads found for advertiser_id={advertiser_id}")
 
         return all_ads
 
@@ -207,150 +334,112 @@ class TikTokAdsService:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
+        params = {
+            "advertiser_id": advertiser_id,
+            "report_type": "BASIC",
+            "data_level": "AUCTION_AD",
+            "dimensions": json.dumps(["ad_id"]),
+            "metrics": json.dumps(["spend"]),
+            "start_date": start_date.strftime("%Y-%m-%d"),
+            "end_date": end_date.strftime("%Y-%m-%d"),
+            "page_size": 1000,
+        }
+        reports = cls._fetch_all_pages(
+            "/report/integrated/get/",
+            token,
+            params,
+            label=f"fetch_active_ad_ids advertiser={advertiser_id}",
+        )
+
         ad_spend_map: Dict[str, float] = {}
-        page = 1
-        
-        with cls._get_client() as client:
-            url = f"{cls.BASE_URL}/report/integrated/get/"
-            
-            while True:
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "report_type": "BASIC",
-                    "data_level": "AUCTION_AD",
-                    "dimensions": json.dumps(["ad_id"]),
-                    "metrics": json.dumps(["spend"]),
-                    "start_date": start_date.strftime("%Y-%m-%d"),
-                    "end_date": end_date.strftime("%Y-%m-%d"),
-                    "page": page,
-                    "page_size": 1000,
-                }
-                
-                try:
-                    resp = client.get(
-                        url,
-                        headers={"Access-Token": token},
-                        params=params,
-                    )
-                    
-                    if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_active_ad_ids error {resp.status_code}")
-                        break
-                    
-                    data = resp.json()
-                    if data.get("code") != 0:
-                        print(f"[TikTokAdsService] fetch_active_ad_ids API error: {data.get('message')}")
-                        break
-                    
-                    reports = data.get("data", {}).get("list", [])
-                    if not reports:
-                        break
-                    
-                    for report in reports:
-                        dims = report.get("dimensions", {})
-                        metrics = report.get("metrics", {})
-                        ad_id = dims.get("ad_id")
-                        spend = float(metrics.get("spend", 0) or 0)
-                        if ad_id and spend > 0:
-                            ad_spend_map[ad_id] = spend
-                    
-                    page_info = data.get("data", {}).get("page_info", {})
-                    total_page = page_info.get("total_page", 1)
-                    
-                    print(f"[TikTokAdsService] advertiser={advertiser_id} "
-                          f"page {page}/{total_page}, active_ads_so_far={len(ad_spend_map)}")
-                    
-                    if page >= total_page:
-                        break
-                    page += 1
-                    
-                except Exception as e:
-                    print(f"[TikTokAdsService] fetch_active_ad_ids exception: {e}")
-                    break
+        for report in reports:
+            dims = report.get("dimensions", {})
+            metrics = report.get("metrics", {})
+            ad_id = dims.get("ad_id")
+            spend = float(metrics.get("spend", 0) or 0)
+            if ad_id and spend > 0:
+                ad_spend_map[ad_id] = spend
         
         print(f"[TikTokAdsService] Found {len(ad_spend_map)} active ads with spend in last {days} days")
         return ad_spend_map
 
+    # fields ของ /ad/get/ ที่ใช้ทั้ง sync ปกติและ delta sync (เก็บเป็น Ad.platform_data)
+    AD_METADATA_FIELDS = [
+        "advertiser_id",
+        "campaign_id",
+        "adgroup_id",
+        "ad_id",
+        "tiktok_item_id",
+        "ad_name",
+        "operation_status",
+        "app_name",
+        "adgroup_name",
+        "campaign_name",
+        "ad_text",
+        "display_name",
+        "create_time",
+        "secondary_status",
+        "modify_time",
+    ]
+
     @classmethod
-    def fetch_ads_by_ids(cls, advertiser_id: str, ad_ids: List[str]) -> List[Dict]:
+    def fetch_ads_in_adgroup(cls, advertiser_id: str, adgroup_id: str) -> List[Dict]:
+        """ads ทั้งหมดใต้ adgroup (ไม่มี token / ดึงไม่ครบ → raise)"""
+        token = cls._get_access_token()
+        if not token:
+            raise RuntimeError("Missing access token")
+        return cls._fetch_all_pages(
+            "/ad/get/",
+            token,
+            {
+                "advertiser_id": advertiser_id,
+                "fields": json.dumps(cls.AD_METADATA_FIELDS),
+                "filtering": json.dumps({"adgroup_ids": [str(adgroup_id)]}),
+                "page_size": 100,
+            },
+            label=f"fetch_ads_in_adgroup advertiser={advertiser_id} adgroup={adgroup_id}",
+            raise_on_error=True,
+        )
+
+    @classmethod
+    def fetch_ads_by_ids(
+        cls, advertiser_id: str, ad_ids: List[str], raise_on_error: bool = True
+    ) -> List[Dict]:
         """
         ดึง Ad metadata เฉพาะ ad_ids ที่ระบุ
         
-        ใช้ filtering โดย ad_ids แทนการดึงทั้งหมด
+        ใช้ filtering โดย ad_ids แทนการดึงทั้งหมด (ครั้งละ 100 ids ผ่าน _fetch_all_pages)
+        raise_on_error=False → ไม่มี token / ดึงไม่ครบ = คืนเท่าที่ได้ (ข้อมูลอาจไม่ครบ)
         """
         if not ad_ids:
             return []
         
         token = cls._get_access_token()
         if not token:
+            if raise_on_error:
+                raise RuntimeError("Missing access token")
             print("[TikTokAdsService] Missing access token, skip fetch_ads_by_ids")
             return []
         
         all_ads: List[Dict] = []
-        
-        with cls._get_client() as client:
-            # TikTok API allows filtering by ad_ids (max ~100 per request)
-            batch_size = 100
-            
-            for i in range(0, len(ad_ids), batch_size):
-                batch = ad_ids[i:i + batch_size]
-                page = 1
-                
-                while True:
-                    params = {
+        # TikTok API allows filtering by ad_ids (max ~100 per request)
+        batch_size = 100
+        for i in range(0, len(ad_ids), batch_size):
+            batch = ad_ids[i:i + batch_size]
+            all_ads.extend(
+                cls._fetch_all_pages(
+                    "/ad/get/",
+                    token,
+                    {
                         "advertiser_id": advertiser_id,
-                        "fields": json.dumps([
-                            "advertiser_id",
-                            "campaign_id",
-                            "adgroup_id",
-                            "ad_id",
-                            "tiktok_item_id",
-                            "ad_name",
-                            "operation_status",
-                            "app_name",
-                            "adgroup_name",
-                            "campaign_name",
-                            "ad_text",
-                            "display_name",
-                            "create_time",
-                            "secondary_status",
-                            "modify_time",
-                        ]),
+                        "fields": json.dumps(cls.AD_METADATA_FIELDS),
                         "filtering": json.dumps({"ad_ids": batch}),
-                        "page": page,
                         "page_size": 100,
-                    }
-                    
-                    try:
-                        resp = client.get(
-                            f"{cls.BASE_URL}/ad/get/",
-                            headers={"Access-Token": token},
-                            params=params,
-                        )
-                        
-                        if resp.status_code != 200:
-                            print(f"[TikTokAdsService] fetch_ads_by_ids error {resp.status_code}")
-                            break
-                        
-                        data = resp.json()
-                        if not isinstance(data, dict) or "data" not in data:
-                            break
-                        
-                        d = data["data"]
-                        ads = d.get("list") or []
-                        if not ads:
-                            break
-                        
-                        all_ads.extend(ads)
-                        
-                        page_info = d.get("page_info") or {}
-                        if page >= page_info.get("total_page", 1):
-                            break
-                        page += 1
-                        
-                    except Exception as e:
-                        print(f"[TikTokAdsService] fetch_ads_by_ids exception: {e}")
-                        break
+                    },
+                    label=f"fetch_ads_by_ids advertiser={advertiser_id}",
+                    raise_on_error=raise_on_error,
+                )
+            )
         
         print(f"[TikTokAdsService] Fetched metadata for {len(all_ads)} ads")
         return all_ads
@@ -448,145 +537,104 @@ class TikTokAdsService:
         return mapping.get(goal)
 
     @classmethod
-    def fetch_campaigns(cls, advertiser_id: str) -> List[Dict]:
+    def fetch_campaigns(cls, advertiser_id: str, raise_on_error: bool = True) -> List[Dict]:
         """
         ดึง Campaign details รวมถึง objective_type
+
+        raise_on_error=False → ไม่มี token / ดึงไม่ครบ = คืนเท่าที่ได้ (ข้อมูลอาจไม่ครบ)
         """
         token = cls._get_access_token()
         if not token:
+            if raise_on_error:
+                raise RuntimeError("Missing access token")
             print("[TikTokAdsService] Missing access token, skip fetch_campaigns")
             return []
         
-        all_campaigns: List[Dict] = []
-        page = 1
-        
-        with cls._get_client() as client:
-            while True:
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "fields": json.dumps([
-                        "campaign_id",
-                        "campaign_name",
-                        "objective_type",
-                        "budget_mode",
-                        "budget",
-                        "operation_status",
-                        "secondary_status",
-                        "create_time",
-                        "modify_time",
-                    ]),
-                    "page_size": 100,
-                    "page": page,
-                }
-                
-                try:
-                    resp = client.get(
-                        f"{cls.BASE_URL}/campaign/get/",
-                        headers={"Access-Token": token},
-                        params=params,
-                    )
-                    
-                    if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_campaigns error {resp.status_code}")
-                        break
-                    
-                    data = resp.json()
-                    if data.get("code") != 0:
-                        print(f"[TikTokAdsService] fetch_campaigns API error: {data.get('message')}")
-                        break
-                    
-                    campaigns = data.get("data", {}).get("list", [])
-                    if not campaigns:
-                        break
-                    
-                    all_campaigns.extend(campaigns)
-                    
-                    page_info = data.get("data", {}).get("page_info", {})
-                    if page >= page_info.get("total_page", 1):
-                        break
-                    page += 1
-                    
-                except Exception as e:
-                    print(f"[TikTokAdsService] fetch_campaigns exception: {e}")
-                    break
+        all_campaigns = cls._fetch_all_pages(
+            "/campaign/get/",
+            token,
+            {
+                "advertiser_id": advertiser_id,
+                "fields": json.dumps([
+                    "campaign_id",
+                    "campaign_name",
+                    "objective_type",
+                    "budget_mode",
+                    "budget",
+                    "operation_status",
+                    "secondary_status",
+                    "create_time",
+                    "modify_time",
+                ]),
+                "page_size": 100,
+            },
+            label=f"fetch_campaigns advertiser={advertiser_id}",
+            raise_on_error=raise_on_error,
+        )
         
         print(f"[TikTokAdsService] Fetched {len(all_campaigns)} campaigns from {advertiser_id}")
         return all_campaigns
 
     @classmethod
-    def fetch_adgroups(cls, advertiser_id: str) -> List[Dict]:
+    def fetch_adgroups(
+        cls,
+        advertiser_id: str,
+        campaign_ids: Optional[List[str]] = None,
+        raise_on_error: bool = False,
+    ) -> List[Dict]:
         """
         ดึง AdGroup details รวมถึง optimization_goal
+
+        campaign_ids: จำกัดเฉพาะ adgroups ใต้ campaign เหล่านี้ (None = ทั้ง advertiser)
+        raise_on_error=True → ไม่มี token / ดึงไม่ครบ = raise (ใช้ตอนต้องรู้แน่ว่า adgroup "ไม่มี" จริง)
         """
         token = cls._get_access_token()
         if not token:
+            if raise_on_error:
+                raise RuntimeError("Missing access token")
             print("[TikTokAdsService] Missing access token, skip fetch_adgroups")
             return []
         
-        all_adgroups: List[Dict] = []
-        page = 1
-        
-        with cls._get_client() as client:
-            while True:
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "fields": json.dumps([
-                        "adgroup_id",
-                        "adgroup_name",
-                        "campaign_id",
-                        "optimization_goal",
-                        "billing_event",
-                        "bid_type",
-                        "bid_price",  # Changed from "bid" to "bid_price"
-                        "budget_mode",
-                        "budget",
-                        "operation_status",
-                        "secondary_status",
-                        "create_time",
-                        "modify_time",
-                    ]),
-                    "page_size": 100,
-                    "page": page,
-                }
-                
-                try:
-                    resp = client.get(
-                        f"{cls.BASE_URL}/adgroup/get/",
-                        headers={"Access-Token": token},
-                        params=params,
-                    )
-                    
-                    if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_adgroups error {resp.status_code}")
-                        break
-                    
-                    data = resp.json()
-                    if data.get("code") != 0:
-                        print(f"[TikTokAdsService] fetch_adgroups API error: {data.get('message')}")
-                        break
-                    
-                    adgroups = data.get("data", {}).get("list", [])
-                    if not adgroups:
-                        break
-                    
-                    all_adgroups.extend(adgroups)
-                    
-                    page_info = data.get("data", {}).get("page_info", {})
-                    if page >= page_info.get("total_page", 1):
-                        break
-                    page += 1
-                    
-                except Exception as e:
-                    print(f"[TikTokAdsService] fetch_adgroups exception: {e}")
-                    break
+        params = {
+            "advertiser_id": advertiser_id,
+            "fields": json.dumps([
+                "adgroup_id",
+                "adgroup_name",
+                "campaign_id",
+                "optimization_goal",
+                "billing_event",
+                "bid_type",
+                "bid_price",  # Changed from "bid" to "bid_price"
+                "budget_mode",
+                "budget",
+                "operation_status",
+                "secondary_status",
+                "create_time",
+                "modify_time",
+            ]),
+            "page_size": 100,
+        }
+        if campaign_ids:
+            params["filtering"] = json.dumps({"campaign_ids": [str(c) for c in campaign_ids]})
+        all_adgroups = cls._fetch_all_pages(
+            "/adgroup/get/",
+            token,
+            params,
+            label=f"fetch_adgroups advertiser={advertiser_id}",
+            raise_on_error=raise_on_error,
+        )
         
         print(f"[TikTokAdsService] Fetched {len(all_adgroups)} adgroups from {advertiser_id}")
         return all_adgroups
 
     @classmethod
-    def update_campaign_objectives(cls, db: Session, ad_account: AdAccount) -> int:
+    def update_campaign_objectives(
+        cls, db: Session, ad_account: AdAccount, commit: bool = True
+    ) -> int:
         """
         อัพเดท Campaign objectives จาก TikTok API
+
+        commit=False → flush เฉยๆ ให้ caller commit เอง (ใช้ใน transaction ต่อ account)
         """
         from app.models import Campaign
         from app.models.enums import Platform as PlatformEnum
@@ -612,14 +660,21 @@ class TikTokAdsService:
                     campaign.objective = cls._map_objective(objective_raw)
                     updated += 1
         
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
         print(f"[TikTokAdsService] Updated {updated} campaign objectives for {ad_account.name}")
         return updated
 
     @classmethod
-    def update_adgroup_optimization_goals(cls, db: Session, ad_account: AdAccount) -> int:
+    def update_adgroup_optimization_goals(
+        cls, db: Session, ad_account: AdAccount, commit: bool = True
+    ) -> int:
         """
         อัพเดท AdGroup optimization_goals จาก TikTok API
+
+        commit=False → flush เฉยๆ ให้ caller commit เอง (ใช้ใน transaction ต่อ account)
         """
         from app.models import AdGroup, Campaign
         from app.models.enums import Platform as PlatformEnum
@@ -658,19 +713,706 @@ class TikTokAdsService:
                     adgroup.optimization_goal = cls._map_optimization_goal(opt_goal_raw)
                     
                 # Update budget info too
-                budget = ag_data.get("budget")
+                budget = cls._budget_value(ag_data.get("budget"))
                 if budget:
-                    adgroup.daily_budget = float(budget) / 1000000 if budget > 10000 else float(budget)
+                    adgroup.daily_budget = budget
                     
                 updated += 1
         
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
         print(f"[TikTokAdsService] Updated {updated} adgroup optimization goals for {ad_account.name}")
         return updated
 
+    # ============================================
+    # Bulk upsert (Campaign / AdGroup / Ad)
+    # ============================================
+
+    UPSERT_BATCH_SIZE = 1000
+
+    @classmethod
+    def _upsert_returning(
+        cls,
+        db: Session,
+        model,
+        rows: List[Dict],
+        conflict_cols: List[str],
+        set_builder,
+        returning: List[str],
+    ) -> List:
+        """
+        INSERT ... ON CONFLICT DO UPDATE ... RETURNING แบบแบ่ง batch
+
+        set_builder(stmt) → dict ของคอลัมน์ที่จะ update ตอนชน unique key
+        """
+        from sqlalchemy.dialects.postgresql import insert
+
+        out = []
+        for i in range(0, len(rows), cls.UPSERT_BATCH_SIZE):
+            chunk = rows[i:i + cls.UPSERT_BATCH_SIZE]
+            stmt = insert(model).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=conflict_cols,
+                set_=set_builder(stmt),
+            ).returning(*[getattr(model, c) for c in returning])
+            out.extend(db.execute(stmt).all())
+        return out
+
+    @classmethod
+    def _bulk_upsert_ad_hierarchy(
+        cls,
+        db: Session,
+        ad_account: AdAccount,
+        ads_raw: List[Dict],
+        lifetime_spend_map: Dict[str, float],
+        content_by_item: Dict[str, Content],
+        keep_spend: bool = False,
+    ) -> Tuple[int, Dict[int, List[Dict]]]:
+        """
+        Upsert Campaign → AdGroup → Ad แบบ set-based (3 statement ต่อ 1000 แถว)
+        โดยอาศัย unique key (platform, ad_account_id, external_*_id)
+
+        กติกาเหมือน loop เดิม:
+        - ชื่อ: อัปเดตเมื่อ API ส่งชื่อมา (ชื่อ fallback "Campaign {id}" ไม่ทับชื่อเดิม)
+        - objective / optimization_goal: ตั้งเฉพาะเมื่อใน DB ยังว่าง
+        - Ad.content_id: ตั้งเมื่อ map content ได้ ไม่ล้างค่าเดิม
+        - Ad.platform_data: snapshot ของ ad dict ล่าสุด (ใช้แทนการดึง /ad/get/ ซ้ำ)
+
+        keep_spend=True → ไม่แตะ Ad.total_spend ของแถวเดิม (ใช้ตอน merge metadata อย่างเดียว)
+
+        Returns:
+            (จำนวน ads ที่ upsert, map content_id -> list of ad summaries)
+        """
+        from sqlalchemy import case, func
+
+        now = datetime.utcnow()
+        platform = PlatformEnum.TIKTOK
+
+        valid_ads = [
+            a for a in ads_raw
+            if a.get("ad_id") and a.get("campaign_id") and a.get("adgroup_id")
+        ]
+        if not valid_ads:
+            return 0, {}
+
+        # ---------- Campaign ----------
+        campaign_rows: Dict[str, Dict] = {}
+        for a in valid_ads:
+            campaign_id = str(a["campaign_id"])
+            objective_raw = a.get("objective_type")
+            campaign_rows[campaign_id] = {
+                "platform": platform,
+                "ad_account_id": ad_account.id,
+                "external_campaign_id": campaign_id,
+                "name": _truncate(a.get("campaign_name") or f"Campaign {campaign_id}"),
+                "objective_raw": objective_raw,
+                "objective": cls._map_objective(objective_raw),
+            }
+
+        def campaign_set(stmt):
+            excluded = stmt.excluded
+            return {
+                "name": case(
+                    (excluded.name == func.concat("Campaign ", excluded.external_campaign_id), Campaign.name),
+                    else_=excluded.name,
+                ),
+                "objective": case(
+                    (Campaign.objective_raw.is_(None), excluded.objective),
+                    else_=Campaign.objective,
+                ),
+                "objective_raw": func.coalesce(Campaign.objective_raw, excluded.objective_raw),
+                "updated_at": now,
+            }
+
+        campaign_id_map = {
+            ext_id: pk
+            for pk, ext_id in cls._upsert_returning(
+                db,
+                Campaign,
+                list(campaign_rows.values()),
+                ["platform", "ad_account_id", "external_campaign_id"],
+                campaign_set,
+                ["id", "external_campaign_id"],
+            )
+        }
+
+        # ---------- AdGroup ----------
+        adgroup_rows: Dict[str, Dict] = {}
+        for a in valid_ads:
+            adgroup_id = str(a["adgroup_id"])
+            opt_goal_raw = a.get("optimization_goal")
+            adgroup_rows[adgroup_id] = {
+                "platform": platform,
+                "ad_account_id": ad_account.id,
+                "campaign_id": campaign_id_map[str(a["campaign_id"])],
+                "external_adgroup_id": adgroup_id,
+                "name": _truncate(a.get("adgroup_name") or f"AdGroup {adgroup_id}"),
+                "optimization_goal_raw": opt_goal_raw,
+                "optimization_goal": cls._map_optimization_goal(opt_goal_raw),
+            }
+
+        def adgroup_set(stmt):
+            excluded = stmt.excluded
+            return {
+                "campaign_id": excluded.campaign_id,
+                "name": case(
+                    (excluded.name == func.concat("AdGroup ", excluded.external_adgroup_id), AdGroup.name),
+                    else_=excluded.name,
+                ),
+                "optimization_goal": case(
+                    (AdGroup.optimization_goal_raw.is_(None), excluded.optimization_goal),
+                    else_=AdGroup.optimization_goal,
+                ),
+                "optimization_goal_raw": func.coalesce(
+                    AdGroup.optimization_goal_raw, excluded.optimization_goal_raw
+                ),
+                "updated_at": now,
+            }
+
+        adgroup_id_map = {
+            ext_id: pk
+            for pk, ext_id in cls._upsert_returning(
+                db,
+                AdGroup,
+                list(adgroup_rows.values()),
+                ["platform", "ad_account_id", "external_adgroup_id"],
+                adgroup_set,
+                ["id", "external_adgroup_id"],
+            )
+        }
+
+        # ---------- Ad ----------
+        ad_rows: Dict[str, Dict] = {}
+        for a in valid_ads:
+            ad_id = str(a["ad_id"])
+            item_id = a.get("tiktok_item_id")
+            content = content_by_item.get(item_id) if item_id else None
+            ad_rows[ad_id] = {
+                "platform": platform,
+                "ad_account_id": ad_account.id,
+                "ad_group_id": adgroup_id_map[str(a["adgroup_id"])],
+                "external_ad_id": ad_id,
+                "content_id": content.id if content else None,
+                "name": _truncate(a.get("ad_name") or f"Ad {ad_id}"),
+                "status": cls._map_operation_status(a.get("operation_status")),
+                "total_spend": lifetime_spend_map.get(ad_id, 0),
+                "platform_data": dict(a),
+                "last_synced_at": now,
+            }
+
+        def ad_set(stmt):
+            excluded = stmt.excluded
+            cols = {
+                "ad_group_id": excluded.ad_group_id,
+                "content_id": func.coalesce(excluded.content_id, Ad.content_id),
+                "name": case(
+                    (excluded.name == func.concat("Ad ", excluded.external_ad_id), Ad.name),
+                    else_=excluded.name,
+                ),
+                "status": excluded.status,
+                "total_spend": excluded.total_spend,
+                "platform_data": excluded.platform_data,
+                "last_synced_at": excluded.last_synced_at,
+                "updated_at": now,
+            }
+            if keep_spend:
+                del cols["total_spend"]
+            return cols
+
+        ad_names = {
+            ext_id: name
+            for ext_id, name in cls._upsert_returning(
+                db,
+                Ad,
+                list(ad_rows.values()),
+                ["platform", "ad_account_id", "external_ad_id"],
+                ad_set,
+                ["external_ad_id", "name"],
+            )
+        }
+
+        # ---------- Summary ต่อ content ----------
+        content_ads_map: Dict[int, List[Dict]] = {}
+        for ad_data in valid_ads:
+            ad_id = str(ad_data["ad_id"])
+            item_id = ad_data.get("tiktok_item_id")
+            if not item_id or item_id not in content_by_item:
+                continue
+
+            content = content_by_item[item_id]
+            # ensure content.ad_account_id ชี้มาที่ account นี้ (ถ้ายังไม่เคยตั้ง)
+            if not content.ad_account_id:
+                content.ad_account_id = ad_account.id
+
+            content_ads_map.setdefault(content.id, []).append({
+                "ad_id": ad_data.get("ad_id"),
+                "campaign_id": ad_data.get("campaign_id"),
+                "adgroup_id": ad_data.get("adgroup_id"),
+                "advertiser_id": ad_data.get("advertiser_id"),
+                "ad_name": ad_names.get(ad_id, ad_rows[ad_id]["name"]),
+                "campaign_name": ad_data.get("campaign_name"),
+                "adgroup_name": ad_data.get("adgroup_name"),
+                "operation_status": ad_data.get("operation_status"),
+                "secondary_status": ad_data.get("secondary_status"),
+                "create_time": ad_data.get("create_time"),
+                "modify_time": ad_data.get("modify_time"),
+                "total_spend": float(lifetime_spend_map.get(ad_id, 0)),  # lifetime spend
+            })
+
+        print(
+            f"[TikTokAdsService] Bulk upserted {len(campaign_rows)} campaigns, "
+            f"{len(adgroup_rows)} adgroups, {len(ad_rows)} ads for {ad_account.name}"
+        )
+        return len(valid_ads), content_ads_map
+
+    # ============================================
+    # Delta metadata sync (modify_time high-water mark)
+    # ============================================
+
+    # AdAccount.config keys
+    META_CURSOR_KEY = "tiktok_meta_modify_time"  # modify_time สูงสุดที่ merge แล้ว
+    META_FULL_SYNC_KEY = "tiktok_meta_full_sync_at"  # full reconcile campaigns/adgroups ล่าสุด
+    ADS_FULL_SYNC_KEY = "tiktok_ads_full_sync_at"  # ดึง metadata ของ active ads ทั้งหมดล่าสุด
+
+    # advertiser_id → time.monotonic() ที่จะลอง filtering.modified_after ใหม่
+    # (API ตอบ MODIFIED_FILTER_ERROR_CODE เรื่อง filter → กรองฝั่งเราแทนจนหมด TTL)
+    MODIFIED_FILTER_ERROR_CODE = 40002  # Invalid parameters
+    _modified_filter_unsupported_until: Dict[str, float] = {}
+
+    @staticmethod
+    def _is_filter_rejected(error: "TikTokApiError") -> bool:
+        """error นี้คือ API ไม่รับ filter จริง ๆ (ไม่ใช่ timeout / 5xx / token)"""
+        if error.code != TikTokAdsService.MODIFIED_FILTER_ERROR_CODE:
+            return False
+        message = str(error).lower()
+        return "modified_after" in message or "filtering" in message
+
+    @staticmethod
+    def _full_sync_due(ad_account: AdAccount, key: str) -> bool:
+        """ถึงรอบ full reconciliation หรือยัง (ไม่เคยทำ / เกิน TIKTOK_METADATA_FULL_SYNC_HOURS)"""
+        cfg = ad_account.config if isinstance(ad_account.config, dict) else {}
+        last = cfg.get(key)
+        if not last:
+            return True
+        try:
+            last_at = datetime.fromisoformat(str(last))
+        except ValueError:
+            return True
+        return datetime.utcnow() - last_at >= timedelta(hours=settings.TIKTOK_METADATA_FULL_SYNC_HOURS)
+
+    @staticmethod
+    def _metadata_since(ad_account: AdAccount) -> Optional[str]:
+        """
+        จุดเริ่มของ delta (high-water mark - overlap) ในรูปแบบ modify_time ของ TikTok
+        None = ยังไม่มี high-water mark
+        """
+        cfg = ad_account.config if isinstance(ad_account.config, dict) else {}
+        hwm = cfg.get(TikTokAdsService.META_CURSOR_KEY)
+        if not hwm:
+            return None
+        try:
+            hwm_at = datetime.strptime(str(hwm), "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return None
+        since = hwm_at - timedelta(minutes=settings.TIKTOK_METADATA_DELTA_OVERLAP_MINUTES)
+        return since.strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def update_account_config(db: Session, ad_account: AdAccount, values: Dict) -> Dict:
+        """
+        merge เฉพาะ key ใน values เข้า ad_accounts.config ด้วย UPDATE เดียว (ไม่ commit)
+
+        หลาย job เขียน cursor คนละ key ใน config เดียวกัน (tiktok_daily_cursor, tiktok_hourly_cursor,
+        metadata mark ...) → ห้าม read-modify-write ทั้งก้อนผ่าน ORM เพราะจะทับ key ของ job อื่น
+        row lock ของ UPDATE ถือจน commit ทำให้ job ที่เขียนพร้อมกันต่อคิวกันแทนที่จะทับกัน
+        """
+        from sqlalchemy import text
+        from sqlalchemy.orm.attributes import set_committed_value
+
+        row = db.execute(
+            text(
+                """
+                UPDATE ad_accounts
+                   SET config = CAST(COALESCE(CAST(config AS JSONB), CAST('{}' AS JSONB))
+                                     || CAST(:patch AS JSONB) AS JSON)
+                 WHERE id = :id
+             RETURNING config
+                """
+            ),
+            {"patch": json.dumps(values), "id": ad_account.id},
+        ).first()
+        config = dict(row.config or {}) if row else {}
+        set_committed_value(ad_account, "config", config)
+        return config
+
+    @classmethod
+    def _fetch_modified(
+        cls,
+        path: str,
+        token: str,
+        params: Dict,
+        since: Optional[str],
+        label: str,
+    ) -> List[Dict]:
+        """
+        ดึงทุกหน้าของ endpoint (/campaign/get/, /adgroup/get/, /ad/get/)
+        ถ้ามี since → ขอเฉพาะที่ modify_time >= since
+
+        error ใด ๆ จะ raise (ห้ามเลื่อน high-water mark ถ้าได้ข้อมูลไม่ครบ)
+        """
+        if not since:
+            return cls._fetch_all_pages(path, token, params, label, raise_on_error=True)
+
+        rows = None
+        advertiser_id = str(params.get("advertiser_id") or "")
+        retry_at = cls._modified_filter_unsupported_until.get(advertiser_id)
+        if retry_at is None or time.monotonic() >= retry_at:
+            try:
+                rows = cls._fetch_all_pages(
+                    path,
+                    token,
+                    {**params, "filtering": json.dumps({"modified_after": since})},
+                    label=f"{label} since {since}",
+                    raise_on_error=True,
+                )
+                cls._modified_filter_unsupported_until.pop(advertiser_id, None)
+            except TikTokApiError as e:
+                if not cls._is_filter_rejected(e):
+                    raise
+                print(
+                    f"[TikTokAdsService] {label}: modified_after filter not accepted, "
+                    f"falling back to full list + local modify_time filter "
+                    f"for {settings.TIKTOK_MODIFIED_FILTER_RECHECK_HOURS}h"
+                )
+                cls._modified_filter_unsupported_until[advertiser_id] = (
+                    time.monotonic() + settings.TIKTOK_MODIFIED_FILTER_RECHECK_HOURS * 3600
+                )
+
+        if rows is None:
+            rows = cls._fetch_all_pages(path, token, params, label, raise_on_error=True)
+
+        # กันกรณี API ไม่สน filter: merge เฉพาะที่เปลี่ยนจริง
+        return [r for r in rows if str(r.get("modify_time") or "") >= since]
+
+    @staticmethod
+    def _budget_value(budget) -> Optional[float]:
+        """budget จาก /campaign/get/ หรือ /adgroup/get/ (บาง account ส่งเป็นหน่วย micro)"""
+        if not budget:
+            return None
+        try:
+            value = float(budget)
+        except (TypeError, ValueError):
+            return None
+        return value / 1000000 if value > 10000 else value
+
+    @staticmethod
+    def _load_local_ad_snapshots(
+        db: Session, ad_account: AdAccount, ad_ids: List[str]
+    ) -> Dict[str, Dict]:
+        """
+        ad dict (หน้าตาเดียวกับ /ad/get/) จาก Ad.platform_data
+        ชื่อ campaign / adgroup อ่านจากตารางปัจจุบัน (rename ไม่ทำให้ ad.modify_time เปลี่ยน)
+        """
+        if not ad_ids:
+            return {}
+
+        rows = (
+            db.query(Ad.external_ad_id, Ad.platform_data, AdGroup.name, Campaign.name)
+            .join(AdGroup, Ad.ad_group_id == AdGroup.id)
+            .join(Campaign, AdGroup.campaign_id == Campaign.id)
+            .filter(
+                Ad.platform == PlatformEnum.TIKTOK,
+                Ad.ad_account_id == ad_account.id,
+                Ad.external_ad_id.in_([str(a) for a in ad_ids]),
+            )
+            .all()
+        )
+
+        snapshots: Dict[str, Dict] = {}
+        for ext_id, data, adgroup_name, campaign_name in rows:
+            if not isinstance(data, dict) or not data.get("ad_id"):
+                continue
+            snap = dict(data)
+            snap["adgroup_name"] = adgroup_name or snap.get("adgroup_name")
+            snap["campaign_name"] = campaign_name or snap.get("campaign_name")
+            snapshots[str(ext_id)] = snap
+        return snapshots
+
+    @classmethod
+    def sync_metadata_delta(
+        cls,
+        db: Session,
+        ad_account: AdAccount,
+        force_full: bool = False,
+        commit: bool = True,
+    ) -> Dict:
+        """
+        Merge campaigns / adgroups / ads ที่เปลี่ยนตั้งแต่ high-water mark เข้าตาราง local
+
+        - high-water mark = modify_time สูงสุดที่เคยเห็น เก็บใน AdAccount.config[META_CURSOR_KEY]
+        - delta: ดึงเฉพาะ resource ที่ modify_time >= mark - TIKTOK_METADATA_DELTA_OVERLAP_MINUTES
+        - full reconciliation (ทุก TIKTOK_METADATA_FULL_SYNC_HOURS หรือ force_full):
+          ดึง campaigns / adgroups ทั้งหมดเป็น safety net
+          (ads ทั้งหมดใน account มีเยอะมาก → active ads ถูก refresh เต็มใน sync_ads_for_account แทน)
+        - mark เลื่อนใน transaction เดียวกับข้อมูล (commit=False → caller commit)
+        """
+        from sqlalchemy import case, func
+
+        advertiser_id = ad_account.external_account_id
+        token = cls._get_access_token()
+        if not token:
+            print("[TikTokAdsService] Missing access token, skip sync_metadata_delta")
+            return {"full": False, "campaigns": 0, "adgroups": 0, "ads": 0, "skipped": True}
+
+        since = cls._metadata_since(ad_account)
+        full = force_full or since is None or cls._full_sync_due(ad_account, cls.META_FULL_SYNC_KEY)
+        structure_since = None if full else since
+        label = f"metadata advertiser={advertiser_id}"
+
+        campaigns_raw = cls._fetch_modified(
+            "/campaign/get/",
+            token,
+            {
+                "advertiser_id": advertiser_id,
+                "fields": json.dumps([
+                    "campaign_id",
+                    "campaign_name",
+                    "objective_type",
+                    "budget_mode",
+                    "budget",
+                    "operation_status",
+                    "secondary_status",
+                    "create_time",
+                    "modify_time",
+                ]),
+                "page_size": 1000,
+            },
+            structure_since,
+            f"{label} campaigns",
+        )
+        adgroups_raw = cls._fetch_modified(
+            "/adgroup/get/",
+            token,
+            {
+                "advertiser_id": advertiser_id,
+                "fields": json.dumps([
+                    "adgroup_id",
+                    "adgroup_name",
+                    "campaign_id",
+                    "optimization_goal",
+                    "billing_event",
+                    "bid_type",
+                    "bid_price",
+                    "budget_mode",
+                    "budget",
+                    "operation_status",
+                    "secondary_status",
+                    "create_time",
+                    "modify_time",
+                ]),
+                "page_size": 1000,
+            },
+            structure_since,
+            f"{label} adgroups",
+        )
+        # ads: delta เสมอ (ถ้ายังไม่มี mark ให้ sync_ads_for_account ดึง active ads เอง)
+        ads_raw = []
+        if since:
+            ads_raw = cls._fetch_modified(
+                "/ad/get/",
+                token,
+                {
+                    "advertiser_id": advertiser_id,
+                    "fields": json.dumps(cls.AD_METADATA_FIELDS),
+                    "page_size": 1000,
+                },
+                since,
+                f"{label} ads",
+            )
+
+        now = datetime.utcnow()
+        platform = PlatformEnum.TIKTOK
+
+        # ---------- Campaign ----------
+        campaign_rows: Dict[str, Dict] = {}
+        for c in campaigns_raw:
+            campaign_id = c.get("campaign_id")
+            if not campaign_id:
+                continue
+            objective_raw = c.get("objective_type")
+            campaign_rows[str(campaign_id)] = {
+                "platform": platform,
+                "ad_account_id": ad_account.id,
+                "external_campaign_id": str(campaign_id),
+                "name": _truncate(c.get("campaign_name") or f"Campaign {campaign_id}"),
+                "status": cls._map_operation_status(c.get("operation_status")),
+                "objective_raw": objective_raw,
+                "objective": cls._map_objective(objective_raw),
+                "daily_budget": cls._budget_value(c.get("budget")),
+                "platform_data": dict(c),
+                "last_synced_at": now,
+            }
+
+        def campaign_set(stmt):
+            excluded = stmt.excluded
+            return {
+                "name": excluded.name,
+                "status": excluded.status,
+                "objective_raw": func.coalesce(excluded.objective_raw, Campaign.objective_raw),
+                "objective": case(
+                    (excluded.objective_raw.is_(None), Campaign.objective),
+                    else_=excluded.objective,
+                ),
+                "daily_budget": func.coalesce(excluded.daily_budget, Campaign.daily_budget),
+                "platform_data": excluded.platform_data,
+                "last_synced_at": excluded.last_synced_at,
+                "updated_at": now,
+            }
+
+        if campaign_rows:
+            cls._upsert_returning(
+                db,
+                Campaign,
+                list(campaign_rows.values()),
+                ["platform", "ad_account_id", "external_campaign_id"],
+                campaign_set,
+                ["id"],
+            )
+
+        # ---------- AdGroup ----------
+        adgroup_rows: Dict[str, Dict] = {}
+        skipped_adgroups = 0
+        if adgroups_raw:
+            campaign_id_map = {
+                ext_id: pk
+                for ext_id, pk in db.query(Campaign.external_campaign_id, Campaign.id).filter(
+                    Campaign.platform == platform,
+                    Campaign.ad_account_id == ad_account.id,
+                )
+            }
+            for ag in adgroups_raw:
+                adgroup_id = ag.get("adgroup_id")
+                internal_campaign_id = campaign_id_map.get(str(ag.get("campaign_id") or ""))
+                if not adgroup_id:
+                    continue
+                if not internal_campaign_id:
+                    skipped_adgroups += 1
+                    continue
+                opt_goal_raw = ag.get("optimization_goal")
+                bid_price = ag.get("bid_price")
+                adgroup_rows[str(adgroup_id)] = {
+                    "platform": platform,
+                    "ad_account_id": ad_account.id,
+                    "campaign_id": internal_campaign_id,
+                    "external_adgroup_id": str(adgroup_id),
+                    "name": _truncate(ag.get("adgroup_name") or f"AdGroup {adgroup_id}"),
+                    "status": cls._map_operation_status(ag.get("operation_status")),
+                    "optimization_goal_raw": opt_goal_raw,
+                    "optimization_goal": cls._map_optimization_goal(opt_goal_raw),
+                    "billing_event": ag.get("billing_event"),
+                    "bid_strategy": ag.get("bid_type"),
+                    "bid_amount": float(bid_price) if bid_price else None,
+                    "daily_budget": cls._budget_value(ag.get("budget")),
+                    "platform_data": dict(ag),
+                    "last_synced_at": now,
+                }
+
+        def adgroup_set(stmt):
+            excluded = stmt.excluded
+            return {
+                "campaign_id": excluded.campaign_id,
+                "name": excluded.name,
+                "status": excluded.status,
+                "optimization_goal_raw": func.coalesce(
+                    excluded.optimization_goal_raw, AdGroup.optimization_goal_raw
+                ),
+                "optimization_goal": case(
+                    (excluded.optimization_goal_raw.is_(None), AdGroup.optimization_goal),
+                    else_=excluded.optimization_goal,
+                ),
+                "billing_event": excluded.billing_event,
+                "bid_strategy": excluded.bid_strategy,
+                "bid_amount": excluded.bid_amount,
+                "daily_budget": func.coalesce(excluded.daily_budget, AdGroup.daily_budget),
+                "platform_data": excluded.platform_data,
+                "last_synced_at": excluded.last_synced_at,
+                "updated_at": now,
+            }
+
+        if adgroup_rows:
+            cls._upsert_returning(
+                db,
+                AdGroup,
+                list(adgroup_rows.values()),
+                ["platform", "ad_account_id", "external_adgroup_id"],
+                adgroup_set,
+                ["id"],
+            )
+
+        # ---------- Ad (metadata only, ไม่แตะ total_spend) ----------
+        ads_merged = 0
+        if ads_raw:
+            item_ids = {a.get("tiktok_item_id") for a in ads_raw if a.get("tiktok_item_id")}
+            content_by_item: Dict[str, Content] = {}
+            if item_ids:
+                content_by_item = {
+                    c.platform_post_id: c
+                    for c in db.query(Content).filter(
+                        Content.platform == platform,
+                        Content.platform_post_id.in_(list(item_ids)),
+                    )
+                }
+            ads_merged, _ = cls._bulk_upsert_ad_hierarchy(
+                db, ad_account, ads_raw, {}, content_by_item, keep_spend=True
+            )
+
+        # ---------- High-water mark ----------
+        cfg = dict(ad_account.config) if isinstance(ad_account.config, dict) else {}
+        modify_times = [
+            str(r.get("modify_time"))
+            for r in (*campaigns_raw, *adgroups_raw, *ads_raw)
+            if r.get("modify_time")
+        ]
+        if cfg.get(cls.META_CURSOR_KEY):
+            modify_times.append(str(cfg[cls.META_CURSOR_KEY]))
+        patch = {}
+        if modify_times:
+            patch[cls.META_CURSOR_KEY] = max(modify_times)
+        if full:
+            patch[cls.META_FULL_SYNC_KEY] = now.isoformat()
+        if patch:
+            cfg = cls.update_account_config(db, ad_account, patch)
+
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+        print(
+            f"[TikTokAdsService] Metadata {'full' if full else 'delta'} sync for {ad_account.name}: "
+            f"{len(campaign_rows)} campaigns, {len(adgroup_rows)} adgroups, {ads_merged} ads "
+            f"(since={structure_since or since or '-'}, mark={cfg.get(cls.META_CURSOR_KEY)})"
+        )
+        return {
+            "full": full,
+            "since": structure_since,
+            "campaigns": len(campaign_rows),
+            "adgroups": len(adgroup_rows),
+            "adgroups_skipped": skipped_adgroups,
+            "ads": ads_merged,
+            "modify_time": cfg.get(cls.META_CURSOR_KEY),
+        }
+
     @classmethod
     def sync_ads_for_account(
-        cls, db: Session, ad_account: AdAccount, days: int = 7
+        cls,
+        db: Session,
+        ad_account: AdAccount,
+        days: int = 7,
+        commit: bool = True,
+        use_local_metadata: bool = False,
     ) -> Dict:
         """
         Sync Ads ของ AdAccount (TikTok Advertiser) หนึ่งบัญชี
@@ -682,6 +1424,10 @@ class TikTokAdsService:
         
         Args:
             days: จำนวนวันที่จะดึง ads ที่มี activity (default=7 วัน)
+            commit: False → flush แทน commit (caller ถือ transaction เอง)
+            use_local_metadata: True → ใช้ Ad.platform_data (ที่ sync_metadata_delta merge ไว้แล้ว)
+                แทนการดึง /ad/get/ ใหม่ ยกเว้น ad ที่ยังไม่มี snapshot หรือถึงรอบ full
+                (TIKTOK_METADATA_FULL_SYNC_HOURS)
         """
         advertiser_id = ad_account.external_account_id
         
@@ -704,9 +1450,33 @@ class TikTokAdsService:
         active_ad_ids = list(active_ads_spend.keys())
         print(f"[TikTokAdsService] Found {len(active_ad_ids)} ads with recent activity")
         
-        # STEP 2: ดึง metadata ของ ads เหล่านั้น
-        print(f"[TikTokAdsService] Step 2: Fetching ad metadata...")
-        ads_raw = cls.fetch_ads_by_ids(advertiser_id, active_ad_ids)
+        # STEP 2 + 3: ดึง metadata และ lifetime spend ของ ads เหล่านั้นพร้อมกัน
+        # (ทั้งสองอย่างต้องการแค่ active_ad_ids)
+        # lifetime spend มาจาก SpendLedgerService (ad_performance_daily + delta วันนี้)
+        # ใช้ db ใน thread นี้เท่านั้น ส่วน metadata ยิง API อย่างเดียวใน worker
+        from app.services.spend_ledger_service import SpendLedgerService
+
+        use_local = use_local_metadata and not cls._full_sync_due(ad_account, cls.ADS_FULL_SYNC_KEY)
+        local_ads = cls._load_local_ad_snapshots(db, ad_account, active_ad_ids) if use_local else {}
+        fetch_ids = [a for a in active_ad_ids if str(a) not in local_ads]
+
+        print(
+            f"[TikTokAdsService] Step 2+3: Fetching ad metadata ({len(local_ads)} from local snapshot, "
+            f"{len(fetch_ids)} from API) and lifetime spend..."
+        )
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            metadata_future = executor.submit(cls.fetch_ads_by_ids, advertiser_id, fetch_ids)
+            lifetime_spend_map = SpendLedgerService.get_lifetime_spend(
+                db, ad_account, ad_ids=active_ad_ids
+            )
+            ads_raw = list(local_ads.values()) + metadata_future.result()
+
+        if use_local_metadata and not use_local and ads_raw:
+            # refresh active ads เต็มรอบแล้ว → รอบถัดไปใช้ snapshot ได้
+            cls.update_account_config(
+                db, ad_account, {cls.ADS_FULL_SYNC_KEY: datetime.utcnow().isoformat()}
+            )
+
         if not ads_raw:
             print(f"[TikTokAdsService] Could not fetch ad metadata")
             return {
@@ -719,19 +1489,9 @@ class TikTokAdsService:
                 "total_spend_synced": 0,
             }
         
-        # STEP 3: ดึง lifetime spend ของ ads เหล่านั้น
-        print(f"[TikTokAdsService] Step 3: Fetching lifetime spend...")
-        lifetime_spend_map = cls.fetch_spend_for_ads(advertiser_id, active_ad_ids)
         total_spend_synced = sum(lifetime_spend_map.values())
         print(f"[TikTokAdsService] Total lifetime spend: {total_spend_synced:.2f}")
 
-        # cache campaign/adgroup ตาม external_id -> instance
-        campaign_cache: Dict[str, Campaign] = {}
-        adgroup_cache: Dict[str, AdGroup] = {}
-
-        # เตรียม map content_id -> list of ad summaries
-        content_ads_map: Dict[int, List[Dict]] = {}
-
         # เตรียม content cache จาก item_id ก่อน (ล่วงหน้า)
         ads_without_item_id = sum(1 for a in ads_raw if not a.get("tiktok_item_id"))
         item_ids = {
@@ -763,7 +1523,7 @@ class TikTokAdsService:
                 f"{len(missing_item_ids)} TikTok item_ids not in DB before mapping ads..."
             )
             ensure_stats = TikTokService.ensure_contents_for_item_ids(
-                list(missing_item_ids), db=db
+                list(missing_item_ids), db=db, commit=commit
             )
             # โหลด content ใหม่สำหรับ item_ids ที่เพิ่งสร้าง
             new_contents = (
@@ -781,163 +1541,15 @@ class TikTokAdsService:
         # item_ids ที่สุดท้ายแล้วยัง map content ไม่ได้เลย
         unresolved_item_ids = [i for i in item_ids if i and i not in content_by_item]
 
-        ads_created_or_updated = 0
-
-        for ad_data in ads_raw:
-            campaign_id = ad_data.get("campaign_id")
-            adgroup_id = ad_data.get("adgroup_id")
-            ad_id = ad_data.get("ad_id")
-            item_id = ad_data.get("tiktok_item_id")
-
-            if not ad_id or not campaign_id or not adgroup_id:
-                continue
-
-            # ---------- Campaign ----------
-            if campaign_id in campaign_cache:
-                campaign = campaign_cache[campaign_id]
-            else:
-                campaign = (
-                    db.query(Campaign)
-                    .filter(
-                        Campaign.platform == PlatformEnum.TIKTOK,
-                        Campaign.ad_account_id == ad_account.id,
-                        Campaign.external_campaign_id == campaign_id,
-                    )
-                    .first()
-                )
-                if not campaign:
-                    campaign = Campaign(
-                        platform=PlatformEnum.TIKTOK,
-                        ad_account_id=ad_account.id,
-                        external_campaign_id=campaign_id,
-                        name=_truncate(
-                            ad_data.get("campaign_name") or f"Campaign {campaign_id}"
-                        ),
-                    )
-                    db.add(campaign)
-                    # ให้แน่ใจว่า campaign.id ถูกสร้างก่อนนำไปอ้างอิงที่ AdGroup
-                    db.flush()
-                else:
-                    # update name เผื่อมีเปลี่ยน
-                    if ad_data.get("campaign_name"):
-                        campaign.name = _truncate(ad_data["campaign_name"])
-                
-                # Update campaign objective if available
-                objective_raw = ad_data.get("objective_type")
-                if objective_raw and not campaign.objective_raw:
-                    campaign.objective_raw = objective_raw
-                    campaign.objective = cls._map_objective(objective_raw)
-                
-                campaign_cache[campaign_id] = campaign
-
-            # ---------- AdGroup ----------
-            if adgroup_id in adgroup_cache:
-                adgroup = adgroup_cache[adgroup_id]
-            else:
-                adgroup = (
-                    db.query(AdGroup)
-                    .filter(
-                        AdGroup.platform == PlatformEnum.TIKTOK,
-                        AdGroup.campaign_id == campaign.id,
-                        AdGroup.external_adgroup_id == adgroup_id,
-                    )
-                    .first()
-                )
-                if not adgroup:
-                    adgroup = AdGroup(
-                        platform=PlatformEnum.TIKTOK,
-                        ad_account_id=ad_account.id,
-                        campaign_id=campaign.id,
-                        external_adgroup_id=adgroup_id,
-                        name=_truncate(
-                            ad_data.get("adgroup_name")
-                            or f"AdGroup {adgroup_id}"
-                        ),
-                    )
-                    db.add(adgroup)
-                    # ให้แน่ใจว่า adgroup.id ถูกสร้างก่อนนำไปอ้างอิงที่ Ad
-                    db.flush()
-                else:
-                    if ad_data.get("adgroup_name"):
-                        adgroup.name = _truncate(ad_data["adgroup_name"])
-                    # Update ad_account_id if not set
-                    if not adgroup.ad_account_id:
-                        adgroup.ad_account_id = ad_account.id
-                
-                # Update adgroup optimization_goal if available
-                opt_goal_raw = ad_data.get("optimization_goal")
-                if opt_goal_raw and not adgroup.optimization_goal_raw:
-                    adgroup.optimization_goal_raw = opt_goal_raw
-                    adgroup.optimization_goal = cls._map_optimization_goal(opt_goal_raw)
-                
-                adgroup_cache[adgroup_id] = adgroup
-
-            # ---------- Ad ----------
-            ad = (
-                db.query(Ad)
-                .filter(
-                    Ad.platform == PlatformEnum.TIKTOK,
-                    Ad.ad_group_id == adgroup.id,
-                    Ad.external_ad_id == ad_id,
-                )
-                .first()
-            )
-
-            if not ad:
-                ad = Ad(
-                    platform=PlatformEnum.TIKTOK,
-                    ad_account_id=ad_account.id,
-                    ad_group_id=adgroup.id,
-                    external_ad_id=ad_id,
-                    name=_truncate(ad_data.get("ad_name") or f"Ad {ad_id}"),
-                )
-                db.add(ad)
-            else:
-                if ad_data.get("ad_name"):
-                    ad.name = _truncate(ad_data["ad_name"])
-                # Update ad_account_id if not set
-                if not ad.ad_account_id:
-                    ad.ad_account_id = ad_account.id
-
-            # map status
-            operation_status = ad_data.get("operation_status")
-            ad.status = cls._map_operation_status(operation_status)
-            
-            # Update spend from lifetime spend map
-            ad_spend = lifetime_spend_map.get(ad_id, 0)
-            ad.total_spend = ad_spend
-            ad.last_synced_at = datetime.utcnow()
-
-            # link to content
-            if item_id and item_id in content_by_item:
-                content = content_by_item[item_id]
-                ad.content_id = content.id
-                # ensure content.ad_account_id ชี้มาที่ account นี้ (ถ้ายังไม่เคยตั้ง)
-                if not content.ad_account_id:
-                    content.ad_account_id = ad_account.id
-
-                # เตรียม summary สำหรับ ads_details (พร้อม spend)
-                ads_summary = {
-                    "ad_id": ad_id,
-                    "campaign_id": campaign_id,
-                    "adgroup_id": adgroup_id,
-                    "advertiser_id": ad_data.get("advertiser_id"),
-                    "ad_name": ad.name,
-                    "campaign_name": ad_data.get("campaign_name"),
-                    "adgroup_name": ad_data.get("adgroup_name"),
-                    "operation_status": operation_status,
-                    "secondary_status": ad_data.get("secondary_status"),
-                    "create_time": ad_data.get("create_time"),
-                    "modify_time": ad_data.get("modify_time"),
-                    "total_spend": float(ad_spend),  # lifetime spend
-                }
-
-                content_ads_map.setdefault(content.id, []).append(ads_summary)
-
-            ads_created_or_updated += 1
+        ads_created_or_updated, content_ads_map = cls._bulk_upsert_ad_hierarchy(
+            db, ad_account, ads_raw, lifetime_spend_map, content_by_item
+        )
 
         # commit สำหรับ Campaign/AdGroup/Ad ทั้งหมดก่อน
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
 
         # ---------- Aggregate กลับไปที่ Content ----------
         if content_ads_map:
@@ -998,7 +1610,10 @@ class TikTokAdsService:
                 existing_details["tiktok"] = list(ads_list)
                 c.ads_details = existing_details  # reassign to trigger change detection
 
-            db.commit()
+            if commit:
+                db.commit()
+            else:
+                db.flush()
 
         mapped_contents = len(content_ads_map)
 
@@ -1013,7 +1628,40 @@ class TikTokAdsService:
         }
 
     @classmethod
-    def sync_all_tiktok_ads(cls, days: int = 7) -> Dict:
+    def _sync_account_isolated(cls, ad_account_id: int, days: int) -> Dict:
+        """
+        Sync 1 account ด้วย session ของตัวเอง + 1 transaction
+        (ใช้ใน parallel mode: account ไหนพังจะ rollback เฉพาะ account นั้น)
+        """
+        db = SessionLocal()
+        try:
+            acc = db.query(AdAccount).filter(AdAccount.id == ad_account_id).first()
+            if not acc:
+                return {"error": f"AdAccount {ad_account_id} not found"}
+
+            print(
+                f"[TikTokAdsService] Syncing ads for advertiser_id="
+                f"{acc.external_account_id} ({acc.name})"
+            )
+            # Campaign / AdGroup / Ad ที่เปลี่ยนตั้งแต่รอบก่อน (objective, optimization goal, budget, ...)
+            meta = cls.sync_metadata_delta(db, acc, commit=False)
+            r = cls.sync_ads_for_account(
+                db, acc, days=days, commit=False,
+                use_local_metadata=not meta.get("skipped"),
+            )
+            r["metadata"] = meta
+
+            db.commit()
+            return r
+        except Exception as e:
+            db.rollback()
+            print(f"[TikTokAdsService] Sync failed for ad_account_id={ad_account_id}: {e}")
+            return {"error": str(e)}
+        finally:
+            db.close()
+
+    @classmethod
+    def sync_all_tiktok_ads(cls, days: int = 7, workers: Optional[int] = None) -> Dict:
         """
         Helper สำหรับ job: sync Ads ของทุก TikTok AdAccount ในระบบ
         
@@ -1022,59 +1670,71 @@ class TikTokAdsService:
                   - ใช้ 7 สำหรับ daily sync (แนะนำ)
                   - ใช้ 31 สำหรับ monthly sync
                   - ใช้ -1 สำหรับ full sync (ช้ามาก)
+            workers: จำนวน account ที่ sync พร้อมกัน
+                  (default = settings.TIKTOK_ADS_SYNC_ACCOUNT_WORKERS, 1 = ทีละ account)
         """
         db = SessionLocal()
-        total_ads = 0
-        total_contents = 0
-        total_ads_without_item = 0
-        total_item_ids = 0
-        total_detail_failed = 0
-        total_unresolved = 0
-        total_spend = 0.0
-
         try:
-            accounts: List[AdAccount] = (
-                db.query(AdAccount)
+            account_ids: List[int] = [
+                row.id
+                for row in db.query(AdAccount.id)
                 .filter(
                     AdAccount.platform == PlatformEnum.TIKTOK,
                     AdAccount.status == AdAccountStatus.ACTIVE,
                 )
+                .order_by(AdAccount.id)
                 .all()
-            )
+            ]
+        finally:
+            db.close()
 
-            for acc in accounts:
-                print(
-                    f"[TikTokAdsService] Syncing ads for advertiser_id="
-                    f"{acc.external_account_id} ({acc.name})"
+        if workers is None:
+            workers = settings.TIKTOK_ADS_SYNC_ACCOUNT_WORKERS
+        workers = max(1, min(workers, len(account_ids) or 1))
+
+        if workers == 1:
+            results = [cls._sync_account_isolated(acc_id, days) for acc_id in account_ids]
+        else:
+            print(f"[TikTokAdsService] Syncing {len(account_ids)} accounts with {workers} workers")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(lambda acc_id: cls._sync_account_isolated(acc_id, days), account_ids)
                 )
-                r = cls.sync_ads_for_account(db, acc, days=days)
-                total_ads += r.get("ads", 0)
-                total_contents += r.get("mapped_contents", 0)
-                total_ads_without_item += r.get("ads_without_item_id", 0)
-                total_item_ids += r.get("item_ids_total", 0)
-                total_spend += r.get("total_spend_synced", 0)
-
-                ensure = r.get("ensure_stats") or {}
-                total_detail_failed += ensure.get("failed", 0)
-                total_unresolved += r.get("item_ids_unresolved", 0)
-                
-                # Update Campaign objectives and AdGroup optimization goals
-                cls.update_campaign_objectives(db, acc)
-                cls.update_adgroup_optimization_goals(db, acc)
 
-            return {
-                "ads": total_ads,
-                "mapped_contents": total_contents,
-                "ad_accounts": len(accounts),
-                "ads_without_item_id": total_ads_without_item,
-                "item_ids_total": total_item_ids,
-                "item_detail_failed": total_detail_failed,
-                "item_ids_unresolved": total_unresolved,
-                "total_spend_synced": total_spend,
-            }
+        total_ads = 0
+        total_contents = 0
+        total_ads_without_item = 0
+        total_item_ids = 0
+        total_detail_failed = 0
+        total_unresolved = 0
+        total_spend = 0.0
+        account_errors = []
 
-        finally:
-            db.close()
+        for acc_id, r in zip(account_ids, results):
+            if r.get("error"):
+                account_errors.append({"ad_account_id": acc_id, "error": r["error"]})
+                continue
+            total_ads += r.get("ads", 0)
+            total_contents += r.get("mapped_contents", 0)
+            total_ads_without_item += r.get("ads_without_item_id", 0)
+            total_item_ids += r.get("item_ids_total", 0)
+            total_spend += r.get("total_spend_synced", 0)
+
+            ensure = r.get("ensure_stats") or {}
+            total_detail_failed += ensure.get("failed", 0)
+            total_unresolved += r.get("item_ids_unresolved", 0)
+
+        return {
+            "ads": total_ads,
+            "mapped_contents": total_contents,
+            "ad_accounts": len(account_ids),
+            "ads_without_item_id": total_ads_without_item,
+            "item_ids_total": total_item_ids,
+            "item_detail_failed": total_detail_failed,
+            "item_ids_unresolved": total_unresolved,
+            "total_spend_synced": total_spend,
+            "account_errors": account_errors,
+        }
 
     @classmethod
     def fetch_spend_for_ads(cls, advertiser_id: str, ad_ids: List[str]) -> Dict[str, float]:
@@ -1087,6 +1747,9 @@ class TikTokAdsService:
             
         Returns:
             Dict[ad_id, total_spend] - mapping ของ ad_id และ total spend
+
+        Raises:
+            RuntimeError: ถ้า batch ใด batch หนึ่งล้มเหลว (หลัง executor retry แล้ว)
         """
         if not ad_ids:
             return {}
@@ -1176,9 +1839,8 @@ class TikTokAdsService:
                     )
 
                     if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_spend_for_ads error {resp.status_code}")
-                        # ไม่ return ทันที เพื่อให้ batch อื่นๆ ยังทำงานต่อได้
-                        continue
+                        # batch ที่หายไปทำให้ spend ไม่ครบ → raise ให้ caller จัดการ ไม่คืนผลครึ่งเดียว
+                        raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
 
                     data = resp.json()
                     if data.get("code") != 0:
@@ -1198,8 +1860,7 @@ class TikTokAdsService:
                         except Exception:
                             pass
                         # endregion
-                        print(f"[TikTokAdsService] fetch_spend_for_ads API error: {data.get('message')}")
-                        continue
+                        raise RuntimeError(f"API error: {data.get('message')}")
 
                     reports = data.get("data", {}).get("list", []) or []
                     for report in reports:
@@ -1209,8 +1870,10 @@ class TikTokAdsService:
                             ad_spend_map[str(ad_id)] = spend
 
                 except Exception as e:
-                    print(f"[TikTokAdsService] fetch_spend_for_ads exception: {e}")
-                    continue
+                    print(
+                        f"[TikTokAdsService] fetch_spend_for_ads batch {i // batch_size + 1} failed: {e}"
+                    )
+                    raise
 
         print(f"[TikTokAdsService] Fetched spend for {len(ad_spend_map)}/{len(ad_ids)} ads")
         return ad_spend_map
@@ -1453,63 +2116,28 @@ class TikTokAdsService:
             print("[TikTokAdsService] Missing access token, skip fetch_lifetime_spend")
             return {}
         
+        params = {
+            "advertiser_id": advertiser_id,
+            "report_type": "BASIC",
+            "data_level": "AUCTION_AD",
+            "dimensions": json.dumps(["ad_id"]),
+            "metrics": json.dumps(["spend"]),
+            "query_lifetime": True,  # Get lifetime data (from account start date)
+            "page_size": 1000,
+        }
+        reports = cls._fetch_all_pages(
+            "/report/integrated/get/",
+            token,
+            params,
+            label=f"fetch_lifetime_spend advertiser={advertiser_id}",
+        )
+
         ad_spend_map: Dict[str, float] = {}
-        
-        with cls._get_client() as client:
-            url = f"{cls.BASE_URL}/report/integrated/get/"
-            page = 1
-            
-            while True:
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "report_type": "BASIC",
-                    "data_level": "AUCTION_AD",
-                    "dimensions": json.dumps(["ad_id"]),
-                    "metrics": json.dumps(["spend"]),
-                    "query_lifetime": True,  # Get lifetime data (from account start date)
-                    "page_size": 1000,
-                    "page": page,
-                }
-                
-                try:
-                    resp = client.get(
-                        url,
-                        headers={"Access-Token": token},
-                        params=params,
-                    )
-                    
-                    if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_lifetime_spend error {resp.status_code}: {resp.text}")
-                        break
-                    
-                    data = resp.json()
-                    if data.get("code") != 0:
-                        print(f"[TikTokAdsService] fetch_lifetime_spend API error: {data.get('message')}")
-                        break
-                    
-                    reports = data.get("data", {}).get("list", [])
-                    
-                    if not reports:
-                        break
-                    
-                    for report in reports:
-                        ad_id = report.get("dimensions", {}).get("ad_id")
-                        spend = float(report.get("metrics", {}).get("spend", 0))
-                        if ad_id:
-                            ad_spend_map[ad_id] = spend
-                    
-                    # Check if more pages
-                    page_info = data.get("data", {}).get("page_info", {})
-                    total_pages = page_info.get("total_page", 1)
-                    
-                    if page >= total_pages:
-                        break
-                    
-                    page += 1
-                    
-                except Exception as e:
-                    print(f"[TikTokAdsService] fetch_lifetime_spend exception: {e}")
-                    break
+        for report in reports:
+            ad_id = report.get("dimensions", {}).get("ad_id")
+            spend = float(report.get("metrics", {}).get("spend", 0))
+            if ad_id:
+                ad_spend_map[ad_id] = spend
         
         print(f"[TikTokAdsService] Fetched lifetime spend for {len(ad_spend_map)} ads from {advertiser_id}")
         return ad_spend_map
@@ -1594,70 +2222,135 @@ class TikTokAdsService:
     # Daily performance snapshot (no ad_id filtering)
     # ============================================
     @classmethod
-    def fetch_ad_daily_report(
+    def iter_ad_daily_report(
         cls,
         advertiser_id: str,
         start_date: str,
         end_date: str,
         metrics: List[str] = None,
-    ) -> List[Dict]:
+    ) -> Iterator[List[Dict]]:
         """
-        Fetch ad-level daily report for a date range.
+        Stream ad-level daily report for a date range, one page (<= 1000 rows) at a time.
 
         Notes:
         - We intentionally DO NOT filter by ad_id because TikTok report API may not support it (runtime evidence).
         - Use dimensions ["ad_id","stat_time_day"] and page through results.
+        - Raises RuntimeError if a page still fails after retries (caller must not advance cursor).
         """
         token = cls._get_access_token()
         if not token:
             print("[TikTokAdsService] Missing access token, skip fetch_ad_daily_report")
-            return []
+            return
 
         # Keep to widely-supported metrics for AUCTION_AD level.
         # (runtime evidence: some accounts reject 'purchase_value')
         if metrics is None:
             metrics = ["spend", "impressions", "clicks", "reach", "conversion"]
 
-        all_rows: List[Dict] = []
-        page = 1
+        params = {
+            "advertiser_id": advertiser_id,
+            "report_type": "BASIC",
+            "data_level": "AUCTION_AD",
+            "dimensions": json.dumps(["ad_id", "stat_time_day"]),
+            "metrics": json.dumps(metrics),
+            "start_date": start_date,
+            "end_date": end_date,
+            "page_size": 1000,
+        }
+        yield from cls._iter_pages(
+            "/report/integrated/get/",
+            token,
+            params,
+            label=f"fetch_ad_daily_report advertiser={advertiser_id} {start_date}..{end_date}",
+            raise_on_error=True,
+        )
 
-        with cls._get_client() as client:
-            url = f"{cls.BASE_URL}/report/integrated/get/"
-            while True:
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "report_type": "BASIC",
-                    "data_level": "AUCTION_AD",
-                    "dimensions": json.dumps(["ad_id", "stat_time_day"]),
-                    "metrics": json.dumps(metrics),
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "page_size": 1000,
-                    "page": page,
-                }
-                try:
-                    resp = client.get(url, headers={"Access-Token": token}, params=params)
-                    if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_ad_daily_report error {resp.status_code}: {resp.text}")
-                        break
-                    data = resp.json()
-                    if data.get("code") != 0:
-                        # Signal failure to caller (do NOT advance cursor)
-                        raise RuntimeError(f"{data.get('message')}")
-                    rows = data.get("data", {}).get("list", []) or []
-                    if not rows:
-                        break
-                    all_rows.extend(rows)
-                    page_info = data.get("data", {}).get("page_info", {}) or {}
-                    total_page = page_info.get("total_page", 1) or 1
-                    if page >= total_page:
-                        break
-                    page += 1
-                except Exception as e:
-                    print(f"[TikTokAdsService] fetch_ad_daily_report exception: {e}")
-                    break
+    @classmethod
+    def fetch_ad_daily_report(
+        cls,
+        advertiser_id: str,
+        start_date: str,
+        end_date: str,
+        metrics: List[str] = None,
+    ) -> List[Dict]:
+        """
+        Fetch ad-level daily report for a date range (ทั้งช่วงเป็น list เดียว)
+
+        สำหรับช่วงยาว ๆ ให้ใช้ `iter_ad_daily_report` แทนเพื่อไม่ต้องถือทุกแถวไว้ใน memory
+        """
+        rows: List[Dict] = []
+        for page in cls.iter_ad_daily_report(advertiser_id, start_date, end_date, metrics):
+            rows.extend(page)
+        return rows
+
+    @staticmethod
+    def _daily_report_row_to_record(ad_account_id: int, r: Dict) -> Optional[Dict]:
+        """แปลง 1 แถวจาก daily report เป็น record สำหรับ ad_performance_daily"""
+        dims = r.get("dimensions", {}) or {}
+        mets = r.get("metrics", {}) or {}
+        ext_ad_id = dims.get("ad_id")
+        day = dims.get("stat_time_day")
+        if not ext_ad_id or not day:
+            return None
+        try:
+            # TikTok often returns "YYYY-MM-DD 00:00:00" for stat_time_day
+            day_str = str(day).split(" ")[0]
+            day_date = datetime.strptime(day_str, "%Y-%m-%d").date()
+        except Exception:
+            return None
 
-        return all_rows
+        def _f(key):
+            try:
+                return float(mets.get(key) or 0)
+            except Exception:
+                return 0.0
+
+        def _i(key):
+            try:
+                return int(float(mets.get(key) or 0))
+            except Exception:
+                return 0
+
+        return {
+            "platform": PlatformEnum.TIKTOK,
+            "ad_account_id": ad_account_id,
+            "external_ad_id": str(ext_ad_id),
+            "date": day_date,
+            "spend": _f("spend"),
+            "impressions": _i("impressions"),
+            "clicks": _i("clicks"),
+            "reach": _i("reach"),
+            "conversions": _i("conversion"),
+            "purchases": _i("purchase"),
+            "purchase_value": _f("purchase_value"),
+            "metrics": dict(mets),
+        }
+
+    @staticmethod
+    def _upsert_daily_records(db: Session, records: List[Dict], now: datetime) -> int:
+        """Postgres upsert 1 batch เข้า ad_performance_daily คืนจำนวนแถวที่ถูกเขียน"""
+        from sqlalchemy.dialects.postgresql import insert
+
+        from app.models import AdPerformanceDaily
+
+        stmt = insert(AdPerformanceDaily).values(records)
+        update_cols = {
+            "spend": stmt.excluded.spend,
+            "impressions": stmt.excluded.impressions,
+            "clicks": stmt.excluded.clicks,
+            "reach": stmt.excluded.reach,
+            "conversions": stmt.excluded.conversions,
+            "purchases": stmt.excluded.purchases,
+            "purchase_value": stmt.excluded.purchase_value,
+            "metrics": stmt.excluded.metrics,
+            "updated_at": now,
+        }
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["platform", "ad_account_id", "external_ad_id", "date"],
+            set_=update_cols,
+        )
+        res = db.execute(stmt)
+        return int(getattr(res, "rowcount", 0) or 0)
 
     @classmethod
     def upsert_tiktok_ad_performance_daily(
@@ -1670,98 +2363,59 @@ class TikTokAdsService:
         """
         Upsert daily performance rows into `ad_performance_daily`.
         Cursor responsibility is handled by caller (script/task).
-        """
-        from datetime import datetime as _dt
-
-        from app.models import AdPerformanceDaily
-        from app.models.enums import Platform as PlatformEnum
 
+        Streaming pipeline:
+        - report ถูกดึงทีละหน้าใน background (prefetch ไม่เกิน TIKTOK_REPORT_PIPELINE_DEPTH หน้า)
+        - แต่ละหน้าแปลงเป็น records แล้ว upsert ทีละ batch (300 แถว) ทันที
+        - memory คงที่ไม่ขึ้นกับความยาวช่วงวัน, commit ครั้งเดียวตอนจบ (ล้มกลางทาง = rollback ทั้งช่วง)
+        """
         advertiser_id = ad_account.external_account_id
-        rows = cls.fetch_ad_daily_report(advertiser_id, start_date=start_date, end_date=end_date)
-
-        # Convert report rows to upsert records
-        records = []
-        for r in rows:
-            dims = r.get("dimensions", {}) or {}
-            mets = r.get("metrics", {}) or {}
-            ext_ad_id = dims.get("ad_id")
-            day = dims.get("stat_time_day")
-            if not ext_ad_id or not day:
-                continue
-            try:
-                # TikTok often returns "YYYY-MM-DD 00:00:00" for stat_time_day
-                day_str = str(day).split(" ")[0]
-                day_date = _dt.strptime(day_str, "%Y-%m-%d").date()
-            except Exception:
-                continue
-
-            def _f(key):
-                try:
-                    return float(mets.get(key) or 0)
-                except Exception:
-                    return 0.0
-
-            def _i(key):
-                try:
-                    return int(float(mets.get(key) or 0))
-                except Exception:
-                    return 0
+        batch_size = 300
+        now = datetime.utcnow()
 
-            records.append(
-                {
-                    "platform": PlatformEnum.TIKTOK,
-                    "ad_account_id": ad_account.id,
-                    "external_ad_id": str(ext_ad_id),
-                    "date": day_date,
-                    "spend": _f("spend"),
-                    "impressions": _i("impressions"),
-                    "clicks": _i("clicks"),
-                    "reach": _i("reach"),
-                    "conversions": _i("conversion"),
-                    "purchases": _i("purchase"),
-                    "purchase_value": _f("purchase_value"),
-                    "metrics": dict(mets),
-                }
-            )
+        rows_fetched = 0
+        total_affected = 0
+        buffer: List[Dict] = []
 
-        if not records:
+        pages = prefetch(
+            cls.iter_ad_daily_report(advertiser_id, start_date=start_date, end_date=end_date),
+            depth=settings.TIKTOK_REPORT_PIPELINE_DEPTH,
+            name="tiktok-report-prefetch",
+        )
+        for page in pages:
+            rows_fetched += len(page)
+            for r in page:
+                record = cls._daily_report_row_to_record(ad_account.id, r)
+                if record:
+                    buffer.append(record)
+
+            # Postgres upsert (batch to avoid max-parameter limits)
+            while len(buffer) >= batch_size:
+                total_affected += cls._upsert_daily_records(db, buffer[:batch_size], now)
+                del buffer[:batch_size]
+
+        if buffer:
+            total_affected += cls._upsert_daily_records(db, buffer, now)
+
+        if not rows_fetched:
             return {"inserted_or_updated": 0, "rows_fetched": 0}
 
-        # Postgres upsert (batch to avoid max-parameter limits)
-        from sqlalchemy.dialects.postgresql import insert
-
-        total_affected = 0
-        batch_size = 300
-        now = _dt.utcnow()
-
-        for i in range(0, len(records), batch_size):
-            chunk = records[i:i + batch_size]
-            stmt = insert(AdPerformanceDaily).values(chunk)
-            update_cols = {
-                "spend": stmt.excluded.spend,
-                "impressions": stmt.excluded.impressions,
-                "clicks": stmt.excluded.clicks,
-                "reach": stmt.excluded.reach,
-                "conversions": stmt.excluded.conversions,
-                "purchases": stmt.excluded.purchases,
-                "purchase_value": stmt.excluded.purchase_value,
-                "metrics": stmt.excluded.metrics,
-                "updated_at": now,
-            }
-            stmt = stmt.on_conflict_do_update(
-                index_elements=["platform", "ad_account_id", "external_ad_id", "date"],
-                set_=update_cols,
-            )
-            res = db.execute(stmt)
-            total_affected += int(getattr(res, "rowcount", 0) or 0)
-
         db.commit()
-        return {"inserted_or_updated": total_affected, "rows_fetched": len(rows)}
+        return {"inserted_or_updated": total_affected, "rows_fetched": rows_fetched}
 
     # ============================================
     # AdGroup Update Methods (POST to TikTok API)
     # ============================================
     
+    @staticmethod
+    def _mutation_result(adgroup_id: str, outcome: Optional[Dict]) -> Optional[Dict]:
+        """ผลของ 1 field จาก AdgroupMutationQueue เป็น shape เดิมของ update_adgroup_*"""
+        if outcome is None:
+            return None
+        if outcome.get("error"):
+            return {"success": False, "message": outcome["error"], "adgroup_id": adgroup_id}
+        return {"success": True, "message": outcome.get("skipped") or "updated", "adgroup_id": adgroup_id}
+
     @classmethod
     def update_adgroup_status(
         cls,
@@ -1770,7 +2424,7 @@ class TikTokAdsService:
         status: str  # "ENABLE" or "DISABLE"
     ) -> Dict:
         """
-        อัปเดท status ของ AdGroup ผ่าน TikTok API
+        อัปเดท status ของ AdGroup ผ่าน TikTok API (คิวกลางของ AdgroupMutationQueue)
         
         Args:
             advertiser_id: TikTok advertiser ID
@@ -1778,68 +2432,30 @@ class TikTokAdsService:
             status: "ENABLE" or "DISABLE"
             
         Returns:
-            Dict with success status and message
+            Dict with success status, message และผลราย adgroup
         """
-        token = cls._get_access_token()
-        if not token:
-            return {"success": False, "message": "Missing access token"}
-        
-        url = f"{cls.BASE_URL}/adgroup/status/update/"
-        
-        # TikTok API limits to 20 adgroups per request
-        chunk_size = 20
+        from app.services.adgroup_mutation_queue import AdgroupMutationQueue
+
+        futures = [AdgroupMutationQueue.enqueue(advertiser_id, ag, status=status) for ag in adgroup_ids]
+        entries = [future.result() for future in futures]
+
         all_results = []
-        
-        with cls._get_client() as client:
-            for i in range(0, len(adgroup_ids), chunk_size):
-                chunk = adgroup_ids[i:i + chunk_size]
-                
-                payload = {
-                    "advertiser_id": advertiser_id,
-                    "adgroup_ids": chunk,
-                    "operation_status": status
-                }
-                
-                try:
-                    resp = client.post(
-                        url,
-                        headers={
-                            "Access-Token": token,
-                            "Content-Type": "application/json"
-                        },
-                        json=payload
-                    )
-                    
-                    data = resp.json()
-                    
-                    if resp.status_code == 200 and data.get("code") == 0:
-                        all_results.append({
-                            "success": True,
-                            "adgroup_ids": chunk,
-                            "status": status
-                        })
-                        print(f"[TikTokAdsService] Updated {len(chunk)} adgroups to {status}")
-                    else:
-                        all_results.append({
-                            "success": False,
-                            "adgroup_ids": chunk,
-                            "error": data.get("message", "Unknown error")
-                        })
-                        print(f"[TikTokAdsService] Failed to update adgroups: {data.get('message')}")
-                        
-                except Exception as e:
-                    all_results.append({
-                        "success": False,
-                        "adgroup_ids": chunk,
-                        "error": str(e)
-                    })
-                    print(f"[TikTokAdsService] Exception updating adgroups: {e}")
-        
-        # Check if all succeeded
-        all_success = all(r.get("success") for r in all_results)
+        for ag, entry in zip(adgroup_ids, entries):
+            outcome = entry.get("status") or {}
+            if outcome.get("error"):
+                all_results.append({"success": False, "adgroup_ids": [ag], "error": outcome["error"]})
+            else:
+                all_results.append({"success": True, "adgroup_ids": [ag], "status": status})
+
+        all_success = all(r["success"] for r in all_results)
+        failed = [r for r in all_results if not r["success"]]
         return {
             "success": all_success,
-            "message": f"Updated {len(adgroup_ids)} adgroups to {status}" if all_success else "Some updates failed",
+            "message": (
+                f"Updated {len(adgroup_ids)} adgroups to {status}"
+                if all_success
+                else failed[0]["error"] if len(failed) == 1 else "Some updates failed"
+            ),
             "results": all_results
         }
     
@@ -1851,7 +2467,7 @@ class TikTokAdsService:
         budget: float
     ) -> Dict:
         """
-        อัปเดท budget ของ AdGroup ผ่าน TikTok API
+        อัปเดท budget ของ AdGroup ผ่าน TikTok API (คิวกลางของ AdgroupMutationQueue)
         
         Args:
             advertiser_id: TikTok advertiser ID
@@ -1861,54 +2477,18 @@ class TikTokAdsService:
         Returns:
             Dict with success status and message
         """
-        token = cls._get_access_token()
-        if not token:
-            return {"success": False, "message": "Missing access token"}
-        
-        url = f"{cls.BASE_URL}/adgroup/update/"
-        
-        payload = {
-            "advertiser_id": advertiser_id,
+        from app.services.adgroup_mutation_queue import AdgroupMutationQueue
+
+        entry = AdgroupMutationQueue.submit(advertiser_id, adgroup_id, budget=budget)
+        outcome = entry.get("budget") or {}
+        if outcome.get("error"):
+            return {"success": False, "message": outcome["error"], "adgroup_id": adgroup_id}
+        return {
+            "success": True,
+            "message": f"Budget updated to {outcome.get('value', budget)}",
             "adgroup_id": adgroup_id,
-            "budget": budget
+            "new_budget": outcome.get("value", budget),
         }
-        
-        with cls._get_client() as client:
-            try:
-                resp = client.post(
-                    url,
-                    headers={
-                        "Access-Token": token,
-                        "Content-Type": "application/json"
-                    },
-                    json=payload
-                )
-                
-                data = resp.json()
-                
-                if resp.status_code == 200 and data.get("code") == 0:
-                    print(f"[TikTokAdsService] Updated adgroup {adgroup_id} budget to {budget}")
-                    return {
-                        "success": True,
-                        "message": f"Budget updated to {budget}",
-                        "adgroup_id": adgroup_id,
-                        "new_budget": budget
-                    }
-                else:
-                    print(f"[TikTokAdsService] Failed to update budget: {data.get('message')}")
-                    return {
-                        "success": False,
-                        "message": data.get("message", "Unknown error"),
-                        "adgroup_id": adgroup_id
-                    }
-                    
-            except Exception as e:
-                print(f"[TikTokAdsService] Exception updating budget: {e}")
-                return {
-                    "success": False,
-                    "message": str(e),
-                    "adgroup_id": adgroup_id
-                }
     
     @classmethod
     def update_adgroup_budget_and_status(
@@ -1916,10 +2496,12 @@ class TikTokAdsService:
         advertiser_id: str,
         adgroup_id: str,
         budget: Optional[float] = None,
-        status: Optional[str] = None  # "ENABLE" or "DISABLE"
+        status: Optional[str] = None,  # "ENABLE" or "DISABLE"
     ) -> Dict:
         """
-        อัปเดททั้ง budget และ status ของ AdGroup
+        อัปเดททั้ง budget และ status ของ AdGroup (คิวกลางของ AdgroupMutationQueue)
+
+        ค่าที่สั่งยิงเสมอ (ไม่ข้ามตาม ad_groups ที่อาจเก่า) และ ad_groups ถูกอัปเดตหลังสำเร็จ
         
         Args:
             advertiser_id: TikTok advertiser ID
@@ -1930,27 +2512,14 @@ class TikTokAdsService:
         Returns:
             Dict with success status and results
         """
-        results = {
-            "success": True,
-            "budget_result": None,
-            "status_result": None
+        from app.services.adgroup_mutation_queue import AdgroupMutationQueue
+
+        entry = AdgroupMutationQueue.submit(advertiser_id, adgroup_id, budget=budget, status=status)
+        return {
+            "success": entry.get("success", True),
+            "budget_result": cls._mutation_result(adgroup_id, entry.get("budget")),
+            "status_result": cls._mutation_result(adgroup_id, entry.get("status")),
         }
-        
-        # Update status first (if provided)
-        if status:
-            status_result = cls.update_adgroup_status(advertiser_id, [adgroup_id], status)
-            results["status_result"] = status_result
-            if not status_result.get("success"):
-                results["success"] = False
-        
-        # Update budget (if provided)
-        if budget is not None:
-            budget_result = cls.update_adgroup_budget(advertiser_id, adgroup_id, budget)
-            results["budget_result"] = budget_result
-            if not budget_result.get("success"):
-                results["success"] = False
-        
-        return results
 
     # ============================================
     # Ad Creation Methods (POST to TikTok API)
@@ -2031,12 +2600,41 @@ class TikTokAdsService:
                 }
     
     @classmethod
-    def get_identity_id(cls, advertiser_id: str, tiktok_item_id: str) -> Optional[str]:
+    def get_identity_id(
+        cls, advertiser_id: str, tiktok_item_id: str, db: Optional[Session] = None
+    ) -> Optional[str]:
         """
-        ดึง identity_id จาก TikTok สำหรับ Spark Ads
+        ดึง identity_id (TT_USER) สำหรับ Spark Ads
         
         Spark Ads ต้องการ identity_id เพื่อระบุตัวตนของ content creator
+        อ่านจาก tiktok_item_identities ก่อน, miss → /identity/get/ แล้วเก็บไว้
         """
+        from app.services.identity_cache_service import IdentityCacheService
+
+        identity_id, _ = IdentityCacheService.get_or_fetch(
+            advertiser_id, tiktok_item_id, cls._fetch_tt_user_identity, identity_type="TT_USER", db=db
+        )
+        return identity_id
+
+    @classmethod
+    def get_identity(
+        cls, advertiser_id: str, tiktok_item_id: str, db: Optional[Session] = None
+    ) -> Tuple[Optional[str], str]:
+        """
+        (identity_id, identity_type) สำหรับสร้าง Spark Ad ของ item นี้
+
+        - item ที่ authorize ไว้กับ advertiser (เจอใน spark-post sync) → AUTH_CODE identity จาก cache
+        - ไม่งั้น → TT_USER identity ของ advertiser (cache หรือ /identity/get/)
+        """
+        from app.services.identity_cache_service import IdentityCacheService
+
+        return IdentityCacheService.get_or_fetch(
+            advertiser_id, tiktok_item_id, cls._fetch_tt_user_identity, db=db
+        )
+
+    @classmethod
+    def _fetch_tt_user_identity(cls, advertiser_id: str) -> Optional[str]:
+        """TT_USER identity แรกของ advertiser จาก /identity/get/ (live call)"""
         token = cls._get_access_token()
         if not token:
             return None
@@ -2320,8 +2918,23 @@ class TikTokAdsService:
     # Spark Ad Posts (for expire date tracking)
     # ============================================
     
+    @staticmethod
+    def _spark_post_from_item(item: Dict) -> Dict:
+        """แปลง 1 item ของ /tt_video/list/ เป็น dict ที่ใช้ในระบบ"""
+        item_info = item.get("item_info", {})
+        auth_info = item.get("auth_info", {})
+        user_info = item.get("user_info", {})
+        return {
+            "item_id": item_info.get("item_id"),
+            "identity_id": user_info.get("identity_id"),
+            "auth_code": item_info.get("auth_code"),
+            "auth_start_time": auth_info.get("auth_start_time"),
+            "auth_end_time": auth_info.get("auth_end_time"),
+            "ad_auth_status": auth_info.get("ad_auth_status"),
+        }
+
     @classmethod
-    def fetch_spark_ad_posts(cls, advertiser_id: str) -> List[Dict]:
+    def fetch_spark_ad_posts(cls, advertiser_id: str, raise_on_error: bool = True) -> List[Dict]:
         """
         ดึงรายการ Spark Ad Posts (authorized content) จาก TikTok
         
@@ -2331,72 +2944,24 @@ class TikTokAdsService:
         - ad_auth_status: สถานะ authorization
         
         สำหรับ Influencer content ที่ถูก authorize ให้ใช้เป็น Spark Ads
+        หน้าที่ 2+ ดึงพร้อมกัน (_iter_pages); raise_on_error=True → ได้ครบทุกหน้าหรือ raise
         """
         token = cls._get_access_token()
         if not token:
+            if raise_on_error:
+                raise RuntimeError("Missing access token")
             print("[TikTokAdsService] Missing access token, skip fetch_spark_ad_posts")
             return []
         
         all_posts: List[Dict] = []
-        page = 1
-        
-        with cls._get_client() as client:
-            while True:
-                url = f"{cls.BASE_URL.replace('/open_api/v1.3', '/open_api/v1.3')}/tt_video/list/"
-                
-                params = {
-                    "advertiser_id": advertiser_id,
-                    "page_size": 50,
-                    "page": page,
-                }
-                
-                try:
-                    resp = client.get(
-                        url,
-                        headers={"Access-Token": token},
-                        params=params,
-                    )
-                    
-                    if resp.status_code != 200:
-                        print(f"[TikTokAdsService] fetch_spark_ad_posts error {resp.status_code}: {resp.text}")
-                        break
-                    
-                    data = resp.json()
-                    
-                    if data.get("code") != 0:
-                        print(f"[TikTokAdsService] fetch_spark_ad_posts API error: {data.get('message')}")
-                        break
-                    
-                    items = data.get("data", {}).get("list", [])
-                    
-                    if not items:
-                        break
-                    
-                    for item in items:
-                        # Extract relevant fields
-                        item_info = item.get("item_info", {})
-                        auth_info = item.get("auth_info", {})
-                        user_info = item.get("user_info", {})
-                        
-                        post_data = {
-                            "item_id": item_info.get("item_id"),
-                            "identity_id": user_info.get("identity_id"),
-                            "auth_code": item_info.get("auth_code"),
-                            "auth_start_time": auth_info.get("auth_start_time"),
-                            "auth_end_time": auth_info.get("auth_end_time"),
-                            "ad_auth_status": auth_info.get("ad_auth_status"),
-                        }
-                        all_posts.append(post_data)
-                    
-                    # Check if more pages
-                    if len(items) < 50:
-                        break
-                    
-                    page += 1
-                    
-                except Exception as e:
-                    print(f"[TikTokAdsService] fetch_spark_ad_posts exception: {e}")
-                    break
+        for rows in cls._iter_pages(
+            "/tt_video/list/",
+            token,
+            {"advertiser_id": advertiser_id, "page_size": 50},
+            label=f"fetch_spark_ad_posts advertiser={advertiser_id}",
+            raise_on_error=raise_on_error,
+        ):
+            all_posts.extend(cls._spark_post_from_item(item) for item in rows)
         
         print(f"[TikTokAdsService] Fetched {len(all_posts)} spark ad posts from {advertiser_id}")
         return all_posts
@@ -2404,47 +2969,31 @@ class TikTokAdsService:
     @classmethod
     def fetch_all_spark_ad_posts(cls) -> Dict[str, Dict]:
         """
-        ดึง Spark Ad Posts จากทุก ad account
+        Spark Ad Posts จากทุก ad account (ผ่าน local index tiktok_spark_posts)
+        
+        refresh เฉพาะ account ที่ข้อมูลเก่า (พร้อมกันหลาย account) แล้วอ่านจากตาราง
         
         Returns:
             Dict[item_id, {auth_end_time, ad_auth_status, ...}]
         """
         from app.core.database import SessionLocal
+        from app.services.spark_post_index_service import SparkPostIndexService
         
-        db = SessionLocal()
-        all_posts_map: Dict[str, Dict] = {}
+        SparkPostIndexService.refresh_all()
         
+        db = SessionLocal()
         try:
-            accounts = (
-                db.query(AdAccount)
-                .filter(
-                    AdAccount.platform == PlatformEnum.TIKTOK,
-                    AdAccount.status == AdAccountStatus.ACTIVE,
-                )
-                .all()
-            )
-            
-            for account in accounts:
-                print(f"[TikTokAdsService] Fetching spark ad posts from {account.name}...")
-                posts = cls.fetch_spark_ad_posts(account.external_account_id)
-                
-                for post in posts:
-                    item_id = post.get("item_id")
-                    if item_id:
-                        # Store/update with latest auth_end_time
-                        all_posts_map[item_id] = post
-            
-            print(f"[TikTokAdsService] Total spark ad posts: {len(all_posts_map)}")
-            
+            all_posts_map = SparkPostIndexService.get_posts_map(db)
         finally:
             db.close()
         
+        print(f"[TikTokAdsService] Total spark ad posts: {len(all_posts_map)}")
         return all_posts_map
 
     @classmethod
     def _create_spark_ad(
         cls,
-        client: httpx.Client,
+        client: TikTokApiClient,
         token: str,
         advertiser_id: str,
         adgroup_id: str,
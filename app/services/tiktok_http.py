@@ -0,0 +1,170 @@
+"""
+TikTok HTTP Client Registry - shared keep-alive httpx clients
+
+ทุก service ที่ยิง TikTok API (TikTokAdsService, TikTokTargetingService,
+TikTokService, SparkAuthService) ใช้ client ชุดเดียวกันทั้ง process
+แทนการเปิด `httpx.Client` ใหม่ทุกครั้ง (ซึ่งต้อง TLS handshake ใหม่ทุก call)
+
+- 1 client ต่อ host → per-host connection cap ผ่าน httpx.Limits
+- keep-alive pool + HTTP/2 (ถ้าติดตั้ง `h2`; ไม่มีจะ fallback เป็น HTTP/1.1)
+- เก็บสถิติ connection reuse ผ่าน httpcore trace extension
+- ปิดทั้งหมดตอน shutdown (FastAPI lifespan / stop_scheduler)
+"""
+import threading
+from contextlib import nullcontext
+from typing import ContextManager, Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+
+    _H2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    _H2_AVAILABLE = False
+
+
+class _HostStats:
+    """Counters ของ host เดียว (อัปเดตจากหลาย thread)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.http2_responses = 0
+        self.errors = 0
+
+    def as_dict(self) -> Dict:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            "http2_responses": self.http2_responses,
+            "errors": self.errors,
+        }
+
+
+class TikTokHttpClientRegistry:
+    """Process-wide registry ของ httpx.Client (1 ตัวต่อ host)"""
+
+    _clients: Dict[str, httpx.Client] = {}
+    _stats: Dict[str, _HostStats] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _host_of(url: str) -> str:
+        parts = urlsplit(url)
+        return parts.netloc or url
+
+    @classmethod
+    def _limits_for(cls, host: str) -> httpx.Limits:
+        per_host = settings.TIKTOK_HTTP_HOST_LIMITS.get(
+            host, settings.TIKTOK_HTTP_MAX_CONNECTIONS_PER_HOST
+        )
+        return httpx.Limits(
+            max_connections=per_host,
+            max_keepalive_connections=min(
+                settings.TIKTOK_HTTP_MAX_KEEPALIVE_CONNECTIONS, per_host
+            ),
+            keepalive_expiry=settings.TIKTOK_HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    @classmethod
+    def _build_client(cls, host: str) -> httpx.Client:
+        stats = cls._stats.setdefault(host, _HostStats())
+        lock = cls._lock
+
+        def on_request(request: httpx.Request):
+            upstream_trace = request.extensions.get("trace")
+
+            def trace(event_name: str, info: Dict):
+                # connect_tcp.complete = เปิด connection ใหม่ (ไม่ได้ reuse จาก pool)
+                if event_name == "connection.connect_tcp.complete":
+                    with lock:
+                        stats.connections_opened += 1
+                if upstream_trace is not None:
+                    upstream_trace(event_name, info)
+
+            request.extensions["trace"] = trace
+            with lock:
+                stats.requests += 1
+
+        def on_response(response: httpx.Response):
+            if response.http_version == "HTTP/2":
+                with lock:
+                    stats.http2_responses += 1
+            if response.status_code >= 500:
+                with lock:
+                    stats.errors += 1
+
+        return httpx.Client(
+            timeout=settings.TIKTOK_HTTP_TIMEOUT,
+            limits=cls._limits_for(host),
+            http2=settings.TIKTOK_HTTP2_ENABLED and _H2_AVAILABLE,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    @classmethod
+    def get_client(cls, url: str) -> httpx.Client:
+        """คืน shared client ของ host ใน url (สร้างครั้งแรกแบบ lazy)"""
+        host = cls._host_of(url)
+        client = cls._clients.get(host)
+        if client is not None and not client.is_closed:
+            return client
+
+        with cls._lock:
+            client = cls._clients.get(host)
+            if client is None or client.is_closed:
+                client = cls._build_client(host)
+                cls._clients[host] = client
+            return client
+
+    @classmethod
+    def client_context(cls, url: str) -> ContextManager[httpx.Client]:
+        """
+        ใช้แทน `with httpx.Client(...) as client:` เดิม
+
+        คืน context manager ที่ *ไม่* ปิด client ตอนออกจาก block
+        เพื่อให้ connection กลับเข้า pool ใช้ต่อได้
+        """
+        return nullcontext(cls.get_client(url))
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """สถิติการใช้ connection แยกตาม host + รวมทั้งหมด"""
+        with cls._lock:
+            hosts = {host: s.as_dict() for host, s in cls._stats.items()}
+
+        total_requests = sum(h["requests"] for h in hosts.values())
+        total_opened = sum(h["connections_opened"] for h in hosts.values())
+        total_reused = max(total_requests - total_opened, 0)
+        return {
+            "http2_available": _H2_AVAILABLE,
+            "http2_enabled": settings.TIKTOK_HTTP2_ENABLED and _H2_AVAILABLE,
+            "open_clients": sum(1 for c in cls._clients.values() if not c.is_closed),
+            "requests": total_requests,
+            "connections_opened": total_opened,
+            "connections_reused": total_reused,
+            "reuse_ratio": round(total_reused / total_requests, 4) if total_requests else 0.0,
+            "hosts": hosts,
+        }
+
+    @classmethod
+    def close_all(cls, reset_stats: bool = False) -> None:
+        """ปิดทุก client (เรียกตอน shutdown) - เรียกซ้ำได้"""
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients = {}
+            if reset_stats:
+                cls._stats = {}
+
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                print(f"[TikTokHttpClientRegistry] Error closing client: {e}")
+
@@ -0,0 +1,344 @@
+"""
+TikTok Report Task Service - backfill `ad_performance_daily` ช่วงยาว ๆ ผ่าน async report task
+
+ใช้แทน `sync_tiktok_ad_performance_daily(chunk_days=2)` ตอน backfill ประวัติย้อนหลัง
+(ทีละ 2 วันต่อรอบ scheduler → ปีนึงใช้เวลาเป็นเดือน)
+
+Flow ต่อ window (ไม่เกิน TIKTOK_REPORT_TASK_MAX_DAYS วัน):
+1) POST /report/task/create/      → task_id
+2) GET  /report/task/check/       → poll จน status = SUCCESS (FAILED / timeout = raise)
+3) GET  /report/task/download/    → CSV (หรือ JSON ที่มี download_url → ตามไปโหลด)
+4) stream-parse CSV ทีละบรรทัด → upsert เข้า ad_performance_daily ทีละ batch
+5) เลื่อน tiktok_daily_cursor ไปท้าย window ใน transaction เดียวกับข้อมูล (commit ครั้งเดียว)
+
+ล้มกลางทาง = rollback ทั้ง window, cursor ไม่ขยับ
+"""
+import csv
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import AdAccount
+from app.models.enums import AdAccountStatus
+from app.models.enums import Platform as PlatformEnum
+from app.services.tiktok_ads_service import TikTokAdsService
+from app.services.tiktok_http import TikTokHttpClientRegistry
+
+
+# header ใน CSV → key ที่ _daily_report_row_to_record ใช้
+_DIMENSION_KEYS = {"ad_id", "stat_time_day"}
+_HEADER_ALIASES = {
+    "ad id": "ad_id",
+    "date": "stat_time_day",
+    "by day": "stat_time_day",
+    "stat time day": "stat_time_day",
+    "cost": "spend",
+    "conversions": "conversion",
+}
+
+
+class ReportTaskError(RuntimeError):
+    """Report task ล้ม / timeout (cursor ต้องไม่ขยับ)"""
+
+
+class TikTokReportTaskService:
+    """Backfill daily ad performance ผ่าน TikTok async report task"""
+
+    BASE_URL = settings.TIKTOK_API_BASE_URL
+    UPSERT_BATCH_SIZE = 300
+
+    # ============================================
+    # Report task API
+    # ============================================
+
+    @staticmethod
+    def _raise_on_error(resp, label: str) -> Dict:
+        if resp.status_code != 200:
+            raise ReportTaskError(f"{label}: HTTP {resp.status_code} {resp.text[:200]}")
+        data = resp.json()
+        if data.get("code") != 0:
+            raise ReportTaskError(f"{label}: {data.get('message')} (code={data.get('code')})")
+        return data.get("data") or {}
+
+    @classmethod
+    def create_task(
+        cls,
+        advertiser_id: str,
+        start_date: str,
+        end_date: str,
+        metrics: Optional[List[str]] = None,
+    ) -> str:
+        """สร้าง async report task (params เดียวกับ iter_ad_daily_report) คืน task_id"""
+        token = TikTokAdsService._get_access_token()
+        if not token:
+            raise ReportTaskError("Missing access token")
+
+        if metrics is None:
+            metrics = ["spend", "impressions", "clicks", "reach", "conversion"]
+
+        body = {
+            "advertiser_id": advertiser_id,
+            "report_type": "BASIC",
+            "data_level": "AUCTION_AD",
+            "dimensions": ["ad_id", "stat_time_day"],
+            "metrics": metrics,
+            "start_date": start_date,
+            "end_date": end_date,
+            "output_format": "CSV",
+        }
+        with TikTokAdsService._get_client() as client:
+            resp = client.post(
+                f"{cls.BASE_URL}/report/task/create/",
+                json=body,
+                headers={"Access-Token": token, "Content-Type": "application/json"},
+            )
+        data = cls._raise_on_error(resp, f"create_task advertiser={advertiser_id}")
+        task_id = data.get("task_id")
+        if not task_id:
+            raise ReportTaskError(f"create_task advertiser={advertiser_id}: no task_id in response")
+        return str(task_id)
+
+    @classmethod
+    def wait_for_task(
+        cls,
+        advertiser_id: str,
+        task_id: str,
+        poll_seconds: Optional[float] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> None:
+        """poll /report/task/check/ จน SUCCESS (FAILED / CANCELED / timeout → ReportTaskError)"""
+        token = TikTokAdsService._get_access_token()
+        poll = poll_seconds if poll_seconds is not None else settings.TIKTOK_REPORT_TASK_POLL_SECONDS
+        timeout = timeout_seconds if timeout_seconds is not None else settings.TIKTOK_REPORT_TASK_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with TikTokAdsService._get_client() as client:
+                resp = client.get(
+                    f"{cls.BASE_URL}/report/task/check/",
+                    params={"advertiser_id": advertiser_id, "task_id": task_id},
+                    headers={"Access-Token": token},
+                )
+            data = cls._raise_on_error(resp, f"check_task {task_id}")
+            status = str(data.get("status") or "").upper()
+            if status == "SUCCESS":
+                return
+            if status in {"FAILED", "CANCELED", "CANCELLED"}:
+                raise ReportTaskError(f"Report task {task_id} {status}: {data.get('message') or ''}")
+
+            if time.monotonic() >= deadline:
+                raise ReportTaskError(f"Report task {task_id} timed out after {timeout:.0f}s (status={status})")
+            time.sleep(poll)
+
+    @staticmethod
+    def _normalize_header(name: str) -> str:
+        key = (name or "").strip().lstrip("\ufeff").lower()
+        if key in _HEADER_ALIASES:
+            return _HEADER_ALIASES[key]
+        key = key.replace(" ", "_")
+        return _HEADER_ALIASES.get(key, key)
+
+    @classmethod
+    def _iter_csv_lines(cls, url: str, params: Optional[Dict], headers: Dict) -> Iterator[Dict]:
+        """stream GET url แล้ว parse CSV ทีละบรรทัด (ไม่โหลดทั้งไฟล์เข้า memory)"""
+        client = TikTokHttpClientRegistry.get_client(url)
+        download_url = None
+        with client.stream("GET", url, params=params, headers=headers) as resp:
+            if resp.status_code != 200:
+                resp.read()
+                raise ReportTaskError(f"download: HTTP {resp.status_code} {resp.text[:200]}")
+
+            content_type = resp.headers.get("content-type", "")
+            if "json" in content_type:
+                # บาง account ได้ JSON กลับมาพร้อม download_url แทนตัวไฟล์
+                resp.read()
+                data = resp.json()
+                if data.get("code") not in (None, 0):
+                    raise ReportTaskError(f"download: {data.get('message')} (code={data.get('code')})")
+                download_url = (data.get("data") or {}).get("download_url")
+                if not download_url:
+                    raise ReportTaskError("download: no file and no download_url in response")
+            else:
+                reader = csv.reader(resp.iter_lines())
+                header = next(reader, None)
+                keys = [cls._normalize_header(h) for h in header or []]
+                for values in reader:
+                    if values:
+                        yield dict(zip(keys, values))
+
+        if download_url:
+            yield from cls._iter_csv_lines(download_url, None, {})
+
+    @classmethod
+    def iter_task_rows(cls, advertiser_id: str, task_id: str) -> Iterator[Dict]:
+        """
+        ดาวน์โหลดผล task แล้ว yield ทีละแถวในรูปเดียวกับ report API
+        ({"dimensions": {...}, "metrics": {...}}) เพื่อใช้ _daily_report_row_to_record ได้ตรง ๆ
+        """
+        token = TikTokAdsService._get_access_token()
+        for row in cls._iter_csv_lines(
+            f"{cls.BASE_URL}/report/task/download/",
+            {"advertiser_id": advertiser_id, "task_id": task_id},
+            {"Access-Token": token},
+        ):
+            dims = {k: v for k, v in row.items() if k in _DIMENSION_KEYS}
+            mets = {k: v for k, v in row.items() if k not in _DIMENSION_KEYS and v not in (None, "", "-")}
+            yield {"dimensions": dims, "metrics": mets}
+
+    # ============================================
+    # Backfill
+    # ============================================
+
+    @classmethod
+    def backfill_window(
+        cls,
+        db: Session,
+        ad_account: AdAccount,
+        start: date,
+        end: date,
+    ) -> Dict:
+        """
+        1 window: create → poll → download → upsert + เลื่อน cursor (commit ครั้งเดียว)
+        session ถูก commit ก่อน create/poll (ไม่ถือ transaction ค้างระหว่างรอ task)
+        error ใด ๆ → rollback แล้ว raise (cursor ไม่ขยับ)
+        """
+        advertiser_id = ad_account.external_account_id
+        account_id, account_name = ad_account.id, ad_account.name
+        start_str, end_str = start.isoformat(), end.isoformat()
+        started = time.monotonic()
+
+        # ปิด transaction ก่อนรอ task (poll ได้ถึง TIKTOK_REPORT_TASK_TIMEOUT_SECONDS)
+        # ไม่ถือ connection / transaction ค้างไว้ระหว่างรอ - transaction ใหม่เริ่มตอนเขียนข้อมูล
+        db.commit()
+
+        task_id = cls.create_task(advertiser_id, start_str, end_str)
+        print(f"[TikTokReportTaskService] {account_name}: task {task_id} {start_str} -> {end_str}")
+        cls.wait_for_task(advertiser_id, task_id)
+
+        now = datetime.utcnow()
+        rows_fetched = 0
+        upserted = 0
+        buffer: List[Dict] = []
+        try:
+            for r in cls.iter_task_rows(advertiser_id, task_id):
+                rows_fetched += 1
+                record = TikTokAdsService._daily_report_row_to_record(account_id, r)
+                if record:
+                    buffer.append(record)
+                if len(buffer) >= cls.UPSERT_BATCH_SIZE:
+                    upserted += TikTokAdsService._upsert_daily_records(db, buffer, now)
+                    buffer = []
+            if buffer:
+                upserted += TikTokAdsService._upsert_daily_records(db, buffer, now)
+
+            cfg = ad_account.config if isinstance(ad_account.config, dict) else {}
+            patch = {"tiktok_daily_cursor": end_str}
+            if not cfg.get("tiktok_daily_cursor"):
+                # วันแรกที่ ledger มีข้อมูล (ใช้ตัดสินว่า SpendLedgerService ใช้ ledger ได้หรือยัง)
+                patch["tiktok_daily_start"] = start_str
+            TikTokAdsService.update_account_config(db, ad_account, patch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        elapsed = time.monotonic() - started
+        print(
+            f"[TikTokReportTaskService] {account_name}: {rows_fetched} rows, "
+            f"{upserted} upserted, cursor -> {end_str} ({elapsed:.1f}s)"
+        )
+        return {
+            "task_id": task_id,
+            "start_date": start_str,
+            "end_date": end_str,
+            "rows_fetched": rows_fetched,
+            "rows_upserted": upserted,
+        }
+
+    @classmethod
+    def backfill_account(
+        cls,
+        db: Session,
+        ad_account: AdAccount,
+        default_start_days: int = 365,
+        max_windows: int = 0,
+    ) -> Dict:
+        """
+        backfill ตั้งแต่ cursor+1 (หรือ start_date) ถึงเมื่อวาน ทีละ window
+        window ที่ล้มจะหยุด account นี้ทันที (window ก่อนหน้าที่ commit แล้วยังอยู่)
+        """
+        today = date.today()
+        max_end = today - timedelta(days=1)
+        window_days = max(1, int(settings.TIKTOK_REPORT_TASK_MAX_DAYS))
+
+        windows: List[Dict] = []
+        while not max_windows or len(windows) < max_windows:
+            cfg = ad_account.config if isinstance(ad_account.config, dict) else {}
+            cursor = str(cfg.get("tiktok_daily_cursor") or "")
+            if cursor:
+                start = date.fromisoformat(cursor) + timedelta(days=1)
+            else:
+                start = ad_account.start_date or (today - timedelta(days=default_start_days))
+            if start > max_end:
+                break
+
+            end = min(start + timedelta(days=window_days - 1), max_end)
+            windows.append(cls.backfill_window(db, ad_account, start, end))
+
+        return {
+            "windows": len(windows),
+            "rows_fetched": sum(w["rows_fetched"] for w in windows),
+            "rows_upserted": sum(w["rows_upserted"] for w in windows),
+            "cursor": (ad_account.config or {}).get("tiktok_daily_cursor"),
+        }
+
+    @classmethod
+    def backfill_all(cls, default_start_days: int = 365, max_accounts: int = 0) -> Dict:
+        """backfill ทุก TikTok account ที่ active (ทีละ account, error ของ account หนึ่งไม่หยุด account อื่น)"""
+        default_start_days = max(1, min(3650, int(default_start_days or 365)))
+
+        db = SessionLocal()
+        try:
+            accounts = (
+                db.query(AdAccount)
+                .filter(
+                    AdAccount.platform == PlatformEnum.TIKTOK,
+                    AdAccount.status == AdAccountStatus.ACTIVE,
+                )
+                .order_by(AdAccount.id.asc())
+                .all()
+            )
+            if max_accounts and max_accounts > 0:
+                accounts = accounts[:max_accounts]
+
+            processed = 0
+            windows = 0
+            rows_fetched = 0
+            rows_upserted = 0
+            errors = []
+            for acc in accounts:
+                try:
+                    r = cls.backfill_account(db, acc, default_start_days=default_start_days)
+                except Exception as e:
+                    print(f"[TikTokReportTaskService] Error {acc.name} ({acc.external_account_id}): {e}")
+                    errors.append({"ad_account_id": acc.id, "name": acc.name, "error": str(e)})
+                    continue
+                processed += 1
+                windows += r["windows"]
+                rows_fetched += r["rows_fetched"]
+                rows_upserted += r["rows_upserted"]
+
+            return {
+                "accounts_total": len(accounts),
+                "accounts_processed": processed,
+                "windows": windows,
+                "rows_fetched": rows_fetched,
+                "rows_upserted": rows_upserted,
+                "errors": errors,
+            }
+        finally:
+            db.close()
@@ -0,0 +1,283 @@
+"""
+TikTok Request Executor - rate limit + retry กลางสำหรับ TikTok Business API
+
+ใช้ร่วมกันโดย TikTokAdsService, TikTokTargetingService และ SparkAuthService
+(ผ่าน `_get_client()` ของแต่ละ service) แทนการยิง httpx ตรง ๆ
+
+- Token bucket แยกต่อ advertiser_id (อ่านจาก params / json body อัตโนมัติ)
+- Global in-flight cap (จำนวน request ที่กำลังวิ่งพร้อมกันทั้ง process)
+- Exponential backoff + jitter เมื่อเจอ HTTP 429 / 5xx หรือ TikTok throttle code
+- Request ที่โดน throttle จะรอคิวแล้วยิงใหม่ ไม่ถูกทิ้ง
+
+POST ที่สร้าง/แก้ไข resource จะ retry เฉพาะกรณีที่ TikTok ปฏิเสธก่อนประมวลผล
+(429 / rate-limit code 40100 / connect error) เพื่อไม่ให้สร้างซ้ำ
+5xx / 50002 (busy / timeout - TikTok อาจทำไปแล้ว) retry เฉพาะ request ที่ idempotent
+(GET หรือส่ง idempotent=True มาเอง)
+"""
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.services.tiktok_http import TikTokHttpClientRegistry
+
+
+# TikTok Business API response codes ที่หมายถึง "ยิงถี่เกิน" (ถูกปฏิเสธก่อนประมวลผล → retry ได้ทุก method)
+RATE_LIMIT_CODES = {
+    40100,  # Too many requests (QPS limit)
+}
+
+# "ระบบไม่ว่าง / timeout" - request อาจถูกประมวลผลไปแล้ว → retry เฉพาะ request ที่ idempotent
+BUSY_CODES = {
+    50002,  # Service busy / timeout, retry later
+}
+
+THROTTLE_CODES = RATE_LIMIT_CODES | BUSY_CODES
+
+# Transport errors ที่ request ยังไม่ถึง server → retry ได้ทุก method
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class _TokenBucket:
+    """
+    Token bucket แบบจองคิว: ผู้เรียกจองโทเคนทันที (ติดลบได้)
+    แล้ว sleep จนถึงคิวของตัวเอง → throttle = รอ ไม่ใช่ drop
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """จอง 1 token แล้วรอจนได้ใช้ คืนเวลาที่รอ (วินาที)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        """โดน throttle → ดึง token ออกเพื่อชะลอ request ถัดไปของ advertiser นี้"""
+        with self.lock:
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class TikTokRequestExecutor:
+    """Process-wide executor (state เป็น class-level เหมือน TikTokHttpClientRegistry)"""
+
+    _buckets: Dict[str, _TokenBucket] = {}
+    _lock = threading.Lock()
+    _inflight: Optional[threading.BoundedSemaphore] = None
+    _stats = {
+        "requests": 0,
+        "retries": 0,
+        "throttled": 0,
+        "server_errors": 0,
+        "gave_up": 0,
+        "queued_seconds": 0.0,
+    }
+
+    # ============================================
+    # Internals
+    # ============================================
+
+    @classmethod
+    def _get_inflight(cls) -> threading.BoundedSemaphore:
+        if cls._inflight is None:
+            with cls._lock:
+                if cls._inflight is None:
+                    cls._inflight = threading.BoundedSemaphore(
+                        max(settings.TIKTOK_MAX_INFLIGHT_REQUESTS, 1)
+                    )
+        return cls._inflight
+
+    @classmethod
+    def _bucket_for(cls, key: str) -> _TokenBucket:
+        bucket = cls._buckets.get(key)
+        if bucket is None:
+            with cls._lock:
+                bucket = cls._buckets.get(key)
+                if bucket is None:
+                    bucket = _TokenBucket(
+                        rate=settings.TIKTOK_RATE_LIMIT_QPS,
+                        capacity=settings.TIKTOK_RATE_LIMIT_BURST,
+                    )
+                    cls._buckets[key] = bucket
+        return bucket
+
+    @classmethod
+    def _count(cls, key: str, value=1) -> None:
+        with cls._lock:
+            cls._stats[key] += value
+
+    @staticmethod
+    def _advertiser_of(params: Optional[Dict], json_body) -> str:
+        for source in (params, json_body):
+            if isinstance(source, dict) and source.get("advertiser_id"):
+                return str(source["advertiser_id"])
+        return "_global"
+
+    @staticmethod
+    def _throttle_code(resp: httpx.Response) -> Optional[int]:
+        """คืน TikTok code ถ้าเป็น throttle code (response 200 แต่ body บอกให้ช้าลง)"""
+        if resp.status_code != 200:
+            return None
+        try:
+            data = resp.json()
+        except Exception:
+            return None
+        code = data.get("code") if isinstance(data, dict) else None
+        return code if code in THROTTLE_CODES else None
+
+    @staticmethod
+    def _backoff_seconds(attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        """Exponential backoff + jitter (เคารพ Retry-After ถ้ามี)"""
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), settings.TIKTOK_RETRY_MAX_DELAY)
+                except ValueError:
+                    pass
+        cap = min(
+            settings.TIKTOK_RETRY_BASE_DELAY * (2 ** attempt),
+            settings.TIKTOK_RETRY_MAX_DELAY,
+        )
+        return random.uniform(cap / 2, cap)
+
+    # ============================================
+    # Public API
+    # ============================================
+
+    @classmethod
+    def request(
+        cls,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict] = None,
+        json=None,
+        advertiser_id: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        ยิง request ผ่าน shared client พร้อม rate limit + retry
+
+        คืน response สุดท้ายเสมอ (caller ตรวจ status_code / code เองเหมือนเดิม)
+        transport error ที่ retry จนหมดแล้วจะ raise ออกไป
+
+        idempotent: None = ตาม method (GET/HEAD/OPTIONS เท่านั้น)
+        False → ไม่ retry 5xx / 50002 / read timeout (retry แค่ 429 / 40100 / connect error)
+        """
+        method = method.upper()
+        key = advertiser_id or cls._advertiser_of(params, json)
+        bucket = cls._bucket_for(key)
+        inflight = cls._get_inflight()
+        client = TikTokHttpClientRegistry.get_client(url)
+        retries = settings.TIKTOK_RETRY_MAX_ATTEMPTS if max_retries is None else max_retries
+        if idempotent is None:
+            idempotent = method in {"GET", "HEAD", "OPTIONS"}
+
+        attempt = 0
+        while True:
+            cls._count("queued_seconds", bucket.acquire())
+            cls._count("requests")
+
+            resp: Optional[httpx.Response] = None
+            error: Optional[Exception] = None
+            throttled = False
+            with inflight:
+                try:
+                    resp = client.request(method, url, params=params, json=json, **kwargs)
+                except httpx.TransportError as e:
+                    error = e
+
+            if error is not None:
+                retryable = idempotent or isinstance(error, _CONNECT_ERRORS)
+                reason = f"{type(error).__name__}: {error}"
+            elif resp.status_code == 429 or cls._throttle_code(resp) in RATE_LIMIT_CODES:
+                cls._count("throttled")
+                throttled = retryable = True
+                reason = f"throttled (HTTP {resp.status_code}, code={cls._throttle_code(resp)})"
+            elif cls._throttle_code(resp) in BUSY_CODES:
+                cls._count("throttled")
+                throttled = retryable = idempotent
+                reason = f"busy (code={cls._throttle_code(resp)})"
+            elif resp.status_code >= 500:
+                cls._count("server_errors")
+                retryable = idempotent
+                reason = f"HTTP {resp.status_code}"
+            else:
+                return resp
+
+            if not retryable or attempt >= retries:
+                if attempt >= retries:
+                    cls._count("gave_up")
+                    print(
+                        f"[TikTokRequestExecutor] Giving up {method} {url} "
+                        f"advertiser={key} after {attempt + 1} attempts - {reason}"
+                    )
+                if error is not None:
+                    raise error
+                return resp
+
+            delay = cls._backoff_seconds(attempt, resp)
+            if throttled:
+                bucket.penalize(delay)
+            print(
+                f"[TikTokRequestExecutor] {reason} on {method} {url} advertiser={key}, "
+                f"retry {attempt + 1}/{retries} in {delay:.1f}s"
+            )
+            cls._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    @classmethod
+    def client_context(cls) -> ContextManager["TikTokApiClient"]:
+        """
+        ใช้แทน `TikTokHttpClientRegistry.client_context()` ใน `_get_client()` ของ service
+
+        client ที่ได้มี `.get()` / `.post()` หน้าตาเหมือน httpx.Client
+        แต่ทุก request วิ่งผ่าน executor
+        """
+        return nullcontext(TikTokApiClient())
+
+    @classmethod
+    def stats(cls) -> Dict:
+        with cls._lock:
+            stats = dict(cls._stats)
+            advertisers = len(cls._buckets)
+        stats["queued_seconds"] = round(stats["queued_seconds"], 2)
+        stats["advertiser_buckets"] = advertisers
+        stats["max_inflight"] = settings.TIKTOK_MAX_INFLIGHT_REQUESTS
+        stats["qps_per_advertiser"] = settings.TIKTOK_RATE_LIMIT_QPS
+        return stats
+
+
+class TikTokApiClient:
+    """httpx.Client-like facade ที่ส่งทุก request ผ่าน TikTokRequestExecutor"""
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return TikTokRequestExecutor.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
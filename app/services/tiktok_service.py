@@ -3,21 +3,30 @@ TikTok Service - Sync content from TikTok Business API
 """
 import re
 import json
+import threading
+import time
 import httpx
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 from decimal import Decimal
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import ColumnElement, case, cast, func, or_, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models import Content, TaskLog, TaskStatus
+from app.models.content import CONTENT_VERSION_NEXT
 from app.models.system import AppSetting
 from app.models.enums import Platform, ContentStatus, ContentType, ContentSource
+from app.services.item_detail_cache_service import ItemDetailCacheService
+from app.services.item_detail_fetcher import ItemDetailFetcher
+from app.services.pfm_score_engine import PFM_TIERS, PFM_WEIGHTS, PFMScoreEngine
+from app.services.prefetch import prefetch
 from app.services.thumbnail_service import download_thumbnail_async
+from app.services.tiktok_http import TikTokHttpClientRegistry
 
 
 class TikTokService:
@@ -44,10 +53,54 @@ class TikTokService:
         self.access_token = self.get_access_token()
         self.business_id = self.get_business_id()
     
+    # Access token cache (process-wide, single-flight refresh)
+    _token_lock = threading.Lock()
+    _cached_token: Optional[str] = None
+    _cached_token_expires_at: float = 0.0  # time.monotonic()
+
     @classmethod
     def get_access_token(cls) -> Optional[str]:
         """
-        ดึง access token สำหรับ TikTok Business API
+        ดึง access token สำหรับ TikTok Business API (ผ่าน cache)
+
+        - token ที่ได้จาก refresh flow อยู่ใน cache ตาม `expires_in` ของ response
+          (หัก TIKTOK_TOKEN_EXPIRY_SKEW_SECONDS กันหมดอายุกลางทาง)
+        - token ตรง ๆ (DB / .env) cache ไว้ TIKTOK_TOKEN_CACHE_SECONDS
+        - หลาย thread เรียกพร้อมกันตอน cache หมดอายุ → refresh แค่ครั้งเดียว คนอื่นรอผลเดียวกัน
+        - ถ้าดึงไม่สำเร็จ จะจำผลว่างไว้สั้น ๆ (TIKTOK_TOKEN_FAILURE_CACHE_SECONDS) กันยิงซ้ำรัว ๆ
+        """
+        if time.monotonic() < cls._cached_token_expires_at:
+            return cls._cached_token
+
+        with cls._token_lock:
+            # อาจมี thread อื่น refresh เสร็จระหว่างรอ lock
+            now = time.monotonic()
+            if now < cls._cached_token_expires_at:
+                return cls._cached_token
+
+            token, expires_in = cls._fetch_access_token()
+            if not token:
+                ttl = settings.TIKTOK_TOKEN_FAILURE_CACHE_SECONDS
+            elif expires_in:
+                ttl = max(expires_in - settings.TIKTOK_TOKEN_EXPIRY_SKEW_SECONDS, 0)
+            else:
+                ttl = settings.TIKTOK_TOKEN_CACHE_SECONDS
+
+            cls._cached_token = token
+            cls._cached_token_expires_at = time.monotonic() + ttl
+            return token
+
+    @classmethod
+    def invalidate_access_token(cls) -> None:
+        """ล้าง token cache (เรียกเมื่อ credentials ใน app_settings เปลี่ยน)"""
+        with cls._token_lock:
+            cls._cached_token = None
+            cls._cached_token_expires_at = 0.0
+
+    @classmethod
+    def _fetch_access_token(cls) -> Tuple[Optional[str], Optional[int]]:
+        """
+        ดึง access token จริง (ไม่ผ่าน cache) คืน (token, expires_in วินาที หรือ None)
         ลำดับความสำคัญ (ใหม่):
         1) ถ้ามี token ตรง ๆ ใน DB (app_settings.key = 'tiktok_access_token') ให้ใช้เลย
         2) ถ้าใน DB มี client_id + client_secret + refresh_token → ใช้ refresh flow
@@ -60,7 +113,7 @@ class TikTokService:
         # 1) token ตรง ๆ ใน DB
         direct_db_token = db_settings.get("tiktok_access_token")
         if direct_db_token:
-            return direct_db_token
+            return direct_db_token, None
 
         # 2) refresh flow จาก DB
         client_id = db_settings.get("tiktok_client_id")
@@ -72,7 +125,7 @@ class TikTokService:
             # 3.1 direct token จาก .env
             direct_env_token = settings.tiktok_content_access_token
             if direct_env_token:
-                return direct_env_token
+                return direct_env_token, None
 
             # 3.2 refresh จาก .env
             client_id = settings.TIKTOK_CLIENT_ID
@@ -81,7 +134,7 @@ class TikTokService:
 
         if not (client_id and client_secret and refresh_token):
             print("[TikTokService] No TikTok credentials configured (DB or .env).")
-            return None
+            return None, None
 
         url = f"{settings.TIKTOK_API_BASE_URL}/tt_user/oauth2/refresh_token/"
         payload = {
@@ -92,30 +145,31 @@ class TikTokService:
         }
 
         try:
-            with httpx.Client(timeout=20.0) as client:
-                resp = client.post(url, json=payload)
+            with TikTokHttpClientRegistry.client_context(url) as client:
+                resp = client.post(url, json=payload, timeout=20.0)
                 if resp.status_code != 200:
                     print(
                         f"[TikTokService] Failed to refresh access token: {resp.status_code} {resp.text}"
                     )
-                    return None
+                    return None, None
 
                 data = resp.json()
-                access_token = (
-                    data.get("data", {}).get("access_token")
-                    if isinstance(data, dict)
-                    else None
-                )
+                token_data = (data.get("data") or {}) if isinstance(data, dict) else {}
+                access_token = token_data.get("access_token")
                 if not access_token:
                     print(
                         f"[TikTokService] No access_token field in refresh response: {data}"
                     )
-                    return None
+                    return None, None
 
-                return access_token
+                try:
+                    expires_in = int(token_data.get("expires_in") or 0) or None
+                except (TypeError, ValueError):
+                    expires_in = None
+                return access_token, expires_in
         except Exception as e:
             print(f"[TikTokService] Error refreshing access token: {e}")
-            return None
+            return None, None
 
     @staticmethod
     def _get_db_settings() -> Dict[str, str]:
@@ -183,7 +237,7 @@ class TikTokService:
         }
         
         try:
-            with httpx.Client(timeout=30.0) as client:
+            with TikTokHttpClientRegistry.client_context(url) as client:
                 response = client.get(url, headers=headers, params=params)
                 response.raise_for_status()
                 return response.json()
@@ -197,7 +251,7 @@ class TikTokService:
         url = f"{TikTokService.ITEM_DETAIL_API}/{item_id}"
         
         try:
-            with httpx.Client(timeout=30.0) as client:
+            with TikTokHttpClientRegistry.client_context(url) as client:
                 response = client.get(url)
                 if response.status_code != 200:
                     return None
@@ -210,31 +264,102 @@ class TikTokService:
             print(f"Error getting item detail for {item_id}: {e}")
             return None
     
+    @staticmethod
+    def iter_item_details(
+        item_ids: List[str],
+        max_concurrency: Optional[int] = None,
+        use_cache: bool = True,
+    ) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """
+        yield (item_id, detail | None) ตามลำดับที่เสร็จ
+
+        - use_cache: item ที่ cache ยังสด (ItemDetailCacheService) ได้ทันที
+          ดึงจริงเฉพาะที่ไม่มี / หมดอายุ (use_cache=False → ดึงใหม่ทั้งหมด)
+        - ที่เหลือดึงแบบ async (ItemDetailFetcher) แล้วเก็บลง cache เสมอ
+        """
+        ids = list(dict.fromkeys(str(i).strip() for i in item_ids or [] if i and str(i).strip()))
+        cache_enabled = settings.TIKTOK_ITEM_DETAIL_CACHE_ENABLED
+
+        to_fetch = ids
+        if use_cache and cache_enabled:
+            cached = ItemDetailCacheService.get_fresh(ids)
+            for item_id, detail in cached.items():
+                yield item_id, detail
+            to_fetch = [i for i in ids if i not in cached]
+            if cached:
+                print(f"[TikTokService] Item details: {len(cached)} from cache, {len(to_fetch)} to fetch")
+
+        fetched: List[Dict] = []
+        try:
+            for item_id, detail in ItemDetailFetcher.iter_details(
+                TikTokService.ITEM_DETAIL_API, to_fetch, max_concurrency=max_concurrency
+            ):
+                if detail and cache_enabled:
+                    fetched.append(detail)
+                    if len(fetched) >= settings.TIKTOK_ITEM_DETAIL_WRITE_BATCH:
+                        ItemDetailCacheService.store(fetched)
+                        fetched = []
+                yield item_id, detail
+        finally:
+            if fetched:
+                ItemDetailCacheService.store(fetched)
+
     @staticmethod
     def get_item_details_concurrently(item_ids: List[str], max_workers: int = 10) -> Tuple[List[Dict], List[str]]:
-        """Fetch item details concurrently"""
+        """
+        Fetch item details concurrently (รอจนครบทุก item)
+
+        max_workers = เพดาน concurrency (ค่าจริงปรับตาม latency / error rate)
+        """
         item_details = []
         failed_ids = []
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_id = {
-                executor.submit(TikTokService.get_item_detail, item_id): item_id 
-                for item_id in item_ids
-            }
-            
-            for future in as_completed(future_to_id):
-                item_id = future_to_id[future]
-                try:
-                    detail = future.result()
-                    if detail:
-                        item_details.append(detail)
-                    else:
-                        failed_ids.append(item_id)
-                except Exception as e:
-                    print(f"Error for {item_id}: {e}")
-                    failed_ids.append(item_id)
-        
+
+        for item_id, detail in TikTokService.iter_item_details(item_ids, max_concurrency=max_workers):
+            if detail:
+                item_details.append(detail)
+            else:
+                failed_ids.append(item_id)
+
         return item_details, failed_ids
+
+    @classmethod
+    def fetch_and_update_content_details(
+        cls,
+        item_ids: List[str],
+        db: Session,
+        max_concurrency: Optional[int] = None,
+        use_cache: bool = True,
+        commit: bool = True,
+    ) -> Tuple[int, List[str]]:
+        """
+        ดึง item details แล้วเขียนลง contents ไปพร้อมกัน
+        (update_content_details ทุก TIKTOK_ITEM_DETAIL_WRITE_BATCH items ระหว่างที่ที่เหลือยังดึงอยู่)
+        item ที่ cache ยังสดไม่ต้องยิง API (use_cache=False → ดึงใหม่ทั้งหมด)
+        commit=False → flush แต่ละชุด ให้ caller commit เอง (ใช้ใน transaction ต่อ account)
+
+        Returns:
+            (updated_count, failed_ids)
+        """
+        batch_size = max(1, settings.TIKTOK_ITEM_DETAIL_WRITE_BATCH)
+        updated = 0
+        failed_ids: List[str] = []
+        pending: List[Dict] = []
+
+        for item_id, detail in cls.iter_item_details(
+            item_ids, max_concurrency=max_concurrency, use_cache=use_cache
+        ):
+            if not detail:
+                failed_ids.append(item_id)
+                continue
+            pending.append(detail)
+            if len(pending) >= batch_size:
+                updated += cls.update_content_details(pending, db, commit=commit)
+                pending = []
+
+        if pending:
+            updated += cls.update_content_details(pending, db, commit=commit)
+
+        return updated, failed_ids
     
     @staticmethod
     def extract_channel_from_url(share_url: str) -> Optional[str]:
@@ -245,12 +370,19 @@ class TikTokService:
         return None
     
     @staticmethod
-    def determine_content_source(channel_acc_id: str) -> ContentSource:
-        """Determine content source based on channel"""
+    def determine_content_source(
+        channel_acc_id: str, official_channels: Optional[Set[str]] = None
+    ) -> ContentSource:
+        """
+        Determine content source based on channel
+
+        official_channels: ส่งมาเมื่อเรียกเป็น batch (โหลดครั้งเดียวต่อรอบ ไม่ต้องอ่าน app_settings ทุก video)
+        """
         if not channel_acc_id:
             return ContentSource.INFLUENCER
 
-        official_channels = TikTokService.get_official_channels()
+        if official_channels is None:
+            official_channels = set(TikTokService.get_official_channels())
         if channel_acc_id in official_channels:
             return ContentSource.PAGE
         return ContentSource.INFLUENCER
@@ -277,39 +409,10 @@ class TikTokService:
         # Adjust likes with bookmarks (1 bookmark = 10 likes)
         adjusted_likes = likes + (bookmarks * 10)
         
-        # Set targets based on view count tiers
-        if video_views < 10000:
-            target_comments = 0.018
-            target_shares = 0.07
-            target_likes = 12
-        elif video_views < 50000:
-            target_comments = 0.016
-            target_shares = 0.05
-            target_likes = 10
-        elif video_views < 100000:
-            target_comments = 0.013
-            target_shares = 0.04
-            target_likes = 7
-        elif video_views < 500000:
-            target_comments = 0.01
-            target_shares = 0.035
-            target_likes = 4
-        elif video_views < 1000000:
-            target_comments = 0.009
-            target_shares = 0.025
-            target_likes = 1.8
-        elif video_views < 5000000:
-            target_comments = 0.004
-            target_shares = 0.02
-            target_likes = 1.5
-        elif video_views < 10000000:
-            target_comments = 0.003
-            target_shares = 0.015
-            target_likes = 1.2
-        else:
-            target_comments = 0.002
-            target_shares = 0.01
-            target_likes = 1
+        # Set targets based on view count tiers (PFM_TIERS ใช้ร่วมกับ PFMScoreEngine)
+        for upper_bound, target_comments, target_shares, target_likes in PFM_TIERS:
+            if upper_bound is None or video_views < upper_bound:
+                break
         
         # Calculate normalized scores
         view_target_comments = (video_views * target_comments) / 100
@@ -322,120 +425,205 @@ class TikTokService:
         
         # Calculate final score (weighted average)
         # Comments: 45%, Shares: 35%, Likes: 25%
-        score = (norm_comments * 45 + norm_shares * 35 + norm_likes * 25) / 100
+        w_comments, w_shares, w_likes = PFM_WEIGHTS
+        score = (norm_comments * w_comments + norm_shares * w_shares + norm_likes * w_likes) / 100
         
         return Decimal(str(round(score, 2)))
     
+    # แถวต่อ 1 INSERT ... ON CONFLICT
+    CONTENT_UPSERT_BATCH_SIZE = 500
+
+    # คอลัมน์ที่ sync_videos_to_db เขียนทับเมื่อ content มีอยู่แล้ว
+    # (platform_created_at / content_source / status / creator_id ตั้งเฉพาะตอนสร้าง)
+    # pfm_score ตั้งเฉพาะตอนสร้าง: list API ไม่มี bookmarks → ค่าที่นี่ไม่ตรงกับ PFMScoreEngine
+    # (ใช้ saves) หลังจากนั้น calculate_all_scores คำนวณใหม่เมื่อ metrics เปลี่ยน
+    _VIDEO_UPDATE_COLUMNS = (
+        "url",
+        "caption",
+        "thumbnail_url",
+        "video_duration",
+        "views",
+        "likes",
+        "comments",
+        "shares",
+        "reach",
+        "total_watch_time",
+        "avg_watch_time",
+        "completion_rate",
+        "platform_metrics",
+        "creator_name",
+    )
+
+    # คอลัมน์ข้างบนที่เป็น input ของ score → เปลี่ยนแล้วต้อง bump content_version (ดู score_tasks._dirty_filter)
+    _VIDEO_SCORE_COLUMNS = (
+        "video_duration",
+        "views",
+        "likes",
+        "comments",
+        "shares",
+        "reach",
+        "avg_watch_time",
+        "completion_rate",
+        "platform_metrics",
+    )
+
     @staticmethod
-    def sync_videos_to_db(videos: List[Dict], db: Session) -> int:
-        """Sync videos to database"""
-        synced_count = 0
-        
+    def _video_columns_changed(table, excluded, columns) -> ColumnElement:
+        """OR ของ IS DISTINCT FROM ระหว่างค่าเดิมกับค่าใหม่ (JSON เทียบเป็น JSONB)"""
+        conditions = []
+        for col in columns:
+            old, new = table.c[col], getattr(excluded, col)
+            if col == "platform_metrics":
+                old, new = cast(old, JSONB), cast(new, JSONB)
+            conditions.append(old.is_distinct_from(new))
+        return or_(*conditions)
+
+    @staticmethod
+    def _video_to_row(video: Dict, official_channels: Set[str]) -> Dict:
+        """แปลง video จาก /business/video/list/ เป็นแถวของตาราง contents"""
+        item_id = str(video["item_id"])
+        share_url = video.get('share_url', '')
+        channel_acc_id = TikTokService.extract_channel_from_url(share_url)
+        content_source = (
+            TikTokService.determine_content_source(channel_acc_id, official_channels)
+            if channel_acc_id
+            else None
+        )
+
+        # Parse create time
+        create_time = None
+        if video.get('create_time'):
+            try:
+                create_time = datetime.fromtimestamp(int(video['create_time']))
+            except (TypeError, ValueError, OSError):
+                pass
+
+        # Calculate PFM
+        pfm_score = TikTokService.calculate_pfm_score(
+            video.get('video_views', 0),
+            video.get('likes', 0),
+            video.get('comments', 0),
+            video.get('shares', 0),
+            0  # bookmarks not in list API
+        )
+
+        return {
+            "platform": Platform.TIKTOK,
+            "platform_post_id": item_id,
+            "url": share_url,
+            "caption": video.get('caption', ''),
+            "thumbnail_url": video.get('thumbnail_url', ''),
+            "platform_created_at": create_time,
+            "content_source": content_source,
+            "status": ContentStatus.READY,
+            "video_duration": Decimal(str(video.get('video_duration', 0))),
+            "views": video.get('video_views', 0),
+            "likes": video.get('likes', 0),
+            "comments": video.get('comments', 0),
+            "shares": video.get('shares', 0),
+            "reach": video.get('reach', 0),
+            "total_watch_time": Decimal(str(video.get('total_time_watched', 0))),
+            "avg_watch_time": Decimal(str(video.get('average_time_watched', 0))),
+            "completion_rate": Decimal(str(video.get('full_video_watched_rate', 0) * 100)),
+            "pfm_score": pfm_score,
+            "platform_metrics": {
+                'impression_sources': video.get('impression_sources', [])
+            },
+            "creator_name": channel_acc_id,
+            "creator_id": channel_acc_id,
+        }
+
+    @staticmethod
+    def sync_videos_to_db(
+        videos: List[Dict],
+        db: Session,
+        official_channels: Optional[Set[str]] = None,
+        commit: bool = True,
+    ) -> int:
+        """
+        Sync videos to database (batch upsert)
+
+        - official channels โหลดครั้งเดียวต่อรอบ (ส่งเข้ามาได้จาก fetch_and_sync_all_videos)
+        - content เดิมของ item_ids ในหน้านี้โหลดด้วย IN query เดียว
+        - สร้าง / อัปเดตด้วย INSERT ... ON CONFLICT (platform, platform_post_id)
+          ครั้งละ CONTENT_UPSERT_BATCH_SIZE แถว
+        - แถวที่ค่าไม่เปลี่ยนไม่ถูกเขียนทับ; ON CONFLICT ไม่รัน onupdate ของ ORM
+          → bump content_version เองเมื่อ input ของ score เปลี่ยน
+        - commit=False → caller commit เอง (เช่นพร้อม cursor checkpoint)
+        """
+        if official_channels is None:
+            official_channels = set(TikTokService.get_official_channels())
+
+        rows: Dict[str, Dict] = {}
         for video in videos:
             try:
-                item_id = video.get('item_id')
-                if not item_id:
+                if not video.get('item_id'):
                     continue
-                
-                # Check if content exists
-                content = db.query(Content).filter(
-                    Content.platform == Platform.TIKTOK,
-                    Content.platform_post_id == item_id
-                ).first()
-                
-                # Extract channel info
-                share_url = video.get('share_url', '')
-                channel_acc_id = TikTokService.extract_channel_from_url(share_url)
-                content_source = TikTokService.determine_content_source(channel_acc_id) if channel_acc_id else None
-                
-                # Parse create time
-                create_time = None
-                if video.get('create_time'):
-                    try:
-                        create_time = datetime.fromtimestamp(int(video['create_time']))
-                    except:
-                        pass
-                
-                # Calculate PFM
-                pfm_score = TikTokService.calculate_pfm_score(
-                    video.get('video_views', 0),
-                    video.get('likes', 0),
-                    video.get('comments', 0),
-                    video.get('shares', 0),
-                    0  # bookmarks not in list API
-                )
-                
-                if content:
-                    # Update existing
-                    content.url = share_url
-                    content.caption = video.get('caption', '')
-                    thumbnail_url = video.get('thumbnail_url', '')
-                    content.thumbnail_url = thumbnail_url
-                    content.video_duration = Decimal(str(video.get('video_duration', 0)))
-                    content.views = video.get('video_views', 0)
-                    content.likes = video.get('likes', 0)
-                    content.comments = video.get('comments', 0)
-                    content.shares = video.get('shares', 0)
-                    content.reach = video.get('reach', 0)
-                    content.total_watch_time = Decimal(str(video.get('total_time_watched', 0)))
-                    content.avg_watch_time = Decimal(str(video.get('average_time_watched', 0)))
-                    content.completion_rate = Decimal(str(video.get('full_video_watched_rate', 0) * 100))
-                    content.pfm_score = pfm_score
-                    content.platform_metrics = {
-                        'impression_sources': video.get('impression_sources', [])
-                    }
-                    content.creator_name = channel_acc_id
-                    
-                    # Download thumbnail in background (before URL expires)
-                    if thumbnail_url:
-                        download_thumbnail_async(thumbnail_url, 'tiktok', item_id)
-                else:
-                    # Create new
-                    thumbnail_url = video.get('thumbnail_url', '')
-                    content = Content(
-                        platform=Platform.TIKTOK,
-                        platform_post_id=item_id,
-                        url=share_url,
-                        caption=video.get('caption', ''),
-                        thumbnail_url=thumbnail_url,
-                        platform_created_at=create_time,
-                        content_source=content_source,
-                        status=ContentStatus.READY,
-                        video_duration=Decimal(str(video.get('video_duration', 0))),
-                        views=video.get('video_views', 0),
-                        likes=video.get('likes', 0),
-                        comments=video.get('comments', 0),
-                        shares=video.get('shares', 0),
-                        reach=video.get('reach', 0),
-                        total_watch_time=Decimal(str(video.get('total_time_watched', 0))),
-                        avg_watch_time=Decimal(str(video.get('average_time_watched', 0))),
-                        completion_rate=Decimal(str(video.get('full_video_watched_rate', 0) * 100)),
-                        pfm_score=pfm_score,
-                        platform_metrics={
-                            'impression_sources': video.get('impression_sources', [])
-                        },
-                        creator_name=channel_acc_id,
-                        creator_id=channel_acc_id,
-                    )
-                    db.add(content)
-                    
-                    # Download thumbnail in background (before URL expires)
-                    if thumbnail_url:
-                        download_thumbnail_async(thumbnail_url, 'tiktok', item_id)
-                
-                synced_count += 1
-                
+                row = TikTokService._video_to_row(video, official_channels)
+                rows[row["platform_post_id"]] = row
             except Exception as e:
                 print(f"Error syncing video {video.get('item_id')}: {e}")
                 continue
-        
-        db.commit()
-        return synced_count
+
+        if not rows:
+            return 0
+
+        existing_ids = {
+            item_id
+            for (item_id,) in db.query(Content.platform_post_id).filter(
+                Content.platform == Platform.TIKTOK,
+                Content.platform_post_id.in_(list(rows.keys())),
+            )
+        }
+
+        values = list(rows.values())
+        table = Content.__table__
+        batch_size = TikTokService.CONTENT_UPSERT_BATCH_SIZE
+        for i in range(0, len(values), batch_size):
+            stmt = pg_insert(table).values(values[i:i + batch_size])
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["platform", "platform_post_id"],
+                set_={
+                    **{col: getattr(excluded, col) for col in TikTokService._VIDEO_UPDATE_COLUMNS},
+                    "updated_at": func.now(),
+                    "content_version": case(
+                        (
+                            TikTokService._video_columns_changed(
+                                table, excluded, TikTokService._VIDEO_SCORE_COLUMNS
+                            ),
+                            text(CONTENT_VERSION_NEXT),
+                        ),
+                        else_=table.c.content_version,
+                    ),
+                },
+                where=TikTokService._video_columns_changed(
+                    table, excluded, TikTokService._VIDEO_UPDATE_COLUMNS
+                ),
+            )
+            db.execute(stmt)
+
+        if commit:
+            db.commit()
+
+        # Download thumbnail in background (before URL expires)
+        for item_id, row in rows.items():
+            if row["thumbnail_url"]:
+                download_thumbnail_async(row["thumbnail_url"], 'tiktok', item_id)
+
+        created = len(rows) - len(existing_ids)
+        print(f"[TikTokService] Synced {len(rows)} videos ({created} new, {len(existing_ids)} updated)")
+        return len(rows)
     
     @staticmethod
-    def update_content_details(item_details: List[Dict], db: Session) -> int:
-        """Update content with detailed info (including bookmarks)"""
+    def update_content_details(item_details: List[Dict], db: Session, commit: bool = True) -> int:
+        """
+        Update content with detailed info (including bookmarks)
+
+        commit=False → flush เฉยๆ ให้ caller commit เอง
+        """
         updated_count = 0
+        official_channels = set(TikTokService.get_official_channels())
 
         for detail in item_details:
             try:
@@ -456,7 +644,7 @@ class TikTokService:
                 # Parse author / channel
                 author = detail.get("author")
                 content_source = (
-                    TikTokService.determine_content_source(author)
+                    TikTokService.determine_content_source(author, official_channels)
                     if author
                     else None
                 )
@@ -546,17 +734,21 @@ class TikTokService:
                 print(f"Error updating content {detail.get('item_id')}: {e}")
                 continue
 
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
         return updated_count
 
     @classmethod
     def ensure_contents_for_item_ids(
-        cls, item_ids: List[str], db: Optional[Session] = None
+        cls, item_ids: List[str], db: Optional[Session] = None, commit: bool = True
     ) -> Dict:
         """
         ให้แน่ใจว่า TikTok content สำหรับ item_ids ที่ระบุ "มีอยู่" ในตาราง contents แล้ว
         - ดึง item details จาก ITEM_DETAIL_API
-        - ใช้ update_content_details เพื่อสร้าง/อัปเดต Content
+        - ใช้ update_content_details เพื่อสร้าง/อัปเดต Content (เขียนเป็นชุดระหว่างที่ยังดึงอยู่)
+        - commit=False → flush เฉยๆ ไม่ commit transaction ของ caller (ใช้ได้เฉพาะเมื่อส่ง db มา)
         """
         # ทำให้เป็น unique + ตัดช่องว่าง
         cleaned: List[str] = []
@@ -579,7 +771,6 @@ class TikTokService:
             own_session = True
 
         try:
-            details, failed_ids = cls.get_item_details_concurrently(cleaned, max_workers=10)
             before_count = (
                 db.query(Content)
                 .filter(
@@ -589,9 +780,9 @@ class TikTokService:
                 .count()
             )
 
-            updated = 0
-            if details:
-                updated = cls.update_content_details(details, db)
+            updated, failed_ids = cls.fetch_and_update_content_details(
+                cleaned, db, commit=commit or own_session
+            )
 
             after_count = (
                 db.query(Content)
@@ -615,105 +806,206 @@ class TikTokService:
             if own_session:
                 db.close()
     
+    # AppSetting ที่เก็บ cursor checkpoint ของ fetch_type="all"
+    VIDEO_SYNC_CHECKPOINT_KEY = "tiktok_video_sync_checkpoint"
+    VIDEO_SYNC_CHECKPOINT_CATEGORY = "sync_state"
+
+    @classmethod
+    def _load_video_sync_checkpoint(cls, db: Session, business_id: str) -> Optional[Dict]:
+        row = db.query(AppSetting).filter(AppSetting.key == cls.VIDEO_SYNC_CHECKPOINT_KEY).first()
+        if not row or not row.value:
+            return None
+        try:
+            state = json.loads(row.value)
+        except ValueError:
+            return None
+        if not isinstance(state, dict) or state.get("business_id") != business_id or not state.get("cursor"):
+            return None
+        # cursor ของ TikTok หมดอายุได้ → checkpoint เก่าเกิน TTL เริ่มหน้าแรกใหม่
+        try:
+            saved_at = datetime.fromisoformat(str(state.get("updated_at")))
+        except ValueError:
+            return None
+        if datetime.utcnow() - saved_at > timedelta(hours=settings.TIKTOK_VIDEO_SYNC_CHECKPOINT_TTL_HOURS):
+            print(f"[TikTokService] Video sync checkpoint from {saved_at} expired, starting from page 1")
+            return None
+        return state
+
+    @classmethod
+    def _save_video_sync_checkpoint(cls, db: Session, state: Optional[Dict]) -> None:
+        """เขียน / ล้าง checkpoint ใน session (caller commit พร้อมหน้าที่เพิ่งเขียน)"""
+        row = db.query(AppSetting).filter(AppSetting.key == cls.VIDEO_SYNC_CHECKPOINT_KEY).first()
+        value = json.dumps(state) if state else None
+        if row:
+            row.value = value
+        elif value:
+            db.add(AppSetting(
+                key=cls.VIDEO_SYNC_CHECKPOINT_KEY,
+                value=value,
+                category=cls.VIDEO_SYNC_CHECKPOINT_CATEGORY,
+                description="cursor ของ TikTok video sync (fetch_type=all) ที่เขียนสำเร็จล่าสุด",
+            ))
+
+    @classmethod
+    def _iter_video_pages(
+        cls,
+        access_token: str,
+        business_id: str,
+        cursor: Optional[str],
+        max_pages: Optional[int],
+    ) -> Iterator[Dict]:
+        """
+        เดิน cursor ของ /business/video/list/ ทีละหน้า
+
+        yield {"page", "videos", "next_cursor", "has_more", "restarted"}; ดึงไม่สำเร็จ → raise
+        เริ่มจาก cursor (resume) แล้วหน้าแรกล้ม → เริ่มใหม่จากหน้าแรกครั้งเดียว (restarted=True)
+        """
+        page = 0
+        restarted = False
+        while True:
+            response = cls.get_videos_list(access_token, business_id, cursor)
+            page += 1
+            if not response and page == 1 and cursor and not restarted:
+                print("[TikTokService] Resumed video list cursor failed, restarting from page 1")
+                page, cursor, restarted = 0, None, True
+                continue
+            if not response:
+                raise RuntimeError(f"Failed to fetch video list page {page}")
+
+            data = response.get('data', {}) or {}
+            videos = data.get('videos', []) or []
+            next_cursor = data.get('cursor')
+            has_more = bool(data.get('has_more', False)) and bool(next_cursor) and bool(videos)
+
+            yield {
+                "page": page,
+                "videos": videos,
+                "next_cursor": next_cursor,
+                "has_more": has_more,
+                "restarted": restarted and page == 1,
+            }
+
+            # หยุดถ้าไม่มีหน้าเพิ่ม หรือไม่มี cursor
+            if not has_more:
+                return
+            # สำหรับโหมด "latest" ให้จำกัดจำนวนหน้า
+            if max_pages is not None and page >= max_pages:
+                return
+            cursor = next_cursor
+
     @classmethod
     def fetch_and_sync_all_videos(cls, access_token: str, business_id: str, 
-                                   fetch_type: str = "latest") -> Dict:
+                                   fetch_type: str = "latest", resume: bool = True) -> Dict:
         """
         Fetch all videos from TikTok and sync to database
+
+        Pipeline: producer เดิน cursor ล่วงหน้าใน background (bounded queue
+        TIKTOK_VIDEO_SYNC_PIPELINE_DEPTH หน้า) ระหว่างที่ writer upsert + commit ทีละหน้า
+
+        fetch_type="all": cursor ของหน้าถัดไปถูก commit พร้อมหน้าที่เพิ่งเขียน (AppSetting)
+        → ล้มกลางทางแล้วรันใหม่จะต่อจากหน้าที่ commit ล่าสุด (resume=False = เริ่มหน้าแรก)
+        ครบทุกหน้าแล้ว checkpoint ถูกล้าง
         
         Args:
             access_token: TikTok access token
             business_id: TikTok business ID
             fetch_type: "latest" (first 3 pages) or "all" (all pages)
+            resume: fetch_type="all" ต่อจาก checkpoint ถ้ามี
         
         Returns:
             Dict with sync results
         """
         db = SessionLocal()
-        cursor = None
         total_fetched = 0
         total_synced = 0
-        fetch_idx = 0
+        pages_processed = 0
+        checkpointed = fetch_type == "all"
         max_pages = 3 if fetch_type == "latest" else None  # "all" จะรันจนกว่า has_more=False
+        start_cursor = None
         
         try:
-            while True:
-                # Fetch videos
-                response = cls.get_videos_list(access_token, business_id, cursor)
-                fetch_idx += 1
-                
-                if not response:
-                    break
-                
-                videos = response.get('data', {}).get('videos', [])
+            official_channels = set(cls.get_official_channels())
+
+            if checkpointed:
+                checkpoint = cls._load_video_sync_checkpoint(db, business_id) if resume else None
+                if checkpoint:
+                    start_cursor = checkpoint["cursor"]
+                    total_fetched = int(checkpoint.get("total_fetched") or 0)
+                    total_synced = int(checkpoint.get("total_synced") or 0)
+                    pages_processed = int(checkpoint.get("pages") or 0)
+                    print(
+                        f"[TikTokService] Resuming video sync from checkpoint "
+                        f"(page {checkpoint.get('pages')}, {total_synced} videos synced)"
+                    )
+                elif not resume:
+                    cls._save_video_sync_checkpoint(db, None)
+                    db.commit()
+
+            pages = prefetch(
+                cls._iter_video_pages(access_token, business_id, start_cursor, max_pages),
+                depth=settings.TIKTOK_VIDEO_SYNC_PIPELINE_DEPTH,
+                name="tiktok-video-list-prefetch",
+            )
+            for page in pages:
+                if page["restarted"]:
+                    # checkpoint ใช้ไม่ได้ → นับใหม่ตั้งแต่หน้าแรก (checkpoint ถูกเขียนทับตอน commit หน้านี้)
+                    start_cursor = None
+                    total_fetched = total_synced = pages_processed = 0
+                videos = page["videos"]
                 if not videos:
+                    if checkpointed:
+                        cls._save_video_sync_checkpoint(db, None)
+                        db.commit()
                     break
-                
+
                 total_fetched += len(videos)
-                print(f"Fetched {total_fetched} videos (page {fetch_idx})...")
-                
-                # Sync to database
-                synced = cls.sync_videos_to_db(videos, db)
+                pages_processed += 1
+                print(f"Fetched {total_fetched} videos (page {pages_processed})...")
+
+                # Sync to database (+ checkpoint ใน transaction เดียวกัน)
+                synced = cls.sync_videos_to_db(videos, db, official_channels, commit=False)
                 total_synced += synced
-                
-                # Check for more pages
-                cursor = response.get('data', {}).get('cursor')
-                has_more = response.get('data', {}).get('has_more', False)
-                
-                # หยุดถ้าไม่มีหน้าเพิ่ม หรือไม่มี cursor
-                if not has_more or not cursor:
-                    break
+                if checkpointed:
+                    cls._save_video_sync_checkpoint(
+                        db,
+                        {
+                            "business_id": business_id,
+                            "cursor": page["next_cursor"],
+                            "pages": pages_processed,
+                            "total_fetched": total_fetched,
+                            "total_synced": total_synced,
+                            "updated_at": datetime.utcnow().isoformat(),
+                        } if page["has_more"] else None,
+                    )
+                db.commit()
 
-                # สำหรับโหมด "latest" ให้จำกัดจำนวนหน้า
-                if max_pages is not None and fetch_idx >= max_pages:
-                    break
-            
             return {
                 "success": True,
                 "total_fetched": total_fetched,
                 "total_synced": total_synced,
-                "pages_processed": fetch_idx
+                "pages_processed": pages_processed,
+                "resumed": bool(start_cursor),
             }
             
         except Exception as e:
+            db.rollback()
             return {
                 "success": False,
                 "error": str(e),
                 "total_fetched": total_fetched,
-                "total_synced": total_synced
+                "total_synced": total_synced,
+                "pages_processed": pages_processed,
+                "resumed": bool(start_cursor),
             }
         finally:
             db.close()
     
     @classmethod
     def update_all_pfm_scores(cls) -> int:
-        """Update PFM scores for all TikTok content"""
-        db = SessionLocal()
-        updated = 0
-        
-        try:
-            contents = db.query(Content).filter(
-                Content.platform == Platform.TIKTOK,
-                Content.deleted_at.is_(None)
-            ).all()
-            
-            for content in contents:
-                old_score = content.pfm_score
-                new_score = cls.calculate_pfm_score(
-                    content.views or 0,
-                    content.likes or 0,
-                    content.comments or 0,
-                    content.shares or 0,
-                    content.saves or 0
-                )
-                
-                if old_score != new_score:
-                    content.pfm_score = new_score
-                    updated += 1
-            
-            db.commit()
-            return updated
-            
-        finally:
-            db.close()
+        """
+        Update PFM scores for all TikTok content
 
+        set-based ผ่าน PFMScoreEngine (chunk ละ PFM_SCORE_CHUNK_SIZE แถว, NumPy ถ้ามี)
+        ผลลัพธ์ตรงกับ calculate_pfm_score ทีละแถว
+        """
+        return PFMScoreEngine.update_all()
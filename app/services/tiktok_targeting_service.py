@@ -9,10 +9,10 @@ Service for fetching targeting options from TikTok Business API:
 """
 
 import json
-from typing import Dict, List, Optional, Any
-import httpx
+from typing import Any, ContextManager, Dict, List, Optional
 
 from app.core.config import settings
+from app.services.tiktok_request_executor import TikTokApiClient, TikTokRequestExecutor
 from app.services.tiktok_service import TikTokService
 
 
@@ -49,9 +49,9 @@ class TikTokTargetingService:
         return settings.ADVERTISER_ID_IDAC_MAIN
     
     @classmethod
-    def _get_client(cls) -> httpx.Client:
-        """Create HTTP client with proper timeout"""
-        return httpx.Client(timeout=30.0)
+    def _get_client(cls) -> ContextManager[TikTokApiClient]:
+        """Client ที่ยิงผ่าน TikTokRequestExecutor (shared pool + rate limit + retry)"""
+        return TikTokRequestExecutor.client_context()
     
     # ============================================
     # Interest Categories (Tree Structure)
@@ -45,6 +45,9 @@ def process_plan_daily_budget(db, plan: BudgetPlan, today: date):
     ).all()
     
     for allocation in allocations:
+        # Update actual spend from yesterday (ทุก allocation ไม่ว่าวันนี้จะมี daily budget แล้วหรือยัง)
+        update_yesterday_spend(db, allocation, today)
+
         # Check if daily budget exists for today
         existing = db.query(DailyBudget).filter(
             DailyBudget.allocation_id == allocation.id,
@@ -52,8 +55,6 @@ def process_plan_daily_budget(db, plan: BudgetPlan, today: date):
         ).first()
         
         if existing:
-            # Update actual spend from yesterday
-            update_yesterday_spend(db, allocation, today)
             continue
         
         # Calculate remaining days in plan
@@ -98,7 +99,11 @@ def update_yesterday_spend(db, allocation: BudgetAllocation, today: date):
     if not daily_budget:
         return
     
-    # TODO: Fetch actual spend from platform APIs
-    # For now, we'll leave actual_spend as is (would be updated by ad sync)
-    pass
+    # actual spend จาก ad_performance_daily (ไม่ยิง API; ledger เติมโดย sync_tiktok_ad_performance_daily
+    # ซึ่ง reconcile วันนั้นซ้ำอีกครั้งหลังปิดวัน) - account ที่ยังไม่ปิดวันใช้ยอด hourly ไปก่อน
+    from app.services.intraday_spend_service import IntradaySpendService
+
+    IntradaySpendService.update_daily_budget_actual_spend(
+        db, yesterday, allocation_id=allocation.id, commit=False
+    )
 
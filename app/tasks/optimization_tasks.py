@@ -3,22 +3,28 @@ Budget optimization tasks
 """
 from datetime import datetime, date
 from decimal import Decimal
-from typing import List, Dict
+from typing import List, Dict, Optional
 
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models import (
     BudgetPlan, BudgetAllocation, DailyBudget, 
     ABXAdgroup, Content, BudgetOptimizationLog
 )
 from app.models.enums import Platform, ContentType, AdStatus
+from app.services.adgroup_mutation_queue import AdgroupMutationQueue
 
 
 def run_budget_optimization():
     """
     Main budget optimization routine
     Runs ACE and ABX optimization for all active budget plans
+
+    OPTIMIZATION_APPLY_ADGROUP_BUDGETS=True → budget ของ ABX adgroups ทุก plan ถูกรวมใน
+    AdgroupMutationQueue เดียว แล้ว flush ครั้งเดียวตอนจบรอบ (batch ต่อ advertiser)
     """
     db = SessionLocal()
+    queue = AdgroupMutationQueue() if settings.OPTIMIZATION_APPLY_ADGROUP_BUDGETS else None
     
     try:
         # Get active budget plans
@@ -43,11 +49,16 @@ def run_budget_optimization():
                     if plan.allocation_type.value == "ace":
                         optimize_ace_allocation(db, allocation)
                     elif plan.allocation_type.value == "abx":
-                        optimize_abx_allocation(db, allocation)
+                        optimize_abx_allocation(db, allocation, queue)
                 except Exception as e:
                     print(f"Error optimizing allocation {allocation.id}: {e}")
                     continue
         
+        if queue is not None and len(queue):
+            results = queue.flush(db)
+            failed = sum(1 for r in results.values() if not r["success"])
+            print(f"Applied adgroup budgets: {len(results)} adgroups, {failed} failed")
+        
         db.commit()
         
     finally:
@@ -131,13 +142,16 @@ def optimize_ace_allocation(db, allocation: BudgetAllocation):
     print(f"    Distributed budget to {len(distribution)} content items")
 
 
-def optimize_abx_allocation(db, allocation: BudgetAllocation):
+def optimize_abx_allocation(db, allocation: BudgetAllocation, queue: Optional[AdgroupMutationQueue] = None):
     """
     ABX (Adgroup-based) budget optimization
     
     1. Get ABX adgroups for this product group
     2. Rank by PFM score
     3. Distribute budget based on performance
+    4. queue ส่งมา → enqueue budget ของแต่ละ adgroup (caller flush)
+       ข้าม no-op ตาม ad_groups ได้: เป็นค่าจากสูตรไม่ใช่ค่าที่ผู้ใช้สั่งเอง
+       (ad_groups เก่า → อย่างแย่รอบนี้ไม่ยิง แล้วรอบถัดไปหลัง sync ค่อยยิง)
     """
     print(f"  Running ABX optimization for allocation {allocation.id}")
     
@@ -194,6 +208,14 @@ def optimize_abx_allocation(db, allocation: BudgetAllocation):
             "pfm_score": float(adgroup.pfm_score or 0),
             "budget": round(adgroup_budget, 2)
         })
+        
+        if queue is not None and adgroup.external_advertiser_id:
+            queue.set_budget(
+                adgroup.external_advertiser_id,
+                adgroup.external_adgroup_id,
+                round(adgroup_budget, 2),
+                skip_noop=True,
+            )
     
     # Log the optimization
     log = BudgetOptimizationLog(
@@ -212,6 +234,5 @@ def optimize_abx_allocation(db, allocation: BudgetAllocation):
     # Mark as allocated
     daily_budget.is_abx_allocated = True
     
-    # TODO: Actually apply budget changes to adgroups via TikTok API
     print(f"    Distributed budget to {len(distribution)} adgroups")
 
@@ -5,6 +5,7 @@ from datetime import datetime, date
 
 from app.core.database import SessionLocal
 from app.models import SaversureScanDaily, OfflineSaleWeekly, SKUSignal
+from app.services.sku_signal_service import SKUSignalService
 
 
 def sync_saversure_data():
@@ -39,24 +40,18 @@ def sync_offline_sales():
     pass
 
 
-def update_sku_signals():
+def update_sku_signals(as_of: date = None) -> dict:
     """
     Update aggregated SKU signals from all sources
+    
+    - online_sales_daily / saversure_scans_daily / offline_sales_weekly → sku_signals
+      (rolling window + trend, ดู SKUSignalService.aggregate)
+    - content ที่ SKU demand เปลี่ยนจะถูกคำนวณ unified score ใหม่ในรอบ score ถัดไป
     """
     db = SessionLocal()
     
     try:
-        today = date.today()
-        
-        # TODO: Aggregate signals from:
-        # - online_sales_daily
-        # - saversure_scans_daily
-        # - offline_sales_weekly
-        # 
-        # Calculate demand_score and trend for each SKU
-        
-        pass
+        return SKUSignalService.aggregate(db, as_of=as_of)
         
     finally:
         db.close()
-
@@ -78,6 +78,18 @@ def start_scheduler():
         replace_existing=True,
     )
 
+    # ============================================
+    # TikTok Ad Hourly Performance (every 15 minutes)
+    # - today's spend into ad_performance_hourly → ABX today_spend / DailyBudget actual_spend
+    # ============================================
+    scheduler.add_job(
+        func=sync_tiktok_ad_hourly_performance_job,
+        trigger=IntervalTrigger(minutes=15),
+        id="sync_tiktok_ad_hourly_performance",
+        name="Sync TikTok ad hourly performance (today pacing)",
+        replace_existing=True,
+    )
+
     # ============================================
     # Aggregate Content Cost from Daily (every 60 minutes)
     # - reads ad_performance_daily and updates contents.ads_total_cost
@@ -170,6 +182,15 @@ def start_scheduler():
         replace_existing=True,
     )
     
+    # SKU demand signals (online / Saversure / offline) - daily at 7:30 AM (after Saversure sync)
+    scheduler.add_job(
+        func=update_sku_signals_job,
+        trigger=CronTrigger(hour=7, minute=30),
+        id="update_sku_signals",
+        name="Aggregate SKU demand signals",
+        replace_existing=True,
+    )
+    
     # Daily budget recalculation - at midnight
     scheduler.add_job(
         func=daily_budget_job,
@@ -179,6 +200,15 @@ def start_scheduler():
         replace_existing=True,
     )
     
+    # Score history: partition เดือนถัดไป + downsample (raw → hourly → daily) - daily at 2:30 AM
+    scheduler.add_job(
+        func=compact_score_history_job,
+        trigger=CronTrigger(hour=2, minute=30),
+        id="compact_score_history",
+        name="Compact content score history",
+        replace_existing=True,
+    )
+    
     # Sync TikTok Targeting Data (interests, actions, regions) - daily at 3 AM
     scheduler.add_job(
         func=sync_targeting_cache_job,
@@ -214,6 +244,12 @@ def stop_scheduler():
         scheduler.shutdown()
         scheduler = None
         print(f"[{datetime.now()}] Scheduler stopped")
+    
+    # jobs ใช้ shared TikTok HTTP clients ร่วมกัน → ปิดพร้อม scheduler
+    from app.services.tiktok_http import TikTokHttpClientRegistry
+    TikTokHttpClientRegistry.close_all()
+    from app.services.item_detail_fetcher import ItemDetailFetcher
+    ItemDetailFetcher.close()
 
 
 # ============================================
@@ -279,6 +315,17 @@ def sync_tiktok_ad_daily_performance_job():
         print(f"[{datetime.now()}] TikTok ad daily performance job failed: {e}")
 
 
+def sync_tiktok_ad_hourly_performance_job():
+    """Today's TikTok hourly ad performance into ad_performance_hourly (+ pacing rollups)."""
+    print(f"[{datetime.now()}] Running TikTok ad hourly performance job...")
+    try:
+        from app.tasks.sync_tasks import sync_tiktok_ad_performance_hourly
+        result = sync_tiktok_ad_performance_hourly()
+        print(f"[{datetime.now()}] TikTok ad hourly performance job completed: {result}")
+    except Exception as e:
+        print(f"[{datetime.now()}] TikTok ad hourly performance job failed: {e}")
+
+
 def aggregate_content_cost_from_daily_job():
     """Aggregate Content ads_total_cost from ad_performance_daily (TikTok now, extend later)."""
     print(f"[{datetime.now()}] Running aggregate content cost from daily job...")
@@ -355,6 +402,17 @@ def calculate_scores_job():
         print(f"[{datetime.now()}] Score calculation failed: {e}")
 
 
+def compact_score_history_job():
+    """Downsample content score history + create upcoming partitions"""
+    print(f"[{datetime.now()}] Running score history compaction job...")
+    try:
+        from app.services.score_history_service import ScoreHistoryService
+        result = ScoreHistoryService.compact()
+        print(f"[{datetime.now()}] Score history compaction completed: {result}")
+    except Exception as e:
+        print(f"[{datetime.now()}] Score history compaction failed: {e}")
+
+
 def optimize_budget_job():
     """Run budget optimization"""
     print(f"[{datetime.now()}] Running budget optimization job...")
@@ -377,6 +435,17 @@ def sync_saversure_job():
         print(f"[{datetime.now()}] Saversure sync failed: {e}")
 
 
+def update_sku_signals_job():
+    """Aggregate SKU demand signals"""
+    print(f"[{datetime.now()}] Running SKU signal aggregation job...")
+    try:
+        from app.tasks.sales_tasks import update_sku_signals
+        result = update_sku_signals()
+        print(f"[{datetime.now()}] SKU signal aggregation completed: {result}")
+    except Exception as e:
+        print(f"[{datetime.now()}] SKU signal aggregation failed: {e}")
+
+
 def daily_budget_job():
     """Daily budget recalculation"""
     print(f"[{datetime.now()}] Running daily budget job...")
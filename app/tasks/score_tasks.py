@@ -1,44 +1,121 @@
 """
 Score calculation tasks
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
+from typing import Dict, Optional
 
+from sqlalchemy import func, or_
+
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models import Content, ContentScoreHistory
 from app.models.enums import Platform
+from app.services.score_history_service import ScoreHistoryService
+from app.services.sku_signal_service import SKUSignalService
+from app.services.tiktok_service import TikTokService
+
+# จำนวน content ที่โหลด / commit ต่อรอบ
+SCORE_BATCH_SIZE = 500
+
+
+def _dirty_filter():
+    """
+    content ที่ input ของ score เปลี่ยนหลังคำนวณครั้งล่าสุด (ใช้ partial index ix_contents_score_dirty)
+
+    content_version มาจาก sequence → bump ทุกครั้งที่ metrics / ads_total_cost / boost ถูกเขียน
+    ตอนเขียน score เก็บ scored_version = content_version ที่อ่านมา (ไม่ bump เอง)
+    → การเขียนที่ commit หลังเราอ่าน (แม้ transaction จะเริ่มก่อน) ได้เลขที่ใหญ่กว่าเสมอ ไม่หลุด
+    (NOW() เป็นเวลาเริ่ม transaction จึงใช้เป็น watermark ไม่ได้)
+    """
+    return or_(Content.scored_version.is_(None), Content.content_version > Content.scored_version)
+
+
+def calculate_all_scores(full: bool = False) -> Dict:
+    """
+    Calculate PFM, FB score, and unified score
 
+    full=False (default): เฉพาะ content ที่เปลี่ยนตั้งแต่รอบก่อน → ต้นทุนตามจำนวนที่เปลี่ยน ไม่ใช่ขนาดตาราง
+    full=True: คำนวณทุก content ที่ยังไม่ถูกลบ (เช่นหลังแก้สูตร)
 
-def calculate_all_scores():
-    """Calculate PFM, FB score, and unified score for all content"""
+    content ที่ score เปลี่ยน (หรือคำนวณครั้งแรก) → เขียนจุดลง content_score_points
+    """
     db = SessionLocal()
+    recorded_at = datetime.now(timezone.utc)
     
     try:
-        # Get all active content
-        contents = db.query(Content).filter(
-            Content.deleted_at.is_(None)
-        ).all()
+        query = db.query(Content.id).filter(Content.deleted_at.is_(None))
+        if not full:
+            query = query.filter(_dirty_filter())
+        content_ids = [row.id for row in query.order_by(Content.id).all()]
+        
+        # SKU demand score โหลดครั้งเดียวต่อรอบ
+        try:
+            sku_demand = SKUSignalService.load_demand_scores(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Error loading SKU demand scores: {e}")
+            sku_demand = {}
         
-        for content in contents:
-            try:
-                # Calculate platform-specific score
-                if content.platform == Platform.TIKTOK:
-                    pfm_score = calculate_pfm_score(content)
-                    content.pfm_score = pfm_score
-                elif content.platform in [Platform.FACEBOOK, Platform.INSTAGRAM]:
-                    fb_score = calculate_fb_score(content)
-                    content.fb_score = fb_score
-                
-                # Calculate unified score
-                unified_score = calculate_unified_score(content)
-                content.unified_score = unified_score
-                
-            except Exception as e:
-                print(f"Error calculating score for content {content.id}: {e}")
-                continue
+        updated = 0
+        failed = 0
+        history_points = 0
+        for i in range(0, len(content_ids), SCORE_BATCH_SIZE):
+            contents = db.query(Content).filter(
+                Content.id.in_(content_ids[i:i + SCORE_BATCH_SIZE])
+            ).all()
+            
+            points = []
+            for content in contents:
+                try:
+                    previous = ScoreHistoryService.scores_of(content)
+                    first_score = content.scored_at is None
+                    
+                    # Calculate platform-specific score
+                    if content.platform == Platform.TIKTOK:
+                        pfm_score = calculate_pfm_score(content)
+                        content.pfm_score = pfm_score
+                    elif content.platform in [Platform.FACEBOOK, Platform.INSTAGRAM]:
+                        fb_score = calculate_fb_score(content)
+                        content.fb_score = fb_score
+                    
+                    # Calculate unified score
+                    unified_score = calculate_unified_score(content, sku_demand)
+                    content.unified_score = unified_score
+                    
+                    if first_score or ScoreHistoryService.scores_of(content) != previous:
+                        points.append(ScoreHistoryService.point_for(content, recorded_at))
+                    
+                    # watermark = version ที่อ่านตอนโหลด batch; คง content_version เดิม (ข้าม onupdate)
+                    content.scored_version = content.content_version
+                    content.content_version = Content.content_version
+                    content.scored_at = func.now()
+                    updated += 1
+                    
+                except Exception as e:
+                    print(f"Error calculating score for content {content.id}: {e}")
+                    failed += 1
+                    continue
+            
+            if points and settings.SCORE_HISTORY_ENABLED:
+                try:
+                    with db.begin_nested():
+                        history_points += ScoreHistoryService.record(db, points)
+                except Exception as e:
+                    # history เขียนไม่ลง (เช่นยังไม่ได้สร้างตาราง) ไม่ให้กระทบ score
+                    print(f"Error recording score history: {e}")
+            
+            db.commit()
         
-        db.commit()
-        print(f"Updated scores for {len(contents)} content items")
+        mode = "full" if full else "incremental"
+        print(f"Updated scores for {updated} content items ({mode}, {failed} failed, {history_points} history points)")
+        return {
+            "mode": mode,
+            "candidates": len(content_ids),
+            "updated": updated,
+            "failed": failed,
+            "history_points": history_points,
+        }
         
     finally:
         db.close()
@@ -47,55 +124,13 @@ def calculate_all_scores():
 def calculate_pfm_score(content: Content) -> Decimal:
     """
     Calculate TikTok PFM score
-    
-    PFM = Performance Factor Multiplier
-    Based on: CTR, CVR, ViewTime, ROAS, Spend efficiency
+
+    สูตรเดียวกับ TikTokService.calculate_pfm_score / PFMScoreEngine (saves = bookmarks)
+    → update_all_pfm_scores กับรอบนี้เขียน pfm_score ค่าเดียวกัน ไม่สลับไปมา
     """
-    # Base score components
-    score = Decimal("1.0")
-    
-    # View engagement (views vs impressions)
-    if content.impressions and content.impressions > 0:
-        view_rate = content.views / content.impressions
-        if view_rate > 0.5:
-            score += Decimal("0.3")
-        elif view_rate > 0.3:
-            score += Decimal("0.15")
-    
-    # Watch time efficiency
-    if content.video_duration and content.avg_watch_time:
-        watch_rate = float(content.avg_watch_time) / float(content.video_duration)
-        if watch_rate > 0.5:
-            score += Decimal("0.4")
-        elif watch_rate > 0.3:
-            score += Decimal("0.2")
-    
-    # Engagement rate
-    if content.views and content.views > 0:
-        engagement = (content.likes + content.comments + content.shares) / content.views
-        if engagement > 0.05:
-            score += Decimal("0.3")
-        elif engagement > 0.02:
-            score += Decimal("0.15")
-    
-    # Completion rate
-    if content.completion_rate:
-        if content.completion_rate > 20:
-            score += Decimal("0.3")
-        elif content.completion_rate > 10:
-            score += Decimal("0.15")
-    
-    # Ad performance (if has ads)
-    if content.ads_total_cost and content.ads_total_cost > 0:
-        # Cost efficiency - lower cost per view is better
-        if content.views and content.views > 0:
-            cpv = float(content.ads_total_cost) / content.views
-            if cpv < 0.1:
-                score += Decimal("0.2")
-            elif cpv < 0.3:
-                score += Decimal("0.1")
-    
-    return min(score, Decimal("3.0"))  # Cap at 3.0
+    return TikTokService.calculate_pfm_score(
+        content.views, content.likes, content.comments, content.shares, content.saves
+    )
 
 
 def calculate_fb_score(content: Content) -> Decimal:
@@ -143,7 +178,7 @@ def calculate_fb_score(content: Content) -> Decimal:
     return min(score, Decimal("3.0"))
 
 
-def calculate_unified_score(content: Content) -> Decimal:
+def calculate_unified_score(content: Content, sku_demand: Optional[Dict[str, Decimal]] = None) -> Decimal:
     """
     Calculate Unified Content Impact Score
     
@@ -151,6 +186,9 @@ def calculate_unified_score(content: Content) -> Decimal:
     - TikTok online performance: ~50%
     - Facebook/IG online performance: ~30%
     - Saversure/Offline demand: ~20% (SKU-level signal)
+    
+    sku_demand: {product_code: demand_score 0-100} จาก SKUSignalService.load_demand_scores
+    (None → ใช้ map ล่าสุดที่โหลดไว้ใน memory)
     """
     score = Decimal("0")
     
@@ -163,8 +201,13 @@ def calculate_unified_score(content: Content) -> Decimal:
         # FB score contributes up to 30 points
         score += (content.fb_score / Decimal("3.0")) * Decimal("30")
     
-    # TODO: Add SKU-level demand signal (up to 20 points)
-    # This would come from SKUSignal table based on product_codes
+    # SKU-level demand signal contributes up to 20 points (เฉลี่ย demand_score ของ SKU ใน content)
+    if sku_demand is None:
+        sku_demand = SKUSignalService.demand_scores()
+    if sku_demand and isinstance(content.product_codes, list):
+        demands = [sku_demand[code] for code in content.product_codes if code in sku_demand]
+        if demands:
+            score += (sum(demands) / len(demands) / Decimal("100")) * Decimal("20")
     
     # Apply boost factor
     if content.boost_factor and content.boost_factor > 1:
@@ -2,7 +2,6 @@
 Content and Ad sync tasks
 """
 from datetime import datetime, timedelta
-from typing import List
 
 from app.core.database import SessionLocal
 from app.models import AppSetting, Content, Platform, TaskLog, TaskStatus
@@ -30,6 +29,37 @@ def log_task_start(task_name: str, task_type: str = "sync") -> TaskLog:
         db.close()
 
 
+def fail_interrupted_tasks(task_names, before: datetime = None) -> int:
+    """
+    Mark PENDING/RUNNING task logs ของ job ที่รันใน thread ของ process (หายไปตอน restart) เป็น FAILED
+
+    เรียกตอน startup ก่อนรับ request - job ที่สร้างก่อน `before` ไม่มี worker ไหนรันอยู่แล้ว
+    """
+    before = before or datetime.now()
+    db = SessionLocal()
+    try:
+        count = (
+            db.query(TaskLog)
+            .filter(
+                TaskLog.task_name.in_(list(task_names)),
+                TaskLog.status.in_([TaskStatus.PENDING, TaskStatus.RUNNING]),
+                TaskLog.created_at < before,
+            )
+            .update(
+                {
+                    TaskLog.status: TaskStatus.FAILED,
+                    TaskLog.completed_at: datetime.now(),
+                    TaskLog.error_message: "Interrupted by server restart",
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
 def log_task_complete(task_id: int, success: bool, message: str = None, 
                       items_processed: int = 0, items_success: int = 0, items_failed: int = 0):
     """Update task log on completion"""
@@ -158,12 +188,15 @@ def _load_content_sync_config(db: SessionLocal) -> dict:
 def refresh_tiktok_organic() -> dict:
     """
     Organic refresh job สำหรับ TikTok:
-    - เลือก content จากตาราง contents (platform = TIKTOK)
-      ที่อายุโพสต์ไม่เกิน organic_refresh_max_days ล่าสุด
-      และจำกัดจำนวนตาม max_content_per_job
-    - เรียก external API เพื่อดึง item details (รวม bookmarks)
+    - OrganicRefreshPlanner ให้คะแนน content ตาม staleness, view velocity,
+      ad spend ล่าสุด และวันหมดอายุ แล้วเลือก top max_content_per_job (API budget ต่อรอบ)
+      (โพสต์ที่เก่ากว่า organic_refresh_max_days ถูกเลือกได้ถ้ายังมี spend / ใกล้หมดอายุ)
+    - เรียก external API เพื่อดึง item details (รวม bookmarks) โดยไม่อ่าน cache
     - อัปเดต metrics + PFM ผ่าน TikTokService.update_content_details
+    - บันทึก last_refreshed_at + velocity ลง content_refresh_stats
     """
+    from app.services.organic_refresh_planner import OrganicRefreshPlanner
+
     task = log_task_start("refresh_tiktok_organic", "sync")
     db = SessionLocal()
 
@@ -172,23 +205,8 @@ def refresh_tiktok_organic() -> dict:
         max_days = cfg["organic_refresh_max_days"]
         max_items = cfg["max_content_per_job"]
 
-        now = datetime.utcnow()
-        min_created_at = now - timedelta(days=max_days)
-
-        # เลือกเฉพาะ TikTok content ที่ยังไม่ถูกลบ และอยู่ในช่วงวันที่กำหนด
-        query = (
-            db.query(Content)
-            .filter(
-                Content.platform == PlatformEnum.TIKTOK,
-                Content.deleted_at.is_(None),
-                Content.platform_created_at != None,  # noqa: E711
-                Content.platform_created_at >= min_created_at,
-            )
-            .order_by(Content.platform_created_at.desc())
-        )
-
-        contents: List[Content] = query.limit(max_items).all()
-        item_ids = [c.platform_post_id for c in contents if c.platform_post_id]
+        planned = OrganicRefreshPlanner.plan(db, budget=max_items, max_age_days=max_days)
+        item_ids = [p["item_id"] for p in planned]
 
         if not item_ids:
             msg = "No TikTok contents selected for organic refresh"
@@ -197,20 +215,19 @@ def refresh_tiktok_organic() -> dict:
 
         print(
             f"Refreshing TikTok organic metrics for {len(item_ids)} items "
-            f"(max_days={max_days}, max_items={max_items})..."
+            f"(max_days={max_days}, max_items={max_items}, "
+            f"top priority={planned[0]['priority']}, cutoff={planned[-1]['priority']})..."
         )
 
-        # ดึงรายละเอียด item ทั้งหมด (รวม bookmarks)
-        item_details, failed_ids = TikTokService.get_item_details_concurrently(
-            item_ids, max_workers=10
+        # ดึงรายละเอียด item (รวม bookmarks) แล้วอัปเดต content เป็นชุดระหว่างที่ยังดึงอยู่
+        # planner เลือกเฉพาะ item ที่ค้างนานพอแล้ว → ดึงใหม่จริง (ไม่อ่าน cache)
+        updated_count, failed_ids = TikTokService.fetch_and_update_content_details(
+            item_ids, db, use_cache=False
         )
 
-        # อัปเดต content ใน DB ด้วยรายละเอียดที่ได้มา
-        updated_count = 0
-        if item_details:
-            updated_count = TikTokService.update_content_details(item_details, db)
+        OrganicRefreshPlanner.record_results(db, planned, failed_ids)
 
-        failed_count = len(failed_ids) + max(len(item_ids) - updated_count, 0)
+        failed_count = len(failed_ids) + max(len(item_ids) - len(failed_ids) - updated_count, 0)
 
         log_task_complete(
             task.id,
@@ -309,6 +326,7 @@ def sync_tiktok_ads(days: int = 7) -> dict:
         detail_failed = result.get("item_detail_failed", 0)
         unresolved = result.get("item_ids_unresolved", 0)
         total_spend = result.get("total_spend_synced", 0)
+        account_errors = result.get("account_errors") or []
 
         msg = (
             f"Synced TikTok ads for {ad_accounts} ad_accounts, "
@@ -319,27 +337,34 @@ def sync_tiktok_ads(days: int = 7) -> dict:
             f"item_detail_failed={detail_failed}, "
             f"item_ids_unresolved={unresolved}"
         )
+        if account_errors:
+            msg += f", account_errors={len(account_errors)}: " + "; ".join(
+                f"{e['ad_account_id']}: {e['error']}" for e in account_errors
+            )
 
         # processed = จำนวน Ads, success = จำนวน content ที่ถูก map อย่างน้อย 1 ad
-        # failed โฟกัสที่ item detail failed + unresolved item_ids
+        # failed = item detail failed + unresolved item_ids + account ที่ sync ไม่สำเร็จ
+        # account ล้มแม้แค่ 1 → task FAILED (ไม่ให้ดูเหมือน sync ครบ)
+        failed = detail_failed + unresolved + len(account_errors)
         log_task_complete(
             task.id,
-            True,
+            not account_errors,
             msg,
             items_processed=ads,
             items_success=mapped,
-            items_failed=detail_failed + unresolved,
+            items_failed=failed,
         )
 
         return {
             "processed": ads,
             "success": mapped,
-            "failed": detail_failed + unresolved,
+            "failed": failed,
             "ads_without_item_id": ads_without_item,
             "item_ids_total": item_ids_total,
             "item_detail_failed": detail_failed,
             "item_ids_unresolved": unresolved,
             "total_spend_synced": total_spend,
+            "account_errors": account_errors,
         }
 
     except Exception as e:
@@ -366,14 +391,13 @@ def sync_campaigns_adgroups() -> dict:
     
     สำหรับใช้กับหน้า Create Ads ให้โหลดเร็วขึ้น (query จาก DB แทน API)
     
-    Flow:
-    1. ดึง campaigns ทุก ad account → upsert เข้า campaigns table
-    2. ดึง adgroups ทุก ad account → upsert เข้า ad_groups table
+    Flow (ต่อ ad account ผ่าน TikTokAdsService.sync_metadata_delta):
+    1. ดึงเฉพาะ campaigns / adgroups / ads ที่ modify_time ใหม่กว่า high-water mark
+    2. upsert เข้า campaigns / ad_groups / ads แล้วเลื่อน mark
+    3. ทุก TIKTOK_METADATA_FULL_SYNC_HOURS ดึง campaigns / adgroups ทั้งหมดเป็น full reconciliation
     """
-    from datetime import timezone
-
-    from app.models import AdAccount, AdGroup, Campaign
-    from app.models.enums import AdAccountStatus, AdStatus
+    from app.models import AdAccount
+    from app.models.enums import AdAccountStatus
     
     task = log_task_start("sync_campaigns_adgroups", "sync")
     
@@ -395,134 +419,46 @@ def sync_campaigns_adgroups() -> dict:
         
         total_campaigns = 0
         total_adgroups = 0
-        
-        def truncate(value, max_len=255):
-            if value is None:
-                return None
-            s = str(value)
-            return s if len(s) <= max_len else s[:max_len]
-        
-        def map_status(operation_status):
-            if operation_status == "ENABLE":
-                return AdStatus.ACTIVE
-            elif operation_status == "DISABLE":
-                return AdStatus.PAUSED
-            return AdStatus.ACTIVE
+        total_ads = 0
+        full_syncs = 0
+        errors = []
         
         for ad_account in ad_accounts:
             print(f"  [{ad_account.name}] Syncing campaigns & adgroups...")
+            try:
+                r = TikTokAdsService.sync_metadata_delta(db, ad_account)
+            except Exception as e:
+                db.rollback()
+                print(f"    Error: {e}")
+                errors.append({"ad_account_id": ad_account.id, "name": ad_account.name, "error": str(e)})
+                continue
             
-            # === Sync Campaigns ===
-            campaigns_raw = TikTokAdsService.fetch_campaigns(ad_account.external_account_id)
-            camp_created = 0
-            
-            for camp_data in campaigns_raw:
-                campaign_id = camp_data.get("campaign_id")
-                if not campaign_id:
-                    continue
-                
-                campaign = (
-                    db.query(Campaign)
-                    .filter(
-                        Campaign.platform == PlatformEnum.TIKTOK,
-                        Campaign.ad_account_id == ad_account.id,
-                        Campaign.external_campaign_id == campaign_id,
-                    )
-                    .first()
-                )
-                
-                if not campaign:
-                    campaign = Campaign(
-                        platform=PlatformEnum.TIKTOK,
-                        ad_account_id=ad_account.id,
-                        external_campaign_id=campaign_id,
-                        name=truncate(camp_data.get("campaign_name") or f"Campaign {campaign_id}"),
-                    )
-                    db.add(campaign)
-                    camp_created += 1
-                else:
-                    if camp_data.get("campaign_name"):
-                        campaign.name = truncate(camp_data["campaign_name"])
-                
-                campaign.objective_raw = camp_data.get("objective_type")
-                campaign.status = map_status(camp_data.get("operation_status"))
-                campaign.daily_budget = camp_data.get("budget")
-                campaign.last_synced_at = datetime.now(timezone.utc)
-            
-            db.commit()
-            total_campaigns += len(campaigns_raw)
-            
-            # === Sync AdGroups ===
-            adgroups_raw = TikTokAdsService.fetch_adgroups(ad_account.external_account_id)
+            total_campaigns += r.get("campaigns", 0)
+            total_adgroups += r.get("adgroups", 0)
+            total_ads += r.get("ads", 0)
+            if r.get("full"):
+                full_syncs += 1
             
-            # Pre-load campaigns for mapping
-            campaigns = (
-                db.query(Campaign)
-                .filter(
-                    Campaign.ad_account_id == ad_account.id,
-                    Campaign.platform == PlatformEnum.TIKTOK,
-                )
-                .all()
+            print(
+                f"    Campaigns: {r.get('campaigns', 0)}, AdGroups: {r.get('adgroups', 0)} "
+                f"({r.get('adgroups_skipped', 0)} skipped), Ads: {r.get('ads', 0)} "
+                f"[{'full' if r.get('full') else 'delta'}]"
             )
-            campaign_map = {c.external_campaign_id: c for c in campaigns}
-            
-            ag_created = 0
-            ag_skipped = 0
-            
-            for ag_data in adgroups_raw:
-                adgroup_id = ag_data.get("adgroup_id")
-                campaign_ext_id = ag_data.get("campaign_id")
-                
-                if not adgroup_id or not campaign_ext_id:
-                    continue
-                
-                campaign = campaign_map.get(campaign_ext_id)
-                if not campaign:
-                    ag_skipped += 1
-                    continue
-                
-                adgroup = (
-                    db.query(AdGroup)
-                    .filter(
-                        AdGroup.platform == PlatformEnum.TIKTOK,
-                        AdGroup.campaign_id == campaign.id,
-                        AdGroup.external_adgroup_id == adgroup_id,
-                    )
-                    .first()
-                )
-                
-                if not adgroup:
-                    adgroup = AdGroup(
-                        platform=PlatformEnum.TIKTOK,
-                        ad_account_id=ad_account.id,
-                        campaign_id=campaign.id,
-                        external_adgroup_id=adgroup_id,
-                        name=truncate(ag_data.get("adgroup_name") or f"AdGroup {adgroup_id}"),
-                    )
-                    db.add(adgroup)
-                    ag_created += 1
-                else:
-                    if ag_data.get("adgroup_name"):
-                        adgroup.name = truncate(ag_data["adgroup_name"])
-                
-                adgroup.optimization_goal_raw = ag_data.get("optimization_goal")
-                adgroup.status = map_status(ag_data.get("operation_status"))
-                adgroup.daily_budget = ag_data.get("budget")
-                adgroup.last_synced_at = datetime.now(timezone.utc)
-            
-            db.commit()
-            total_adgroups += len(adgroups_raw)
-            
-            print(f"    Campaigns: {len(campaigns_raw)} ({camp_created} new)")
-            print(f"    AdGroups: {len(adgroups_raw)} ({ag_created} new, {ag_skipped} skipped)")
         
-        msg = f"Synced {total_campaigns} campaigns, {total_adgroups} adgroups from {len(ad_accounts)} accounts"
-        log_task_complete(task.id, True, msg, total_campaigns + total_adgroups, total_campaigns + total_adgroups, 0)
+        msg = (
+            f"Synced {total_campaigns} campaigns, {total_adgroups} adgroups, {total_ads} ads "
+            f"from {len(ad_accounts)} accounts ({full_syncs} full, {len(errors)} errors)"
+        )
+        changed = total_campaigns + total_adgroups + total_ads
+        log_task_complete(task.id, True, msg, changed, changed, len(errors))
         
         return {
             "campaigns": total_campaigns,
             "adgroups": total_adgroups,
+            "ads": total_ads,
             "accounts": len(ad_accounts),
+            "full_syncs": full_syncs,
+            "errors": errors,
         }
         
     except Exception as e:
@@ -534,13 +470,14 @@ def sync_campaigns_adgroups() -> dict:
 
 def sync_ads_spend_data():
     """
-    Sync ads spend data from TikTok Report API (Lifetime spend)
+    Sync ads spend data (Lifetime spend)
     
     This task should run HOURLY to keep ad costs up-to-date.
     
     Flow:
     1. ดึง advertiser_ids จากฐานข้อมูล
-    2. เรียก TikTok Report API เพื่อดึง lifetime spend ของทุก ad
+    2. ดึง lifetime spend ของทุก ad ผ่าน SpendLedgerService
+       (ad_performance_daily + delta วันนี้; fallback เป็น lifetime report ถ้า ledger ยังไม่พร้อม)
     3. อัพเดท ad_total_cost ใน ads_details ของ Content
     4. คำนวณและอัพเดท ads_total_cost รวมของ Content
     """
@@ -551,7 +488,7 @@ def sync_ads_spend_data():
         import json
 
         from app.models import AdAccount
-        from app.services.tiktok_ads_service import TikTokAdsService
+        from app.services.spend_ledger_service import SpendLedgerService
         
         # Get all active TikTok ad accounts
         accounts = db.query(AdAccount).filter(
@@ -569,7 +506,7 @@ def sync_ads_spend_data():
         for account in accounts:
             print(f"  Fetching spend data for account: {account.name} ({account.external_account_id})")
             try:
-                spend_data = TikTokAdsService.fetch_lifetime_spend(account.external_account_id)
+                spend_data = SpendLedgerService.get_lifetime_spend(db, account)
                 for ad_id, spend in spend_data.items():
                     if ad_id not in all_ad_spend:
                         all_ad_spend[ad_id] = 0.0
@@ -707,7 +644,9 @@ def update_all_ads_total_cost():
         # Handle both {'tiktok': [...]} and [...] formats
         result = db.execute(text("""
             UPDATE contents
-            SET ads_total_cost = COALESCE(subquery.total_cost, 0)
+            SET ads_total_cost = COALESCE(subquery.total_cost, 0),
+                updated_at = NOW(),
+                content_version = nextval('content_version_seq')
             FROM (
                 SELECT 
                     id,
@@ -744,6 +683,7 @@ def update_all_ads_total_cost():
                 GROUP BY id
             ) AS subquery
             WHERE contents.id = subquery.id
+              AND contents.ads_total_cost IS DISTINCT FROM COALESCE(subquery.total_cost, 0)
         """))
         
         db.commit()
@@ -803,6 +743,7 @@ def sync_tiktok_ad_performance_daily(chunk_days: int = 2, default_start_days: in
         total_upserted = 0
         advanced = 0
         errors = []
+        closed_start = closed_end = None
 
         for acc in accounts:
             cfg = acc.config if isinstance(acc.config, dict) else {}
@@ -831,22 +772,37 @@ def sync_tiktok_ad_performance_daily(chunk_days: int = 2, default_start_days: in
                 total_rows_fetched += int(result.get("rows_fetched") or 0)
                 total_upserted += int(result.get("inserted_or_updated") or 0)
 
-                # advance cursor only on success
-                new_cfg = dict(cfg)
-                new_cfg["tiktok_daily_cursor"] = end_str
-                acc.config = new_cfg
-                db.add(acc)
+                # advance cursor only on success (เขียนเฉพาะ key ของตัวเอง ไม่ทับ tiktok_hourly_cursor)
+                patch = {"tiktok_daily_cursor": end_str}
+                if not cursor:
+                    # วันแรกที่ ledger มีข้อมูล (ใช้ตัดสินว่า SpendLedgerService ใช้ ledger ได้หรือยัง)
+                    patch["tiktok_daily_start"] = start_str
+                TikTokAdsService.update_account_config(db, acc, patch)
                 db.commit()
                 advanced += 1
+                closed_start = min(closed_start or start, start)
+                closed_end = max(closed_end or end, end)
             except Exception as e:
                 db.rollback()
                 errors.append({"ad_account_id": acc.id, "name": acc.name, "error": str(e)})
                 continue
 
+        # วันที่เพิ่งปิดเข้า ledger → reconcile DailyBudget.actual_spend จากยอดปิดวัน
+        # (ค่า intraday ตอน 23:45 ไม่ครบวัน)
+        budgets_reconciled = 0
+        if closed_start:
+            from app.services.intraday_spend_service import IntradaySpendService
+
+            day = closed_start
+            while day <= closed_end:
+                budgets_reconciled += IntradaySpendService.update_daily_budget_actual_spend(db, day)
+                day += timedelta(days=1)
+
         return {
             "accounts_total": len(accounts),
             "accounts_processed": processed_accounts,
             "cursor_advanced": advanced,
+            "daily_budgets_reconciled": budgets_reconciled,
             "rows_fetched": total_rows_fetched,
             "rows_upserted": total_upserted,
             "errors": errors,
@@ -855,6 +811,55 @@ def sync_tiktok_ad_performance_daily(chunk_days: int = 2, default_start_days: in
         db.close()
 
 
+def sync_tiktok_ad_performance_hourly(max_accounts: int = 0) -> dict:
+    """
+    Intraday TikTok ad performance (วันนี้เท่านั้น) into `ad_performance_hourly`.
+
+    - 1 hourly report ต่อ account (dimensions ad_id + stat_time_hour)
+    - ลบแถวของวันที่ปิดเข้า ad_performance_daily แล้ว
+    - rollup → ABXAdgroup.today_spend, DailyBudget.actual_spend (วันนี้)
+    """
+    from app.services.intraday_spend_service import IntradaySpendService
+
+    return IntradaySpendService.sync_all_today(max_accounts=max_accounts)
+
+
+def backfill_tiktok_ad_performance_daily_report_task(default_start_days: int = 365, max_accounts: int = 0) -> dict:
+    """
+    Backfill `ad_performance_daily` ช่วงยาวผ่าน TikTok async report task
+
+    - ใช้ cursor เดียวกับ sync_tiktok_ad_performance_daily (tiktok_daily_cursor)
+    - 1 task ต่อ window (TIKTOK_REPORT_TASK_MAX_DAYS วัน) แทนการดึงทีละ 2 วัน
+    - cursor เลื่อนพร้อมข้อมูลใน commit เดียวกัน (window ที่ล้ม = ไม่ขยับ)
+    """
+    from app.services.tiktok_report_task_service import TikTokReportTaskService
+
+    task = log_task_start("backfill_tiktok_ad_daily_report_task", "sync")
+    try:
+        result = TikTokReportTaskService.backfill_all(
+            default_start_days=default_start_days,
+            max_accounts=max_accounts,
+        )
+        errors = result.get("errors") or []
+        msg = (
+            f"Report-task backfill: {result['accounts_processed']}/{result['accounts_total']} accounts, "
+            f"windows={result['windows']}, rows={result['rows_fetched']}, "
+            f"upserted={result['rows_upserted']}, errors={len(errors)}"
+        )
+        log_task_complete(
+            task.id,
+            not errors or result["accounts_processed"] > 0,
+            msg,
+            items_processed=result["accounts_total"],
+            items_success=result["accounts_processed"],
+            items_failed=len(errors),
+        )
+        return result
+    except Exception as e:
+        log_task_complete(task.id, False, str(e))
+        raise
+
+
 def aggregate_content_cost_from_ad_performance_daily(platform: str = "TIKTOK", lookback_days: int = 7) -> dict:
     """
     Aggregate spend from `ad_performance_daily` to `contents.ads_total_cost`.
@@ -902,10 +907,13 @@ def aggregate_content_cost_from_ad_performance_daily(platform: str = "TIKTOK", l
                 GROUP BY a.content_id
             )
             UPDATE contents c
-            SET ads_total_cost = agg.total_spend
+            SET ads_total_cost = agg.total_spend,
+                updated_at = NOW(),
+                content_version = nextval('content_version_seq')
             FROM agg
             WHERE c.id = agg.content_id
               AND c.deleted_at IS NULL
+              AND c.ads_total_cost IS DISTINCT FROM agg.total_spend
             """
         )
 
@@ -941,7 +949,7 @@ def update_content_expire_dates():
     อัปเดต expire_date สำหรับทุก Content
     
     Logic (based on old system hourly_tasks.py):
-    1. INFLUENCER content: ดึง auth_end_time จาก TikTok Spark Ads API (tt_video/list)
+    1. INFLUENCER content: auth_end_time จาก local index tiktok_spark_posts (tt_video/list)
        - วันหมดอายุ = วันที่ authorization สำหรับ Spark Ads หมดอายุ
     2. PAGE/STAFF/UGC content: ใช้ platform_created_at + 2 years
        - Official content ใช้ได้ตลอด (2 ปี)
@@ -955,59 +963,23 @@ def update_content_expire_dates():
         from dateutil.relativedelta import relativedelta
 
         from app.models.enums import ContentSource
-        from app.services.tiktok_ads_service import TikTokAdsService
+        from app.services.spark_post_index_service import SparkPostIndexService
         
         # ============================================
-        # Step 1: ดึง Spark Ad Posts จากทุก ad account
-        # (สำหรับ INFLUENCER content)
+        # Step 1: refresh local index ของ Spark Ad Posts (tiktok_spark_posts)
+        # เฉพาะ account ที่ข้อมูลเก่า, หลาย account พร้อมกัน
         # ============================================
-        print("  Fetching spark ad posts for expire dates...")
-        spark_posts_map = TikTokAdsService.fetch_all_spark_ad_posts()
+        print("  Refreshing spark ad post index for expire dates...")
+        SparkPostIndexService.refresh_all()
         
-        updated_influencer = 0
         updated_official = 0
         
         # ============================================
-        # Step 2: อัปเดต INFLUENCER content จาก auth_end_time
+        # Step 2: อัปเดต INFLUENCER content จาก auth_end_time (1 UPDATE join)
         # ============================================
-        if spark_posts_map:
-            # Get all TikTok contents that might be influencer content
-            influencer_contents = (
-                db.query(Content)
-                .filter(
-                    Content.platform == PlatformEnum.TIKTOK,
-                    Content.deleted_at.is_(None),
-                    Content.content_source == ContentSource.INFLUENCER,
-                )
-                .all()
-            )
-            
-            for content in influencer_contents:
-                item_id = content.platform_post_id
-                if item_id and item_id in spark_posts_map:
-                    spark_post = spark_posts_map[item_id]
-                    auth_end_time = spark_post.get("auth_end_time")
-                    
-                    if auth_end_time:
-                        try:
-                            # auth_end_time อาจเป็น "2025-12-31 23:59:59" หรือ timestamp
-                            if isinstance(auth_end_time, str):
-                                # Parse datetime string to date
-                                from datetime import datetime as dt
-                                expire_dt = dt.strptime(auth_end_time.split(" ")[0], "%Y-%m-%d")
-                                content.expire_date = expire_dt.date()
-                            elif isinstance(auth_end_time, (int, float)):
-                                # Unix timestamp
-                                from datetime import datetime as dt
-                                expire_dt = dt.fromtimestamp(auth_end_time)
-                                content.expire_date = expire_dt.date()
-                            
-                            updated_influencer += 1
-                        except Exception as e:
-                            print(f"    Error parsing auth_end_time for content {content.id}: {e}")
-            
-            db.commit()
-            print(f"  Updated expire_date for {updated_influencer} influencer contents")
+        updated_influencer = SparkPostIndexService.apply_influencer_expire_dates(db)
+        db.commit()
+        print(f"  Updated expire_date for {updated_influencer} influencer contents")
         
         # ============================================
         # Step 3: อัปเดต content ที่ไม่ใช่ INFLUENCER (PAGE/STAFF/UGC)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Migration script: unique keys สำหรับ campaigns / ad_groups / ads (no Alembic).
+
+Why:
+- TikTokAdsService.sync_ads_for_account ใช้ INSERT ... ON CONFLICT DO UPDATE
+  ซึ่งต้องมี unique index บน (platform, ad_account_id, external_*_id)
+
+Steps:
+1) backfill ad_account_id ที่ยังว่าง (ad_groups ← campaigns, ads ← ad_groups)
+2) รวมแถวซ้ำ (เก็บ id ต่ำสุด, ย้าย FK ที่ชี้มาไปหาแถวที่เก็บไว้, ลบแถวที่เหลือ)
+3) สร้าง unique index
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/add_ads_hierarchy_unique_constraints.py           # dry-run: แสดงจำนวนแถวซ้ำ
+  python scripts/add_ads_hierarchy_unique_constraints.py --apply
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+# (table, external id column, unique index name)
+TARGETS = [
+    ("campaigns", "external_campaign_id", "uq_campaigns_platform_account_external"),
+    ("ad_groups", "external_adgroup_id", "uq_ad_groups_platform_account_external"),
+    ("ads", "external_ad_id", "uq_ads_platform_account_external"),
+]
+
+
+def _referencing_columns(db, table: str):
+    """หา (table, column) ทั้งหมดที่มี FK ชี้มาที่ table.id"""
+    rows = db.execute(
+        text(
+            """
+            SELECT kcu.table_name, kcu.column_name
+            FROM information_schema.referential_constraints rc
+            JOIN information_schema.key_column_usage kcu
+              ON kcu.constraint_name = rc.constraint_name
+            JOIN information_schema.constraint_column_usage ccu
+              ON ccu.constraint_name = rc.unique_constraint_name
+            WHERE ccu.table_name = :table AND ccu.column_name = 'id'
+            """
+        ),
+        {"table": table},
+    ).all()
+    return [(r[0], r[1]) for r in rows]
+
+
+def _duplicate_pairs(db, table: str, ext_col: str):
+    """คืน [(duplicate_id, keeper_id)] ของแถวที่ซ้ำกันตาม unique key"""
+    rows = db.execute(
+        text(
+            f"""
+            SELECT id, keeper_id FROM (
+                SELECT id,
+                       MIN(id) OVER (PARTITION BY platform, ad_account_id, {ext_col}) AS keeper_id
+                FROM {table}
+                WHERE ad_account_id IS NOT NULL
+            ) t
+            WHERE id <> keeper_id
+            """
+        )
+    ).all()
+    return [(r[0], r[1]) for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", action="store_true", help="แก้ข้อมูลและสร้าง index จริง")
+    args = parser.parse_args()
+
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        # 1) backfill ad_account_id
+        missing_ag = db.execute(
+            text("SELECT COUNT(*) FROM ad_groups WHERE ad_account_id IS NULL")
+        ).scalar()
+        missing_ad = db.execute(
+            text("SELECT COUNT(*) FROM ads WHERE ad_account_id IS NULL")
+        ).scalar()
+        print(f"ad_groups without ad_account_id: {missing_ag}")
+        print(f"ads without ad_account_id: {missing_ad}")
+
+        if args.apply:
+            db.execute(
+                text(
+                    """
+                    UPDATE ad_groups ag SET ad_account_id = c.ad_account_id
+                    FROM campaigns c
+                    WHERE ag.campaign_id = c.id AND ag.ad_account_id IS NULL
+                    """
+                )
+            )
+            db.execute(
+                text(
+                    """
+                    UPDATE ads a SET ad_account_id = ag.ad_account_id
+                    FROM ad_groups ag
+                    WHERE a.ad_group_id = ag.id AND a.ad_account_id IS NULL
+                    """
+                )
+            )
+
+        # 2) merge duplicates + 3) unique index
+        for table, ext_col, index_name in TARGETS:
+            existing = {ix["name"] for ix in inspector.get_indexes(table)}
+            existing |= {uc["name"] for uc in inspector.get_unique_constraints(table)}
+            if index_name in existing:
+                print(f"OK: {index_name} already exists")
+                continue
+
+            pairs = _duplicate_pairs(db, table, ext_col)
+            print(f"{table}: {len(pairs)} duplicate rows")
+            if not args.apply:
+                continue
+
+            if pairs:
+                refs = _referencing_columns(db, table)
+                for ref_table, ref_col in refs:
+                    for dup_id, keeper_id in pairs:
+                        db.execute(
+                            text(f"UPDATE {ref_table} SET {ref_col} = :keeper WHERE {ref_col} = :dup"),
+                            {"keeper": keeper_id, "dup": dup_id},
+                        )
+                db.execute(
+                    text(f"DELETE FROM {table} WHERE id = ANY(:ids)"),
+                    {"ids": [dup_id for dup_id, _ in pairs]},
+                )
+                print(f"  merged {len(pairs)} rows (FK refs: {refs})")
+
+            db.execute(
+                text(
+                    f"CREATE UNIQUE INDEX {index_name} "
+                    f"ON {table} (platform, ad_account_id, {ext_col});"
+                )
+            )
+            print(f"OK: Created {index_name}")
+
+        if args.apply:
+            db.commit()
+        else:
+            print("Dry-run only. Re-run with --apply to migrate.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Migration script: เพิ่ม platform_data column ใน ads table
+
+platform_data: JSON snapshot ของ ad metadata จาก TikTok /ad/get/ (รวม modify_time)
+ใช้โดย delta metadata sync (TikTokAdsService.sync_metadata_delta) เพื่อไม่ต้องดึง
+metadata ของ ad ที่ไม่เปลี่ยนซ้ำทุกรอบ
+
+Usage:
+    python scripts/add_ads_platform_data_column.py
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import text
+from app.core.database import SessionLocal
+
+
+def add_ads_platform_data_column():
+    """เพิ่ม platform_data column ใน ads table"""
+
+    db = SessionLocal()
+    try:
+        print("🔄 กำลังเพิ่ม ads.platform_data column...")
+
+        result = db.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'ads'
+            AND column_name = 'platform_data'
+        """)).fetchone()
+
+        if result:
+            print("✅ ads.platform_data column มีอยู่แล้ว ไม่ต้องเพิ่ม")
+            return
+
+        db.execute(text("ALTER TABLE ads ADD COLUMN platform_data JSON"))
+        db.commit()
+
+        print("✅ เพิ่ม ads.platform_data column สำเร็จ!")
+        print("   - Type: JSON (nullable)")
+        print("   - แถวเดิมจะถูกเติมเองตอน sync ads รอบถัดไป")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ เกิดข้อผิดพลาด: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    add_ads_platform_data_column()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Migration script: unique key (platform, platform_post_id) บนตาราง contents (no Alembic).
+
+Why:
+- TikTokService.sync_videos_to_db ใช้ INSERT ... ON CONFLICT DO UPDATE
+  ซึ่งต้องมี unique index บน (platform, platform_post_id)
+
+Steps:
+1) รวมแถวซ้ำ (เก็บ id ต่ำสุด, ย้าย FK ที่ชี้มาไปหาแถวที่เก็บไว้, ลบแถวที่เหลือ)
+2) สร้าง unique index
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/add_contents_platform_post_unique.py           # dry-run: แสดงจำนวนแถวซ้ำ
+  python scripts/add_contents_platform_post_unique.py --apply
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+INDEX_NAME = "uq_contents_platform_post"
+
+
+def _referencing_columns(db):
+    """หา (table, column) ทั้งหมดที่มี FK ชี้มาที่ contents.id"""
+    rows = db.execute(
+        text(
+            """
+            SELECT kcu.table_name, kcu.column_name
+            FROM information_schema.referential_constraints rc
+            JOIN information_schema.key_column_usage kcu
+              ON kcu.constraint_name = rc.constraint_name
+            JOIN information_schema.constraint_column_usage ccu
+              ON ccu.constraint_name = rc.unique_constraint_name
+            WHERE ccu.table_name = 'contents' AND ccu.column_name = 'id'
+            """
+        )
+    ).all()
+    return [(r[0], r[1]) for r in rows]
+
+
+def _duplicate_pairs(db):
+    """
+    คืน [(duplicate_id, keeper_id)] ของแถวที่ซ้ำกันตาม (platform, platform_post_id)
+    เก็บแถวที่ยังไม่ถูก soft delete ก่อน แล้วค่อยดู id ต่ำสุด
+    """
+    rows = db.execute(
+        text(
+            """
+            SELECT id, keeper_id FROM (
+                SELECT id,
+                       FIRST_VALUE(id) OVER (
+                           PARTITION BY platform, platform_post_id
+                           ORDER BY (deleted_at IS NOT NULL), id
+                       ) AS keeper_id
+                FROM contents
+            ) t
+            WHERE id <> keeper_id
+            """
+        )
+    ).all()
+    return [(r[0], r[1]) for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", action="store_true", help="แก้ข้อมูลและสร้าง index จริง")
+    args = parser.parse_args()
+
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        existing = {ix["name"] for ix in inspector.get_indexes("contents")}
+        existing |= {uc["name"] for uc in inspector.get_unique_constraints("contents")}
+        if INDEX_NAME in existing:
+            print(f"OK: {INDEX_NAME} already exists")
+            return
+
+        pairs = _duplicate_pairs(db)
+        print(f"contents: {len(pairs)} duplicate rows")
+        if not args.apply:
+            print("Dry-run only. Re-run with --apply to migrate.")
+            return
+
+        if pairs:
+            refs = _referencing_columns(db)
+            for ref_table, ref_col in refs:
+                for dup_id, keeper_id in pairs:
+                    db.execute(
+                        text(f"UPDATE {ref_table} SET {ref_col} = :keeper WHERE {ref_col} = :dup"),
+                        {"keeper": keeper_id, "dup": dup_id},
+                    )
+            db.execute(
+                text("DELETE FROM contents WHERE id = ANY(:ids)"),
+                {"ids": [dup_id for dup_id, _ in pairs]},
+            )
+            print(f"  merged {len(pairs)} rows (FK refs: {refs})")
+
+        db.execute(
+            text(f"CREATE UNIQUE INDEX {INDEX_NAME} ON contents (platform, platform_post_id);")
+        )
+        db.commit()
+        print(f"OK: Created {INDEX_NAME}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
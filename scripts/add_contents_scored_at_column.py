@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Migration script: contents.scored_at / content_version / scored_version + partial index
+สำหรับ incremental scoring (no Alembic).
+
+Why:
+- score_tasks.calculate_all_scores คำนวณเฉพาะ content ที่ content_version > scored_version
+  (หรือยังไม่เคยคำนวณ) แทนการคำนวณทุกแถวทุก 30 นาที
+- content_version มาจาก sequence content_version_seq (bump ทุกครั้งที่แถวถูกเขียน)
+  ไม่ใช้ updated_at > scored_at เพราะ NOW() = เวลาเริ่ม transaction → transaction ยาว ๆ หลุด watermark
+- partial index ix_contents_score_dirty เก็บเฉพาะแถวที่ต้องคำนวณ → หาได้โดยไม่ scan ทั้งตาราง
+  (รันซ้ำได้ - index เดิมที่ใช้ updated_at > scored_at ถูกสร้างใหม่)
+
+หลังรัน: scored_version เป็น NULL ทุกแถว → รอบแรกของ calculate_all_scores จะคำนวณทั้งหมด 1 ครั้ง
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/add_contents_scored_at_column.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import engine
+
+
+INDEX_NAME = "ix_contents_score_dirty"
+
+
+def main():
+    with engine.begin() as conn:
+        print("🔄 เพิ่ม contents.scored_at ...")
+        conn.execute(text("ALTER TABLE contents ADD COLUMN IF NOT EXISTS scored_at TIMESTAMPTZ NULL"))
+
+        print("🔄 เพิ่ม content_version_seq + contents.content_version / scored_version ...")
+        conn.execute(text("CREATE SEQUENCE IF NOT EXISTS content_version_seq"))
+        conn.execute(
+            text(
+                "ALTER TABLE contents ADD COLUMN IF NOT EXISTS content_version BIGINT NOT NULL "
+                "DEFAULT nextval('content_version_seq')"
+            )
+        )
+        conn.execute(text("ALTER TABLE contents ADD COLUMN IF NOT EXISTS scored_version BIGINT NULL"))
+
+        print(f"🔄 สร้าง partial index {INDEX_NAME} ...")
+        conn.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAME}"))
+        conn.execute(
+            text(
+                f"""
+                CREATE INDEX IF NOT EXISTS {INDEX_NAME}
+                    ON contents (id)
+                 WHERE deleted_at IS NULL
+                   AND (scored_version IS NULL OR content_version > scored_version)
+                """
+            )
+        )
+
+        pending = conn.execute(
+            text(
+                """
+                SELECT COUNT(*) FROM contents
+                 WHERE deleted_at IS NULL
+                   AND (scored_version IS NULL OR content_version > scored_version)
+                """
+            )
+        ).scalar()
+
+    print(f"✅ เสร็จ - content ที่รอคำนวณ score: {pending}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Migration script: unique key (date, product_code) บนตาราง sku_signals (no Alembic).
+
+Why:
+- SKUSignalService.aggregate ใช้ INSERT ... ON CONFLICT (date, product_code) DO UPDATE
+
+Steps:
+1) ลบแถวซ้ำ (เก็บ id สูงสุดของแต่ละ date + product_code)
+2) สร้าง unique constraint
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/add_sku_signals_unique.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+
+
+CONSTRAINT_NAME = "uq_sku_signals_date_product"
+
+
+def main():
+    db = SessionLocal()
+    try:
+        exists = db.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name"),
+            {"name": CONSTRAINT_NAME},
+        ).first()
+        if exists:
+            print(f"OK: {CONSTRAINT_NAME} already exists")
+            return
+
+        deleted = db.execute(
+            text(
+                """
+                DELETE FROM sku_signals s
+                 USING sku_signals newer
+                 WHERE newer.date = s.date
+                   AND newer.product_code = s.product_code
+                   AND newer.id > s.id
+                """
+            )
+        ).rowcount
+        print(f"Removed {deleted} duplicate sku_signals rows")
+
+        db.execute(
+            text(
+                f"ALTER TABLE sku_signals ADD CONSTRAINT {CONSTRAINT_NAME} UNIQUE (date, product_code)"
+            )
+        )
+        db.commit()
+        print(f"OK: Created {CONSTRAINT_NAME}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
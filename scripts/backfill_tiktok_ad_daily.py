@@ -17,6 +17,10 @@ Usage:
   $env:PYTHONPATH='D:\\GitHubCode\\WeBoostX2'
   python scripts/backfill_tiktok_ad_daily.py --chunk_days 2
   python scripts/backfill_tiktok_ad_daily.py --chunk_days 7 --max_accounts 1
+
+Report-task mode (ประวัติยาว ๆ: 1 async report task ต่อ TIKTOK_REPORT_TASK_MAX_DAYS วัน,
+cursor เลื่อนทีเดียวถึงเมื่อวาน):
+  python scripts/backfill_tiktok_ad_daily.py --mode report_task --default_start_days 365
 """
 
 import argparse
@@ -40,12 +44,13 @@ def _get_cursor(cfg: dict) -> str:
     return str(v) if v else ""
 
 
-def _set_cursor(db, acc: AdAccount, cursor: str):
-    cfg = acc.config if isinstance(acc.config, dict) else {}
-    cfg = dict(cfg)  # copy for SQLAlchemy change detection
-    cfg["tiktok_daily_cursor"] = cursor
-    acc.config = cfg
-    db.add(acc)
+def _set_cursor(db, acc: AdAccount, cursor: str, start: str):
+    # merge เฉพาะ key ของ backfill (ไม่ทับ config key ของ job อื่นที่เขียนพร้อมกัน)
+    patch = {"tiktok_daily_cursor": cursor}
+    if not _get_cursor(acc.config):
+        # วันแรกที่ ledger มีข้อมูล (ใช้ตัดสินว่า SpendLedgerService ใช้ ledger ได้หรือยัง)
+        patch["tiktok_daily_start"] = start
+    TikTokAdsService.update_account_config(db, acc, patch)
     db.commit()
 
 
@@ -54,8 +59,25 @@ def main():
     ap.add_argument("--chunk_days", type=int, default=2)
     ap.add_argument("--default_start_days", type=int, default=30)
     ap.add_argument("--max_accounts", type=int, default=0)
+    ap.add_argument("--mode", choices=["chunk", "report_task"], default="chunk")
     args = ap.parse_args()
 
+    if args.mode == "report_task":
+        from app.services.tiktok_report_task_service import TikTokReportTaskService
+
+        result = TikTokReportTaskService.backfill_all(
+            default_start_days=args.default_start_days,
+            max_accounts=args.max_accounts,
+        )
+        print(
+            f"accounts={result['accounts_processed']}/{result['accounts_total']} "
+            f"windows={result['windows']} rows_fetched={result['rows_fetched']} "
+            f"upserted={result['rows_upserted']}"
+        )
+        for err in result["errors"]:
+            print(f"  [ERROR] {err['name']} (id={err['ad_account_id']}): {err['error']}")
+        return
+
     chunk_days = max(1, min(31, args.chunk_days))
     default_start_days = max(1, min(3650, args.default_start_days))
 
@@ -107,7 +129,7 @@ def main():
                 print(f"  rows_fetched={result.get('rows_fetched')} upserted={result.get('inserted_or_updated')}")
 
                 # advance cursor only when API call succeeded (even if 0 rows)
-                _set_cursor(db, acc, end_str)
+                _set_cursor(db, acc, end_str, start_str)
                 print(f"  cursor -> {end_str}")
             except Exception as e:
                 print(f"  [ERROR] {acc.name} ({acc.external_account_id}) {start_str}->{end_str}: {e}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Benchmark: PFM scoring แบบทีละแถว (calculate_pfm_score) เทียบกับ PFMScoreEngine (NumPy)
+
+- สร้าง metrics สุ่ม (views แบบ log-normal ครอบทุก tier + ค่าขอบ tier พอดี + views = 0)
+- จับเวลาทั้งสองแบบ แล้วตรวจว่าผลตรงกันทุกแถว (Decimal เท่ากัน)
+- ไม่แตะ DB
+- ต้องมี numpy (requirements.txt) - ไม่มี numpy engine เป็นแค่ loop ทีละแถวเดิม
+  (ช้ากว่า calculate_pfm_score ตรง ๆ เล็กน้อย) → script ตรวจแค่ความถูกต้องแล้วไม่รายงาน speedup
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/benchmark_pfm_scoring.py --rows 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pfm_score_engine import PFM_TIERS, PFMScoreEngine
+from app.services.tiktok_service import TikTokService
+
+
+def _make_rows(n: int, seed: int):
+    rng = random.Random(seed)
+    bounds = [t[0] for t in PFM_TIERS if t[0] is not None]
+    views, likes, comments, shares, saves = [], [], [], [], []
+    for i in range(n):
+        if i % 50 == 0:
+            v = rng.choice(bounds + [0, 1])  # ขอบ tier พอดี / ไม่มี views
+        else:
+            v = int(rng.lognormvariate(10, 2.5))
+        views.append(v)
+        likes.append(int(v * rng.uniform(0, 0.15)))
+        comments.append(int(v * rng.uniform(0, 0.002)))
+        shares.append(int(v * rng.uniform(0, 0.005)))
+        saves.append(int(v * rng.uniform(0, 0.01)))
+    return views, likes, comments, shares, saves
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk", type=int, default=10000, help="ขนาด chunk เหมือน PFM_SCORE_CHUNK_SIZE")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    numpy_available = PFMScoreEngine.numpy_available()
+    if not numpy_available:
+        print("!! ไม่พบ numpy - engine ใช้ calculate_pfm_score ทีละแถว: ตรวจความถูกต้องอย่างเดียว ไม่วัด speedup")
+        print("   (pip install -r requirements.txt)")
+
+    views, likes, comments, shares, saves = _make_rows(args.rows, args.seed)
+    print(f"rows={args.rows}, chunk={args.chunk}")
+
+    started = time.perf_counter()
+    scalar = [
+        TikTokService.calculate_pfm_score(v, l, c, s, b)
+        for v, l, c, s, b in zip(views, likes, comments, shares, saves)
+    ]
+    scalar_seconds = time.perf_counter() - started
+
+    # จับเวลาเฉพาะส่วนที่ update_all ใช้จริง (compute_cents ต่อ chunk)
+    started = time.perf_counter()
+    chunks = []
+    for i in range(0, args.rows, args.chunk):
+        j = i + args.chunk
+        if PFMScoreEngine.numpy_available():
+            chunks.append(
+                PFMScoreEngine.compute_cents(views[i:j], likes[i:j], comments[i:j], shares[i:j], saves[i:j])
+            )
+        else:
+            chunks.append(
+                PFMScoreEngine.compute(views[i:j], likes[i:j], comments[i:j], shares[i:j], saves[i:j])
+            )
+    vector_seconds = time.perf_counter() - started
+
+    # ตรวจผล (ไม่นับเวลา)
+    vectorized = []
+    for i in range(0, args.rows, args.chunk):
+        j = i + args.chunk
+        vectorized.extend(
+            PFMScoreEngine.compute(views[i:j], likes[i:j], comments[i:j], shares[i:j], saves[i:j])
+        )
+    mismatches = [i for i, (a, b) in enumerate(zip(scalar, vectorized)) if a != b]
+
+    print(f"calculate_pfm_score : {scalar_seconds:8.3f}s ({args.rows / scalar_seconds:,.0f} rows/s)")
+    if numpy_available:
+        print(f"PFMScoreEngine      : {vector_seconds:8.3f}s ({args.rows / vector_seconds:,.0f} rows/s)")
+        print(f"speedup             : {scalar_seconds / vector_seconds:8.1f}x")
+    print(f"mismatches          : {len(mismatches)}")
+    for i in mismatches[:10]:
+        print(f"  row {i}: views={views[i]} scalar={scalar[i]} engine={vectorized[i]}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
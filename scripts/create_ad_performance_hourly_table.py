@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Migration script: create `ad_performance_hourly` table (no Alembic).
+
+Why:
+- Today's spend per ad / adgroup (pacing) from the DB instead of the report API.
+- Rows live only until the day is closed into `ad_performance_daily`.
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\GitHubCode\WeBoostX2'
+  python scripts/create_ad_performance_hourly_table.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+def main():
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        if "ad_performance_hourly" in inspector.get_table_names():
+            print("OK: Table ad_performance_hourly already exists")
+            return
+
+        print("Creating table ad_performance_hourly...")
+        db.execute(
+            text(
+                """
+                CREATE TABLE ad_performance_hourly (
+                    platform VARCHAR(50) NOT NULL,
+                    ad_account_id INTEGER NOT NULL REFERENCES ad_accounts(id),
+                    external_ad_id VARCHAR(100) NOT NULL,
+                    stat_hour TIMESTAMP NOT NULL,
+                    external_adgroup_id VARCHAR(100),
+                    spend NUMERIC(15,2) DEFAULT 0,
+                    impressions INTEGER DEFAULT 0,
+                    clicks INTEGER DEFAULT 0,
+                    conversions INTEGER DEFAULT 0,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (platform, ad_account_id, external_ad_id, stat_hour)
+                );
+                """
+            )
+        )
+        db.execute(text("CREATE INDEX ix_ad_perf_hourly_stat_hour ON ad_performance_hourly (stat_hour);"))
+        db.execute(
+            text("CREATE INDEX ix_ad_perf_hourly_adgroup ON ad_performance_hourly (external_adgroup_id);")
+        )
+        db.commit()
+        print("OK: Created ad_performance_hourly")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
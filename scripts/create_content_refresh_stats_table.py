@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Migration script: create `content_refresh_stats` table (no Alembic).
+
+Why:
+- Organic refresh planner needs last_refreshed_at + per-item velocity stats
+  to spend the item-detail API budget where metrics actually move.
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\GitHubCode\WeBoostX2'
+  python scripts/create_content_refresh_stats_table.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+def main():
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        if "content_refresh_stats" in inspector.get_table_names():
+            print("OK: Table content_refresh_stats already exists")
+            return
+
+        print("Creating table content_refresh_stats...")
+        db.execute(
+            text(
+                """
+                CREATE TABLE content_refresh_stats (
+                    content_id INTEGER PRIMARY KEY REFERENCES contents(id) ON DELETE CASCADE,
+                    last_refreshed_at TIMESTAMPTZ,
+                    last_attempted_at TIMESTAMPTZ,
+                    last_views BIGINT,
+                    views_per_hour DOUBLE PRECISION,
+                    refresh_count INTEGER NOT NULL DEFAULT 0,
+                    unchanged_count INTEGER NOT NULL DEFAULT 0,
+                    fail_count INTEGER NOT NULL DEFAULT 0,
+                    last_score DOUBLE PRECISION,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            )
+        )
+        db.execute(
+            text(
+                "CREATE INDEX ix_content_refresh_stats_last_refreshed_at "
+                "ON content_refresh_stats (last_refreshed_at);"
+            )
+        )
+        db.commit()
+        print("OK: Created content_refresh_stats")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
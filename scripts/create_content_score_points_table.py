@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Migration script: create `content_score_points` (partitioned by month) (no Alembic).
+
+Why:
+- score history แบบ time series: เก็บเฉพาะตอน score เปลี่ยน, คอลัมน์ตัวเลขล้วน,
+  partition รายเดือน + downsample (raw 7 วัน → รายชั่วโมง 90 วัน → รายวัน)
+  ดู app/services/score_history_service.py
+
+Steps:
+1) สร้างตารางแม่ PARTITION BY RANGE (recorded_at) + index สำหรับ compact
+2) สร้าง partition เดือนนี้ + ล่วงหน้า (SCORE_HISTORY_PARTITION_MONTHS_AHEAD) + default partition
+   (หลังจากนี้ job compact_score_history สร้างเดือนถัดไปเองทุกวัน)
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/create_content_score_points_table.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+from app.services.score_history_service import ScoreHistoryService
+
+
+def main():
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        if "content_score_points" in inspector.get_table_names():
+            print("OK: Table content_score_points already exists")
+        else:
+            print("Creating table content_score_points...")
+            db.execute(
+                text(
+                    """
+                    CREATE TABLE content_score_points (
+                        content_id INTEGER NOT NULL REFERENCES contents(id) ON DELETE CASCADE,
+                        recorded_at TIMESTAMPTZ NOT NULL,
+                        resolution SMALLINT NOT NULL DEFAULT 0,
+                        pfm_score NUMERIC(5, 2),
+                        fb_score NUMERIC(5, 2),
+                        unified_score NUMERIC(5, 2),
+                        views BIGINT,
+                        likes INTEGER,
+                        comments INTEGER,
+                        shares INTEGER,
+                        saves INTEGER,
+                        ads_total_cost NUMERIC(15, 2),
+                        PRIMARY KEY (content_id, recorded_at, resolution)
+                    ) PARTITION BY RANGE (recorded_at);
+                    """
+                )
+            )
+            db.execute(
+                text(
+                    "CREATE INDEX ix_content_score_points_pending "
+                    "ON content_score_points (recorded_at) WHERE resolution < 2;"
+                )
+            )
+            db.commit()
+            print("OK: Created content_score_points")
+
+        created = ScoreHistoryService.ensure_partitions(db)
+        print(f"OK: Partitions {', '.join(created)} (+ default)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
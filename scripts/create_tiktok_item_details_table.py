@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Migration script: create `tiktok_item_details` table (no Alembic).
+
+Why:
+- Responses of the external item-detail API cached in the DB so ads sync,
+  organic refresh and manual import don't re-fetch the same items within minutes.
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\GitHubCode\WeBoostX2'
+  python scripts/create_tiktok_item_details_table.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+def main():
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        if "tiktok_item_details" in inspector.get_table_names():
+            print("OK: Table tiktok_item_details already exists")
+            return
+
+        print("Creating table tiktok_item_details...")
+        db.execute(
+            text(
+                """
+                CREATE TABLE tiktok_item_details (
+                    item_id VARCHAR(100) PRIMARY KEY,
+                    detail JSON NOT NULL,
+                    item_created_at TIMESTAMPTZ,
+                    fetched_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            )
+        )
+        db.execute(text("CREATE INDEX ix_tiktok_item_details_fetched_at ON tiktok_item_details (fetched_at);"))
+        db.commit()
+        print("OK: Created tiktok_item_details")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
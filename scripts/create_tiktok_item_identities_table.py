@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Migration script: create `tiktok_item_identities` table (no Alembic).
+
+Why:
+- Spark Ad identity per (advertiser, item, identity_type) cached in the DB so ACE/ABX creation
+  doesn't call the identity API every time.
+- identity_type is part of the primary key so a TT_USER fallback doesn't overwrite the
+  AUTH_CODE identity of the same item. Re-running on an existing table migrates the old
+  (advertiser_id, item_id) primary key.
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\GitHubCode\WeBoostX2'
+  python scripts/create_tiktok_item_identities_table.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+def main():
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        if "tiktok_item_identities" in inspector.get_table_names():
+            pk = inspector.get_pk_constraint("tiktok_item_identities")
+            if "identity_type" in (pk.get("constrained_columns") or []):
+                print("OK: Table tiktok_item_identities already exists")
+                return
+
+            print("Adding identity_type to tiktok_item_identities primary key...")
+            db.execute(text(f"ALTER TABLE tiktok_item_identities DROP CONSTRAINT {pk['name']}"))
+            db.execute(
+                text(
+                    "ALTER TABLE tiktok_item_identities "
+                    "ADD PRIMARY KEY (advertiser_id, item_id, identity_type)"
+                )
+            )
+            db.commit()
+            print("OK: Migrated tiktok_item_identities primary key")
+            return
+
+        print("Creating table tiktok_item_identities...")
+        db.execute(
+            text(
+                """
+                CREATE TABLE tiktok_item_identities (
+                    advertiser_id VARCHAR(100) NOT NULL,
+                    item_id VARCHAR(100) NOT NULL,
+                    identity_id VARCHAR(100) NOT NULL,
+                    identity_type VARCHAR(50) NOT NULL,
+                    auth_end_time TIMESTAMPTZ,
+                    source VARCHAR(30),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (advertiser_id, item_id, identity_type)
+                );
+                """
+            )
+        )
+        db.execute(text("CREATE INDEX ix_tiktok_item_identities_item ON tiktok_item_identities (item_id);"))
+        db.commit()
+        print("OK: Created tiktok_item_identities")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
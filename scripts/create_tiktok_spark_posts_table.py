@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Migration script: create `tiktok_spark_posts` table (no Alembic).
+
+Why:
+- Spark Ad authorization data (auth_end_time etc.) indexed locally instead of
+  re-downloading /tt_video/list/ for every account each hour.
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\GitHubCode\WeBoostX2'
+  python scripts/create_tiktok_spark_posts_table.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
+
+
+def main():
+    inspector = inspect(engine)
+    db = SessionLocal()
+    try:
+        if "tiktok_spark_posts" in inspector.get_table_names():
+            print("OK: Table tiktok_spark_posts already exists")
+            return
+
+        print("Creating table tiktok_spark_posts...")
+        db.execute(
+            text(
+                """
+                CREATE TABLE tiktok_spark_posts (
+                    advertiser_id VARCHAR(100) NOT NULL,
+                    item_id VARCHAR(100) NOT NULL,
+                    ad_account_id INTEGER REFERENCES ad_accounts(id),
+                    identity_id VARCHAR(100),
+                    auth_code VARCHAR(255),
+                    auth_start_time TIMESTAMPTZ,
+                    auth_end_time TIMESTAMPTZ,
+                    ad_auth_status VARCHAR(50),
+                    is_listed BOOLEAN NOT NULL DEFAULT TRUE,
+                    first_seen_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (advertiser_id, item_id)
+                );
+                """
+            )
+        )
+        db.execute(text("CREATE INDEX ix_tiktok_spark_posts_item ON tiktok_spark_posts (item_id);"))
+        db.execute(text("CREATE INDEX ix_tiktok_spark_posts_account ON tiktok_spark_posts (ad_account_id);"))
+        db.execute(text("CREATE INDEX ix_tiktok_spark_posts_auth_end ON tiktok_spark_posts (auth_end_time);"))
+        db.commit()
+        print("OK: Created tiktok_spark_posts")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+Fake TikTok async report task API (local HTTP server) สำหรับทดสอบ TikTokReportTaskService
+
+Endpoints (ใต้ prefix อะไรก็ได้ เช่น /open_api/v1.3):
+- POST /report/task/create/    → {"code": 0, "data": {"task_id": ...}} (ตรวจ body เหมือน API จริง)
+- GET  /report/task/check/     → status = PROCESSING ไป `polls_before_success` ครั้ง แล้ว SUCCESS
+- GET  /report/task/download/  → ไฟล์ CSV ตรง ๆ หรือ (download_mode="url") JSON ที่มี download_url
+- GET  /files/<task_id>.csv    → ไฟล์ CSV (ปลายทางของ download_url)
+
+CSV ใช้ header แบบที่ TikTok export จริง ("Ad ID", "By Day", "Cost", ...) + BOM
+เพื่อตรวจ _HEADER_ALIASES / _normalize_header
+
+ใช้คู่กับ scripts/test_report_task_fake.py หรือรันแยกแล้วชี้ TIKTOK_API_BASE_URL มาที่นี่:
+
+Usage (PowerShell):
+  python scripts/fake_tiktok_report_task_api.py --port 8765
+  $env:TIKTOK_API_BASE_URL = 'http://127.0.0.1:8765/open_api/v1.3'
+  $env:TIKTOK_AD_TOKEN = 'fake-token'
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+FAKE_TOKEN = "fake-token"
+
+CSV_HEADER = ["Ad ID", "By Day", "Cost", "Impressions", "Clicks", "Reach", "Conversions"]
+DEFAULT_ROWS = [
+    ["1790000000000000001", "2025-01-01 00:00:00", "120.50", "10000", "150", "8000", "3"],
+    ["1790000000000000001", "2025-01-02 00:00:00", "98.25", "9000", "120", "7600", "2"],
+    ["1790000000000000002", "2025-01-01 00:00:00", "0", "0", "0", "0", "-"],
+]
+
+
+class FakeReportTaskState:
+    """สถานะของ fake server (task ที่สร้าง, จำนวนครั้งที่ poll, request ที่ได้รับ)"""
+
+    def __init__(
+        self,
+        rows: Optional[List[List[str]]] = None,
+        polls_before_success: int = 2,
+        download_mode: str = "csv",
+        fail_task: bool = False,
+    ):
+        self.rows = rows if rows is not None else DEFAULT_ROWS
+        self.polls_before_success = polls_before_success
+        self.download_mode = download_mode
+        self.fail_task = fail_task
+        self.tasks: Dict[str, Dict] = {}
+        self.requests: List[str] = []
+        self.lock = threading.Lock()
+
+    def csv_bytes(self) -> bytes:
+        lines = [",".join(CSV_HEADER)] + [",".join(r) for r in self.rows]
+        return ("\ufeff" + "\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def _make_handler(state: FakeReportTaskState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # noqa: A002 - signature ของ BaseHTTPRequestHandler
+            pass
+
+        def _send_json(self, payload: Dict, status: int = 200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_csv(self):
+            body = state.csv_bytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, code: int, message: str):
+            self._send_json({"code": code, "message": message, "data": {}})
+
+        def _authorized(self) -> bool:
+            if self.headers.get("Access-Token") != FAKE_TOKEN:
+                self._error(40105, "Access token is incorrect or has been revoked.")
+                return False
+            return True
+
+        def _task(self, query: Dict) -> Optional[Dict]:
+            task_id = (query.get("task_id") or [""])[0]
+            task = state.tasks.get(task_id)
+            if not task:
+                self._error(40002, f"task_id {task_id} not found")
+            return task
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            with state.lock:
+                state.requests.append(f"POST {path}")
+            if not path.endswith("/report/task/create/"):
+                self._send_json({"code": 40400, "message": "not found"}, 404)
+                return
+            if not self._authorized():
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._error(40002, "invalid JSON body")
+                return
+            for field in ("advertiser_id", "report_type", "data_level", "dimensions", "metrics", "start_date", "end_date"):
+                if not body.get(field):
+                    self._error(40002, f"{field}: Missing data for required field.")
+                    return
+            if body.get("output_format") != "CSV":
+                self._error(40002, "output_format: must be CSV")
+                return
+
+            with state.lock:
+                task_id = f"task-{len(state.tasks) + 1}"
+                state.tasks[task_id] = {"body": body, "polls": 0}
+            self._send_json({"code": 0, "message": "OK", "data": {"task_id": task_id}})
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            path, query = parts.path, parse_qs(parts.query)
+            with state.lock:
+                state.requests.append(f"GET {path}")
+
+            if path.startswith("/files/") and path.endswith(".csv"):
+                self._send_csv()
+                return
+            if not self._authorized():
+                return
+
+            if path.endswith("/report/task/check/"):
+                task = self._task(query)
+                if not task:
+                    return
+                with state.lock:
+                    task["polls"] += 1
+                    polls = task["polls"]
+                if state.fail_task:
+                    status = "FAILED"
+                elif polls > state.polls_before_success:
+                    status = "SUCCESS"
+                else:
+                    status = "PROCESSING"
+                self._send_json({"code": 0, "message": "OK", "data": {"status": status}})
+                return
+
+            if path.endswith("/report/task/download/"):
+                task_id = (query.get("task_id") or [""])[0]
+                if not self._task(query):
+                    return
+                if state.download_mode == "url":
+                    host = self.headers.get("Host")
+                    self._send_json(
+                        {"code": 0, "message": "OK", "data": {"download_url": f"http://{host}/files/{task_id}.csv"}}
+                    )
+                else:
+                    self._send_csv()
+                return
+
+            self._send_json({"code": 40400, "message": "not found"}, 404)
+
+    return Handler
+
+
+def start_fake_server(state: FakeReportTaskState, port: int = 0) -> ThreadingHTTPServer:
+    """เปิด server ใน background thread (port=0 → สุ่ม port ว่าง) ปิดด้วย server.shutdown()"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--polls_before_success", type=int, default=2)
+    ap.add_argument("--download_mode", choices=["csv", "url"], default="csv")
+    args = ap.parse_args()
+
+    state = FakeReportTaskState(
+        polls_before_success=args.polls_before_success,
+        download_mode=args.download_mode,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _make_handler(state))
+    print(f"Fake report task API on http://127.0.0.1:{args.port}/open_api/v1.3 (token={FAKE_TOKEN})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+ทดสอบว่า TikTokService.sync_videos_to_db (INSERT ... ON CONFLICT) bump contents.content_version
+→ content ที่ metrics เปลี่ยนโผล่ใน query ของ incremental scoring (score_tasks._dirty_filter)
+
+ตรวจ:
+1) upsert ครั้งแรก → content ใหม่ยังไม่เคยคำนวณ → dirty
+2) ทำเหมือนคำนวณ score แล้ว (scored_version = content_version) → ไม่ dirty
+3) upsert ด้วยค่าเดิม → แถวไม่ถูกเขียนทับ → ยังไม่ dirty
+4) upsert ด้วย views ใหม่ → content_version ขยับ → dirty
+
+ใช้ DB จริง (DATABASE_URL) แต่ทุกอย่างอยู่ใน transaction เดียวแล้ว rollback ทิ้ง
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/test_content_version_upsert.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import update  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.models import Content  # noqa: E402
+from app.models.enums import Platform  # noqa: E402
+from app.services.tiktok_service import TikTokService  # noqa: E402
+from app.tasks.score_tasks import _dirty_filter  # noqa: E402
+
+ITEM_ID = "test-content-version-upsert"
+
+
+def _video(views: int) -> dict:
+    return {
+        "item_id": ITEM_ID,
+        "share_url": "",
+        "caption": "content_version upsert test",
+        "thumbnail_url": "",
+        "video_duration": 15,
+        "video_views": views,
+        "likes": 10,
+        "comments": 2,
+        "shares": 1,
+        "reach": views,
+        "total_time_watched": 100,
+        "average_time_watched": 5,
+        "full_video_watched_rate": 0.2,
+    }
+
+
+def _is_dirty(db, content_id: int) -> bool:
+    return (
+        db.query(Content.id)
+        .filter(Content.id == content_id, Content.deleted_at.is_(None), _dirty_filter())
+        .first()
+        is not None
+    )
+
+
+def main():
+    db = SessionLocal()
+    try:
+        TikTokService.sync_videos_to_db([_video(1000)], db, official_channels=set(), commit=False)
+        content_id, version = (
+            db.query(Content.id, Content.content_version)
+            .filter(Content.platform == Platform.TIKTOK, Content.platform_post_id == ITEM_ID)
+            .one()
+        )
+        assert _is_dirty(db, content_id), "new content should be dirty"
+        print(f"OK: new content dirty (id={content_id}, content_version={version})")
+
+        db.execute(
+            update(Content)
+            .where(Content.id == content_id)
+            .values(scored_version=Content.content_version, content_version=Content.content_version)
+        )
+        assert not _is_dirty(db, content_id), "scored content should not be dirty"
+        print("OK: scored content clean")
+
+        TikTokService.sync_videos_to_db([_video(1000)], db, official_channels=set(), commit=False)
+        assert not _is_dirty(db, content_id), "unchanged upsert should not mark content dirty"
+        print("OK: unchanged upsert keeps content clean")
+
+        TikTokService.sync_videos_to_db([_video(5000)], db, official_channels=set(), commit=False)
+        new_version = db.query(Content.content_version).filter(Content.id == content_id).scalar()
+        assert new_version > version, (version, new_version)
+        assert _is_dirty(db, content_id), "metrics upsert should mark content dirty"
+        print(f"OK: metrics upsert bumps content_version ({version} -> {new_version}) and marks dirty")
+    finally:
+        db.rollback()
+        db.close()
+
+    print("All content_version upsert checks passed")
+
+
+if __name__ == "__main__":
+    main()
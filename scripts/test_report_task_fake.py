@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+ทดสอบ TikTokReportTaskService กับ fake report task API (ไม่ต้องใช้ token / DB จริง)
+
+ตรวจ:
+1) create_task ส่ง body ครบ (fake ตรวจ field เหมือน API จริง) แล้วได้ task_id
+2) wait_for_task poll จน SUCCESS / task FAILED → ReportTaskError
+3) download ทั้งแบบไฟล์ CSV ตรง ๆ และแบบ JSON ที่มี download_url
+4) header ของ CSV ("Ad ID", "By Day", "Cost", "Conversions" + BOM) ถูก map เป็น key ของ report API
+   และแถวที่ได้แปลงเป็น record ของ ad_performance_daily ได้ (_daily_report_row_to_record)
+
+Usage (PowerShell):
+  $env:PYTHONPATH = 'D:\\GitHubCode\\WeBoostX2'
+  python scripts/test_report_task_fake.py
+"""
+
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_tiktok_report_task_api import FAKE_TOKEN, FakeReportTaskState, start_fake_server  # noqa: E402
+
+ADVERTISER_ID = "7000000000000000000"
+
+
+def _check_rows(rows):
+    assert len(rows) == 3, f"expected 3 rows, got {len(rows)}"
+    first = rows[0]
+    assert set(first) == {"dimensions", "metrics"}, first
+    assert first["dimensions"] == {"ad_id": "1790000000000000001", "stat_time_day": "2025-01-01 00:00:00"}, first
+    assert first["metrics"] == {
+        "spend": "120.50",
+        "impressions": "10000",
+        "clicks": "150",
+        "reach": "8000",
+        "conversion": "3",
+    }, first
+    # "-" = ไม่มีค่า → ตัดทิ้ง
+    assert "conversion" not in rows[2]["metrics"], rows[2]
+
+
+def main():
+    state = FakeReportTaskState(polls_before_success=2)
+    server = start_fake_server(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}/open_api/v1.3"
+
+    # settings อ่าน env ตอน import → ต้องตั้งก่อน import app
+    os.environ["TIKTOK_API_BASE_URL"] = base
+    os.environ["TIKTOK_AD_TOKEN"] = FAKE_TOKEN
+
+    from app.services.tiktok_ads_service import TikTokAdsService
+    from app.services.tiktok_report_task_service import ReportTaskError, TikTokReportTaskService
+
+    try:
+        # 1) create + 2) poll
+        task_id = TikTokReportTaskService.create_task(ADVERTISER_ID, "2025-01-01", "2025-01-02")
+        body = state.tasks[task_id]["body"]
+        assert body["dimensions"] == ["ad_id", "stat_time_day"], body
+        assert body["advertiser_id"] == ADVERTISER_ID, body
+        TikTokReportTaskService.wait_for_task(ADVERTISER_ID, task_id, poll_seconds=0.01, timeout_seconds=5)
+        assert state.tasks[task_id]["polls"] == 3, state.tasks[task_id]
+        print(f"OK: create + poll ({task_id}, {state.tasks[task_id]['polls']} polls)")
+
+        # 3) download (CSV ตรง ๆ) + 4) parse
+        rows = list(TikTokReportTaskService.iter_task_rows(ADVERTISER_ID, task_id))
+        _check_rows(rows)
+        record = TikTokAdsService._daily_report_row_to_record(1, rows[0])
+        assert record["date"] == date(2025, 1, 1), record
+        assert record["spend"] == 120.5 and record["conversions"] == 3, record
+        print("OK: download CSV + header aliases + record")
+
+        # 3) download ผ่าน download_url
+        state.download_mode = "url"
+        rows = list(TikTokReportTaskService.iter_task_rows(ADVERTISER_ID, task_id))
+        _check_rows(rows)
+        assert any(r.startswith("GET /files/") for r in state.requests), state.requests
+        print("OK: download via download_url")
+
+        # task ล้ม / timeout / task_id ผิด → ReportTaskError
+        state.fail_task = True
+        failed_id = TikTokReportTaskService.create_task(ADVERTISER_ID, "2025-01-01", "2025-01-02")
+        try:
+            TikTokReportTaskService.wait_for_task(ADVERTISER_ID, failed_id, poll_seconds=0.01, timeout_seconds=5)
+            raise AssertionError("FAILED task should raise ReportTaskError")
+        except ReportTaskError as e:
+            print(f"OK: failed task raises ({e})")
+
+        state.fail_task = False
+        state.polls_before_success = 1000
+        slow_id = TikTokReportTaskService.create_task(ADVERTISER_ID, "2025-01-01", "2025-01-02")
+        try:
+            TikTokReportTaskService.wait_for_task(ADVERTISER_ID, slow_id, poll_seconds=0.01, timeout_seconds=0.1)
+            raise AssertionError("slow task should time out")
+        except ReportTaskError as e:
+            print(f"OK: timeout raises ({e})")
+
+        try:
+            list(TikTokReportTaskService.iter_task_rows(ADVERTISER_ID, "task-unknown"))
+            raise AssertionError("unknown task download should raise ReportTaskError")
+        except ReportTaskError as e:
+            print(f"OK: download error raises ({e})")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("All report task checks passed")
+
+
+if __name__ == "__main__":
+    main()